@@ -2,6 +2,7 @@
 Factories para criação de dados de teste usando Factory Boy
 """
 import factory
+import pytest
 from factory.django import DjangoModelFactory
 from django.contrib.auth.models import User, Group
 from faker import Faker
@@ -11,6 +12,14 @@ from decimal import Decimal
 fake = Faker('pt_BR')
 
 
+@pytest.fixture(autouse=True)
+def limpar_cache():
+    """Isola o cache entre testes (o banco de testes reutiliza os mesmos IDs de fazenda)"""
+    from django.core.cache import cache
+    cache.clear()
+    yield
+
+
 class UserFactory(DjangoModelFactory):
     class Meta:
         model = User
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 from django.contrib.messages import constants as messages
 
@@ -37,7 +38,6 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'debug_toolbar',  # Django Debug Toolbar
     'django_filters',
     'usuarios.apps.UsuariosConfig',
     'paginas.apps.PaginasConfig',
@@ -49,7 +49,6 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
-    'debug_toolbar.middleware.DebugToolbarMiddleware',  # Django Debug Toolbar (deve estar no topo)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,9 +56,17 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Consultas e tempos por URL (paginas.desempenho); antes do FazendaMiddleware para
+    # medir também a sessão e o usuário, carregados sob demanda por ele
+    'paginas.middleware.DesempenhoMiddleware',
     'perfis.middleware.FazendaMiddleware',  # Middleware de controle de fazenda
 ]
 
+# Django Debug Toolbar somente em desenvolvimento (deve estar no topo do MIDDLEWARE)
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.insert(0, 'debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'farmedicare.urls'
 
 TEMPLATES = [
@@ -85,13 +92,24 @@ WSGI_APPLICATION = 'farmedicare.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite com o perfil de produção (farmedicare.sqlite): WAL, PRAGMAs de desempenho,
+# busy timeout e transações com BEGIN IMMEDIATE para os workers concorrentes do gunicorn
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'farmedicare.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
 
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # Em WAL, só perde os últimos commits se o sistema (não o processo) cair
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,  # Negativo = KiB (64 MB por conexão)
+    'temp_store': 'MEMORY',
+    'busy_timeout': 20000,  # ms esperando o lock de escrita antes de "database is locked"
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -160,9 +178,55 @@ INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
-# Cache Configuration - DESABILITADO para evitar problemas de sincronização
+# Cache Configuration
+# Os dados por fazenda usam chaves versionadas (paginas.cache): qualquer alteração em
+# movimentações, parcelas ou medicamentos troca a versão da fazenda via signals.
+# Backend em arquivo para que a versão seja compartilhada entre os workers do gunicorn.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
     }
-} 
\ No newline at end of file
+}
+
+# Testes (manage.py test ou pytest) usam um cache próprio, em memória: o banco de
+# testes reutiliza os ids de usuários e fazendas, e o cache em arquivo é o mesmo
+# do servidor de desenvolvimento.
+TESTANDO = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTANDO:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'farmedicare-testes',
+        }
+    }
+
+# Relatórios em PDF gerados em segundo plano (relatorios.jobs)
+# RELATORIOS_PDF_EXECUCAO: 'thread' (pool local de threads) ou 'sincrona' (na própria requisição)
+RELATORIOS_PDF_DIR = os.path.join(BASE_DIR, 'relatorios_gerados')
+RELATORIOS_PDF_WORKERS = 2
+RELATORIOS_PDF_EXECUCAO = 'thread'
+RELATORIOS_PDF_RETENCAO_HORAS = 24
+
+# Orçamento por requisição (paginas.desempenho): acima dele a requisição vai para o log
+# (logger paginas.desempenho); os testes verificam o número de consultas das páginas
+# principais com os mesmos limites. Chaves: nome da URL ou 'padrao'.
+DESEMPENHO_ORCAMENTOS = {
+    'padrao': {'consultas': 15, 'tempo_banco_ms': 250, 'tempo_total_ms': 1000},
+    # Dashboards: a primeira leitura do dia também materializa as notificações
+    'pagina_index': {'consultas': 35},
+    'dashboard_relatorios': {'consultas': 30},
+    'api_notificacoes': {'consultas': 8, 'tempo_total_ms': 200},
+}
+DESEMPENHO_INTERVALO_GRAVACAO = 30  # segundos entre as gravações dos agregados de cada processo
+
+# Stream de notificações (Server-Sent Events, relatorios.views.stream_notificacoes)
+# Só vale a pena servido por ASGI (uvicorn/daphne): em WSGI cada conexão prende um worker.
+# Desligado, o endpoint responde 204 e o notificacoes.js volta à consulta periódica.
+NOTIFICACOES_STREAM = os.environ.get('NOTIFICACOES_STREAM', '') == '1'
+NOTIFICACOES_STREAM_INTERVALO = 5  # segundos entre as verificações da versão da fazenda
+NOTIFICACOES_STREAM_DURACAO = 300  # segundos até encerrar a conexão (o navegador reconecta)
@@ -0,0 +1,36 @@
+"""
+Backend SQLite de produção (ENGINE = 'farmedicare.sqlite')
+
+O backend sqlite3 padrão do Django abre o banco com o journal em rollback, fsync
+completo a cada commit e transações deferidas: com vários workers do gunicorn, a
+transação que começa lendo e depois tenta escrever falha na hora com
+"database is locked" (o upgrade do lock não espera o busy timeout).
+
+Este backend:
+    - aplica os PRAGMAs de settings.SQLITE_PRAGMAS em cada conexão nova (WAL,
+      synchronous=NORMAL, mmap_size, cache_size, temp_store e busy_timeout)
+    - inicia as transações (atomic) com BEGIN IMMEDIATE: o lock de escrita é pego
+      no início e a espera por ele respeita o busy_timeout
+
+Em WAL as leituras não bloqueiam a escrita nem são bloqueadas por ela.
+`python manage.py benchmark_sqlite` compara o perfil padrão com este.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+def aplicar_pragmas(conexao, pragmas):
+    """Aplica os PRAGMAs em uma conexão sqlite3 (journal_mode primeiro: os outros dependem dele)"""
+    for nome, valor in sorted(pragmas.items(), key=lambda item: item[0] != 'journal_mode'):
+        conexao.execute(f'PRAGMA {nome} = {valor}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        conexao = super().get_new_connection(conn_params)
+        aplicar_pragmas(conexao, getattr(settings, 'SQLITE_PRAGMAS', {}))
+        return conexao
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
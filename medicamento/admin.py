@@ -5,6 +5,7 @@ from .models import Medicamento, EntradaMedicamento, SaidaMedicamento
 @admin.register(Medicamento)
 class MedicamentoAdmin(admin.ModelAdmin):
     list_display = ['nome', 'fazenda', 'quantidade_total', 'proxima_validade']
+    list_select_related = ['fazenda', 'estoque']
     list_filter = ['fazenda']
     search_fields = ['nome']
 
@@ -14,7 +14,7 @@ def notificacoes_medicamentos(request):
         fazenda_ativa = request.fazenda_ativa if hasattr(request, 'fazenda_ativa') else None
         
         return {
-            'notificacoes_count': contar_notificacoes_nao_lidas(fazenda=fazenda_ativa)
+            'notificacoes_count': contar_notificacoes_nao_lidas(fazenda=fazenda_ativa, request=request)
         }
     return {
         'notificacoes_count': 0
@@ -186,3 +186,33 @@ class EntradaMedicamentoForm(forms.ModelForm):
         return valor
     
     # Removido clean_cadastrada_por - campo não está mais no formulário
+
+
+class EntradaMedicamentoImportacaoForm(EntradaMedicamentoForm):
+    """
+    EntradaMedicamentoForm aplicado a uma linha de planilha (paginas.importacao).
+    O medicamento chega pelo nome e é resolvido no índice em memória do importador,
+    sem query por linha; as demais regras são as do formulário.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.medicamentos = kwargs.pop('medicamentos')  # nome normalizado -> Medicamento
+        super().__init__(*args, **kwargs)
+        # Relação resolvida no clean() pelo nome (e excluída da validação do modelo)
+        del self.fields['medicamento']
+
+    def clean(self):
+        from paginas.importacao import normalizar_nome
+
+        cleaned_data = super().clean()
+
+        nome = str(self.data.get('medicamento') or '').strip()
+        medicamento = self.medicamentos.get(normalizar_nome(nome))
+        if not nome:
+            self.add_error(None, 'Informe o medicamento.')
+        elif medicamento is None:
+            self.add_error(None, f'Medicamento "{nome}" não encontrado nesta fazenda.')
+        else:
+            cleaned_data['medicamento'] = medicamento
+
+        return cleaned_data
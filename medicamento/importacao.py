@@ -0,0 +1,55 @@
+"""
+Importação de entradas de medicamentos a partir de planilhas
+
+Colunas: medicamento, quantidade, valor_medicamento, validade (obrigatórias);
+observacao (opcional). Veja paginas.importacao para o pipeline.
+"""
+from django.db import transaction
+
+from paginas import busca
+from paginas.cache import invalidar_ao_gravar
+from paginas.importacao import Importador, normalizar_decimal, normalizar_nome
+from relatorios.notificacoes import materializar_notificacoes
+
+from .forms import EntradaMedicamentoImportacaoForm
+from .models import EntradaMedicamento, EstoqueMedicamento, Medicamento
+
+
+class ImportadorEntradasMedicamento(Importador):
+    colunas_obrigatorias = ('medicamento', 'quantidade', 'valor_medicamento', 'validade')
+    form_class = EntradaMedicamentoImportacaoForm
+
+    def carregar_indices(self):
+        """Medicamentos da fazenda por nome normalizado (uma query)"""
+        self.medicamentos = {
+            normalizar_nome(medicamento.nome): medicamento
+            for medicamento in Medicamento.objects.filter(fazenda=self.fazenda)
+        }
+        self.medicamentos_alterados = set()
+
+    def argumentos_formulario(self):
+        return {'medicamentos': self.medicamentos}
+
+    def validar_linha(self, dados):
+        dados = dict(dados)
+        dados['valor_medicamento'] = normalizar_decimal(dados.get('valor_medicamento', ''))
+
+        entrada = self.validar_com_formulario(dados, EntradaMedicamento())
+        entrada.cadastrada_por = self.usuario
+        # Feito pelo save() no cadastro individual
+        entrada.quantidade_disponivel = entrada.quantidade
+        entrada.fazenda_id = self.fazenda.pk
+        return entrada
+
+    def gravar_bloco(self, objetos):
+        EntradaMedicamento.objects.bulk_create(objetos)
+        # bulk_create não dispara os signals: documentos de busca gravados no mesmo bloco
+        busca.indexar(busca.TIPO_ENTRADA_MEDICAMENTO, objetos)
+        self.medicamentos_alterados.update(entrada.medicamento_id for entrada in objetos)
+
+    def finalizar(self):
+        # bulk_create não passa pelo save(): estoque e cache atualizados de uma vez
+        with transaction.atomic():
+            EstoqueMedicamento.reconstruir(Medicamento.objects.filter(pk__in=self.medicamentos_alterados))
+            invalidar_ao_gravar(self.fazenda.pk)
+        materializar_notificacoes(self.fazenda.pk)
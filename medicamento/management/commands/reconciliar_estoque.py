@@ -0,0 +1,33 @@
+"""
+Reconstrói o snapshot de estoque (EstoqueMedicamento) a partir do histórico
+de entradas e saídas.
+
+Uso:
+    python manage.py reconciliar_estoque
+    python manage.py reconciliar_estoque --fazenda 3
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from medicamento.models import EstoqueMedicamento, Medicamento
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o estoque desnormalizado dos medicamentos a partir das entradas e saídas"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fazenda',
+            type=int,
+            help='ID da fazenda a reconciliar (padrão: todas)',
+        )
+
+    def handle(self, *args, **options):
+        medicamentos = Medicamento.objects.all()
+        if options['fazenda']:
+            medicamentos = medicamentos.filter(fazenda_id=options['fazenda'])
+
+        with transaction.atomic():
+            total = EstoqueMedicamento.reconstruir(medicamentos)
+
+        self.stdout.write(self.style.SUCCESS(f'{total} estoque(s) de medicamento reconciliado(s).'))
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.23 on 2026-10-17 15:48
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def popular_estoque(apps, schema_editor):
+    """Cria o snapshot de estoque dos medicamentos existentes a partir do histórico"""
+    from django.db.models import Min, Sum
+
+    Medicamento = apps.get_model('medicamento', 'Medicamento')
+    EntradaMedicamento = apps.get_model('medicamento', 'EntradaMedicamento')
+    SaidaMedicamento = apps.get_model('medicamento', 'SaidaMedicamento')
+    EstoqueMedicamento = apps.get_model('medicamento', 'EstoqueMedicamento')
+
+    entradas = dict(
+        EntradaMedicamento.objects.order_by().values('medicamento_id')
+        .annotate(total=Sum('quantidade')).values_list('medicamento_id', 'total')
+    )
+    saidas = dict(
+        SaidaMedicamento.objects.order_by().values('medicamento_id')
+        .annotate(total=Sum('quantidade')).values_list('medicamento_id', 'total')
+    )
+    lotes = {
+        row['medicamento_id']: row
+        for row in EntradaMedicamento.objects.filter(quantidade_disponivel__gt=0)
+        .order_by().values('medicamento_id')
+        .annotate(valor=Sum('valor_medicamento'), validade=Min('validade'))
+    }
+
+    EstoqueMedicamento.objects.bulk_create([
+        EstoqueMedicamento(
+            medicamento_id=medicamento_id,
+            quantidade=(entradas.get(medicamento_id) or 0) - (saidas.get(medicamento_id) or 0),
+            valor_total=lotes.get(medicamento_id, {}).get('valor') or Decimal('0.00'),
+            proxima_validade=lotes.get(medicamento_id, {}).get('validade'),
+        )
+        for medicamento_id in Medicamento.objects.values_list('id', flat=True)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicamento', '0002_alter_medicamento_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstoqueMedicamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.IntegerField(default=0, help_text='Entradas - saídas', verbose_name='Quantidade em Estoque')),
+                ('valor_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Soma do valor das entradas que ainda possuem estoque', max_digits=12, verbose_name='Valor em Estoque')),
+                ('proxima_validade', models.DateField(blank=True, null=True, verbose_name='Próxima Validade')),
+                ('atualizado_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Atualizado Em')),
+                ('medicamento', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='estoque', to='medicamento.medicamento', verbose_name='Medicamento')),
+            ],
+            options={
+                'verbose_name': 'Estoque de Medicamento',
+                'verbose_name_plural': 'Estoques de Medicamentos',
+            },
+        ),
+        migrations.RunPython(popular_estoque, migrations.RunPython.noop),
+    ]
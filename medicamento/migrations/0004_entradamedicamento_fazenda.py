@@ -0,0 +1,52 @@
+# Generated by Django 4.2.23 on 2026-10-17 17:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def popular_fazenda(apps, schema_editor):
+    """Copia a fazenda do medicamento para as entradas existentes"""
+    from django.db.models import OuterRef, Subquery
+
+    Medicamento = apps.get_model('medicamento', 'Medicamento')
+    EntradaMedicamento = apps.get_model('medicamento', 'EntradaMedicamento')
+
+    medicamento = Medicamento.objects.filter(pk=OuterRef('medicamento_id'))
+    EntradaMedicamento.objects.update(fazenda_id=Subquery(medicamento.values('fazenda_id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfis', '0001_initial'),
+        ('medicamento', '0003_estoquemedicamento'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='entradamedicamento',
+            name='medicamento_validad_7cd097_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='entradamedicamento',
+            name='medicamento_validad_7a4993_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='entradamedicamento',
+            name='medicamento_medicam_a4f2a7_idx',
+        ),
+        migrations.AddField(
+            model_name='entradamedicamento',
+            name='fazenda',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='entradas_medicamento', to='perfis.fazenda', verbose_name='Fazenda'),
+        ),
+        migrations.RunPython(popular_fazenda, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='entradamedicamento',
+            index=models.Index(condition=models.Q(('quantidade_disponivel__gt', 0)), fields=['fazenda', 'validade'], name='entrada_estoque_fazenda_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entradamedicamento',
+            index=models.Index(condition=models.Q(('quantidade_disponivel__gt', 0)), fields=['medicamento', 'validade'], name='entrada_estoque_medic_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicamento', '0004_entradamedicamento_fazenda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entradamedicamento',
+            name='versao',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Versão'),
+        ),
+    ]
@@ -1,5 +1,11 @@
 from django.db import models
+from django.db.models import F, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 from datetime import date
+from decimal import Decimal
 from django.contrib.auth.models import User
 from perfis.models import Fazenda
 
@@ -13,23 +19,40 @@ class Medicamento(models.Model):
     def __str__(self):
         return f"{self.nome}"
 
+    def save(self, *args, **kwargs):
+        anterior = None
+        if self.pk:
+            anterior = Medicamento.objects.filter(pk=self.pk).values_list('fazenda_id', flat=True).first()
+        super().save(*args, **kwargs)
+        # Mantém a cópia da fazenda nas entradas
+        if anterior is not None and anterior != self.fazenda_id:
+            self.entradamedicamento_set.update(fazenda_id=self.fazenda_id)
+
+    def _get_estoque(self):
+        """
+        Retorna o snapshot de estoque (EstoqueMedicamento) do medicamento.
+        Use select_related('estoque') nas listagens para evitar uma query por linha.
+        """
+        try:
+            return self.estoque
+        except EstoqueMedicamento.DoesNotExist:
+            # Medicamento sem snapshot (ex.: dados anteriores ao ledger) - reconstrói do histórico
+            return EstoqueMedicamento.recalcular(self.pk)
+
     @property
     def proxima_validade(self):
         """
-        Retorna a validade mais próxima (a primeira a vencer) entre as entradas.
-        Se não houver entradas, retorna None.
+        Retorna a validade mais próxima (a primeira a vencer) entre as entradas
+        que ainda possuem estoque. Se não houver, retorna None.
         """
-        entrada = self.entradamedicamento_set.order_by("validade").first()
-        return entrada.validade if entrada else None
+        return self._get_estoque().proxima_validade
 
     @property
     def quantidade_total(self):
         """
-        Calcula o estoque atual: entradas - saídas.
+        Estoque atual (entradas - saídas), lido do snapshot EstoqueMedicamento.
         """
-        entradas = sum(e.quantidade for e in self.entradamedicamento_set.all())
-        saidas = sum(s.quantidade for s in self.saidamedicamento_set.all())
-        return entradas - saidas
+        return self._get_estoque().quantidade
 
     class Meta:
         verbose_name = "Medicamento"
@@ -63,13 +86,43 @@ class EntradaMedicamento(models.Model):
         auto_now_add=True, verbose_name="Data de Cadastro"
     )
     observacao = models.TextField(blank=True, null=True, verbose_name="Observação")
+    # Cópia desnormalizada de medicamento.fazenda (mantida pelo save de EntradaMedicamento
+    # e Medicamento) para filtrar o estoque da fazenda sem join
+    fazenda = models.ForeignKey(
+        Fazenda,
+        on_delete=models.CASCADE,
+        null=True,
+        editable=False,
+        related_name="entradas_medicamento",
+        verbose_name="Fazenda",
+    )
+    # Incrementada a cada baixa de estoque (e a cada edição): as saídas só descontam
+    # o lote se ele ainda está na versão lida (medicamento.saidas)
+    versao = models.PositiveIntegerField(default=0, editable=False, verbose_name="Versão")
 
     def save(self, *args, **kwargs):
         # Se é nova entrada, quantidade_disponivel = quantidade
+        anterior = None
         if not self.pk:
             self.quantidade_disponivel = self.quantidade
+        else:
+            anterior = EntradaMedicamento.objects.filter(pk=self.pk).values(
+                'medicamento_id', 'quantidade'
+            ).first()
+            self.versao += 1
+        if self.fazenda_id is None or (anterior and anterior['medicamento_id'] != self.medicamento_id):
+            self.fazenda_id = self.medicamento.fazenda_id
         super().save(*args, **kwargs)
 
+        # Manter o snapshot de estoque sincronizado
+        if anterior and anterior['medicamento_id'] != self.medicamento_id:
+            # Entrada movida para outro medicamento
+            EstoqueMedicamento.registrar_movimento(anterior['medicamento_id'], -anterior['quantidade'])
+            EstoqueMedicamento.registrar_movimento(self.medicamento_id, self.quantidade)
+        else:
+            delta = self.quantidade - (anterior['quantidade'] if anterior else 0)
+            EstoqueMedicamento.registrar_movimento(self.medicamento_id, delta)
+
     def __str__(self):
         return f"{self.medicamento.nome} - {self.quantidade_disponivel}/{self.quantidade} un. - Validade: {self.validade}"
 
@@ -78,9 +131,18 @@ class EntradaMedicamento(models.Model):
         verbose_name_plural = "Entradas de Medicamentos"
         ordering = ["validade"]
         indexes = [
-            models.Index(fields=['validade']),
-            models.Index(fields=['validade', 'quantidade_disponivel']),
-            models.Index(fields=['medicamento', 'validade']),
+            # OTIMIZADO: índices parciais só com os lotes que ainda têm estoque
+            # (vencimentos, listagem do estoque e saídas por validade)
+            models.Index(
+                fields=['fazenda', 'validade'],
+                condition=Q(quantidade_disponivel__gt=0),
+                name='entrada_estoque_fazenda_idx',
+            ),
+            models.Index(
+                fields=['medicamento', 'validade'],
+                condition=Q(quantidade_disponivel__gt=0),
+                name='entrada_estoque_medic_idx',
+            ),
             models.Index(fields=['-data_cadastro']),
         ]
 
@@ -104,6 +166,22 @@ class SaidaMedicamento(models.Model):
         auto_now_add=True, verbose_name="Data da Saída"
     )
 
+    def save(self, *args, **kwargs):
+        anterior = None
+        if self.pk:
+            anterior = SaidaMedicamento.objects.filter(pk=self.pk).values(
+                'medicamento_id', 'quantidade'
+            ).first()
+        super().save(*args, **kwargs)
+
+        # Manter o snapshot de estoque sincronizado
+        if anterior and anterior['medicamento_id'] != self.medicamento_id:
+            EstoqueMedicamento.registrar_movimento(anterior['medicamento_id'], anterior['quantidade'])
+            EstoqueMedicamento.registrar_movimento(self.medicamento_id, -self.quantidade)
+        else:
+            delta = self.quantidade - (anterior['quantidade'] if anterior else 0)
+            EstoqueMedicamento.registrar_movimento(self.medicamento_id, -delta)
+
     def __str__(self):
         return f"Saída: {self.medicamento.nome} - {self.quantidade} un. (Entrada #{self.entrada.id})"
 
@@ -111,3 +189,153 @@ class SaidaMedicamento(models.Model):
         verbose_name = "Saída de Medicamento"
         verbose_name_plural = "Saídas de Medicamentos"
         ordering = ["-data_saida"]
+
+
+class EstoqueMedicamento(models.Model):
+    """
+    Snapshot desnormalizado do estoque de cada medicamento.
+
+    Mantido pelos saves de EntradaMedicamento/SaidaMedicamento e pelos signals
+    de exclusão, permitindo ler o estoque em O(1) por medicamento.
+    Pode ser reconstruído a partir do histórico com:
+        python manage.py reconciliar_estoque
+    """
+    medicamento = models.OneToOneField(
+        Medicamento,
+        on_delete=models.CASCADE,
+        related_name='estoque',
+        verbose_name="Medicamento"
+    )
+    quantidade = models.IntegerField(
+        default=0,
+        verbose_name="Quantidade em Estoque",
+        help_text="Entradas - saídas"
+    )
+    valor_total = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal('0.00'),
+        verbose_name="Valor em Estoque",
+        help_text="Soma do valor das entradas que ainda possuem estoque"
+    )
+    proxima_validade = models.DateField(
+        blank=True, null=True, verbose_name="Próxima Validade"
+    )
+    atualizado_em = models.DateTimeField(
+        default=timezone.now, verbose_name="Atualizado Em"
+    )
+
+    def __str__(self):
+        return f"{self.medicamento.nome} - {self.quantidade} un."
+
+    @staticmethod
+    def _lotes_ativos():
+        """Subqueries de valor e validade das entradas com estoque (correlacionadas por medicamento)"""
+        lotes = EntradaMedicamento.objects.filter(
+            medicamento_id=OuterRef('medicamento_id'),
+            quantidade_disponivel__gt=0
+        ).order_by().values('medicamento_id')
+        valor = Subquery(lotes.annotate(total=Sum('valor_medicamento')).values('total')[:1])
+        validade = Subquery(lotes.annotate(minima=Min('validade')).values('minima')[:1])
+        return valor, validade
+
+    @classmethod
+    def registrar_movimento(cls, medicamento_id, delta_quantidade=0, criar=True):
+        """
+        Aplica uma variação de quantidade no snapshot e atualiza valor/validade
+        a partir dos lotes ativos, tudo em um único UPDATE.
+
+        Se o snapshot ainda não existir e criar=True, reconstrói do histórico.
+        """
+        valor, validade = cls._lotes_ativos()
+        atualizados = cls.objects.filter(medicamento_id=medicamento_id).update(
+            quantidade=F('quantidade') + delta_quantidade,
+            valor_total=Coalesce(valor, Value(Decimal('0.00')), output_field=models.DecimalField()),
+            proxima_validade=validade,
+            atualizado_em=timezone.now(),
+        )
+        if not atualizados and criar:
+            cls.recalcular(medicamento_id)
+        return atualizados
+
+    @classmethod
+    def recalcular(cls, medicamento_id):
+        """Reconstrói o snapshot de um medicamento a partir do histórico"""
+        cls.reconstruir(Medicamento.objects.filter(pk=medicamento_id))
+        return cls.objects.filter(medicamento_id=medicamento_id).first()
+
+    @classmethod
+    def reconstruir(cls, medicamentos=None):
+        """
+        Reconstrói os snapshots dos medicamentos informados (todos se None)
+        a partir de EntradaMedicamento e SaidaMedicamento.
+        Usa agregações agrupadas: número de queries constante.
+
+        Returns:
+            int: Quantidade de snapshots criados ou atualizados
+        """
+        if medicamentos is None:
+            medicamentos = Medicamento.objects.all()
+        ids = list(medicamentos.values_list('id', flat=True))
+        if not ids:
+            return 0
+
+        entradas = {
+            row['medicamento_id']: row['total']
+            for row in EntradaMedicamento.objects.filter(medicamento_id__in=ids)
+            .order_by().values('medicamento_id').annotate(total=Sum('quantidade'))
+        }
+        saidas = {
+            row['medicamento_id']: row['total']
+            for row in SaidaMedicamento.objects.filter(medicamento_id__in=ids)
+            .order_by().values('medicamento_id').annotate(total=Sum('quantidade'))
+        }
+        lotes = {
+            row['medicamento_id']: row
+            for row in EntradaMedicamento.objects.filter(
+                medicamento_id__in=ids, quantidade_disponivel__gt=0
+            ).order_by().values('medicamento_id').annotate(
+                valor=Sum('valor_medicamento'), validade=Min('validade')
+            )
+        }
+        existentes = {e.medicamento_id: e for e in cls.objects.filter(medicamento_id__in=ids)}
+
+        agora = timezone.now()
+        novos, alterados = [], []
+        for medicamento_id in ids:
+            lote = lotes.get(medicamento_id, {})
+            estoque = existentes.get(medicamento_id) or cls(medicamento_id=medicamento_id)
+            estoque.quantidade = (entradas.get(medicamento_id) or 0) - (saidas.get(medicamento_id) or 0)
+            estoque.valor_total = lote.get('valor') or Decimal('0.00')
+            estoque.proxima_validade = lote.get('validade')
+            estoque.atualizado_em = agora
+            (alterados if estoque.pk else novos).append(estoque)
+
+        cls.objects.bulk_create(novos, batch_size=500)
+        cls.objects.bulk_update(
+            alterados, ['quantidade', 'valor_total', 'proxima_validade', 'atualizado_em'], batch_size=500
+        )
+        return len(novos) + len(alterados)
+
+    class Meta:
+        verbose_name = "Estoque de Medicamento"
+        verbose_name_plural = "Estoques de Medicamentos"
+
+
+@receiver(post_save, sender=Medicamento)
+def criar_estoque_medicamento(sender, instance, created, **kwargs):
+    """
+    Signal para criar o snapshot de estoque (zerado) quando um medicamento é criado
+    """
+    if created:
+        EstoqueMedicamento.objects.get_or_create(medicamento=instance)
+
+
+@receiver(post_delete, sender=EntradaMedicamento)
+def estoque_entrada_excluida(sender, instance, **kwargs):
+    """Remove do snapshot a quantidade de uma entrada excluída"""
+    EstoqueMedicamento.registrar_movimento(instance.medicamento_id, -instance.quantidade, criar=False)
+
+
+@receiver(post_delete, sender=SaidaMedicamento)
+def estoque_saida_excluida(sender, instance, **kwargs):
+    """Devolve ao snapshot a quantidade de uma saída excluída"""
+    EstoqueMedicamento.registrar_movimento(instance.medicamento_id, instance.quantidade, criar=False)
@@ -38,7 +38,7 @@ def gerar_notificacoes_medicamentos(fazenda=None):
     # ========== OTIMIZAÇÃO: Filtrar antes de carregar + FILTRAR POR FAZENDA ==========
     # Buscar apenas entradas que precisam de notificação (≤30 dias E quantidade disponível)
     entradas = EntradaMedicamento.objects.filter(
-        medicamento__fazenda=fazenda,
+        fazenda=fazenda,
         validade__lte=limite_critico,
         quantidade_disponivel__gt=0
     ).select_related(
@@ -103,27 +103,23 @@ def gerar_notificacoes_medicamentos(fazenda=None):
     }
 
 
-def contar_notificacoes_nao_lidas(fazenda=None):
+def contar_notificacoes_nao_lidas(fazenda=None, request=None):
     """
-    Conta quantas notificações ativas existem (para o badge).
+    Conta quantas notificações ativas de medicamentos existem (para o badge).
     
-    OTIMIZADO: Usa count() direto no banco ao invés de carregar todos os objetos
+    OTIMIZADO: Lê do resumo de notificações compartilhado (tabela materializada,
+    com cache por fazenda e memorizado por requisição)
     
     Args:
         fazenda: Fazenda para filtrar notificações (None retorna 0)
+        request: Requisição atual, para reaproveitar o resumo já calculado
     
     Returns:
         int: Número de notificações não lidas
     """
+    from relatorios.notificacoes import resumo_notificacoes
+    
     if not fazenda:
         return 0
     
-    hoje = date.today()
-    limite_critico = hoje + timedelta(days=30)
-    
-    # Count direto no banco - muito mais rápido - FILTRANDO POR FAZENDA
-    return EntradaMedicamento.objects.filter(
-        medicamento__fazenda=fazenda,
-        validade__lte=limite_critico,
-        quantidade_disponivel__gt=0
-    ).only('id').count()
+    return resumo_notificacoes(fazenda, request=request)['medicamentos']
@@ -0,0 +1,268 @@
+"""
+Motor de Saída de Medicamentos (FIFO - First In, First Out)
+
+Planeja toda a retirada em memória (lotes com validade mais próxima primeiro)
+e grava o resultado em lote, numa única transação: baixa condicional dos lotes +
+bulk_create das saídas + atualização do EstoqueMedicamento.
+
+Concorrência sem travas (select_for_update não trava nada no SQLite): a baixa é um
+UPDATE que só desconta os lotes ainda na versão lida e com saldo suficiente.
+Se outra saída alterou algum lote entre a leitura e a gravação, a transação é
+desfeita e o plano é refeito com os saldos novos (até TENTATIVAS_SAIDA vezes).
+"""
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+
+from medicamento.models import EntradaMedicamento, EstoqueMedicamento, Medicamento, SaidaMedicamento
+from paginas.cache import invalidar_ao_gravar
+from relatorios.notificacoes import agendar_atualizacao
+
+
+TENTATIVAS_SAIDA = 5
+LOTE_BAIXA = 200  # lotes por UPDATE (limite de profundidade de expressões do SQLite)
+
+
+class SaidaMedicamentoError(Exception):
+    """
+    Erro de validação ao registrar uma saída.
+    `status` é o código HTTP sugerido para a resposta da API.
+    """
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        self.status = status
+
+
+def normalizar_itens(itens, motivo_padrao=''):
+    """
+    Valida a lista de saídas solicitadas.
+
+    Args:
+        itens: Lista de dicts com 'medicamento_id', 'quantidade' e 'motivo' (opcional)
+        motivo_padrao: Motivo usado quando o item não informa um
+
+    Returns:
+        list: Itens com medicamento_id e quantidade convertidos para int
+
+    Raises:
+        SaidaMedicamentoError: Se algum item for inválido
+    """
+    if not isinstance(itens, list) or not itens:
+        raise SaidaMedicamentoError('Informe ao menos um medicamento para saída.')
+
+    normalizados = []
+    for item in itens:
+        if not isinstance(item, dict):
+            raise SaidaMedicamentoError('Item de saída inválido.')
+
+        medicamento_id = item.get('medicamento_id')
+        quantidade = item.get('quantidade')
+        if not medicamento_id or not quantidade:
+            raise SaidaMedicamentoError('Medicamento e quantidade são obrigatórios.')
+
+        try:
+            medicamento_id = int(medicamento_id)
+        except (TypeError, ValueError):
+            raise SaidaMedicamentoError('Medicamento inválido.')
+
+        try:
+            quantidade = int(quantidade)
+            if quantidade <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            raise SaidaMedicamentoError('Quantidade deve ser um número positivo.')
+
+        normalizados.append({
+            'medicamento_id': medicamento_id,
+            'quantidade': quantidade,
+            'motivo': item.get('motivo', motivo_padrao) or '',
+        })
+    return normalizados
+
+
+def planejar_fifo(lotes, quantidade):
+    """
+    Distribui a quantidade entre os lotes (já ordenados por validade).
+
+    Não grava nada no banco: apenas desconta `quantidade_disponivel` dos objetos
+    em memória, para que itens seguintes do mesmo lote vejam o saldo restante.
+
+    Returns:
+        list: Tuplas (entrada, quantidade_retirada)
+
+    Raises:
+        SaidaMedicamentoError: Se o saldo dos lotes não cobrir a quantidade
+    """
+    disponivel = sum(entrada.quantidade_disponivel for entrada in lotes)
+    if quantidade > disponivel:
+        raise SaidaMedicamentoError(f'Estoque insuficiente. Disponível: {disponivel} unidades.')
+
+    plano = []
+    restante = quantidade
+    for entrada in lotes:
+        if restante <= 0:
+            break
+        if entrada.quantidade_disponivel <= 0:
+            continue
+
+        retirada = min(restante, entrada.quantidade_disponivel)
+        entrada.quantidade_disponivel -= retirada
+        plano.append((entrada, retirada))
+        restante -= retirada
+    return plano
+
+
+class ConflitoEstoque(Exception):
+    """Algum lote mudou entre a leitura e a baixa (outra saída simultânea)"""
+
+
+def baixar_lotes(retiradas):
+    """
+    Desconta as retiradas dos lotes com UPDATEs condicionais:
+
+        UPDATE ... SET quantidade_disponivel = quantidade_disponivel - n, versao = versao + 1
+        WHERE (id = x AND versao = v AND quantidade_disponivel >= n) OR ...
+
+    Args:
+        retiradas: Lista de (entrada, quantidade), com a entrada na versão lida
+
+    Raises:
+        ConflitoEstoque: Se algum lote não foi descontado (a transação deve ser desfeita)
+    """
+    for inicio in range(0, len(retiradas), LOTE_BAIXA):
+        lote = retiradas[inicio:inicio + LOTE_BAIXA]
+        condicao = Q()
+        for entrada, quantidade in lote:
+            condicao |= Q(pk=entrada.pk, versao=entrada.versao, quantidade_disponivel__gte=quantidade)
+        atualizados = EntradaMedicamento.objects.filter(condicao).update(
+            quantidade_disponivel=Case(
+                *[When(pk=entrada.pk, then=F('quantidade_disponivel') - quantidade) for entrada, quantidade in lote]
+            ),
+            versao=F('versao') + 1,
+        )
+        if atualizados != len(lote):
+            raise ConflitoEstoque()
+    for entrada, _ in retiradas:
+        entrada.versao += 1
+
+
+def registrar_saidas(fazenda, usuario, itens):
+    """
+    Registra as saídas de um ou mais medicamentos da fazenda em uma única transação.
+
+    Custo fixo de queries por lote (não por entrada): uma leitura dos medicamentos,
+    uma leitura dos lotes, a baixa condicional, bulk_create e uma atualização de
+    estoque por medicamento. Em conflito com outra saída, tudo é refeito.
+
+    Args:
+        fazenda: Fazenda ativa (os medicamentos devem pertencer a ela)
+        usuario: Usuário que registra as saídas
+        itens: Itens já validados por normalizar_itens()
+
+    Returns:
+        list: Um dict por item com medicamento, quantidade, novo_estoque e entradas_processadas
+
+    Raises:
+        SaidaMedicamentoError: Medicamento inexistente, estoque insuficiente ou
+                               conflitos seguidos com outras saídas (status 409)
+    """
+    for _ in range(TENTATIVAS_SAIDA):
+        try:
+            return _registrar_saidas(fazenda, usuario, itens)
+        except ConflitoEstoque:
+            continue
+    raise SaidaMedicamentoError(
+        'O estoque foi alterado por outra saída simultânea. Tente novamente.', status=409
+    )
+
+
+def _registrar_saidas(fazenda, usuario, itens):
+    ids = {item['medicamento_id'] for item in itens}
+
+    with transaction.atomic():
+        medicamentos = {
+            m.id: m for m in Medicamento.objects.filter(fazenda=fazenda, id__in=ids)
+        }
+        if len(medicamentos) != len(ids):
+            raise SaidaMedicamentoError(
+                'Medicamento não encontrado ou não pertence à fazenda ativa.', status=404
+            )
+
+        # Lotes com saldo, ordenados por validade (FIFO); a versão lida protege a baixa
+        lotes = defaultdict(list)
+        for entrada in EntradaMedicamento.objects.filter(
+            medicamento_id__in=ids,
+            quantidade_disponivel__gt=0
+        ).order_by('medicamento_id', 'validade', 'id'):
+            lotes[entrada.medicamento_id].append(entrada)
+
+        # Planejar tudo em memória antes de gravar
+        planos = []
+        for item in itens:
+            medicamento = medicamentos[item['medicamento_id']]
+            lotes_medicamento = lotes[medicamento.id]
+            if not any(e.quantidade_disponivel > 0 for e in lotes_medicamento):
+                raise SaidaMedicamentoError(f'Não há estoque disponível para {medicamento.nome}.')
+            try:
+                plano = planejar_fifo(lotes_medicamento, item['quantidade'])
+            except SaidaMedicamentoError as erro:
+                if len(itens) > 1:
+                    erro.mensagem = f'{medicamento.nome}: {erro.mensagem}'
+                raise
+            planos.append((item, medicamento, plano))
+
+        # Gravar em lote
+        alteradas = {}
+        retirado_por_entrada = defaultdict(int)
+        saidas = []
+        for item, medicamento, plano in planos:
+            for entrada, retirada in plano:
+                alteradas[entrada.id] = entrada
+                retirado_por_entrada[entrada.id] += retirada
+                saidas.append(SaidaMedicamento(
+                    medicamento=medicamento,
+                    entrada=entrada,
+                    quantidade=retirada,
+                    motivo=item['motivo'],
+                    registrada_por=usuario,
+                ))
+
+        baixar_lotes([(alteradas[pk], total) for pk, total in retirado_por_entrada.items()])
+        SaidaMedicamento.objects.bulk_create(saidas, batch_size=500)
+
+        # bulk_create não chama save(): atualizar o snapshot de estoque explicitamente
+        retirado_por_medicamento = defaultdict(int)
+        for item, medicamento, _ in planos:
+            retirado_por_medicamento[medicamento.id] += item['quantidade']
+        for medicamento_id, total in retirado_por_medicamento.items():
+            EstoqueMedicamento.registrar_movimento(medicamento_id, -total)
+        # A baixa também não dispara os signals: lotes zerados saem das notificações
+        agendar_atualizacao(fazenda.pk, entradas=Q(pk__in=list(alteradas)))
+        # Nem o cache da fazenda (contagens, resumos): regra em paginas.cache
+        invalidar_ao_gravar(fazenda.pk)
+
+        estoques = dict(
+            EstoqueMedicamento.objects.filter(
+                medicamento_id__in=retirado_por_medicamento
+            ).values_list('medicamento_id', 'quantidade')
+        )
+
+    resultados = []
+    saidas_iter = iter(saidas)
+    for item, medicamento, plano in planos:
+        resultados.append({
+            'medicamento': medicamento,
+            'quantidade': item['quantidade'],
+            'novo_estoque': estoques.get(medicamento.id, 0),
+            'entradas_processadas': [
+                {
+                    'entrada_id': entrada.id,
+                    'quantidade': retirada,
+                    'saida_id': next(saidas_iter).id,
+                }
+                for entrada, retirada in plano
+            ],
+        })
+    return resultados
@@ -1,7 +1,8 @@
-﻿from django.test import TestCase, Client
+﻿from django.test import TestCase, TransactionTestCase, Client
 from django.contrib.auth.models import User
 from perfis.models import Fazenda, PerfilUsuario
-from medicamento.models import Medicamento, EntradaMedicamento
+from django.db.models import F
+from medicamento.models import Medicamento, EntradaMedicamento, SaidaMedicamento
 from datetime import date, timedelta
 
 
@@ -317,3 +318,585 @@ class SaidaMedicamentoTestCase(TestCase):
         # Verificar que o estoque foi restaurado
         self.medicamento.refresh_from_db()
         self.assertEqual(self.medicamento.quantidade_total, 50)
+
+
+class BaixaCondicionalEstoqueTestCase(TestCase):
+    """Testes da baixa condicional dos lotes (versão + saldo no WHERE do UPDATE)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='produtor', password='senha123')
+        self.fazenda = Fazenda.objects.create(nome='Fazenda Teste', dono=self.user)
+        self.medicamento = Medicamento.objects.create(nome='Ivermectina', fazenda=self.fazenda)
+        self.entrada = EntradaMedicamento.objects.create(
+            medicamento=self.medicamento, quantidade=10, valor_medicamento=50,
+            validade=date.today() + timedelta(days=365), cadastrada_por=self.user
+        )
+
+    def test_baixa_recusa_lote_alterado_depois_da_leitura(self):
+        """Testa que a baixa não desconta um lote cuja versão ou saldo mudou"""
+        from medicamento.saidas import ConflitoEstoque, baixar_lotes
+
+        lido = EntradaMedicamento.objects.get(pk=self.entrada.pk)
+        EntradaMedicamento.objects.filter(pk=self.entrada.pk).update(versao=5, quantidade_disponivel=3)
+
+        with self.assertRaises(ConflitoEstoque):
+            baixar_lotes([(lido, 4)])
+        self.entrada.refresh_from_db()
+        self.assertEqual(self.entrada.quantidade_disponivel, 3)
+
+        lido.refresh_from_db()
+        baixar_lotes([(lido, 3)])
+        self.entrada.refresh_from_db()
+        self.assertEqual((self.entrada.quantidade_disponivel, self.entrada.versao), (0, 6))
+
+    def test_conflito_desfaz_a_tentativa_e_refaz_o_plano(self):
+        """Testa que, em conflito, nada da tentativa fica gravado e a saída é replanejada"""
+        from unittest import mock
+        from medicamento import saidas
+
+        baixar_original = saidas.baixar_lotes
+        chamadas = []
+
+        def baixar_com_concorrente(retiradas):
+            # Na primeira tentativa, outra saída altera o lote depois da nossa leitura
+            if not chamadas:
+                EntradaMedicamento.objects.filter(pk=self.entrada.pk).update(versao=F('versao') + 1)
+            chamadas.append(retiradas)
+            return baixar_original(retiradas)
+
+        with mock.patch.object(saidas, 'baixar_lotes', baixar_com_concorrente):
+            saidas.registrar_saidas(self.fazenda, self.user, [
+                {'medicamento_id': self.medicamento.id, 'quantidade': 5, 'motivo': ''}
+            ])
+        self.assertEqual(len(chamadas), 2)
+        self.assertEqual(SaidaMedicamento.objects.get().quantidade, 5)
+        self.entrada.refresh_from_db()
+        self.assertEqual(self.entrada.quantidade_disponivel, 5)
+        self.medicamento.refresh_from_db()
+        self.assertEqual(self.medicamento.quantidade_total, 5)
+
+    def test_conflitos_seguidos_retornam_409(self):
+        from unittest import mock
+        from medicamento import saidas
+
+        with mock.patch.object(saidas, 'baixar_lotes', side_effect=saidas.ConflitoEstoque):
+            with self.assertRaises(saidas.SaidaMedicamentoError) as erro:
+                saidas.registrar_saidas(self.fazenda, self.user, [
+                    {'medicamento_id': self.medicamento.id, 'quantidade': 1, 'motivo': ''}
+                ])
+        self.assertEqual(erro.exception.status, 409)
+        self.assertFalse(SaidaMedicamento.objects.exists())
+
+    def test_saida_invalida_o_cache_da_fazenda(self):
+        """Testa que as contagens em cache mudam depois de uma saída (bulk_create não dispara signals)"""
+        from medicamento import saidas
+        from paginas.cache import obter_ou_calcular
+
+        def disponivel():
+            return obter_ou_calcular(self.fazenda, 'teste_disponivel', lambda: sum(
+                EntradaMedicamento.objects.filter(fazenda=self.fazenda).values_list('quantidade_disponivel', flat=True)
+            ))
+
+        self.assertEqual(disponivel(), 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            saidas.registrar_saidas(self.fazenda, self.user, [
+                {'medicamento_id': self.medicamento.id, 'quantidade': 4, 'motivo': ''}
+            ])
+        self.assertEqual(disponivel(), 6)
+
+
+class SaidaConcorrenteTestCase(TransactionTestCase):
+    """Teste de estresse: várias threads retirando do mesmo medicamento ao mesmo tempo"""
+
+    def test_saidas_simultaneas_nao_deixam_estoque_inconsistente(self):
+        import threading
+        from django.db import OperationalError, connection
+        from medicamento.saidas import SaidaMedicamentoError, registrar_saidas
+
+        user = User.objects.create_user(username='produtor', password='senha123')
+        fazenda = Fazenda.objects.create(nome='Fazenda Teste', dono=user)
+        medicamento = Medicamento.objects.create(nome='Ivermectina', fazenda=fazenda)
+        for dias in (30, 60, 90):
+            EntradaMedicamento.objects.create(
+                medicamento=medicamento, quantidade=20, valor_medicamento=100,
+                validade=date.today() + timedelta(days=dias), cadastrada_por=user
+            )
+
+        threads_total, retiradas_por_thread = 8, 6
+        barreira = threading.Barrier(threads_total)
+        sucessos = []
+
+        def retirar():
+            try:
+                barreira.wait()
+                for _ in range(retiradas_por_thread):
+                    try:
+                        registrar_saidas(fazenda, user, [
+                            {'medicamento_id': medicamento.id, 'quantidade': 2, 'motivo': ''}
+                        ])
+                        sucessos.append(2)
+                    except (SaidaMedicamentoError, OperationalError):
+                        pass  # Sem saldo, conflitos seguidos ou banco ocupado: nada gravado
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=retirar) for _ in range(threads_total)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        retirado = sum(SaidaMedicamento.objects.values_list('quantidade', flat=True))
+        disponivel = sum(EntradaMedicamento.objects.values_list('quantidade_disponivel', flat=True))
+        self.assertEqual(retirado, sum(sucessos))
+        self.assertEqual(disponivel, 60 - retirado)
+        self.assertGreater(retirado, 0)
+        for entrada in EntradaMedicamento.objects.all():
+            self.assertEqual(
+                entrada.quantidade - entrada.quantidade_disponivel,
+                sum(entrada.saidamedicamento_set.values_list('quantidade', flat=True))
+            )
+        medicamento.refresh_from_db()
+        self.assertEqual(medicamento.quantidade_total, disponivel)
+
+
+class EstoqueMedicamentoTestCase(TestCase):
+    """
+    Testes do snapshot de estoque (EstoqueMedicamento) mantido por entradas e saídas
+    """
+    
+    def setUp(self):
+        """Configuração inicial"""
+        from medicamento.models import SaidaMedicamento
+        self.SaidaMedicamento = SaidaMedicamento
+        
+        self.user = User.objects.create_user(username='produtor', password='senha123')
+        self.fazenda = Fazenda.objects.create(nome='Fazenda Estoque', dono=self.user)
+        self.medicamento = Medicamento.objects.create(nome='Ivermectina', fazenda=self.fazenda)
+        
+        self.entrada_antiga = EntradaMedicamento.objects.create(
+            medicamento=self.medicamento,
+            quantidade=30,
+            valor_medicamento=300.00,
+            validade=date.today() + timedelta(days=10),
+            cadastrada_por=self.user
+        )
+        self.entrada_nova = EntradaMedicamento.objects.create(
+            medicamento=self.medicamento,
+            quantidade=70,
+            valor_medicamento=700.00,
+            validade=date.today() + timedelta(days=200),
+            cadastrada_por=self.user
+        )
+    
+    def _estoque(self):
+        from medicamento.models import EstoqueMedicamento
+        return EstoqueMedicamento.objects.get(medicamento=self.medicamento)
+    
+    def _registrar_saida(self, entrada, quantidade):
+        entrada.quantidade_disponivel -= quantidade
+        entrada.save()
+        return self.SaidaMedicamento.objects.create(
+            medicamento=self.medicamento,
+            entrada=entrada,
+            quantidade=quantidade,
+            registrada_por=self.user
+        )
+    
+    def test_entradas_atualizam_snapshot(self):
+        """Testa que novas entradas somam quantidade, valor e definem a próxima validade"""
+        estoque = self._estoque()
+        self.assertEqual(estoque.quantidade, 100)
+        self.assertEqual(float(estoque.valor_total), 1000.00)
+        self.assertEqual(estoque.proxima_validade, self.entrada_antiga.validade)
+    
+    def test_saida_que_zera_lote_atualiza_validade(self):
+        """Testa que ao zerar o lote mais antigo a próxima validade passa para o seguinte"""
+        self._registrar_saida(self.entrada_antiga, 30)
+        
+        estoque = self._estoque()
+        self.assertEqual(estoque.quantidade, 70)
+        self.assertEqual(float(estoque.valor_total), 700.00)
+        self.assertEqual(estoque.proxima_validade, self.entrada_nova.validade)
+    
+    def test_exclusoes_mantem_snapshot(self):
+        """Testa exclusão de saída (devolve estoque) e de entrada (remove estoque)"""
+        saida = self._registrar_saida(self.entrada_nova, 20)
+        self.assertEqual(self._estoque().quantidade, 80)
+        
+        saida.delete()
+        self.assertEqual(self._estoque().quantidade, 100)
+        
+        self._registrar_saida(self.entrada_nova, 10)
+        self.entrada_nova.delete()  # Remove a entrada e, em cascata, sua saída
+        self.assertEqual(self._estoque().quantidade, 30)
+    
+    def test_edicao_de_quantidade_da_entrada(self):
+        """Testa que editar a quantidade de uma entrada aplica apenas a diferença"""
+        self.entrada_nova.quantidade = 50
+        self.entrada_nova.save()
+        self.assertEqual(self._estoque().quantidade, 80)
+    
+    def test_reconciliar_estoque_reconstroi_do_historico(self):
+        """Testa que o comando reconciliar_estoque corrige um snapshot divergente"""
+        from django.core.management import call_command
+        from medicamento.models import EstoqueMedicamento
+        
+        self._registrar_saida(self.entrada_antiga, 5)
+        EstoqueMedicamento.objects.filter(medicamento=self.medicamento).update(quantidade=999)
+        
+        call_command('reconciliar_estoque', stdout=open('/dev/null', 'w'))
+        
+        self.assertEqual(self._estoque().quantidade, 95)
+        self.medicamento.refresh_from_db()
+        self.assertEqual(self.medicamento.quantidade_total, 95)
+    
+    def test_leitura_do_estoque_sem_queries_extras(self):
+        """Testa que listar medicamentos com select_related não gera uma query por medicamento"""
+        Medicamento.objects.create(nome='Dipirona', fazenda=self.fazenda)
+        
+        with self.assertNumQueries(1):
+            quantidades = [
+                m.quantidade_total
+                for m in Medicamento.objects.filter(fazenda=self.fazenda).select_related('estoque')
+            ]
+        self.assertEqual(sorted(quantidades), [0, 100])
+
+
+class SaidaMedicamentoAPITestCase(TestCase):
+    """
+    Testes do motor FIFO de saídas via API (saída única e em lote)
+    """
+    
+    def setUp(self):
+        """Configuração inicial"""
+        self.user = User.objects.create_user(username='veterinario', password='senha123')
+        self.fazenda = Fazenda.objects.create(nome='Fazenda FIFO', dono=self.user)
+        self.ivermectina = Medicamento.objects.create(nome='Ivermectina', fazenda=self.fazenda)
+        self.dipirona = Medicamento.objects.create(nome='Dipirona', fazenda=self.fazenda)
+        
+        self.lote_antigo = EntradaMedicamento.objects.create(
+            medicamento=self.ivermectina, quantidade=10, valor_medicamento=100.00,
+            validade=date.today() + timedelta(days=15), cadastrada_por=self.user
+        )
+        self.lote_novo = EntradaMedicamento.objects.create(
+            medicamento=self.ivermectina, quantidade=20, valor_medicamento=200.00,
+            validade=date.today() + timedelta(days=90), cadastrada_por=self.user
+        )
+        self.lote_dipirona = EntradaMedicamento.objects.create(
+            medicamento=self.dipirona, quantidade=5, valor_medicamento=50.00,
+            validade=date.today() + timedelta(days=60), cadastrada_por=self.user
+        )
+        
+        self.client = Client()
+        self.client.login(username='veterinario', password='senha123')
+        session = self.client.session
+        session['fazenda_ativa_id'] = self.fazenda.id
+        session.save()
+    
+    def _post(self, dados):
+        import json
+        from django.urls import reverse
+        return self.client.post(
+            reverse('saida_medicamento_api'), data=json.dumps(dados), content_type='application/json'
+        )
+    
+    def test_saida_unica_consome_lote_mais_antigo_primeiro(self):
+        """Testa que a saída consome primeiro o lote com validade mais próxima"""
+        response = self._post({'medicamento_id': self.ivermectina.id, 'quantidade': 15})
+        
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['novo_estoque'], 15)
+        self.assertEqual(
+            [(e['entrada_id'], e['quantidade']) for e in data['entradas_processadas']],
+            [(self.lote_antigo.id, 10), (self.lote_novo.id, 5)]
+        )
+        
+        self.lote_antigo.refresh_from_db()
+        self.lote_novo.refresh_from_db()
+        self.assertEqual(self.lote_antigo.quantidade_disponivel, 0)
+        self.assertEqual(self.lote_novo.quantidade_disponivel, 15)
+    
+    def test_saida_em_lote_para_varios_medicamentos(self):
+        """Testa o registro de uma rodada de tratamento com vários medicamentos"""
+        from medicamento.models import SaidaMedicamento
+        
+        response = self._post({
+            'motivo': 'Rodada de vermifugação',
+            'itens': [
+                {'medicamento_id': self.ivermectina.id, 'quantidade': 12},
+                {'medicamento_id': self.dipirona.id, 'quantidade': 5},
+            ]
+        })
+        
+        self.assertEqual(response.status_code, 200)
+        saidas = {s['medicamento']: s for s in response.json()['saidas']}
+        self.assertEqual(saidas['Ivermectina']['novo_estoque'], 18)
+        self.assertTrue(saidas['Dipirona']['estoque_zerado'])
+        self.assertEqual(SaidaMedicamento.objects.filter(motivo='Rodada de vermifugação').count(), 3)
+    
+    def test_lote_com_estoque_insuficiente_nao_grava_nada(self):
+        """Testa que um item sem estoque suficiente cancela o lote inteiro"""
+        from medicamento.models import SaidaMedicamento
+        
+        response = self._post({
+            'itens': [
+                {'medicamento_id': self.ivermectina.id, 'quantidade': 5},
+                {'medicamento_id': self.dipirona.id, 'quantidade': 6},
+            ]
+        })
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Dipirona', response.json()['error'])
+        self.assertFalse(SaidaMedicamento.objects.exists())
+        self.lote_antigo.refresh_from_db()
+        self.assertEqual(self.lote_antigo.quantidade_disponivel, 10)
+    
+    def test_medicamento_id_invalido_e_erro_de_validacao(self):
+        """Testa que um id não numérico é recusado como validação (400), não como erro interno"""
+        response = self._post({'medicamento_id': 'abc', 'quantidade': 1})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Medicamento inválido.')
+
+        response = self._post({'medicamento_id': str(self.ivermectina.id), 'quantidade': 1})
+        self.assertEqual(response.status_code, 200)
+
+    def test_medicamento_de_outra_fazenda(self):
+        """Testa que não é possível dar saída em medicamento de outra fazenda"""
+        outra_fazenda = Fazenda.objects.create(nome='Outra Fazenda', dono=self.user)
+        outro = Medicamento.objects.create(nome='Outro', fazenda=outra_fazenda)
+        
+        response = self._post({'medicamento_id': outro.id, 'quantidade': 1})
+        
+        self.assertEqual(response.status_code, 404)
+
+
+class ImportacaoEntradasTestCase(TestCase):
+    """
+    Testes da importação de entradas de medicamentos por planilha
+    """
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='produtor', password='senha123')
+        self.fazenda = Fazenda.objects.create(nome='Fazenda Importação', dono=self.user)
+        self.user.perfil.fazendas.add(self.fazenda)
+        self.medicamento = Medicamento.objects.create(nome='Ivermectina', fazenda=self.fazenda)
+        
+        self.client = Client()
+        self.client.login(username='produtor', password='senha123')
+        session = self.client.session
+        session['fazenda_ativa_id'] = self.fazenda.id
+        session.save()
+    
+    def test_importacao_pela_tela(self):
+        """Testa o envio da planilha, a atualização do estoque e o relatório de erros"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.urls import reverse
+        
+        validade = (date.today() + timedelta(days=60)).strftime('%d/%m/%Y')
+        vencida = (date.today() - timedelta(days=1)).strftime('%d/%m/%Y')
+        conteudo = (
+            "medicamento;quantidade;valor_medicamento;validade;observacao\n"
+            f"IVERMECTINA;40;120,00;{validade};Lote A\n"
+            f"Ivermectina;10;30,00;{vencida};Lote vencido\n"
+            f"Dipirona;5;10,00;{validade};\n"
+        )
+        arquivo = SimpleUploadedFile('entradas.csv', conteudo.encode('utf-8'), content_type='text/csv')
+        
+        response = self.client.post(reverse('importar_entradas_medicamento'), {'arquivo': arquivo})
+        
+        self.assertEqual(response.status_code, 200)
+        resultado = response.context['resultado']
+        self.assertEqual((resultado.importadas, resultado.total_erros), (1, 2))
+        self.assertEqual(EntradaMedicamento.objects.get().quantidade_disponivel, 40)
+        self.assertEqual(EntradaMedicamento.objects.get().fazenda_id, self.fazenda.id)
+        self.medicamento.refresh_from_db()
+        self.assertEqual(self.medicamento.quantidade_total, 40)
+
+    def test_importacao_sem_fazenda_ativa_redireciona(self):
+        """Testa que a tela de importação sem fazenda ativa redireciona em vez de falhar"""
+        from django.contrib.messages.storage.fallback import FallbackStorage
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import RequestFactory
+        from django.urls import reverse
+        from medicamento.views import EntradaMedicamentoImportacaoView
+
+        arquivo = SimpleUploadedFile('entradas.csv', b"medicamento;quantidade\n", content_type='text/csv')
+        request = RequestFactory().post(reverse('importar_entradas_medicamento'), {'arquivo': arquivo})
+        request.user = self.user
+        request.session = self.client.session
+        request._messages = FallbackStorage(request)
+
+        response = EntradaMedicamentoImportacaoView.as_view()(request)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse('selecionar_fazenda'))
+        self.assertFalse(EntradaMedicamento.objects.exists())
+
+    def test_bloco_gravado_invalida_o_cache_mesmo_se_a_importacao_falhar(self):
+        """Testa que os blocos confirmados invalidam o cache e atualizam o estoque mesmo se um bloco falhar"""
+        import io
+        from unittest import mock
+        from medicamento.importacao import ImportadorEntradasMedicamento
+        from paginas.cache import obter_ou_calcular
+
+        def entradas():
+            return obter_ou_calcular(
+                self.fazenda, 'teste_entradas', lambda: EntradaMedicamento.objects.filter(fazenda=self.fazenda).count()
+            )
+
+        validade = (date.today() + timedelta(days=60)).strftime('%d/%m/%Y')
+        conteudo = "medicamento;quantidade;valor_medicamento;validade\n" + f"Ivermectina;10;30,00;{validade}\n" * 2
+        importador = ImportadorEntradasMedicamento(self.fazenda, self.user, tamanho_bloco=1)
+        gravar_original = importador.gravar_bloco
+        blocos = []
+
+        def gravar_e_falhar_no_segundo(objetos):
+            blocos.append(objetos)
+            if len(blocos) == 2:
+                raise RuntimeError('falha no segundo bloco')
+            gravar_original(objetos)
+
+        self.assertEqual(entradas(), 0)
+        with mock.patch.object(importador, 'gravar_bloco', gravar_e_falhar_no_segundo):
+            with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+                importador.importar(io.BytesIO(conteudo.encode('utf-8')), 'entradas.csv')
+        self.assertEqual(entradas(), 1)
+        # finalizar() roda para o bloco confirmado
+        self.medicamento.refresh_from_db()
+        self.assertEqual(self.medicamento.quantidade_total, 10)
+
+
+
+class MedicamentoEstoqueListViewTestCase(TestCase):
+    """
+    Testes da tela de controle de validade (totais calculados no banco)
+    """
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='produtor', password='senha123')
+        self.fazenda = Fazenda.objects.create(nome='Fazenda Validade', dono=self.user)
+        self.user.perfil.fazendas.add(self.fazenda)
+        self.medicamento = Medicamento.objects.create(nome='Ivermectina', fazenda=self.fazenda)
+        
+        hoje = date.today()
+        # 25 entradas: 3 vencidas, 4 críticas, 5 em atenção, 13 ok e uma já consumida
+        dias = [-10] * 3 + [10] * 4 + [45] * 5 + [120] * 13
+        for indice, dia in enumerate(dias):
+            EntradaMedicamento.objects.create(
+                medicamento=self.medicamento,
+                quantidade=10,
+                valor_medicamento=5,
+                validade=hoje + timedelta(days=dia),
+                cadastrada_por=self.user,
+                observacao=f'Lote {indice}',
+            )
+        consumida = EntradaMedicamento.objects.create(
+            medicamento=self.medicamento,
+            quantidade=10,
+            valor_medicamento=5,
+            validade=hoje - timedelta(days=100),
+            cadastrada_por=self.user,
+        )
+        EntradaMedicamento.objects.filter(pk=consumida.pk).update(quantidade_disponivel=0)
+        
+        self.client = Client()
+        self.client.login(username='produtor', password='senha123')
+        session = self.client.session
+        session['fazenda_ativa_id'] = self.fazenda.id
+        session.save()
+    
+    def test_totais_independem_da_pagina(self):
+        """Testa se as contagens cobrem todo o estoque e só a página é listada"""
+        from django.urls import reverse
+        
+        for pagina in (1, 2):
+            response = self.client.get(reverse('medicamento_estoque'), {'page': pagina})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['total_medicamentos'], 25)
+            self.assertEqual(response.context['total_quantidade'], 250)
+            self.assertEqual(
+                (response.context['vencidos'], response.context['proximo_vencer'],
+                 response.context['atencao'], response.context['ok']),
+                (3, 4, 5, 13)
+            )
+        
+        primeira = self.client.get(reverse('medicamento_estoque')).context['medicamentos_data']
+        self.assertEqual(len(primeira), 20)
+        self.assertEqual(primeira[0]['status'], 'vencido')
+        self.assertEqual(
+            [item['dias_para_vencer'] for item in primeira],
+            sorted(item['dias_para_vencer'] for item in primeira)
+        )
+        self.assertEqual(len(response.context['medicamentos_data']), 5)
+    
+    def test_filtro_de_status(self):
+        """Testa se o filtro de status limita lista e totais"""
+        from django.urls import reverse
+        
+        response = self.client.get(reverse('medicamento_estoque'), {'status_validade': 'critico'})
+        self.assertEqual(response.context['total_medicamentos'], 4)
+        self.assertEqual(response.context['proximo_vencer'], 4)
+        self.assertEqual({item['status'] for item in response.context['medicamentos_data']}, {'critico'})
+
+
+class EntradaMedicamentoFazendaTestCase(TestCase):
+    """
+    Testes da cópia da fazenda em EntradaMedicamento e dos índices parciais do estoque
+    """
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='produtor', password='senha123')
+        self.fazenda1 = Fazenda.objects.create(nome='Fazenda Um', dono=self.user)
+        self.fazenda2 = Fazenda.objects.create(nome='Fazenda Dois', dono=self.user)
+        self.medicamento1 = Medicamento.objects.create(nome='Ivermectina', fazenda=self.fazenda1)
+        self.medicamento2 = Medicamento.objects.create(nome='Dipirona', fazenda=self.fazenda2)
+        self.entrada = EntradaMedicamento.objects.create(
+            medicamento=self.medicamento1,
+            quantidade=10,
+            valor_medicamento=50,
+            validade=date.today() + timedelta(days=10),
+            cadastrada_por=self.user,
+        )
+    
+    def test_fazenda_acompanha_o_medicamento(self):
+        """Testa a cópia no cadastro, na troca de medicamento e na troca de fazenda"""
+        self.assertEqual(self.entrada.fazenda_id, self.fazenda1.id)
+        
+        self.entrada.medicamento = self.medicamento2
+        self.entrada.save()
+        self.entrada.refresh_from_db()
+        self.assertEqual(self.entrada.fazenda_id, self.fazenda2.id)
+        
+        self.medicamento2.fazenda = self.fazenda1
+        self.medicamento2.save()
+        self.entrada.refresh_from_db()
+        self.assertEqual(self.entrada.fazenda_id, self.fazenda1.id)
+    
+    def test_vencimentos_pela_fazenda_da_entrada(self):
+        """Testa que os vencimentos filtram pela fazenda da entrada, no índice parcial"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from relatorios.notificacoes import resumo_notificacoes
+        
+        with CaptureQueriesContext(connection) as queries:
+            resumo = resumo_notificacoes(self.fazenda1)
+        self.assertEqual(resumo['medicamentos_vencer'], 1)
+        sql_entradas = [q['sql'] for q in queries if 'medicamento_entradamedicamento' in q['sql']]
+        self.assertEqual(len(sql_entradas), 1)
+        # O join com medicamento só traz o nome exibido; o filtro usa a cópia da fazenda
+        self.assertIn('"medicamento_entradamedicamento"."fazenda_id" =', sql_entradas[0])
+        self.assertNotIn('"medicamento_medicamento"."fazenda_id"', sql_entradas[0])
+        
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'EXPLAIN QUERY PLAN SELECT id FROM medicamento_entradamedicamento '
+                    'WHERE fazenda_id = %s AND validade <= %s AND "quantidade_disponivel" > 0',
+                    [self.fazenda1.id, date.today()]
+                )
+                plano = ' '.join(str(linha) for linha in cursor.fetchall())
+            self.assertIn('entrada_estoque_fazenda_idx', plano)
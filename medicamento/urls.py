@@ -11,6 +11,7 @@ from medicamento.views import (
     EntradaMedicamentoUpdateView,
     MedicamentoEstoqueListView,
     SaidaMedicamentoAPIView,
+    EntradaMedicamentoImportacaoView,
     # NotificacoesListView,  # REMOVIDO - Usando sistema unificado
     # NotificacoesAPIView,   # REMOVIDO - Usando sistema unificado
 )
@@ -39,4 +40,7 @@ urlpatterns = [
     
     # API de saída de medicamento
     path('api/saida/', SaidaMedicamentoAPIView.as_view(), name='saida_medicamento_api'),
+    
+    # Importação de entradas por planilha (CSV/XLSX)
+    path('importar/entradas/', EntradaMedicamentoImportacaoView.as_view(), name='importar_entradas_medicamento'),
 ]
\ No newline at end of file
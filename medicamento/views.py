@@ -8,14 +8,19 @@ from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.db.models import Q
+from django.db.models import Count, Q, Sum
 from datetime import date, timedelta
 import json
 
 from medicamento.models import EntradaMedicamento, Medicamento, SaidaMedicamento
 from medicamento.notificacoes import gerar_notificacoes_medicamentos
+from medicamento.saidas import SaidaMedicamentoError, normalizar_itens, registrar_saidas
 from medicamento.forms import MedicamentoForm, EntradaMedicamentoForm
 from medicamento.filters import EntradaMedicamentoFilter
+from medicamento.importacao import ImportadorEntradasMedicamento
+from paginas import busca
+from paginas.paginacao import PaginacaoCursorMixin
+from paginas.views import ImportacaoPlanilhaView
 from perfis.models import Fazenda
 
 
@@ -138,8 +143,11 @@ class MedicamentoListView(LoginRequiredMixin, ListView):
         
         return (
             Medicamento.objects.filter(fazenda=fazenda_ativa)
-            .select_related("fazenda")
-            .only("id", "nome", "fazenda__nome")
+            .select_related("fazenda", "estoque")
+            .only(
+                "id", "nome", "fazenda__nome",
+                "estoque__quantidade", "estoque__proxima_validade"
+            )
             .order_by("nome")
         )
 
@@ -214,7 +222,7 @@ class EntradaMedicamentoUpdateView(LoginRequiredMixin, UpdateView):
         fazenda_ativa = getattr(self.request, 'fazenda_ativa', None)
         if not fazenda_ativa:
             return EntradaMedicamento.objects.none()
-        return EntradaMedicamento.objects.filter(medicamento__fazenda=fazenda_ativa)
+        return EntradaMedicamento.objects.filter(fazenda=fazenda_ativa)
     
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -253,7 +261,7 @@ class EntradaMedicamentoDeleteView(LoginRequiredMixin, DeleteView):
         fazenda_ativa = getattr(self.request, 'fazenda_ativa', None)
         if not fazenda_ativa:
             return EntradaMedicamento.objects.none()
-        return EntradaMedicamento.objects.filter(medicamento__fazenda=fazenda_ativa)
+        return EntradaMedicamento.objects.filter(fazenda=fazenda_ativa)
     
     def delete(self, request, *args, **kwargs):
         entrada = self.get_object()
@@ -301,11 +309,12 @@ class EntradaMedicamentoListView(LoginRequiredMixin, ListView):
 
 
 ############ List Medicamentos com Controle de Validade (NOVA) ############
-class MedicamentoEstoqueListView(LoginRequiredMixin, ListView):
+class MedicamentoEstoqueListView(LoginRequiredMixin, PaginacaoCursorMixin, ListView):
     model = EntradaMedicamento
     template_name = "medicamento_estoque_novo.html"
     context_object_name = "entradas"
     paginate_by = 20
+    ordenacao_cursor = ('validade', 'id')
     filterset_class = EntradaMedicamentoFilter
     
     def get_queryset(self):
@@ -313,8 +322,13 @@ class MedicamentoEstoqueListView(LoginRequiredMixin, ListView):
         if not fazenda_ativa:
             return EntradaMedicamento.objects.none()
         
+        # Entradas já consumidas (quantidade zero) ficam fora do controle de validade;
+        # ordenar pela validade equivale a ordenar pelos dias para vencer
         queryset = (
-            EntradaMedicamento.objects.filter(medicamento__fazenda=fazenda_ativa)
+            EntradaMedicamento.objects.filter(
+                fazenda=fazenda_ativa,
+                quantidade_disponivel__gt=0
+            )
             .select_related('medicamento', 'medicamento__fazenda')
             .only(
                 'id', 'quantidade', 'quantidade_disponivel', 'validade', 
@@ -322,16 +336,15 @@ class MedicamentoEstoqueListView(LoginRequiredMixin, ListView):
                 'medicamento__id', 'medicamento__nome', 
                 'medicamento__fazenda__id', 'medicamento__fazenda__nome'
             )
-            .order_by('validade')
+            .order_by('validade', 'id')
         )
         
         # Pesquisa por texto (busca em todos os registros)
         search_query = self.request.GET.get('search', '').strip()
         if search_query:
-            queryset = queryset.filter(
-                Q(medicamento__nome__icontains=search_query) |
-                Q(medicamento__fazenda__nome__icontains=search_query) |
-                Q(observacao__icontains=search_query)
+            # OTIMIZADO: índice de busca (FTS) em vez de LIKE nos joins
+            queryset = busca.filtrar_busca(
+                queryset, fazenda_ativa, busca.TIPO_ENTRADA_MEDICAMENTO, search_query
             )
         
         # Aplicar filtros
@@ -346,37 +359,31 @@ class MedicamentoEstoqueListView(LoginRequiredMixin, ListView):
         # Adicionar parâmetro de pesquisa ao contexto
         context['search_query'] = self.request.GET.get('search', '')
         
-        # Preparar dados das entradas com informações de validade
-        entradas_data = []
-        total_medicamentos = 0
-        total_quantidade = 0
-        vencidos = 0
-        proximo_vencer = 0  # 30 dias
-        atencao = 0  # 60 dias
+        # OTIMIZADO: contagens por status e total em uma única query agregada
+        # (antes todo o estoque filtrado era carregado e classificado em Python)
+        limite_critico = hoje + timedelta(days=30)
+        limite_atencao = hoje + timedelta(days=60)
+        totais = self.object_list.order_by().aggregate(
+            total_medicamentos=Count('id'),
+            total_quantidade=Sum('quantidade_disponivel'),
+            vencidos=Count('id', filter=Q(validade__lt=hoje)),
+            proximo_vencer=Count('id', filter=Q(validade__gte=hoje, validade__lte=limite_critico)),
+            atencao=Count('id', filter=Q(validade__gt=limite_critico, validade__lte=limite_atencao)),
+        )
         
-        # Usar queryset filtrado para os cálculos
-        for entrada in self.filterset.qs:
+        # Apenas as entradas da página atual são materializadas
+        entradas_data = []
+        for entrada in context['object_list']:
             medicamento = entrada.medicamento
-            
-            # Usar quantidade_disponivel (descontando saídas)
-            quantidade_disponivel = entrada.quantidade_disponivel
-            
-            # Ignorar entradas com quantidade zero (já utilizadas completamente)
-            if quantidade_disponivel <= 0:
-                continue
-            
             dias_para_vencer = (entrada.validade - hoje).days
             
             # Determinar status
             if dias_para_vencer < 0:
                 status = 'vencido'
-                vencidos += 1
             elif dias_para_vencer <= 30:
                 status = 'critico'
-                proximo_vencer += 1
             elif dias_para_vencer <= 60:
                 status = 'atencao'
-                atencao += 1
             else:
                 status = 'ok'
             
@@ -385,7 +392,7 @@ class MedicamentoEstoqueListView(LoginRequiredMixin, ListView):
                 'entrada_id': entrada.id,
                 'nome': medicamento.nome,
                 'fazenda': medicamento.fazenda,
-                'quantidade_total': quantidade_disponivel,
+                'quantidade_total': entrada.quantidade_disponivel,
                 'valor_total': entrada.valor_medicamento,
                 'proxima_validade': entrada.validade,
                 'dias_para_vencer': dias_para_vencer,
@@ -394,20 +401,15 @@ class MedicamentoEstoqueListView(LoginRequiredMixin, ListView):
                 'lote': entrada.observacao if entrada.observacao else f'Entrada #{entrada.id}',
                 'data_cadastro': entrada.data_cadastro
             })
-            
-            total_medicamentos += 1
-            total_quantidade += quantidade_disponivel
-        
-        # Ordenar por dias para vencer (mais urgente primeiro)
-        entradas_data.sort(key=lambda x: x['dias_para_vencer'])
         
+        total_medicamentos = totais['total_medicamentos']
         context['medicamentos_data'] = entradas_data
         context['total_medicamentos'] = total_medicamentos
-        context['total_quantidade'] = total_quantidade
-        context['vencidos'] = vencidos
-        context['proximo_vencer'] = proximo_vencer
-        context['atencao'] = atencao
-        context['ok'] = total_medicamentos - vencidos - proximo_vencer - atencao
+        context['total_quantidade'] = totais['total_quantidade'] or 0
+        context['vencidos'] = totais['vencidos']
+        context['proximo_vencer'] = totais['proximo_vencer']
+        context['atencao'] = totais['atencao']
+        context['ok'] = total_medicamentos - totais['vencidos'] - totais['proximo_vencer'] - totais['atencao']
         context['today'] = hoje
         context['title'] = "Controle de Validade de Medicamentos"
         context['titulo'] = "Controle de Validade de Medicamentos"
@@ -489,159 +491,100 @@ class SaidaMedicamentoAPIView(LoginRequiredMixin, View):
     """
     API endpoint para registrar saída de medicamentos
     Implementa lógica FIFO (First In, First Out) - saída das entradas mais antigas primeiro
+
+    Aceita uma saída única:
+        {"medicamento_id": 1, "quantidade": 5, "motivo": "..."}
+    ou um lote de saídas (ex.: uma rodada de tratamento inteira):
+        {"itens": [{"medicamento_id": 1, "quantidade": 5}, ...], "motivo": "..."}
     """
     def post(self, request, *args, **kwargs):
-        from django.db import transaction
-        
         try:
-            print(f"DEBUG - Request body: {request.body}")
-            
             # Parsear o JSON do corpo da requisição
             data = json.loads(request.body)
-            
-            print(f"DEBUG - Dados recebidos: {data}")
-            
-            medicamento_id = data.get('medicamento_id')
-            quantidade_solicitada = data.get('quantidade')
-            motivo = data.get('motivo', '')
-            
-            print(f"DEBUG - Medicamento ID: {medicamento_id}, Quantidade: {quantidade_solicitada}")
-            
-            # Validações
-            if not medicamento_id or not quantidade_solicitada:
+            if not isinstance(data, dict):
                 return JsonResponse({
                     'success': False,
-                    'error': 'Medicamento e quantidade são obrigatórios.'
+                    'error': 'Dados JSON inválidos.'
                 }, status=400)
             
-            try:
-                quantidade_solicitada = int(quantidade_solicitada)
-                if quantidade_solicitada <= 0:
-                    raise ValueError
-            except ValueError:
+            fazenda_ativa = getattr(request, 'fazenda_ativa', None)
+            if not fazenda_ativa:
                 return JsonResponse({
                     'success': False,
-                    'error': 'Quantidade deve ser um número positivo.'
+                    'error': 'Nenhuma fazenda ativa selecionada.'
                 }, status=400)
             
-            # Usar transaction para garantir atomicidade e select_for_update para evitar race condition
-            with transaction.atomic():
-                # Buscar o medicamento e validar que pertence à fazenda ativa
-                fazenda_ativa = getattr(request, 'fazenda_ativa', None)
-                if not fazenda_ativa:
-                    return JsonResponse({
-                        'success': False,
-                        'error': 'Nenhuma fazenda ativa selecionada.'
-                    }, status=400)
-                
-                # Buscar medicamento apenas da fazenda ativa
-                try:
-                    medicamento = Medicamento.objects.get(
-                        id=medicamento_id,
-                        fazenda=fazenda_ativa
-                    )
-                except Medicamento.DoesNotExist:
-                    return JsonResponse({
-                        'success': False,
-                        'error': 'Medicamento não encontrado ou não pertence à fazenda ativa.'
-                    }, status=404)
-                
-                print(f"DEBUG - Medicamento encontrado: {medicamento.nome}")
-                
-                # Buscar entradas com quantidade disponível, ordenadas por validade (FIFO)
-                # select_for_update() trava as linhas para evitar concorrência
-                entradas_disponiveis = EntradaMedicamento.objects.select_for_update().filter(
-                    medicamento=medicamento,
-                    quantidade_disponivel__gt=0
-                ).order_by('validade')
-                
-                if not entradas_disponiveis.exists():
-                    return JsonResponse({
-                        'success': False,
-                        'error': 'Não há estoque disponível para este medicamento.'
-                    }, status=400)
-                
-                # Verificar se há estoque suficiente total
-                estoque_total = sum(e.quantidade_disponivel for e in entradas_disponiveis)
-                print(f"DEBUG - Estoque total disponível: {estoque_total}")
-                
-                if quantidade_solicitada > estoque_total:
-                    return JsonResponse({
-                        'success': False,
-                        'error': f'Estoque insuficiente. Disponível: {estoque_total} unidades.'
-                    }, status=400)
-                
-                # Implementar lógica FIFO - retirar das entradas mais antigas primeiro
-                quantidade_restante = quantidade_solicitada
-                entradas_processadas = []
-                
-                for entrada in entradas_disponiveis:
-                    if quantidade_restante <= 0:
-                        break
-                    
-                    # Quantidade a retirar desta entrada
-                    quantidade_desta_entrada = min(quantidade_restante, entrada.quantidade_disponivel)
-                    
-                    # Atualizar quantidade disponível da entrada
-                    entrada.quantidade_disponivel -= quantidade_desta_entrada
-                    entrada.save(update_fields=['quantidade_disponivel'])
-                    
-                    # Registrar a saída
-                    saida = SaidaMedicamento.objects.create(
-                        medicamento=medicamento,
-                        entrada=entrada,
-                        quantidade=quantidade_desta_entrada,
-                        motivo=motivo,
-                        registrada_por=request.user
-                    )
-                    
-                    entradas_processadas.append({
-                        'entrada_id': entrada.id,
-                        'quantidade': quantidade_desta_entrada,
-                        'saida_id': saida.id
-                    })
-                    
-                    print(f"DEBUG - Saída criada: {quantidade_desta_entrada} da entrada #{entrada.id}")
-                    
-                    # Reduzir quantidade restante
-                    quantidade_restante -= quantidade_desta_entrada
-                    
-                    # Se a entrada zerou, ela não será mais exibida (filtro na view)
-                    if entrada.quantidade_disponivel == 0:
-                        print(f"DEBUG - Entrada #{entrada.id} zerada (não será mais exibida)")
-                
-                # Calcular novo estoque total
-                novo_estoque = medicamento.quantidade_total
-                print(f"DEBUG - Novo estoque total: {novo_estoque}")
-                
-                # Manter o medicamento cadastrado mesmo se o estoque zerar
-                # O medicamento permanece para futuras entradas
-                if novo_estoque <= 0:
-                    print(f"DEBUG - Estoque zerado, mas medicamento {medicamento.nome} permanece cadastrado")
-                    mensagem = f'Saída de {quantidade_solicitada} unidades registrada! O estoque de {medicamento.nome} está zerado.'
-                else:
-                    mensagem = f'Saída de {quantidade_solicitada} unidades registrada com sucesso!'
-                
-                return JsonResponse({
-                    'success': True,
-                    'message': mensagem,
-                    'novo_estoque': novo_estoque,
-                    'estoque_zerado': novo_estoque <= 0,
-                    'entradas_processadas': entradas_processadas
-                })
+            lote = 'itens' in data
+            motivo = data.get('motivo', '')
+            itens = normalizar_itens(data['itens'] if lote else [data], motivo_padrao=motivo)
+            
+            # Planeja e grava todas as saídas em uma única transação
+            resultados = registrar_saidas(fazenda_ativa, request.user, itens)
             
         except json.JSONDecodeError:
-            print("DEBUG - Erro ao decodificar JSON")
             return JsonResponse({
                 'success': False,
                 'error': 'Dados JSON inválidos.'
             }, status=400)
+        except SaidaMedicamentoError as e:
+            return JsonResponse({
+                'success': False,
+                'error': e.mensagem
+            }, status=e.status)
         except Exception as e:
-            print(f"DEBUG - Erro: {str(e)}")
             import traceback
             traceback.print_exc()
             return JsonResponse({
                 'success': False,
                 'error': f'Erro ao processar saída: {str(e)}'
             }, status=500)
+        
+        if lote:
+            total_unidades = sum(r['quantidade'] for r in resultados)
+            return JsonResponse({
+                'success': True,
+                'message': f'{len(resultados)} saída(s) registrada(s), totalizando {total_unidades} unidades!',
+                'saidas': [
+                    {
+                        'medicamento_id': r['medicamento'].id,
+                        'medicamento': r['medicamento'].nome,
+                        'quantidade': r['quantidade'],
+                        'novo_estoque': r['novo_estoque'],
+                        'estoque_zerado': r['novo_estoque'] <= 0,
+                        'entradas_processadas': r['entradas_processadas'],
+                    }
+                    for r in resultados
+                ]
+            })
+        
+        resultado = resultados[0]
+        novo_estoque = resultado['novo_estoque']
+        
+        # Manter o medicamento cadastrado mesmo se o estoque zerar
+        # O medicamento permanece para futuras entradas
+        if novo_estoque <= 0:
+            mensagem = f'Saída de {resultado["quantidade"]} unidades registrada! O estoque de {resultado["medicamento"].nome} está zerado.'
+        else:
+            mensagem = f'Saída de {resultado["quantidade"]} unidades registrada com sucesso!'
+        
+        return JsonResponse({
+            'success': True,
+            'message': mensagem,
+            'novo_estoque': novo_estoque,
+            'estoque_zerado': novo_estoque <= 0,
+            'entradas_processadas': resultado['entradas_processadas']
+        })
+
 
+############ Importação de Entradas (planilha) ############
+class EntradaMedicamentoImportacaoView(ImportacaoPlanilhaView):
+    importador_class = ImportadorEntradasMedicamento
+    titulo = "Importar Entradas de Medicamentos"
+    subtitulo = "Importe entradas de estoque de uma planilha. Os medicamentos devem estar cadastrados na fazenda."
+    colunas = [
+        ("medicamento", "nome do medicamento, obrigatório"),
+        ("quantidade", "obrigatória"),
+        ("valor_medicamento", "valor total da entrada, obrigatório"),
+        ("validade", "obrigatória"),
+        ("observacao", "opcional"),
+    ]
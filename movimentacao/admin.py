@@ -1,8 +1,14 @@
 from django.contrib import admin
-from .models import Movimentacao, Parcela, Categoria
+from .models import Movimentacao, Parcela, Categoria, ResumoMensalMovimentacao
 # Register your models here.
 
 
 admin.site.register(Movimentacao)
 admin.site.register(Parcela)    
-admin.site.register(Categoria)
\ No newline at end of file
+admin.site.register(Categoria)
+
+@admin.register(ResumoMensalMovimentacao)
+class ResumoMensalMovimentacaoAdmin(admin.ModelAdmin):
+    list_display = ['mes', 'fazenda', 'tipo', 'categoria', 'parceiro', 'total', 'quantidade']
+    list_select_related = ['fazenda', 'categoria', 'parceiro']
+    list_filter = ['fazenda', 'tipo', 'mes']
@@ -172,6 +172,52 @@ class MovimentacaoForm(forms.ModelForm):
     # Removido clean_cadastrada_por - campo não está mais no formulário
 
 
+
+class MovimentacaoImportacaoForm(MovimentacaoForm):
+    """
+    MovimentacaoForm aplicado a uma linha de planilha (paginas.importacao).
+    Categoria e parceiro chegam pelo nome e são resolvidos nos índices em memória
+    do importador, sem query por linha; as demais regras são as do formulário.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.categorias = kwargs.pop('categorias')  # nome normalizado -> [Categoria]
+        self.parceiros = kwargs.pop('parceiros')  # nome normalizado -> Parceiros
+        super().__init__(*args, **kwargs)
+        # Relações resolvidas no clean() pelo nome (e excluídas da validação do modelo)
+        del self.fields['categoria']
+        del self.fields['parceiros']
+
+    def clean(self):
+        from paginas.importacao import normalizar_nome
+
+        cleaned_data = super().clean()
+
+        nome_categoria = str(self.data.get('categoria') or '').strip()
+        tipo = normalizar_nome(self.data.get('tipo')) or None
+        candidatas = [
+            categoria for categoria in self.categorias.get(normalizar_nome(nome_categoria), [])
+            if not tipo or categoria.tipo == tipo
+        ]
+        if not nome_categoria:
+            self.add_error(None, 'Informe a categoria.')
+        elif not candidatas:
+            self.add_error(None, f'Categoria "{nome_categoria}" não encontrada nesta fazenda.')
+        elif len(candidatas) > 1:
+            self.add_error(None, f'Existe receita e despesa com o nome "{nome_categoria}": informe a coluna tipo.')
+        else:
+            cleaned_data['categoria'] = candidatas[0]
+
+        nome_parceiro = str(self.data.get('parceiro') or '').strip()
+        if nome_parceiro:
+            parceiro = self.parceiros.get(normalizar_nome(nome_parceiro))
+            if parceiro is None:
+                self.add_error(None, f'Parceiro "{nome_parceiro}" não encontrado nesta fazenda.')
+            else:
+                cleaned_data['parceiros'] = parceiro
+
+        return cleaned_data
+
 class ParcelaForm(forms.ModelForm):
     """
     Formulário personalizado para edição de parcelas.
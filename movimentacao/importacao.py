@@ -0,0 +1,73 @@
+"""
+Importação de movimentações (receitas e despesas) a partir de planilhas
+
+Colunas: categoria, valor_total, data (obrigatórias); tipo, parceiro, parcelas,
+imposto_renda, descricao (opcionais). Veja paginas.importacao para o pipeline.
+"""
+from django.db import transaction
+
+from paginas import busca
+from paginas.cache import invalidar_ao_gravar
+from paginas.importacao import Importador, normalizar_booleano, normalizar_decimal, normalizar_nome
+from perfis.models import Parceiros
+from relatorios.notificacoes import materializar_notificacoes
+
+from .forms import MovimentacaoImportacaoForm
+from .models import Categoria, Movimentacao, Parcela, ResumoMensalMovimentacao
+
+
+class ImportadorMovimentacoes(Importador):
+    colunas_obrigatorias = ('categoria', 'valor_total', 'data')
+    form_class = MovimentacaoImportacaoForm
+
+    def carregar_indices(self):
+        """Categorias e parceiros da fazenda por nome normalizado (duas queries no total)"""
+        self.categorias = {}
+        for categoria in Categoria.objects.filter(fazenda=self.fazenda):
+            self.categorias.setdefault(normalizar_nome(categoria.nome), []).append(categoria)
+        self.parceiros = {
+            normalizar_nome(parceiro.nome): parceiro
+            for parceiro in Parceiros.objects.filter(fazenda=self.fazenda)
+        }
+
+    def argumentos_formulario(self):
+        return {'categorias': self.categorias, 'parceiros': self.parceiros}
+
+    def validar_linha(self, dados):
+        dados = dict(dados)
+        dados['valor_total'] = normalizar_decimal(dados.get('valor_total', ''))
+        dados['parcelas'] = str(dados.get('parcelas') or '1').strip()
+        dados['imposto_renda'] = normalizar_booleano(dados.get('imposto_renda', ''))
+
+        movimentacao = self.validar_com_formulario(dados, Movimentacao())
+        movimentacao.fazenda = self.fazenda
+        movimentacao.cadastrada_por = self.usuario
+        # Feito pelo save() no cadastro individual
+        movimentacao.tipo = movimentacao.categoria.tipo
+        return movimentacao
+
+    def gravar_bloco(self, objetos):
+        """Movimentações e parcelas do bloco em dois bulk_create"""
+        Movimentacao.objects.bulk_create(objetos)
+        Parcela.objects.bulk_create([
+            Parcela(
+                movimentacao=movimentacao,
+                fazenda_id=movimentacao.fazenda_id,
+                tipo=movimentacao.tipo,
+                ordem_parcela=ordem,
+                valor_parcela=valor_parcela,
+                data_vencimento=data_vencimento,
+                status_pagamento="Pendente",
+            )
+            for movimentacao in objetos
+            for ordem, valor_parcela, data_vencimento in movimentacao.calcular_parcelas()
+        ], batch_size=1000)
+        # bulk_create não dispara os signals: documentos de busca gravados no mesmo bloco
+        busca.indexar(busca.TIPO_MOVIMENTACAO, objetos)
+
+    def finalizar(self):
+        # bulk_create não passa pelo save(): resumo mensal e cache atualizados de uma vez
+        with transaction.atomic():
+            ResumoMensalMovimentacao.reconstruir([self.fazenda])
+            invalidar_ao_gravar(self.fazenda.pk)
+        materializar_notificacoes(self.fazenda.pk)
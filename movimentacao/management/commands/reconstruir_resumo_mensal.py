@@ -0,0 +1,38 @@
+"""
+Reconstrói o resumo mensal das movimentações (ResumoMensalMovimentacao)
+a partir do histórico de Movimentacao.
+
+Uso:
+    python manage.py reconstruir_resumo_mensal
+    python manage.py reconstruir_resumo_mensal --fazenda 3
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from movimentacao.models import ResumoMensalMovimentacao
+from paginas.cache import invalidar_ao_gravar
+from perfis.models import Fazenda
+
+
+class Command(BaseCommand):
+    help = "Reconstrói os totais mensais usados nos gráficos a partir das movimentações"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fazenda',
+            type=int,
+            help='ID da fazenda a reconstruir (padrão: todas)',
+        )
+
+    def handle(self, *args, **options):
+        fazendas = Fazenda.objects.all()
+        if options['fazenda']:
+            fazendas = fazendas.filter(pk=options['fazenda'])
+
+        with transaction.atomic():
+            total = ResumoMensalMovimentacao.reconstruir(fazendas)
+            # Os gráficos em cache foram calculados com o resumo antigo
+            for fazenda_id in fazendas.values_list('pk', flat=True):
+                invalidar_ao_gravar(fazenda_id)
+
+        self.stdout.write(self.style.SUCCESS(f'{total} linha(s) de resumo mensal reconstruída(s).'))
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.23 on 2026-10-17 17:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def popular_resumo(apps, schema_editor):
+    """Cria o resumo mensal das movimentações existentes"""
+    from django.db.models import Count, Sum
+    from django.db.models.functions import TruncMonth
+
+    Movimentacao = apps.get_model('movimentacao', 'Movimentacao')
+    ResumoMensalMovimentacao = apps.get_model('movimentacao', 'ResumoMensalMovimentacao')
+
+    agregados = Movimentacao.objects.order_by().annotate(
+        mes_ref=TruncMonth('data')
+    ).values(
+        'fazenda_id', 'mes_ref', 'categoria__tipo', 'categoria_id', 'parceiros_id'
+    ).annotate(soma=Sum('valor_total'), qtd=Count('id'))
+
+    ResumoMensalMovimentacao.objects.bulk_create([
+        ResumoMensalMovimentacao(
+            fazenda_id=row['fazenda_id'],
+            mes=row['mes_ref'],
+            tipo=row['categoria__tipo'],
+            categoria_id=row['categoria_id'],
+            parceiro_id=row['parceiros_id'],
+            total=row['soma'] or 0,
+            quantidade=row['qtd'],
+        )
+        for row in agregados
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfis', '0001_initial'),
+        ('movimentacao', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoMensalMovimentacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primeiro dia do mês', verbose_name='Mês')),
+                ('tipo', models.CharField(choices=[('receita', 'Receita'), ('despesa', 'Despesa')], max_length=50, verbose_name='Tipo')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Valor Total')),
+                ('quantidade', models.IntegerField(default=0, verbose_name='Quantidade de Movimentações')),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='movimentacao.categoria', verbose_name='Categoria')),
+                ('fazenda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_mensais', to='perfis.fazenda', verbose_name='Fazenda')),
+                ('parceiro', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='perfis.parceiros', verbose_name='Empresa Parceira')),
+            ],
+            options={
+                'verbose_name': 'Resumo Mensal de Movimentações',
+                'verbose_name_plural': 'Resumos Mensais de Movimentações',
+                'indexes': [models.Index(fields=['fazenda', 'mes', 'tipo'], name='movimentaca_fazenda_47173f_idx')],
+                'unique_together': {('fazenda', 'mes', 'categoria', 'parceiro')},
+            },
+        ),
+        migrations.RunPython(popular_resumo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.23 on 2026-10-17 17:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def popular_fazenda_tipo(apps, schema_editor):
+    """Copia fazenda e tipo da movimentação para as parcelas existentes"""
+    from django.db.models import OuterRef, Subquery
+
+    Movimentacao = apps.get_model('movimentacao', 'Movimentacao')
+    Parcela = apps.get_model('movimentacao', 'Parcela')
+
+    movimentacao = Movimentacao.objects.filter(pk=OuterRef('movimentacao_id'))
+    Parcela.objects.update(
+        fazenda_id=Subquery(movimentacao.values('fazenda_id')[:1]),
+        tipo=Subquery(movimentacao.values('categoria__tipo')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfis', '0001_initial'),
+        ('movimentacao', '0002_resumomensalmovimentacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parcela',
+            name='fazenda',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='parcelas', to='perfis.fazenda', verbose_name='Fazenda'),
+        ),
+        migrations.AddField(
+            model_name='parcela',
+            name='tipo',
+            field=models.CharField(blank=True, choices=[('receita', 'Receita'), ('despesa', 'Despesa')], editable=False, max_length=50, verbose_name='Tipo'),
+        ),
+        migrations.RunPython(popular_fazenda_tipo, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='parcela',
+            index=models.Index(fields=['fazenda', 'tipo', 'status_pagamento', 'data_vencimento'], name='movimentaca_fazenda_d43035_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parcela',
+            index=models.Index(fields=['fazenda', 'tipo', '-data_vencimento'], name='movimentaca_fazenda_d2007a_idx'),
+        ),
+    ]
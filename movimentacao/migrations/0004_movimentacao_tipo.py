@@ -0,0 +1,34 @@
+# Generated by Django 4.2.23 on 2026-10-17 17:50
+
+from django.db import migrations, models
+
+
+def popular_tipo(apps, schema_editor):
+    """Copia o tipo da categoria para as movimentações existentes"""
+    from django.db.models import OuterRef, Subquery
+
+    Categoria = apps.get_model('movimentacao', 'Categoria')
+    Movimentacao = apps.get_model('movimentacao', 'Movimentacao')
+
+    categoria = Categoria.objects.filter(pk=OuterRef('categoria_id'))
+    Movimentacao.objects.update(tipo=Subquery(categoria.values('tipo')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movimentacao', '0003_parcela_fazenda_tipo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimentacao',
+            name='tipo',
+            field=models.CharField(blank=True, choices=[('receita', 'Receita'), ('despesa', 'Despesa')], editable=False, max_length=50, verbose_name='Tipo'),
+        ),
+        migrations.RunPython(popular_tipo, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(fields=['fazenda', 'tipo', '-data'], name='movimentaca_fazenda_76c24b_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:45
+
+from django.db import migrations, models
+
+
+def recalcular_linhas_sem_parceiro(apps, schema_editor):
+    """
+    Recalcula a partir das movimentações as linhas sem parceiro duplicadas (o índice
+    antigo não as impedia e cada UPDATE com F() somava em todas as cópias).
+    """
+    from datetime import timedelta
+    from django.db.models import Count, Sum
+
+    Resumo = apps.get_model('movimentacao', 'ResumoMensalMovimentacao')
+    Movimentacao = apps.get_model('movimentacao', 'Movimentacao')
+    duplicadas = list(
+        Resumo.objects.filter(parceiro__isnull=True)
+        .values('fazenda_id', 'mes', 'categoria_id')
+        .annotate(linhas=Count('id'))
+        .filter(linhas__gt=1)
+    )
+    for grupo in duplicadas:
+        chave = {'fazenda_id': grupo['fazenda_id'], 'mes': grupo['mes'], 'categoria_id': grupo['categoria_id']}
+        linhas = Resumo.objects.filter(parceiro__isnull=True, **chave).order_by('id')
+        mantida = linhas.first()
+        linhas.exclude(pk=mantida.pk).delete()
+
+        proximo_mes = (grupo['mes'] + timedelta(days=32)).replace(day=1)
+        agregado = Movimentacao.objects.filter(
+            fazenda_id=grupo['fazenda_id'], categoria_id=grupo['categoria_id'], parceiros__isnull=True,
+            data__gte=grupo['mes'], data__lt=proximo_mes,
+        ).aggregate(soma=Sum('valor_total'), qtd=Count('id'))
+        if agregado['qtd']:
+            Resumo.objects.filter(pk=mantida.pk).update(total=agregado['soma'], quantidade=agregado['qtd'])
+        else:
+            mantida.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movimentacao', '0004_movimentacao_tipo'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='resumomensalmovimentacao',
+            unique_together=set(),
+        ),
+        migrations.RunPython(recalcular_linhas_sem_parceiro, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='resumomensalmovimentacao',
+            constraint=models.UniqueConstraint(condition=models.Q(('parceiro__isnull', False)), fields=('fazenda', 'mes', 'categoria', 'parceiro'), name='resumo_mensal_unico_com_parceiro'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumomensalmovimentacao',
+            constraint=models.UniqueConstraint(condition=models.Q(('parceiro__isnull', True)), fields=('fazenda', 'mes', 'categoria'), name='resumo_mensal_unico_sem_parceiro'),
+        ),
+    ]
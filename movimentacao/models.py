@@ -1,6 +1,12 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from datetime import timedelta
+from decimal import ROUND_DOWN, Decimal
 
 from perfis.models import Fazenda, Parceiros
 
@@ -39,6 +45,18 @@ class Movimentacao(models.Model):
     cadastrado_em = models.DateTimeField(
         auto_now_add=True, verbose_name="Cadastrado Em"
     )
+    # Cópia desnormalizada de categoria.tipo (mantida pelo save de Movimentacao
+    # e Categoria) para separar receitas e despesas sem join
+    tipo = models.CharField(
+        max_length=50,
+        choices=[
+            ("receita", "Receita"),
+            ("despesa", "Despesa"),
+        ],
+        blank=True,
+        editable=False,
+        verbose_name="Tipo",
+    )
 
     def __str__(self):
         parceiro_info = f"Parceiro: {self.parceiros}\n" if self.parceiros else ""
@@ -56,35 +74,176 @@ class Movimentacao(models.Model):
             f"Cadastrado Em: {self.cadastrado_em}"
         )
 
-    def gerar_parcelas(self):
-        """Gera automaticamente as parcelas baseadas na movimentação"""
-        # Deleta parcelas existentes para recriar
-        self.parcela_set.all().delete()
-
-        valor_parcela = self.valor_total / self.parcelas
-
-        for i in range(self.parcelas):
-            # Calcula a data de vencimento (30 dias entre cada parcela)
-            data_vencimento = self.data + timedelta(days=30 * i)
-
-            Parcela.objects.create(
-                movimentacao=self,
-                ordem_parcela=i + 1,
-                valor_parcela=valor_parcela,
-                data_vencimento=data_vencimento,
-                valor_pago=0.00,
-                status_pagamento="Pendente",
-                data_quitacao=None,
+    def calcular_parcelas(self, valor=None, ordens=None):
+        """
+        Calcula o cronograma de parcelas sem acessar o banco.
+
+        O valor é dividido em centavos exatos: cada parcela recebe o valor truncado
+        e a última absorve o resto, de modo que a soma feche com o valor total.
+
+        Args:
+            valor: Valor a distribuir (padrão: valor_total)
+            ordens: Ordens das parcelas que recebem o valor (padrão: 1..parcelas)
+
+        Returns:
+            list: Tuplas (ordem_parcela, valor_parcela, data_vencimento)
+        """
+        valor = Decimal(str(self.valor_total if valor is None else valor))
+        ordens = list(range(1, self.parcelas + 1) if ordens is None else ordens)
+        if not ordens:
+            return []
+
+        valor_parcela = (valor / len(ordens)).quantize(Decimal("0.01"), rounding=ROUND_DOWN)
+        ultima = valor - valor_parcela * (len(ordens) - 1)
+        return [
+            (
+                ordem,
+                ultima if ordem == ordens[-1] else valor_parcela,
+                # Calcula a data de vencimento (30 dias entre cada parcela)
+                self.data + timedelta(days=30 * (ordem - 1)),
             )
+            for ordem in ordens
+        ]
+
+    def validar_cronograma(self, pagas=None):
+        """
+        Verifica se o cronograma ainda comporta o valor não pago.
+
+        Args:
+            pagas: Parcelas pagas por ordem (padrão: lidas do banco)
+
+        Returns:
+            Decimal: Valor a distribuir nas parcelas não pagas
+
+        Raises:
+            ValidationError: Se o valor total ficou abaixo do já pago ou se sobra
+                             valor e todas as parcelas do novo número já estão pagas
+        """
+        if pagas is None:
+            pagas = {
+                parcela.ordem_parcela: parcela
+                for parcela in self.parcela_set.filter(status_pagamento="Pago")
+            } if self.pk else {}
+        total_pago = sum((parcela.valor_parcela for parcela in pagas.values()), Decimal("0.00"))
+        valor_pendente = Decimal(str(self.valor_total)) - total_pago
+
+        if valor_pendente < 0:
+            raise ValidationError({
+                "valor_total": f"O valor total não pode ser menor que o já pago nas parcelas (R$ {total_pago})."
+            })
+        if valor_pendente > 0 and all(ordem in pagas for ordem in range(1, self.parcelas + 1)):
+            raise ValidationError({
+                "parcelas": (
+                    f"As {self.parcelas} parcela(s) já estão pagas: aumente o número de parcelas "
+                    f"para cobrir os R$ {valor_pendente} restantes."
+                )
+            })
+        return valor_pendente
+
+    def clean(self):
+        super().clean()
+        # No cadastro não há parcelas pagas; na edição o formulário mostra o erro
+        if self.pk and self.valor_total is not None and self.parcelas is not None:
+            self.validar_cronograma()
+
+    def gerar_parcelas(self):
+        """
+        Gera (ou recalcula) as parcelas baseadas na movimentação.
+
+        Parcelas pagas são preservadas e o restante do valor é distribuído nas
+        demais (validar_cronograma recusa um restante negativo ou sem parcela
+        para recebê-lo); as pendentes são atualizadas no lugar. Novas parcelas são criadas
+        em um único bulk_create e as que sobraram são excluídas.
+        """
+        existentes = {parcela.ordem_parcela: parcela for parcela in self.parcela_set.all()}
+        pagas = {
+            ordem: parcela for ordem, parcela in existentes.items()
+            if parcela.status_pagamento == "Pago"
+        }
+        valor_pendente = self.validar_cronograma(pagas)
+        ordens = [ordem for ordem in range(1, self.parcelas + 1) if ordem not in pagas]
+
+        fazenda_id, tipo = self.copias_parcela()
+        novas, alteradas = [], []
+        for ordem, valor_parcela, data_vencimento in self.calcular_parcelas(valor_pendente, ordens):
+            parcela = existentes.get(ordem)
+            if parcela is None:
+                novas.append(Parcela(
+                    movimentacao=self,
+                    fazenda_id=fazenda_id,
+                    tipo=tipo,
+                    ordem_parcela=ordem,
+                    valor_parcela=valor_parcela,
+                    data_vencimento=data_vencimento,
+                    valor_pago=Decimal("0.00"),
+                    status_pagamento="Pendente",
+                    data_quitacao=None,
+                ))
+            elif parcela.valor_parcela != valor_parcela or parcela.data_vencimento != data_vencimento:
+                parcela.valor_parcela = valor_parcela
+                parcela.data_vencimento = data_vencimento
+                alteradas.append(parcela)
+
+        # Pendentes além do novo número de parcelas deixam de existir
+        excedentes = [
+            parcela.pk for ordem, parcela in existentes.items()
+            if ordem > self.parcelas and ordem not in pagas
+        ]
+
+        if excedentes:
+            Parcela.objects.filter(pk__in=excedentes).delete()
+        if alteradas:
+            Parcela.objects.bulk_update(alteradas, ["valor_parcela", "data_vencimento"])
+        if novas:
+            Parcela.objects.bulk_create(novas)
+
+    def copias_parcela(self):
+        """Valores copiados em cada parcela: (fazenda_id, tipo)"""
+        return self.fazenda_id, self.tipo
+
+    def _chave_resumo(self):
+        """Linha do resumo mensal em que esta movimentação é contabilizada"""
+        return {
+            'fazenda_id': self.fazenda_id,
+            'mes': self.data.replace(day=1),
+            'categoria_id': self.categoria_id,
+            'parceiro_id': self.parceiros_id,
+        }
 
     def save(self, *args, **kwargs):
         """Override do save para gerar parcelas automaticamente"""
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
+        # Movimentação, resumo mensal e parcelas gravados juntos; os callbacks
+        # on_commit dos signals só rodam depois de as parcelas serem geradas
+        with transaction.atomic():
+            is_new = self.pk is None
+            anterior = None
+            if not is_new:
+                anterior = Movimentacao.objects.filter(pk=self.pk).first()
+            self.tipo = self.categoria.tipo
+            super().save(*args, **kwargs)
 
-        # Se for uma nova movimentação ou o número de parcelas mudou, gera as parcelas
-        if is_new or "parcelas" in kwargs.get("update_fields", []):
-            self.gerar_parcelas()
+            # Manter o resumo mensal sincronizado (retira a versão anterior, soma a nova)
+            if anterior:
+                ResumoMensalMovimentacao.registrar(
+                    anterior._chave_resumo(), anterior.tipo, -anterior.valor_total, -1
+                )
+            ResumoMensalMovimentacao.registrar(self._chave_resumo(), self.tipo, self.valor_total, 1)
+
+            # Fazenda/tipo copiados nas parcelas acompanham a movimentação
+            if anterior and (anterior.fazenda_id, anterior.tipo) != self.copias_parcela():
+                fazenda_id, tipo = self.copias_parcela()
+                self.parcela_set.update(fazenda_id=fazenda_id, tipo=tipo)
+
+            # Se for uma nova movimentação ou o cronograma mudou (número de parcelas,
+            # valor ou data), gera/recalcula as parcelas
+            if is_new or "parcelas" in (kwargs.get("update_fields") or []) or (
+                anterior and (
+                    anterior.parcelas != self.parcelas
+                    or anterior.valor_total != Decimal(str(self.valor_total))
+                    or anterior.data != self.data
+                )
+            ):
+                self.gerar_parcelas()
 
     class Meta:
         verbose_name_plural = "Movimentações"
@@ -94,6 +253,8 @@ class Movimentacao(models.Model):
             models.Index(fields=['-data']),
             models.Index(fields=['categoria', '-data']),
             models.Index(fields=['fazenda', '-data']),
+            # Totais do dashboard, relatórios e listagens: fazenda + tipo + data
+            models.Index(fields=['fazenda', 'tipo', '-data']),
         ]
 
 
@@ -120,6 +281,26 @@ class Parcela(models.Model):
     data_quitacao = models.DateField(
         blank=True, null=True, verbose_name="Data de Quitação"
     )
+    # Cópias desnormalizadas da movimentação (mantidas pelo save de Parcela,
+    # Movimentacao e Categoria) para filtrar parcelas sem join
+    fazenda = models.ForeignKey(
+        Fazenda,
+        on_delete=models.CASCADE,
+        null=True,
+        editable=False,
+        related_name="parcelas",
+        verbose_name="Fazenda",
+    )
+    tipo = models.CharField(
+        max_length=50,
+        choices=[
+            ("receita", "Receita"),
+            ("despesa", "Despesa"),
+        ],
+        blank=True,
+        editable=False,
+        verbose_name="Tipo",
+    )
 
     def __str__(self):
         return (
@@ -132,11 +313,19 @@ class Parcela(models.Model):
             f"Data Quitação: {self.data_quitacao if self.data_quitacao else 'Não Quitada'}"
         )
 
+    def save(self, *args, **kwargs):
+        if self.fazenda_id is None or not self.tipo:
+            self.fazenda_id, self.tipo = self.movimentacao.copias_parcela()
+        super().save(*args, **kwargs)
+
     class Meta:
         indexes = [
             models.Index(fields=['-data_vencimento']),
             models.Index(fields=['status_pagamento', '-data_vencimento']),
             models.Index(fields=['movimentacao', 'ordem_parcela']),
+            # Notificações, relatórios e listagens: fazenda + tipo + status + vencimento
+            models.Index(fields=['fazenda', 'tipo', 'status_pagamento', 'data_vencimento']),
+            models.Index(fields=['fazenda', 'tipo', '-data_vencimento']),
         ]
 
 
@@ -163,7 +352,164 @@ class Categoria(models.Model):
     def __str__(self):
         return f"{self.nome} ({self.tipo})"
 
+    def save(self, *args, **kwargs):
+        tipo_anterior = None
+        if self.pk:
+            tipo_anterior = Categoria.objects.filter(pk=self.pk).values_list('tipo', flat=True).first()
+        super().save(*args, **kwargs)
+
+        # O tipo é copiado nas movimentações, no resumo mensal e nas parcelas:
+        # acompanha a troca de tipo da categoria
+        if tipo_anterior and tipo_anterior != self.tipo:
+            Movimentacao.objects.filter(categoria=self).update(tipo=self.tipo)
+            ResumoMensalMovimentacao.objects.filter(categoria=self).update(tipo=self.tipo)
+            Parcela.objects.filter(movimentacao__categoria=self).update(tipo=self.tipo)
+
     class Meta:
         verbose_name_plural = "Categorias"
         ordering = ["nome"]
         unique_together = [["nome", "tipo", "fazenda"]]  # Nome único por tipo e fazenda
+
+
+############  Resumo Mensal  ############
+class ResumoMensalMovimentacao(models.Model):
+    """
+    Totais mensais desnormalizados das movimentações, por
+    (fazenda, mês, tipo, categoria, parceiro).
+
+    Mantido pelo save de Movimentacao/Categoria e pelo signal de exclusão, para que
+    os gráficos mensais leiam poucas linhas por mês em vez de varrer todo o histórico.
+    Pode ser reconstruído a partir das movimentações com:
+        python manage.py reconstruir_resumo_mensal
+    """
+    fazenda = models.ForeignKey(
+        Fazenda,
+        on_delete=models.CASCADE,
+        related_name='resumos_mensais',
+        verbose_name="Fazenda",
+    )
+    mes = models.DateField(verbose_name="Mês", help_text="Primeiro dia do mês")
+    tipo = models.CharField(
+        max_length=50,
+        choices=[
+            ("receita", "Receita"),
+            ("despesa", "Despesa"),
+        ],
+        verbose_name="Tipo",
+    )
+    categoria = models.ForeignKey(
+        Categoria, on_delete=models.CASCADE, verbose_name="Categoria"
+    )
+    parceiro = models.ForeignKey(
+        Parceiros,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        verbose_name="Empresa Parceira",
+    )
+    total = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name="Valor Total"
+    )
+    quantidade = models.IntegerField(default=0, verbose_name="Quantidade de Movimentações")
+
+    def __str__(self):
+        return f"{self.mes:%m/%Y} - {self.categoria} - {self.total}"
+
+    @classmethod
+    def registrar(cls, chave, tipo, delta_total, delta_quantidade):
+        """
+        Soma uma variação na linha do resumo (UPDATE com F(), sem ler a linha).
+        Cria a linha na primeira movimentação e a remove quando fica vazia.
+        """
+        # valor_total pode chegar como float/str antes de ser relido do banco
+        delta_total = Decimal(str(delta_total))
+        linhas = cls.objects.filter(**chave)
+        atualizados = linhas.update(
+            total=F('total') + delta_total,
+            quantidade=F('quantidade') + delta_quantidade,
+        )
+        if not atualizados:
+            if delta_quantidade <= 0:
+                return
+            try:
+                with transaction.atomic():
+                    cls.objects.create(tipo=tipo, total=delta_total, quantidade=delta_quantidade, **chave)
+            except IntegrityError:
+                # Criada em paralelo por outra requisição
+                linhas.update(
+                    total=F('total') + delta_total,
+                    quantidade=F('quantidade') + delta_quantidade,
+                )
+        elif delta_quantidade < 0:
+            linhas.filter(quantidade__lte=0).delete()
+
+    @classmethod
+    def reconstruir(cls, fazendas=None):
+        """
+        Reconstrói o resumo das fazendas informadas (todas se None) a partir
+        das movimentações, com uma única agregação.
+
+        Returns:
+            int: Quantidade de linhas de resumo criadas
+        """
+        movimentacoes = Movimentacao.objects.all()
+        resumos = cls.objects.all()
+        if fazendas is not None:
+            movimentacoes = movimentacoes.filter(fazenda__in=fazendas)
+            resumos = resumos.filter(fazenda__in=fazendas)
+
+        agregados = movimentacoes.order_by().annotate(
+            mes_ref=TruncMonth('data')
+        ).values(
+            'fazenda_id', 'mes_ref', 'tipo', 'categoria_id', 'parceiros_id'
+        ).annotate(
+            soma=Sum('valor_total'), qtd=Count('id')
+        )
+
+        novos = [
+            cls(
+                fazenda_id=row['fazenda_id'],
+                mes=row['mes_ref'],
+                tipo=row['tipo'],
+                categoria_id=row['categoria_id'],
+                parceiro_id=row['parceiros_id'],
+                total=row['soma'] or 0,
+                quantidade=row['qtd'],
+            )
+            for row in agregados
+        ]
+        resumos.delete()
+        cls.objects.bulk_create(novos, batch_size=500)
+        return len(novos)
+
+    class Meta:
+        verbose_name = "Resumo Mensal de Movimentações"
+        verbose_name_plural = "Resumos Mensais de Movimentações"
+        constraints = [
+            # NULLs nunca são iguais num índice único: as linhas sem parceiro precisam
+            # de um índice parcial próprio para o IntegrityError de registrar() disparar
+            models.UniqueConstraint(
+                fields=['fazenda', 'mes', 'categoria', 'parceiro'],
+                condition=Q(parceiro__isnull=False),
+                name='resumo_mensal_unico_com_parceiro',
+            ),
+            models.UniqueConstraint(
+                fields=['fazenda', 'mes', 'categoria'],
+                condition=Q(parceiro__isnull=True),
+                name='resumo_mensal_unico_sem_parceiro',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['fazenda', 'mes', 'tipo']),
+        ]
+
+
+@receiver(post_delete, sender=Movimentacao)
+def resumo_movimentacao_excluida(sender, instance, origin=None, **kwargs):
+    """Retira do resumo mensal o valor de uma movimentação excluída"""
+    if isinstance(origin, (Fazenda, Categoria, Parceiros)):
+        # Exclusão em cascata: as linhas do resumo são apagadas junto com a origem
+        return
+    ResumoMensalMovimentacao.registrar(
+        instance._chave_resumo(), None, -instance.valor_total, -1
+    )
@@ -1,8 +1,9 @@
 from django.test import TestCase
 from django.contrib.auth.models import User
-from datetime import date
+from datetime import date, timedelta
 from perfis.models import Fazenda, Parceiros
-from .models import Movimentacao, Categoria, Parcela
+from decimal import Decimal
+from .models import Movimentacao, Categoria, Parcela, ResumoMensalMovimentacao
 
 class CategoriaModelTest(TestCase):
     def setUp(self):
@@ -119,6 +120,362 @@ class ParcelaModelTest(TestCase):
         self.assertEqual(parcela_atualizada.status_pagamento, "Pago")
 
 
+
+class GerarParcelasTest(TestCase):
+    """Testes do cronograma de parcelas gerado em lote"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.fazenda = Fazenda.objects.create(nome="Fazenda Parcelas", dono=self.user)
+        self.categoria = Categoria.objects.create(nome="Financiamento", tipo="despesa", fazenda=self.fazenda)
+
+    def _criar(self, valor, parcelas):
+        return Movimentacao.objects.create(
+            categoria=self.categoria, valor_total=valor, parcelas=parcelas,
+            data=date(2024, 1, 1), fazenda=self.fazenda, cadastrada_por=self.user
+        )
+
+    def test_resto_na_ultima_parcela(self):
+        """Testa que a soma das parcelas fecha exatamente com o valor total"""
+        movimentacao = self._criar(Decimal('100.00'), 3)
+        valores = list(movimentacao.parcela_set.order_by('ordem_parcela').values_list('valor_parcela', flat=True))
+
+        self.assertEqual(valores, [Decimal('33.33'), Decimal('33.33'), Decimal('33.34')])
+
+    def test_parcelas_criadas_em_lote(self):
+        """Testa que o número de queries para gerar parcelas não depende da quantidade"""
+        movimentacao = self._criar(Decimal('60000.00'), 1)
+        movimentacao.parcelas = 60
+
+        # SELECT das existentes + UPDATE da 1ª parcela + um INSERT para as outras 59
+        with self.assertNumQueries(3):
+            movimentacao.gerar_parcelas()
+        self.assertEqual(movimentacao.parcela_set.count(), 60)
+        self.assertEqual(movimentacao.parcela_set.last().data_vencimento, date(2024, 1, 1) + timedelta(days=30 * 59))
+
+    def test_recalculo_preserva_parcelas_pagas(self):
+        """Testa que ao mudar valor e número de parcelas as pagas continuam intactas"""
+        movimentacao = self._criar(Decimal('300.00'), 3)
+        primeira = movimentacao.parcela_set.get(ordem_parcela=1)
+        primeira.status_pagamento = 'Pago'
+        primeira.valor_pago = primeira.valor_parcela
+        primeira.save()
+
+        movimentacao.valor_total = Decimal('500.00')
+        movimentacao.parcelas = 2
+        movimentacao.save()
+
+        parcelas = list(movimentacao.parcela_set.order_by('ordem_parcela'))
+        self.assertEqual([p.pk for p in parcelas][0], primeira.pk)
+        self.assertEqual(
+            [(p.ordem_parcela, p.valor_parcela, p.status_pagamento) for p in parcelas],
+            [(1, Decimal('100.00'), 'Pago'), (2, Decimal('400.00'), 'Pendente')]
+        )
+
+
+    def _pagar(self, movimentacao, *ordens):
+        for parcela in movimentacao.parcela_set.filter(ordem_parcela__in=ordens):
+            parcela.status_pagamento = 'Pago'
+            parcela.valor_pago = parcela.valor_parcela
+            parcela.save()
+
+    def test_recusa_valor_sem_parcela_pendente_para_receber(self):
+        """Testa que aumentar o valor com todas as parcelas pagas é recusado (o restante sumiria)"""
+        from django.core.exceptions import ValidationError
+
+        movimentacao = self._criar(Decimal('200.00'), 2)
+        self._pagar(movimentacao, 1, 2)
+
+        movimentacao.valor_total = Decimal('300.00')
+        with self.assertRaises(ValidationError) as erro:
+            movimentacao.full_clean()
+        self.assertIn('parcelas', erro.exception.message_dict)
+        with self.assertRaises(ValidationError):
+            movimentacao.save()
+
+        movimentacao.refresh_from_db()
+        self.assertEqual(movimentacao.valor_total, Decimal('200.00'))
+        self.assertEqual(movimentacao.parcela_set.count(), 2)
+
+        # Com uma parcela a mais o restante tem onde ficar
+        movimentacao.valor_total = Decimal('300.00')
+        movimentacao.parcelas = 3
+        movimentacao.save()
+        self.assertEqual(movimentacao.parcela_set.get(ordem_parcela=3).valor_parcela, Decimal('100.00'))
+
+    def test_recusa_valor_total_menor_que_o_pago(self):
+        """Testa que baixar o valor total abaixo do já pago é recusado (gerariam parcelas negativas)"""
+        from django.core.exceptions import ValidationError
+
+        movimentacao = self._criar(Decimal('300.00'), 3)
+        self._pagar(movimentacao, 1, 2)
+
+        movimentacao.valor_total = Decimal('150.00')
+        with self.assertRaises(ValidationError) as erro:
+            movimentacao.full_clean()
+        self.assertIn('valor_total', erro.exception.message_dict)
+        with self.assertRaises(ValidationError):
+            movimentacao.save()
+
+        self.assertFalse(movimentacao.parcela_set.filter(valor_parcela__lt=0).exists())
+        movimentacao.refresh_from_db()
+        self.assertEqual(movimentacao.valor_total, Decimal('300.00'))
+
+
+class ParcelaFazendaTipoTest(TestCase):
+    """Testes das cópias de fazenda e tipo da movimentação em Parcela"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.fazenda = Fazenda.objects.create(nome="Fazenda Parcelas", dono=self.user)
+        self.categoria = Categoria.objects.create(nome="Financiamento", tipo="despesa", fazenda=self.fazenda)
+        self.movimentacao = Movimentacao.objects.create(
+            categoria=self.categoria, valor_total=Decimal('300.00'), parcelas=3,
+            data=date.today(), fazenda=self.fazenda, cadastrada_por=self.user
+        )
+
+    def _copias(self):
+        return set(Parcela.objects.values_list('fazenda_id', 'tipo'))
+
+    def test_parcelas_geradas_com_fazenda_e_tipo(self):
+        """Testa as parcelas geradas em lote e as criadas individualmente"""
+        Parcela.objects.create(
+            movimentacao=self.movimentacao, ordem_parcela=4,
+            valor_parcela=Decimal('10.00'), data_vencimento=date.today()
+        )
+        self.assertEqual(self._copias(), {(self.fazenda.id, 'despesa')})
+
+    def test_troca_de_categoria_e_de_tipo(self):
+        """Testa que as cópias acompanham a movimentação e a categoria"""
+        receita = Categoria.objects.create(nome="Venda", tipo="receita", fazenda=self.fazenda)
+        self.movimentacao.categoria = receita
+        self.movimentacao.save()
+        self.assertEqual(self._copias(), {(self.fazenda.id, 'receita')})
+
+        receita.tipo = 'despesa'
+        receita.save()
+        self.assertEqual(self._copias(), {(self.fazenda.id, 'despesa')})
+
+    def test_notificacoes_filtram_pela_fazenda_da_parcela(self):
+        """Testa que as notificações filtram as parcelas pelas cópias, sem passar pela movimentação"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from relatorios.notificacoes import resumo_notificacoes
+
+        with CaptureQueriesContext(connection) as queries:
+            resumo = resumo_notificacoes(self.fazenda)
+        self.assertEqual(resumo['despesas_vencer'], 1)
+        sql_parcelas = [q['sql'] for q in queries if 'movimentacao_parcela' in q['sql']]
+        self.assertEqual(len(sql_parcelas), 1)
+        # Os joins só trazem os nomes exibidos; o filtro usa as cópias da parcela
+        self.assertIn('"movimentacao_parcela"."fazenda_id" =', sql_parcelas[0])
+        self.assertNotIn('"movimentacao_movimentacao"."fazenda_id"', sql_parcelas[0])
+
+
+class MovimentacaoTipoTest(TestCase):
+    """Testes da cópia do tipo da categoria em Movimentacao"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.fazenda = Fazenda.objects.create(nome="Fazenda Tipo", dono=self.user)
+        self.categoria = Categoria.objects.create(nome="Leite", tipo="receita", fazenda=self.fazenda)
+        self.movimentacao = Movimentacao.objects.create(
+            categoria=self.categoria, valor_total=Decimal('100.00'),
+            data=date.today(), fazenda=self.fazenda, cadastrada_por=self.user
+        )
+
+    def test_tipo_acompanha_a_categoria(self):
+        """Testa a cópia no cadastro, na troca de categoria e na troca de tipo da categoria"""
+        self.assertEqual(self.movimentacao.tipo, 'receita')
+
+        despesa = Categoria.objects.create(nome="Ração", tipo="despesa", fazenda=self.fazenda)
+        self.movimentacao.categoria = despesa
+        self.movimentacao.save()
+        self.assertEqual(Movimentacao.objects.get().tipo, 'despesa')
+
+        despesa.tipo = 'receita'
+        despesa.save()
+        self.assertEqual(Movimentacao.objects.get().tipo, 'receita')
+        self.assertEqual(set(Parcela.objects.values_list('tipo', flat=True)), {'receita'})
+
+    def test_totais_do_dashboard_sem_join(self):
+        """Testa que os totais de receitas e despesas do dashboard não fazem join com categoria"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.user.perfil.fazendas.add(self.fazenda)
+        self.client.login(username='testuser', password='testpass123')
+        session = self.client.session
+        session['fazenda_ativa_id'] = self.fazenda.id
+        session.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('pagina_index'))
+        self.assertEqual(response.context['total_receitas'], Decimal('100.00'))
+        sql_totais = [
+            q['sql'] for q in queries
+            if 'FROM "movimentacao_movimentacao"' in q['sql'] and 'SUM(' in q['sql']
+        ]
+        self.assertTrue(sql_totais)
+        for sql in sql_totais:
+            self.assertNotIn('JOIN', sql)
+
+
+class ResumoMensalMovimentacaoTest(TestCase):
+    """Testes do resumo mensal usado pelos gráficos"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.fazenda = Fazenda.objects.create(nome="Fazenda Resumo", dono=self.user)
+        self.parceiro = Parceiros.objects.create(nome="Laticínio", fazenda=self.fazenda)
+        self.receita = Categoria.objects.create(nome="Leite", tipo="receita", fazenda=self.fazenda)
+        self.despesa = Categoria.objects.create(nome="Ração", tipo="despesa", fazenda=self.fazenda)
+
+    def _criar(self, categoria, valor, data, parceiro=None):
+        return Movimentacao.objects.create(
+            parceiros=parceiro, categoria=categoria, valor_total=valor,
+            data=data, fazenda=self.fazenda, cadastrada_por=self.user
+        )
+
+    def _resumo(self):
+        return {
+            (linha.mes, linha.tipo, linha.parceiro_id): (linha.total, linha.quantidade)
+            for linha in ResumoMensalMovimentacao.objects.filter(fazenda=self.fazenda)
+        }
+
+    def test_criacao_soma_no_mes(self):
+        """Testa que movimentações do mesmo mês/categoria/parceiro somam na mesma linha"""
+        self._criar(self.receita, 100, date(2024, 3, 5), self.parceiro)
+        self._criar(self.receita, 50.5, date(2024, 3, 20), self.parceiro)
+        self._criar(self.despesa, 30, date(2024, 4, 1))
+
+        self.assertEqual(self._resumo(), {
+            (date(2024, 3, 1), 'receita', self.parceiro.pk): (Decimal('150.50'), 2),
+            (date(2024, 4, 1), 'despesa', None): (Decimal('30.00'), 1),
+        })
+
+    def test_edicao_move_valor_entre_meses(self):
+        """Testa que editar valor e data tira da linha antiga e soma na nova"""
+        movimentacao = self._criar(self.despesa, 80, date(2024, 1, 10))
+        movimentacao.valor_total = Decimal('120.00')
+        movimentacao.data = date(2024, 2, 10)
+        movimentacao.save()
+
+        self.assertEqual(self._resumo(), {(date(2024, 2, 1), 'despesa', None): (Decimal('120.00'), 1)})
+
+    def test_exclusao_e_troca_de_tipo(self):
+        """Testa a exclusão de movimentações e a troca do tipo da categoria"""
+        primeira = self._criar(self.receita, 10, date(2024, 5, 1))
+        self._criar(self.receita, 20, date(2024, 5, 2))
+        primeira.delete()
+        self.receita.tipo = 'despesa'
+        self.receita.save()
+
+        self.assertEqual(self._resumo(), {(date(2024, 5, 1), 'despesa', None): (Decimal('20.00'), 1)})
+
+    def test_reconstruir_resumo_mensal(self):
+        """Testa que o comando reconstrói o resumo a partir das movimentações"""
+        from django.core.management import call_command
+        from io import StringIO
+
+        self._criar(self.receita, 100, date(2024, 6, 1), self.parceiro)
+        esperado = self._resumo()
+        ResumoMensalMovimentacao.objects.all().update(total=999)
+
+        call_command('reconstruir_resumo_mensal', stdout=StringIO())
+        self.assertEqual(self._resumo(), esperado)
+
+
+    def test_linha_sem_parceiro_e_unica(self):
+        """Testa que a linha sem parceiro não duplica (NULL não conta como igual no unique_together)"""
+        from django.db import IntegrityError, transaction
+
+        chave = {'fazenda': self.fazenda, 'mes': date(2024, 7, 1), 'categoria': self.receita, 'parceiro': None}
+        ResumoMensalMovimentacao.objects.create(tipo='receita', total=10, quantidade=1, **chave)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ResumoMensalMovimentacao.objects.create(tipo='receita', total=10, quantidade=1, **chave)
+
+        # Outra requisição criou a linha entre o UPDATE (0 linhas) e o create de registrar()
+        from unittest import mock
+        from django.db.models.query import QuerySet
+
+        update_original = QuerySet.update
+        chamadas = []
+
+        def update_sem_ver_a_linha(queryset, **kwargs):
+            chamadas.append(kwargs)
+            return 0 if len(chamadas) == 1 else update_original(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update_sem_ver_a_linha):
+            ResumoMensalMovimentacao.registrar(chave, 'receita', 5, 1)
+        linha = ResumoMensalMovimentacao.objects.get(**chave)
+        self.assertEqual((linha.total, linha.quantidade), (Decimal('15.00'), 2))
+
+
+class ImportacaoMovimentacoesTest(TestCase):
+    """Testes da importação de movimentações por planilha"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.fazenda = Fazenda.objects.create(nome="Fazenda Importação", dono=self.user)
+        Parceiros.objects.create(nome="Cooperativa Sul", fazenda=self.fazenda)
+        Categoria.objects.create(nome="Venda de Leite", tipo="receita", fazenda=self.fazenda)
+        Categoria.objects.create(nome="Frete", tipo="receita", fazenda=self.fazenda)
+        Categoria.objects.create(nome="Frete", tipo="despesa", fazenda=self.fazenda)
+
+    def _importar(self, conteudo, **kwargs):
+        from io import BytesIO
+        from movimentacao.importacao import ImportadorMovimentacoes
+
+        arquivo = BytesIO(conteudo.encode('utf-8'))
+        return ImportadorMovimentacoes(self.fazenda, self.user, tamanho_bloco=2).importar(
+            arquivo, 'planilha.csv', **kwargs
+        )
+
+    def test_importa_linhas_validas_e_relata_erros(self):
+        """Testa a gravação em lote com parcelas, resumo mensal e erros por linha"""
+        resultado = self._importar(
+            "Categoria;Tipo;Parceiro;Valor Total;Parcelas;Data;Imposto Renda\n"
+            "venda de leite;;Cooperativa Sul;1.500,00;3;15/03/2024;sim\n"
+            "Frete;despesa;;200,50;1;2024-03-20;\n"
+            "Frete;;;10;1;2024-03-21;\n"
+            "Ração;;;10;1;2024-03-22;\n"
+            "Venda de Leite;;;abc;1;2024-03-23;\n"
+        )
+
+        self.assertEqual((resultado.linhas, resultado.importadas, resultado.total_erros), (5, 2, 3))
+        self.assertEqual([linha for linha, _ in resultado.erros], [4, 5, 6])
+
+        venda = Movimentacao.objects.get(categoria__nome="Venda de Leite")
+        self.assertEqual(venda.valor_total, Decimal('1500.00'))
+        self.assertTrue(venda.imposto_renda)
+        self.assertEqual(venda.parceiros.nome, "Cooperativa Sul")
+        self.assertEqual(venda.parcela_set.count(), 3)
+        self.assertEqual(
+            ResumoMensalMovimentacao.objects.get(fazenda=self.fazenda, tipo='despesa').total, Decimal('200.50')
+        )
+
+    def test_simular_nao_grava(self):
+        """Testa que a simulação só valida"""
+        resultado = self._importar("categoria,valor_total,data\nVenda de Leite,100,2024-01-01\n", simular=True)
+
+        self.assertEqual(resultado.importadas, 1)
+        self.assertFalse(Movimentacao.objects.exists())
+
+    def test_coluna_obrigatoria_ausente(self):
+        """Testa que um cabeçalho sem as colunas obrigatórias é rejeitado"""
+        from paginas.importacao import ErroImportacao
+
+        with self.assertRaises(ErroImportacao):
+            self._importar("categoria;valor\nVenda de Leite;100\n")
+
+    def test_cabecalho_conferido_sem_linhas(self):
+        """Testa que um modelo errado é rejeitado mesmo sem linhas de dados"""
+        from paginas.importacao import ErroImportacao
+
+        with self.assertRaises(ErroImportacao):
+            self._importar("categoria;valor\n")
+
 from django.test import Client
 from django.urls import reverse
 from decimal import Decimal
@@ -180,4 +537,55 @@ class TestMovimentacaoViews(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn('total_despesas', response.context)
         self.assertEqual(response.context['total_despesas'], Decimal('500.00'))
-    
\ No newline at end of file
+        
+    def test_resumo_da_listagem_cobre_todas_as_paginas(self):
+        """Testa se os totais por grupo são calculados no banco sobre todos os registros filtrados"""
+        for indice in range(25):
+            Movimentacao.objects.create(
+                parceiros=self.parceiro,
+                categoria=self.categoria,
+                valor_total=Decimal('100.00'),
+                parcelas=2 if indice < 5 else 1,
+                data=date.today() - timedelta(days=indice),
+                fazenda=self.fazenda,
+                cadastrada_por=self.user
+            )
+        
+        response = self.client.get(reverse('listar_movimentacao_receita'), {'page': 2})
+        
+        self.assertEqual(len(response.context['page_obj'].object_list), 5)
+        self.assertEqual(response.context['total_receitas'], Decimal('2500.00'))
+        resumo = response.context['resumo']
+        self.assertEqual(resumo['todas'], {'quantidade': 25, 'valor': Decimal('2500.00'), 'parcelas': 30})
+        self.assertEqual(resumo['parcelado']['quantidade'], 5)
+        self.assertEqual(resumo['vista']['quantidade'], 20)
+    
+    def test_resumo_de_parcelas_por_status(self):
+        """Testa contagens e valores em aberto por status das parcelas"""
+        movimentacao = Movimentacao.objects.create(
+            parceiros=self.parceiro,
+            categoria=self.categoria,
+            valor_total=Decimal('300.00'),
+            parcelas=3,
+            data=date.today() - timedelta(days=15),
+            fazenda=self.fazenda,
+            cadastrada_por=self.user
+        )
+        # Vencimentos: há 15 dias, daqui a 15 dias e daqui a 45 dias
+        primeira = movimentacao.parcela_set.get(ordem_parcela=1)
+        primeira.valor_pago = Decimal('40.00')
+        primeira.save()
+        movimentacao.parcela_set.filter(ordem_parcela=3).update(
+            status_pagamento='Pago', valor_pago=Decimal('100.00')
+        )
+        
+        response = self.client.get(reverse('listar_parcelas_receita'))
+        
+        resumo = response.context['resumo']
+        self.assertEqual(resumo['todos']['quantidade'], 3)
+        self.assertEqual(resumo['todos']['valor'], Decimal('300.00'))
+        self.assertEqual(resumo['todos']['valor_aberto'], Decimal('160.00'))
+        self.assertEqual((resumo['pago']['quantidade'], resumo['pago']['valor_aberto']), (1, 0))
+        self.assertEqual(resumo['vencido']['quantidade'], 1)
+        self.assertEqual(resumo['vencido']['valor_aberto'], Decimal('60.00'))
+        self.assertEqual(resumo['pendente']['valor_aberto'], Decimal('100.00'))
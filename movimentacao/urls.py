@@ -23,6 +23,8 @@ from movimentacao.views import (
     ParcelasDespesaListView,
     CategoriaListView
 )
+# Importação em lote
+from movimentacao.views import MovimentacaoImportacaoView
 
 urlpatterns = [
     # URLs antigas mantidas para compatibilidade
@@ -56,4 +58,7 @@ urlpatterns = [
     # Lista de Categorias
     path('listar/categorias/', CategoriaListView.as_view(), name='listar_categorias'),
 
+    # Importação de planilhas (CSV/XLSX)
+    path('importar/movimentacoes/', MovimentacaoImportacaoView.as_view(), name='importar_movimentacoes'),
+
 ]
\ No newline at end of file
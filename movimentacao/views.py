@@ -5,10 +5,15 @@ from django.contrib import messages
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, DeleteView, UpdateView, ListView
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Count, F, Q, Sum
 from .models import Categoria, Movimentacao, Parcela
 from .forms import MovimentacaoForm, CategoriaForm, ParcelaForm
 from .filters import MovimentacaoFilter, ParcelaFilter
+from .importacao import ImportadorMovimentacoes
+from paginas import busca
+from paginas.paginacao import PaginacaoCursorMixin
+from paginas.resumos import ResumoFiltradoMixin
+from paginas.views import ImportacaoPlanilhaView
 
 
 # Create your views here.
@@ -16,6 +21,61 @@ from .filters import MovimentacaoFilter, ParcelaFilter
 ############  CRUD das entidades Movimentacao, Parcela, Categoria  ############
 
 
+# OTIMIZADO: totais das listagens calculados no banco (paginas.resumos), por grupo
+# de filtro da tela, sobre o mesmo queryset filtrado da paginação
+RESUMO_MOVIMENTACOES_CAMPOS = {
+    'quantidade': Count('pk'),
+    'valor': Sum('valor_total'),
+    'parcelas': Sum('parcelas'),
+}
+
+RESUMO_MOVIMENTACOES_GRUPOS = {
+    'todas': None,
+    'parcelado': Q(parcelas__gt=1),
+    'vista': Q(parcelas=1),
+}
+
+RESUMO_PARCELAS_CAMPOS = {
+    'quantidade': Count('pk'),
+    'valor': Sum('valor_parcela'),
+    'valor_aberto': Sum(F('valor_parcela') - F('valor_pago'), filter=~Q(status_pagamento='Pago')),
+}
+
+
+def grupos_status_parcela(hoje):
+    """Grupos de status das listagens de parcelas (vencida = não paga e vencimento passado)"""
+    return {
+        'todos': None,
+        'pago': Q(status_pagamento='Pago'),
+        'pendente': ~Q(status_pagamento='Pago') & Q(data_vencimento__gte=hoje),
+        'vencido': ~Q(status_pagamento='Pago') & Q(data_vencimento__lt=hoje),
+    }
+
+
+def filtro_busca_parcelas(fazenda, termo):
+    """
+    Parcelas encontradas pelo documento de busca da movimentação ou pelo status.
+
+    O status é comparado por igualdade (usa o índice fazenda/tipo/status) com os
+    valores cujo nome começa pelo termo ("pend" -> Pendente), sem LIKE na tabela.
+
+    Returns:
+        Q (None se a pesquisa não tem termos)
+    """
+    documentos = busca.documentos_correspondentes(fazenda, busca.TIPO_MOVIMENTACAO, termo)
+    if documentos is None:
+        return None
+    filtro = Q(movimentacao_id__in=documentos.values('objeto_id'))
+    termo_normalizado = busca.normalizar_nome(termo)
+    status = [
+        valor for valor, _ in Parcela._meta.get_field('status_pagamento').choices
+        if busca.normalizar_nome(valor).startswith(termo_normalizado)
+    ]
+    if status:
+        filtro |= Q(status_pagamento__in=status)
+    return filtro
+
+
 ############ Create Movimentacao ############
 class MovimentacaoCreateView(LoginRequiredMixin, CreateView):
     model = Movimentacao
@@ -409,14 +469,14 @@ class MovimentacaoListView(LoginRequiredMixin, ListView):
         if hasattr(self.request, 'fazenda_ativa'):
             context["despesas"] = (
                 Movimentacao.objects.filter(
-                    categoria__tipo="despesa",
+                    tipo="despesa",
                     fazenda=self.request.fazenda_ativa
                 )
                 .select_related("fazenda", "categoria", "parceiros", "cadastrada_por")
             )
             context["receitas"] = (
                 Movimentacao.objects.filter(
-                    categoria__tipo="receita",
+                    tipo="receita",
                     fazenda=self.request.fazenda_ativa
                 )
                 .select_related("fazenda", "categoria", "parceiros", "cadastrada_por")
@@ -432,13 +492,16 @@ class MovimentacaoListView(LoginRequiredMixin, ListView):
 
 
 ############ List Movimentação Receita ############
-class MovimentacaoReceitaListView(LoginRequiredMixin, ListView):
+class MovimentacaoReceitaListView(LoginRequiredMixin, PaginacaoCursorMixin, ResumoFiltradoMixin, ListView):
     model = Movimentacao
     template_name = "receita/lista_receita.html"
     context_object_name = "receitas"
     login_url = reverse_lazy("login")
     paginate_by = 20
+    ordenacao_cursor = ('-data', 'id')
     filterset_class = MovimentacaoFilter
+    resumo_grupos = {**RESUMO_MOVIMENTACOES_GRUPOS, 'ir': Q(imposto_renda=True)}
+    resumo_campos = RESUMO_MOVIMENTACOES_CAMPOS
 
     def get_queryset(self):
         """Filtra receitas apenas da fazenda ativa"""
@@ -450,7 +513,7 @@ class MovimentacaoReceitaListView(LoginRequiredMixin, ListView):
             super()
             .get_queryset()
             .filter(
-                categoria__tipo="receita",
+                tipo="receita",
                 fazenda=self.request.fazenda_ativa
             )
             .order_by("-data")
@@ -460,11 +523,9 @@ class MovimentacaoReceitaListView(LoginRequiredMixin, ListView):
         # Pesquisa por texto (busca em todos os registros)
         search_query = self.request.GET.get('search', '').strip()
         if search_query:
-            queryset = queryset.filter(
-                Q(descricao__icontains=search_query) |
-                Q(parceiros__nome__icontains=search_query) |
-                Q(categoria__nome__icontains=search_query) |
-                Q(fazenda__nome__icontains=search_query)
+            # OTIMIZADO: índice de busca (FTS) em vez de LIKE nos joins
+            queryset = busca.filtrar_busca(
+                queryset, self.request.fazenda_ativa, busca.TIPO_MOVIMENTACAO, search_query
             )
         
         # Aplicar filtros
@@ -477,10 +538,8 @@ class MovimentacaoReceitaListView(LoginRequiredMixin, ListView):
         # Adicionar parâmetro de pesquisa ao contexto
         context['search_query'] = self.request.GET.get('search', '')
 
-        # Calcula os totais para receitas (apenas itens filtrados)
-        total_receitas = sum(receita.valor_total for receita in self.filterset.qs)
-        
-        context["total_receitas"] = total_receitas
+        # Totais dos itens filtrados (agregados no banco pelo ResumoFiltradoMixin)
+        context["total_receitas"] = context["resumo"]["todas"]["valor"]
         context["filter"] = self.filterset
 
         return context
@@ -495,13 +554,16 @@ class MovimentacaoReceitaListView(LoginRequiredMixin, ListView):
 
 
 ############ List Movimentação Despesa ############
-class MovimentacaoDespesaListView(LoginRequiredMixin, ListView):
+class MovimentacaoDespesaListView(LoginRequiredMixin, PaginacaoCursorMixin, ResumoFiltradoMixin, ListView):
     model = Movimentacao
     template_name = "despesa/lista_despesa.html"
     context_object_name = "despesas"
     login_url = reverse_lazy("login")
     paginate_by = 20
+    ordenacao_cursor = ('-data', 'id')
     filterset_class = MovimentacaoFilter
+    resumo_grupos = {**RESUMO_MOVIMENTACOES_GRUPOS, 'alta': Q(valor_total__gt=5000)}
+    resumo_campos = RESUMO_MOVIMENTACOES_CAMPOS
 
     def get_queryset(self):
         """Filtra despesas apenas da fazenda ativa"""
@@ -513,7 +575,7 @@ class MovimentacaoDespesaListView(LoginRequiredMixin, ListView):
             super()
             .get_queryset()
             .filter(
-                categoria__tipo="despesa",
+                tipo="despesa",
                 fazenda=self.request.fazenda_ativa
             )
             .order_by("-data")
@@ -523,11 +585,9 @@ class MovimentacaoDespesaListView(LoginRequiredMixin, ListView):
         # Pesquisa por texto (busca em todos os registros)
         search_query = self.request.GET.get('search', '').strip()
         if search_query:
-            queryset = queryset.filter(
-                Q(descricao__icontains=search_query) |
-                Q(parceiros__nome__icontains=search_query) |
-                Q(categoria__nome__icontains=search_query) |
-                Q(fazenda__nome__icontains=search_query)
+            # OTIMIZADO: índice de busca (FTS) em vez de LIKE nos joins
+            queryset = busca.filtrar_busca(
+                queryset, self.request.fazenda_ativa, busca.TIPO_MOVIMENTACAO, search_query
             )
         
         # Aplicar filtros
@@ -540,10 +600,8 @@ class MovimentacaoDespesaListView(LoginRequiredMixin, ListView):
         # Adicionar parâmetro de pesquisa ao contexto
         context['search_query'] = self.request.GET.get('search', '')
 
-        # Calcula os totais para despesas (apenas itens filtrados)
-        total_despesas = sum(despesa.valor_total for despesa in self.filterset.qs)
-        
-        context["total_despesas"] = total_despesas
+        # Totais dos itens filtrados (agregados no banco pelo ResumoFiltradoMixin)
+        context["total_despesas"] = context["resumo"]["todas"]["valor"]
         context["filter"] = self.filterset
 
         return context
@@ -558,13 +616,18 @@ class MovimentacaoDespesaListView(LoginRequiredMixin, ListView):
 
 
 ############ List Parcelas de Receitas (A Receber) ###########
-class ParcelasReceitaListView(LoginRequiredMixin, ListView):
+class ParcelasReceitaListView(LoginRequiredMixin, PaginacaoCursorMixin, ResumoFiltradoMixin, ListView):
     model = Parcela
     template_name = "parcela/lista_parcelas_receita.html"
     context_object_name = "parcelas"
     login_url = reverse_lazy("login")
     paginate_by = 20
+    ordenacao_cursor = ('-data_vencimento', 'id')
     filterset_class = ParcelaFilter
+    resumo_campos = RESUMO_PARCELAS_CAMPOS
+
+    def get_resumo_grupos(self):
+        return grupos_status_parcela(timezone.now().date())
 
     def get_queryset(self):
         fazenda_ativa = self.request.fazenda_ativa if hasattr(self.request, 'fazenda_ativa') else None
@@ -572,8 +635,8 @@ class ParcelasReceitaListView(LoginRequiredMixin, ListView):
             return Parcela.objects.none()
         
         queryset = Parcela.objects.filter(
-            movimentacao__fazenda=fazenda_ativa,
-            movimentacao__categoria__tipo="receita"
+            fazenda=fazenda_ativa,
+            tipo="receita"
         ).order_by("-data_vencimento").select_related(
             'movimentacao', 
             'movimentacao__fazenda',
@@ -584,12 +647,10 @@ class ParcelasReceitaListView(LoginRequiredMixin, ListView):
         # Pesquisa por texto (busca em todos os registros)
         search_query = self.request.GET.get('search', '').strip()
         if search_query:
-            queryset = queryset.filter(
-                Q(movimentacao__descricao__icontains=search_query) |
-                Q(movimentacao__parceiros__nome__icontains=search_query) |
-                Q(movimentacao__categoria__nome__icontains=search_query) |
-                Q(status_pagamento__icontains=search_query)
-            )
+            # OTIMIZADO: índice de busca da movimentação + status por igualdade
+            filtro = filtro_busca_parcelas(fazenda_ativa, search_query)
+            if filtro is not None:
+                queryset = queryset.filter(filtro)
         
         # Aplicar filtros
         self.filterset = ParcelaFilter(self.request.GET, queryset=queryset)
@@ -611,13 +672,18 @@ class ParcelasReceitaListView(LoginRequiredMixin, ListView):
 
 
 ############ List Parcelas de Despesas (A Pagar) ###########
-class ParcelasDespesaListView(LoginRequiredMixin, ListView):
+class ParcelasDespesaListView(LoginRequiredMixin, PaginacaoCursorMixin, ResumoFiltradoMixin, ListView):
     model = Parcela
     template_name = "parcela/lista_parcelas_despesa.html"
     context_object_name = "parcelas"
     login_url = reverse_lazy("login")
     paginate_by = 20
+    ordenacao_cursor = ('-data_vencimento', 'id')
     filterset_class = ParcelaFilter
+    resumo_campos = RESUMO_PARCELAS_CAMPOS
+
+    def get_resumo_grupos(self):
+        return grupos_status_parcela(timezone.now().date())
 
     def get_queryset(self):
         fazenda_ativa = self.request.fazenda_ativa if hasattr(self.request, 'fazenda_ativa') else None
@@ -625,8 +691,8 @@ class ParcelasDespesaListView(LoginRequiredMixin, ListView):
             return Parcela.objects.none()
         
         queryset = Parcela.objects.filter(
-            movimentacao__fazenda=fazenda_ativa,
-            movimentacao__categoria__tipo="despesa"
+            fazenda=fazenda_ativa,
+            tipo="despesa"
         ).order_by("-data_vencimento").select_related(
             'movimentacao', 
             'movimentacao__fazenda',
@@ -637,12 +703,10 @@ class ParcelasDespesaListView(LoginRequiredMixin, ListView):
         # Pesquisa por texto (busca em todos os registros)
         search_query = self.request.GET.get('search', '').strip()
         if search_query:
-            queryset = queryset.filter(
-                Q(movimentacao__descricao__icontains=search_query) |
-                Q(movimentacao__parceiros__nome__icontains=search_query) |
-                Q(movimentacao__categoria__nome__icontains=search_query) |
-                Q(status_pagamento__icontains=search_query)
-            )
+            # OTIMIZADO: índice de busca da movimentação + status por igualdade
+            filtro = filtro_busca_parcelas(fazenda_ativa, search_query)
+            if filtro is not None:
+                queryset = queryset.filter(filtro)
         
         # Aplicar filtros
         self.filterset = ParcelaFilter(self.request.GET, queryset=queryset)
@@ -676,7 +740,7 @@ class ParcelasListView(LoginRequiredMixin, ListView):
             return Parcela.objects.none()
         
         return Parcela.objects.filter(
-            movimentacao__fazenda=fazenda_ativa
+            fazenda=fazenda_ativa
         ).order_by("-data_vencimento").select_related(
             'movimentacao', 
             'movimentacao__fazenda',
@@ -720,3 +784,20 @@ class CategoriaListView(LoginRequiredMixin, ListView):
         context["categorias_despesa"] = [c for c in all_categorias if c.tipo == "despesa"]
         
         return context
+
+
+############ Importação de Movimentações (planilha) ############
+class MovimentacaoImportacaoView(ImportacaoPlanilhaView):
+    importador_class = ImportadorMovimentacoes
+    titulo = "Importar Movimentações"
+    subtitulo = "Importe receitas e despesas de uma planilha. As parcelas são geradas automaticamente."
+    colunas = [
+        ("categoria", "nome da categoria, obrigatória"),
+        ("tipo", "receita ou despesa, se houver categorias com o mesmo nome"),
+        ("parceiro", "nome do parceiro, opcional"),
+        ("valor_total", "obrigatório"),
+        ("parcelas", "padrão 1"),
+        ("data", "obrigatória"),
+        ("imposto_renda", "sim/não"),
+        ("descricao", "opcional"),
+    ]
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class PaginasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'paginas'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        # Registra os signals de invalidação do cache por fazenda e do índice de busca
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(signals.criar_indice_busca, sender=self)
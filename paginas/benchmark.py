@@ -0,0 +1,153 @@
+"""
+Benchmark das views mais acessadas, com base de referência em JSON
+
+Cada endpoint é chamado pelo test client do Django, como um usuário logado na
+fazenda gerada por paginas.sinteticos, e medido com paginas.desempenho.medir
+(consultas em todas as conexões e tempo total da requisição). O cache da fazenda
+é invalidado antes de cada repetição: a medição é a da requisição que recalcula
+tudo, a que regride quando uma view ganha consultas.
+
+A base guarda, por endpoint, a mediana do tempo e o número de consultas, junto
+com o volume de dados usado; comparar() aponta os endpoints acima da tolerância.
+
+Uso: python manage.py benchmark_views (paginas/management/commands)
+"""
+import json
+import statistics
+
+from django.test import Client
+from django.urls import reverse
+
+from medicamento.models import EstoqueMedicamento
+from paginas.cache import invalidar_fazenda
+from paginas.desempenho import medir
+
+
+def _dados_saida(fazenda):
+    """Saída de uma unidade do medicamento com mais estoque (cabe em todas as repetições)"""
+    estoque = EstoqueMedicamento.objects.filter(medicamento__fazenda=fazenda).order_by('-quantidade').first()
+    return {'medicamento_id': estoque.medicamento_id, 'quantidade': 1, 'motivo': 'Benchmark'}
+
+
+# Nome na base -> (nome da URL, método, parâmetros ou função que os monta a partir da fazenda)
+# A saída de estoque fica por último: ela grava no banco
+ENDPOINTS = {
+    'pagina_index': ('pagina_index', 'get', {}),
+    'dashboard_relatorios': ('dashboard_relatorios', 'get', {}),
+    'gerar_pdf_relatorio': ('gerar_pdf_relatorio', 'get', {'periodo': '90'}),
+    'api_notificacoes': ('api_notificacoes', 'get', {}),
+    'medicamento_estoque': ('medicamento_estoque', 'get', {}),
+    'listar_parcelas_receita': ('listar_parcelas_receita', 'get', {}),
+    'listar_parcelas_despesa': ('listar_parcelas_despesa', 'get', {}),
+    'saida_medicamento_api': ('saida_medicamento_api', 'post', _dados_saida),
+}
+
+
+class FalhaBenchmark(Exception):
+    """Endpoint que não respondeu 200 durante o benchmark"""
+
+
+def _requisicao(cliente, metodo, url, dados):
+    if metodo == 'post':
+        resposta = cliente.post(url, data=json.dumps(dados), content_type='application/json')
+    else:
+        resposta = cliente.get(url, dados)
+    if resposta.streaming:
+        # O PDF só é gerado por inteiro quando o conteúdo é consumido
+        b''.join(resposta.streaming_content)
+        resposta.close()
+    return resposta
+
+
+def medir_endpoints(usuario, fazenda, repeticoes=5, nomes=None):
+    """
+    Mede os endpoints (após uma requisição de aquecimento de cada um).
+
+    Args:
+        usuario: Usuário com acesso à fazenda
+        fazenda: Fazenda ativa nas requisições
+        repeticoes: Requisições medidas por endpoint
+        nomes: Endpoints medidos (padrão: todos de ENDPOINTS)
+
+    Returns:
+        dict: {endpoint: {tempo_ms, tempo_min_ms, consultas}} (tempo_ms é a mediana)
+
+    Raises:
+        FalhaBenchmark: Se alguma requisição não responder 200
+    """
+    cliente = Client()
+    cliente.force_login(usuario)
+    sessao = cliente.session
+    sessao['fazenda_ativa_id'] = fazenda.pk
+    sessao.save()
+
+    resultados = {}
+    for nome in nomes or ENDPOINTS:
+        url_name, metodo, dados = ENDPOINTS[nome]
+        url = reverse(url_name)
+        dados = dados(fazenda) if callable(dados) else dados
+
+        tempos, consultas = [], []
+        for repeticao in range(repeticoes + 1):
+            invalidar_fazenda(fazenda.pk)
+            with medir() as medicao:
+                resposta = _requisicao(cliente, metodo, url, dados)
+            if resposta.status_code != 200:
+                raise FalhaBenchmark(f'{nome}: status {resposta.status_code}')
+            if repeticao:
+                tempos.append(medicao.tempo_total * 1000)
+                consultas.append(medicao.consultas)
+
+        resultados[nome] = {
+            'tempo_ms': round(statistics.median(tempos), 1),
+            'tempo_min_ms': round(min(tempos), 1),
+            'consultas': max(consultas),
+        }
+    return resultados
+
+
+def comparar(base, atual, tolerancia_tempo=0.5, tolerancia_consultas=0, folga_ms=10):
+    """
+    Compara as medições com a base.
+
+    Um endpoint regride quando o tempo passa de base * (1 + tolerancia_tempo) + folga_ms
+    (a folga absorve o ruído dos endpoints de poucos milissegundos) ou quando as
+    consultas passam de base + tolerancia_consultas.
+
+    Returns:
+        tuple: (linhas, regressoes) com uma linha por endpoint medido e as
+               descrições das regressões
+    """
+    linhas, regressoes = [], []
+    for nome, medicao in atual.items():
+        referencia = base.get(nome)
+        if referencia is None:
+            linhas.append((nome, medicao, None, 'novo'))
+            continue
+
+        problemas = []
+        limite_tempo = referencia['tempo_ms'] * (1 + tolerancia_tempo) + folga_ms
+        if medicao['tempo_ms'] > limite_tempo:
+            problemas.append(f"tempo {medicao['tempo_ms']:.1f} ms > {limite_tempo:.1f} ms")
+        limite_consultas = referencia['consultas'] + tolerancia_consultas
+        if medicao['consultas'] > limite_consultas:
+            problemas.append(f"consultas {medicao['consultas']} > {limite_consultas}")
+
+        linhas.append((nome, medicao, referencia, 'REGRESSÃO' if problemas else 'ok'))
+        regressoes.extend(f'{nome}: {problema}' for problema in problemas)
+    return linhas, regressoes
+
+
+def ler_base(caminho):
+    """Base gravada por gravar_base ({'volume': {...}, 'endpoints': {...}}), ou None"""
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return None
+
+
+def gravar_base(caminho, volume, resultados):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump({'volume': volume, 'endpoints': resultados}, arquivo, indent=2, ensure_ascii=False, sort_keys=True)
+        arquivo.write('\n')
@@ -0,0 +1,226 @@
+"""
+Índice de busca textual das listagens (movimentações, parcelas e estoque)
+
+Cada registro pesquisável tem um DocumentoBusca com o texto já normalizado (sem
+acentos, minúsculo) de todos os campos exibidos na pesquisa, de modo que a busca
+consulta uma única tabela indexada em vez de vários LIKE '%x%' sobre joins.
+
+Backends:
+    - SQLite: tabela virtual FTS5 (unicode61, remove_diacritics) sobre o conteúdo de
+      DocumentoBusca, mantida por triggers; cada termo casa por prefixo
+    - PostgreSQL: índice GIN trigram (pg_trgm) sobre o texto
+    - Outros (ou SQLite sem FTS5): LIKE no texto normalizado, sem joins
+
+A busca só filtra: as listagens mantêm a ordenação por data, da qual depende a
+paginação por cursor (paginas.paginacao).
+
+Os documentos são atualizados pelos signals de paginas.signals e pelas importações em
+lote; `reconstruir_indice_busca` recria o índice a partir dos dados.
+
+Parcelas não têm documento próprio: são encontradas pelo documento da movimentação.
+"""
+from django.db import connection
+
+from paginas.importacao import normalizar_nome
+
+TIPO_MOVIMENTACAO = 'movimentacao'
+TIPO_ENTRADA_MEDICAMENTO = 'entrada_medicamento'
+
+TABELA_FTS = 'paginas_documentobusca_fts'
+
+SQL_FTS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} USING fts5(
+        texto, content='paginas_documentobusca', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ai AFTER INSERT ON paginas_documentobusca BEGIN
+        INSERT INTO {TABELA_FTS}(rowid, texto) VALUES (new.id, new.texto);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ad AFTER DELETE ON paginas_documentobusca BEGIN
+        INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, texto) VALUES ('delete', old.id, old.texto);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_au AFTER UPDATE ON paginas_documentobusca BEGIN
+        INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, texto) VALUES ('delete', old.id, old.texto);
+        INSERT INTO {TABELA_FTS}(rowid, texto) VALUES (new.id, new.texto);
+    END""",
+]
+
+SQL_TRIGRAM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS paginas_documentobusca_texto_trgm "
+    "ON paginas_documentobusca USING gin (texto gin_trgm_ops)",
+]
+
+
+############ Textos dos documentos ############
+def _texto(*partes):
+    return normalizar_nome(' '.join(str(parte) for parte in partes if parte))
+
+
+def texto_movimentacao(movimentacao):
+    parceiro = movimentacao.parceiros.nome if movimentacao.parceiros_id else ''
+    return _texto(movimentacao.descricao, movimentacao.categoria.nome, parceiro)
+
+
+def texto_entrada_medicamento(entrada):
+    return _texto(entrada.medicamento.nome, entrada.observacao)
+
+
+############ Escrita ############
+def _documentos(tipo, objetos):
+    from paginas.models import DocumentoBusca
+
+    if tipo == TIPO_MOVIMENTACAO:
+        return [
+            DocumentoBusca(
+                fazenda_id=objeto.fazenda_id, tipo=tipo, objeto_id=objeto.pk,
+                texto=texto_movimentacao(objeto),
+            )
+            for objeto in objetos
+        ]
+    return [
+        DocumentoBusca(
+            fazenda_id=objeto.fazenda_id, tipo=tipo, objeto_id=objeto.pk,
+            texto=texto_entrada_medicamento(objeto),
+        )
+        for objeto in objetos
+    ]
+
+
+def indexar(tipo, objetos):
+    """Cria ou atualiza os documentos dos objetos (um upsert em lote)"""
+    from paginas.models import DocumentoBusca
+
+    documentos = _documentos(tipo, objetos)
+    if documentos:
+        DocumentoBusca.objects.bulk_create(
+            documentos, batch_size=500,
+            update_conflicts=True, unique_fields=['tipo', 'objeto_id'], update_fields=['fazenda', 'texto'],
+        )
+
+
+def remover(tipo, ids):
+    from paginas.models import DocumentoBusca
+
+    DocumentoBusca.objects.filter(tipo=tipo, objeto_id__in=ids).delete()
+
+
+def reindexar(fazendas=None):
+    """
+    Recria todos os documentos (de todas as fazendas ou só das informadas).
+
+    Returns:
+        int: Número de documentos gravados
+    """
+    from medicamento.models import EntradaMedicamento
+    from movimentacao.models import Movimentacao
+    from paginas.models import DocumentoBusca
+
+    documentos = DocumentoBusca.objects.all()
+    movimentacoes = Movimentacao.objects.select_related('categoria', 'parceiros').only(
+        'id', 'fazenda_id', 'descricao', 'categoria__nome', 'parceiros__nome'
+    )
+    entradas = EntradaMedicamento.objects.select_related('medicamento').only(
+        'id', 'fazenda_id', 'observacao', 'medicamento__nome'
+    )
+    if fazendas is not None:
+        documentos = documentos.filter(fazenda__in=fazendas)
+        movimentacoes = movimentacoes.filter(fazenda__in=fazendas)
+        entradas = entradas.filter(fazenda__in=fazendas)
+
+    documentos.delete()
+    total = 0
+    for tipo, queryset in ((TIPO_MOVIMENTACAO, movimentacoes), (TIPO_ENTRADA_MEDICAMENTO, entradas)):
+        lote = []
+        for objeto in queryset.iterator(chunk_size=2000):
+            lote.append(objeto)
+            if len(lote) == 2000:
+                indexar(tipo, lote)
+                total += len(lote)
+                lote = []
+        indexar(tipo, lote)
+        total += len(lote)
+    return total
+
+
+############ Consulta ############
+_fts_disponivel = {}
+
+
+def criar_indice_textual(conexao=connection):
+    """
+    Cria o índice textual do backend (FTS5 + triggers no SQLite, GIN trigram no
+    PostgreSQL). Idempotente: chamado pela migration e após cada migrate
+    (post_migrate), cobrindo bancos montados sem migrations, como o de testes.
+    """
+    _fts_disponivel.pop(conexao.alias, None)
+    with conexao.cursor() as cursor:
+        if conexao.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABELA_FTS])
+            if cursor.fetchone():
+                return
+            try:
+                for sql in SQL_FTS:
+                    cursor.execute(sql)
+            except Exception:
+                return  # SQLite compilado sem FTS5: a busca usa LIKE no texto normalizado
+            cursor.execute(f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')")
+        elif conexao.vendor == 'postgresql':
+            for sql in SQL_TRIGRAM:
+                cursor.execute(sql)
+
+
+def _usa_fts():
+    """Informa se a tabela FTS5 existe (verificado uma vez por conexão)"""
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _fts_disponivel:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABELA_FTS])
+            _fts_disponivel[connection.alias] = cursor.fetchone() is not None
+    return _fts_disponivel[connection.alias]
+
+
+def reconstruir_fts():
+    """Reescreve o índice FTS5 inteiro a partir de DocumentoBusca (apenas SQLite)"""
+    if _usa_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')")
+
+
+def _consulta_fts(termos):
+    """Termos da pesquisa como consulta FTS5: todos obrigatórios, casando por prefixo"""
+    return ' '.join('"{}"*'.format(termo.replace('"', '""')) for termo in termos)
+
+
+def documentos_correspondentes(fazenda, tipo, termo):
+    """
+    Documentos da fazenda que contêm todos os termos da pesquisa.
+
+    Returns:
+        QuerySet de DocumentoBusca (None se a pesquisa não tem termos)
+    """
+    from django.db.models.expressions import RawSQL
+    from paginas.models import DocumentoBusca
+
+    termos = normalizar_nome(termo).split()
+    if not termos:
+        return None
+
+    documentos = DocumentoBusca.objects.filter(fazenda=fazenda, tipo=tipo)
+    if _usa_fts():
+        return documentos.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s", [_consulta_fts(termos)]
+        ))
+    for parte in termos:
+        documentos = documentos.filter(texto__contains=parte)
+    return documentos
+
+
+def filtrar_busca(queryset, fazenda, tipo, termo, campo='pk'):
+    """Restringe o queryset aos registros encontrados pelo índice de busca"""
+    documentos = documentos_correspondentes(fazenda, tipo, termo)
+    if documentos is None:
+        return queryset
+    return queryset.filter(**{f'{campo}__in': documentos.values('objeto_id')})
+
@@ -0,0 +1,101 @@
+"""
+Cache por fazenda com versionamento
+
+Cada fazenda tem uma versão guardada no cache. Todas as chaves de dados da fazenda
+incluem essa versão, então trocar a versão invalida de uma vez tudo o que foi
+calculado antes (sem precisar apagar chave por chave).
+
+A versão é trocada pelos signals de paginas.signals sempre que Movimentacao, Parcela,
+EntradaMedicamento, SaidaMedicamento (e cadastros exibidos nos gráficos) mudam.
+
+Regra: os signals só cobrem gravações feitas por Model.save()/delete(). Todo
+caminho que grava sem passar por eles (bulk_create, bulk_update, QuerySet.update
+ou QuerySet.delete fora de um save()) precisa invalidar a fazenda explicitamente,
+com invalidar_ao_gravar() dentro da transação da gravação (invalidar_fazenda()
+direto fica para quem só descarta o cache, sem gravar nada). Hoje:
+    - medicamento.saidas (bulk_create das saídas e baixa condicional dos lotes)
+    - paginas.importacao.Importador (a cada bloco gravado) e o finalizar() dos
+      importadores (reconstrução do resumo mensal e do estoque)
+    - paginas.sinteticos (a cada mês gravado e na reconstrução final)
+    - relatorios.notificacoes (materializar_notificacoes e atualizar_notificacoes,
+      usadas também pelo comando materializar_notificacoes)
+    - o comando reconstruir_resumo_mensal
+Os QuerySet.update feitos dentro de um save() (ex.: cópias desnormalizadas em
+Movimentacao.save) já são cobertos pelo signal do próprio save().
+"""
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _chave_versao(fazenda_id):
+    return f'fazenda_{fazenda_id}_versao'
+
+
+def _nova_versao():
+    """
+    Gera uma versão única (não um contador), para que duas invalidações
+    concorrentes nunca resultem na mesma versão e uma versão despejada do
+    cache nunca volte a valer.
+    """
+    return f'{time.time_ns():x}{uuid.uuid4().hex[:6]}'
+
+
+def _fazenda_id(fazenda):
+    return fazenda if isinstance(fazenda, (int, str)) else fazenda.pk
+
+
+def versao_fazenda(fazenda):
+    """Retorna a versão atual dos dados da fazenda (cria uma se não existir)"""
+    chave = _chave_versao(_fazenda_id(fazenda))
+    versao = cache.get(chave)
+    if versao is None:
+        versao = _nova_versao()
+        # add() não sobrescreve uma versão criada em paralelo por outro processo
+        if not cache.add(chave, versao, None):
+            versao = cache.get(chave, versao)
+    return versao
+
+
+def invalidar_fazenda(fazenda_id):
+    """Troca a versão da fazenda, invalidando todos os dados em cache dela"""
+    if fazenda_id:
+        cache.set(_chave_versao(fazenda_id), _nova_versao(), None)
+
+
+def invalidar_ao_gravar(fazenda_id):
+    """
+    Invalida agora (para a própria requisição) e de novo após o commit, para que
+    uma leitura concorrente feita antes do commit não fique valendo no cache.
+    """
+    invalidar_fazenda(fazenda_id)
+    transaction.on_commit(lambda: invalidar_fazenda(fazenda_id))
+
+
+def chave_fazenda(fazenda, nome, *partes):
+    """Monta a chave versionada de um dado da fazenda"""
+    fazenda_id = _fazenda_id(fazenda)
+    sufixo = '_'.join(str(parte) for parte in partes)
+    chave = f'fazenda_{fazenda_id}_v{versao_fazenda(fazenda_id)}_{nome}'
+    return f'{chave}_{sufixo}' if sufixo else chave
+
+
+def obter_ou_calcular(fazenda, nome, calcular, *partes, timeout=3600):
+    """
+    Busca o dado versionado da fazenda no cache ou calcula e guarda.
+
+    Args:
+        fazenda: Fazenda (ou id) dona dos dados
+        nome: Nome do dado (ex.: 'notificacoes_count')
+        calcular: Função sem argumentos que produz o valor
+        *partes: Parâmetros que diferenciam o dado (datas, filtros...)
+        timeout: Tempo máximo em segundos (a invalidação real é pela versão)
+    """
+    chave = chave_fazenda(fazenda, nome, *partes)
+    valor = cache.get(chave)
+    if valor is None:
+        valor = calcular()
+        cache.set(chave, valor, timeout)
+    return valor
@@ -0,0 +1,206 @@
+"""
+Instrumentação de desempenho por requisição (consultas, tempo de banco e tempo total)
+
+O DesempenhoMiddleware (paginas.middleware) mede cada requisição com um
+execute_wrapper do Django, que funciona com DEBUG=False e não guarda o SQL. Ele:
+    - registra no log (logger paginas.desempenho) as requisições acima do orçamento
+      da URL (settings.DESEMPENHO_ORCAMENTOS)
+    - acumula os agregados por nome de URL em memória e os soma no cache
+      compartilhado a cada DESEMPENHO_INTERVALO_GRAVACAO segundos, uma chave por
+      processo (os workers do gunicorn não disputam a mesma chave)
+
+`python manage.py relatorio_desempenho` soma os agregados de todos os processos.
+Nos testes, OrcamentoMixin.assertDentroDoOrcamento usa os mesmos orçamentos.
+
+Orçamentos (por nome de URL, sobre o padrão):
+    DESEMPENHO_ORCAMENTOS = {
+        'padrao': {'consultas': 15, 'tempo_banco_ms': 250, 'tempo_total_ms': 1000},
+        'api_notificacoes': {'consultas': 8},
+    }
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+CHAVE_PROCESSOS = 'desempenho:processos'
+RETENCAO = 7 * 24 * 3600
+SEM_ROTA = '<sem rota>'
+
+# Campo medido -> (atributo da Medicao, fator para a unidade do orçamento)
+LIMITES = {
+    'consultas': ('consultas', 1),
+    'tempo_banco_ms': ('tempo_banco', 1000),
+    'tempo_total_ms': ('tempo_total', 1000),
+}
+
+
+############ Medição ############
+class Medicao:
+    """Consultas e tempos de uma requisição (também é o execute_wrapper das conexões)"""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_banco = 0.0
+        self.tempo_total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.tempo_banco += time.perf_counter() - inicio
+
+    def __str__(self):
+        return (
+            f'{self.consultas} consulta(s), banco {self.tempo_banco * 1000:.0f} ms, '
+            f'total {self.tempo_total * 1000:.0f} ms'
+        )
+
+
+@contextmanager
+def medir():
+    """Mede as consultas (em todas as conexões) e o tempo do bloco"""
+    medicao = Medicao()
+    inicio = time.perf_counter()
+    with ExitStack() as pilha:
+        for conexao in connections.all():
+            pilha.enter_context(conexao.execute_wrapper(medicao))
+        try:
+            yield medicao
+        finally:
+            medicao.tempo_total = time.perf_counter() - inicio
+
+
+def orcamento_url(url_name):
+    """Orçamento da URL: o padrão sobrescrito pelos limites específicos dela"""
+    orcamentos = getattr(settings, 'DESEMPENHO_ORCAMENTOS', {})
+    return {**orcamentos.get('padrao', {}), **orcamentos.get(url_name, {})}
+
+
+def excedidos(medicao, orcamento, limites=None):
+    """
+    Limites do orçamento ultrapassados pela medição.
+
+    Args:
+        limites: Campos verificados (padrão: todos os do orçamento)
+
+    Returns:
+        list: Descrições como 'consultas 45 > 30'
+    """
+    resultado = []
+    for campo, limite in orcamento.items():
+        if campo not in LIMITES or (limites is not None and campo not in limites):
+            continue
+        atributo, fator = LIMITES[campo]
+        valor = getattr(medicao, atributo) * fator
+        if valor > limite:
+            resultado.append(f'{campo} {valor:.0f} > {limite}')
+    return resultado
+
+
+############ Agregados por processo ############
+_trava = threading.Lock()
+_estado = {'agregados': {}, 'gravado_em': time.monotonic()}
+
+
+def _chave_processo():
+    return f'desempenho:{socket.gethostname()}-{os.getpid()}'
+
+
+def _somar(total, agregados):
+    for url_name, linha in agregados.items():
+        soma = total.setdefault(url_name, dict.fromkeys(linha, 0))
+        for campo, valor in linha.items():
+            soma[campo] = max(soma[campo], valor) if campo.endswith('_max') else soma[campo] + valor
+    return total
+
+
+def registrar(url_name, medicao, acima_do_orcamento):
+    """Acumula a medição nos agregados do processo e grava-os periodicamente no cache"""
+    with _trava:
+        linha = _estado['agregados'].setdefault(url_name, {
+            'requisicoes': 0, 'consultas': 0, 'consultas_max': 0,
+            'tempo_banco': 0.0, 'tempo_total': 0.0, 'tempo_total_max': 0.0, 'acima': 0,
+        })
+        linha['requisicoes'] += 1
+        linha['consultas'] += medicao.consultas
+        linha['consultas_max'] = max(linha['consultas_max'], medicao.consultas)
+        linha['tempo_banco'] += medicao.tempo_banco
+        linha['tempo_total'] += medicao.tempo_total
+        linha['tempo_total_max'] = max(linha['tempo_total_max'], medicao.tempo_total)
+        linha['acima'] += bool(acima_do_orcamento)
+        gravar_agora = (
+            time.monotonic() - _estado['gravado_em'] >= getattr(settings, 'DESEMPENHO_INTERVALO_GRAVACAO', 30)
+        )
+    if gravar_agora:
+        gravar()
+
+
+def gravar():
+    """Soma no cache (na chave do processo) o que foi medido desde a última gravação"""
+    with _trava:
+        novos = _estado['agregados']
+        _estado['agregados'] = {}
+        _estado['gravado_em'] = time.monotonic()
+    if not novos:
+        return
+
+    chave = _chave_processo()
+    cache.set(chave, _somar(cache.get(chave, {}), novos), RETENCAO)
+    # Regravado a cada gravação: um registro perdido numa corrida volta na seguinte
+    processos = cache.get(CHAVE_PROCESSOS, {})
+    processos[chave] = time.time()
+    cache.set(CHAVE_PROCESSOS, processos, RETENCAO)
+
+
+def ler_agregados():
+    """
+    Soma os agregados gravados por todos os processos desde a última limpeza.
+
+    Returns:
+        dict: {url_name: {requisicoes, consultas, consultas_max, tempo_banco,
+               tempo_total, tempo_total_max, acima}} (tempos em segundos)
+    """
+    total = {}
+    for agregados in cache.get_many(list(cache.get(CHAVE_PROCESSOS, {}))).values():
+        _somar(total, agregados)
+    return total
+
+
+def limpar():
+    """
+    Zera os agregados gravados de todos os processos (o que os outros processos
+    mediram desde a última gravação deles ainda entra na próxima).
+    """
+    with _trava:
+        _estado['agregados'] = {}
+    cache.delete_many([*cache.get(CHAVE_PROCESSOS, {}), CHAVE_PROCESSOS])
+
+
+############ Testes ############
+class OrcamentoMixin:
+    """
+    Asserções de orçamento para os TestCases, com os mesmos limites do middleware.
+
+    Por padrão só o número de consultas é verificado: os tempos variam com a
+    máquina que roda os testes.
+    """
+
+    def assertDentroDoOrcamento(self, resposta, limites=('consultas',), **orcamento):
+        medicao = getattr(resposta, 'desempenho', None)
+        if medicao is None:
+            self.fail('Resposta sem medição: o DesempenhoMiddleware está no MIDDLEWARE?')
+        url_name = resposta.resolver_match.url_name if resposta.resolver_match else SEM_ROTA
+        acima = excedidos(medicao, {**orcamento_url(url_name), **orcamento}, limites)
+        if acima:
+            self.fail(f'{url_name} acima do orçamento ({", ".join(acima)}): {medicao}')
@@ -0,0 +1,27 @@
+from django import forms
+
+
+class ImportacaoPlanilhaForm(forms.Form):
+    """
+    Formulário de envio de planilha para importação em lote (paginas.importacao).
+    """
+    arquivo = forms.FileField(
+        label='Planilha (.csv ou .xlsx)',
+        help_text='A primeira linha deve conter o nome das colunas',
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.xlsx',
+        }),
+    )
+    simular = forms.BooleanField(
+        label='Apenas validar (não gravar)',
+        required=False,
+        help_text='Confere todas as linhas e mostra os erros sem importar nada',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+
+    def clean_arquivo(self):
+        arquivo = self.cleaned_data['arquivo']
+        if not arquivo.name.lower().endswith(('.csv', '.xlsx', '.xlsm')):
+            raise forms.ValidationError('Formato não suportado. Envie um arquivo .csv ou .xlsx.')
+        return arquivo
@@ -0,0 +1,238 @@
+"""
+Importação de planilhas (CSV/XLSX) em lote
+
+As linhas são lidas em streaming (sem carregar o arquivo inteiro), validadas em
+blocos com as mesmas regras dos formulários de cadastro e gravadas com bulk_create.
+Cadastros referenciados pelo nome (categoria, parceiro, medicamento) são resolvidos
+por um índice em memória carregado uma única vez por importação.
+
+Importadores concretos:
+    - movimentacao.importacao.ImportadorMovimentacoes
+    - medicamento.importacao.ImportadorEntradasMedicamento
+
+XLSX depende do openpyxl (importado só quando necessário).
+"""
+import csv
+import io
+import os
+import unicodedata
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from paginas.cache import invalidar_ao_gravar
+
+TAMANHO_BLOCO = 1000
+MAX_ERROS_RELATADOS = 500
+
+
+class ErroImportacao(Exception):
+    """Erro que impede a importação do arquivo inteiro (formato, cabeçalho...)"""
+
+
+def normalizar_nome(texto):
+    """Chave de busca por nome: sem acentos, minúsculas e espaços simples"""
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def normalizar_cabecalho(texto):
+    return normalizar_nome(texto).replace(' ', '_')
+
+
+def normalizar_decimal(valor):
+    """Aceita '1.234,56' (padrão brasileiro), '1234,56' e '1234.56'"""
+    texto = str(valor).strip().replace('R$', '').replace(' ', '')
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    return texto
+
+
+def normalizar_booleano(valor):
+    return 'true' if normalizar_nome(valor) in ('sim', 's', 'true', '1', 'x', 'yes') else 'false'
+
+
+def _linhas_csv(arquivo):
+    """Gera as linhas do CSV como listas (detecta ';' ou ',' como separador)"""
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    amostra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=';,\t')
+    except csv.Error:
+        dialeto = csv.excel
+    yield from csv.reader(texto, dialeto)
+
+
+def _linhas_xlsx(arquivo):
+    """Gera as linhas da primeira planilha do XLSX (modo somente leitura, em streaming)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ErroImportacao('Para importar arquivos .xlsx instale o pacote openpyxl (ou envie um .csv).')
+
+    planilha = load_workbook(arquivo, read_only=True, data_only=True).worksheets[0]
+    for linha in planilha.iter_rows(values_only=True):
+        yield ['' if valor is None else valor for valor in linha]
+
+
+def ler_planilha(arquivo, nome_arquivo, colunas_obrigatorias=()):
+    """
+    Lê um arquivo CSV ou XLSX linha a linha.
+
+    O cabeçalho é conferido antes da primeira linha de dados: um modelo errado é
+    rejeitado mesmo que o arquivo não tenha nenhuma linha.
+
+    Yields:
+        tuple: (número da linha na planilha, dict coluna -> valor)
+
+    Raises:
+        ErroImportacao: Formato não suportado, arquivo vazio ou colunas obrigatórias ausentes
+    """
+    extensao = os.path.splitext(nome_arquivo)[1].lower()
+    if extensao == '.csv':
+        linhas = _linhas_csv(arquivo)
+    elif extensao in ('.xlsx', '.xlsm'):
+        linhas = _linhas_xlsx(arquivo)
+    else:
+        raise ErroImportacao('Formato não suportado. Envie um arquivo .csv ou .xlsx.')
+
+    cabecalho = next(linhas, None)
+    if not cabecalho:
+        raise ErroImportacao('O arquivo está vazio.')
+    colunas = [normalizar_cabecalho(coluna) for coluna in cabecalho]
+    faltando = [coluna for coluna in colunas_obrigatorias if coluna not in colunas]
+    if faltando:
+        raise ErroImportacao(f"Colunas obrigatórias ausentes: {', '.join(faltando)}.")
+
+    for numero, valores in enumerate(linhas, start=2):
+        if not any(str(valor).strip() for valor in valores):
+            continue  # Linha em branco
+        # Linhas mais curtas que o cabeçalho: colunas finais vazias
+        valores = list(valores) + [''] * (len(colunas) - len(valores))
+        yield numero, dict(zip(colunas, valores))
+
+
+class ResultadoImportacao:
+    """Totais da importação e erros por linha"""
+
+    def __init__(self):
+        self.linhas = 0
+        self.importadas = 0
+        self.erros = []  # [(linha, mensagem)]
+        self.total_erros = 0
+
+    def adicionar_erro(self, linha, mensagem):
+        self.total_erros += 1
+        if len(self.erros) < MAX_ERROS_RELATADOS:
+            self.erros.append((linha, mensagem))
+
+    @property
+    def sucesso(self):
+        return self.total_erros == 0
+
+
+class Importador:
+    """
+    Pipeline base: lê -> valida em blocos -> grava em lote.
+
+    Subclasses definem:
+        colunas_obrigatorias: colunas que precisam existir no cabeçalho
+        form_class: formulário que valida cada linha (usado por validar_com_formulario)
+        carregar_indices(): monta os índices de busca por nome
+        argumentos_formulario(): argumentos extras do formulário (ex.: os índices)
+        validar_linha(dados): retorna a instância (não salva) ou levanta ValidationError
+        gravar_bloco(objetos): grava um bloco de instâncias válidas
+        finalizar(): atualizações agregadas após a gravação (opcional)
+    """
+    colunas_obrigatorias = ()
+    form_class = None
+
+    def __init__(self, fazenda, usuario, tamanho_bloco=TAMANHO_BLOCO):
+        self.fazenda = fazenda
+        self.usuario = usuario
+        self.tamanho_bloco = tamanho_bloco
+
+    def carregar_indices(self):
+        pass
+
+    def argumentos_formulario(self):
+        return {}
+
+    def validar_linha(self, dados):
+        raise NotImplementedError
+
+    def gravar_bloco(self, objetos):
+        raise NotImplementedError
+
+    def finalizar(self):
+        pass
+
+    def validar_com_formulario(self, dados, instancia):
+        """
+        Valida uma linha com um formulário form_class novo, ligado aos dados da linha
+        (os índices de argumentos_formulario() são compartilhados, sem query por linha).
+
+        Returns:
+            A instância preenchida pelo formulário; levanta ValidationError se inválida.
+        """
+        form = self.form_class(data=dados, instance=instancia, **self.argumentos_formulario())
+        if not form.is_valid():
+            raise ValidationError(form.errors.as_data())
+        return form.instance
+
+    @staticmethod
+    def mensagens_erro(erro):
+        """Converte ValidationError/erros de formulário em uma mensagem de uma linha"""
+        if hasattr(erro, 'message_dict'):
+            return '; '.join(
+                f"{campo}: {' '.join(mensagens)}" if campo != '__all__' else ' '.join(mensagens)
+                for campo, mensagens in erro.message_dict.items()
+            )
+        return ' '.join(getattr(erro, 'messages', [str(erro)]))
+
+    def importar(self, arquivo, nome_arquivo, simular=False):
+        """
+        Importa o arquivo. Linhas inválidas são relatadas e as válidas gravadas
+        (com simular=True nada é gravado, apenas validado).
+
+        Returns:
+            ResultadoImportacao
+        """
+        resultado = ResultadoImportacao()
+        linhas = ler_planilha(arquivo, nome_arquivo, self.colunas_obrigatorias)
+
+        # Lê o cabeçalho (e o confere) antes de carregar os índices
+        bloco = list(islice(linhas, self.tamanho_bloco))
+        self.carregar_indices()
+
+        gravadas = 0
+        try:
+            while bloco:
+                validos = []
+                for numero, dados in bloco:
+                    resultado.linhas += 1
+                    try:
+                        validos.append(self.validar_linha(dados))
+                    except ValidationError as erro:
+                        resultado.adicionar_erro(numero, self.mensagens_erro(erro))
+
+                if validos and not simular:
+                    # Um bloco por transação: a memória e o tempo de lock ficam limitados
+                    with transaction.atomic():
+                        self.gravar_bloco(validos)
+                        # bulk_create não dispara os signals (regra em paginas.cache): um bloco
+                        # confirmado vale mesmo se um bloco seguinte falhar
+                        invalidar_ao_gravar(self.fazenda.pk)
+                    gravadas += len(validos)
+                resultado.importadas += len(validos)
+
+                bloco = list(islice(linhas, self.tamanho_bloco))
+        finally:
+            # Os blocos confirmados ficam gravados mesmo se um bloco seguinte falhar:
+            # estoque, resumo mensal e notificações precisam refletir essas linhas
+            if gravadas:
+                self.finalizar()
+        return resultado
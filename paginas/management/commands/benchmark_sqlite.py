@@ -0,0 +1,127 @@
+"""
+Compara a vazão de leituras e escritas concorrentes no SQLite com o perfil padrão
+do Django e com o perfil de produção (farmedicare.sqlite + settings.SQLITE_PRAGMAS).
+
+Cada processo simula um worker do gunicorn sobre um banco temporário: leituras
+agregadas por faixa de validade e escritas no formato de uma saída de estoque
+(lê o lote, desconta e grava a saída na mesma transação).
+
+Uso:
+    python manage.py benchmark_sqlite
+    python manage.py benchmark_sqlite --processos 8 --segundos 10 --escritas 0.3
+"""
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from farmedicare.sqlite.base import aplicar_pragmas
+
+
+def _perfis():
+    """
+    padrao: backend sqlite3 do Django (journal em rollback, synchronous=FULL, BEGIN
+            deferido e o timeout de 5 s do módulo sqlite3)
+    producao: farmedicare.sqlite (SQLITE_PRAGMAS e BEGIN IMMEDIATE)
+    """
+    return {
+        'padrao': {'pragmas': {}, 'begin': 'BEGIN', 'timeout': 5},
+        'producao': {'pragmas': getattr(settings, 'SQLITE_PRAGMAS', {}), 'begin': 'BEGIN IMMEDIATE', 'timeout': 5},
+    }
+
+
+def _criar_banco(caminho, linhas):
+    conexao = sqlite3.connect(caminho)
+    conexao.executescript("""
+        CREATE TABLE lote (id INTEGER PRIMARY KEY, validade INTEGER, quantidade_disponivel INTEGER);
+        CREATE INDEX lote_validade ON lote (validade);
+        CREATE TABLE saida (id INTEGER PRIMARY KEY, lote_id INTEGER, quantidade INTEGER);
+    """)
+    conexao.executemany(
+        'INSERT INTO lote (validade, quantidade_disponivel) VALUES (?, ?)',
+        ((random.randint(0, 3650), 1000) for _ in range(linhas)),
+    )
+    conexao.commit()
+    conexao.close()
+
+
+def _worker(caminho, perfil, segundos, fracao_escritas, linhas, resultados):
+    conexao = sqlite3.connect(caminho, timeout=perfil['timeout'], isolation_level=None)
+    aplicar_pragmas(conexao, perfil['pragmas'])
+    leituras = escritas = erros = 0
+    fim = time.monotonic() + segundos
+    while time.monotonic() < fim:
+        try:
+            if random.random() < fracao_escritas:
+                lote_id = random.randint(1, linhas)
+                conexao.execute(perfil['begin'])
+                try:
+                    conexao.execute('SELECT quantidade_disponivel FROM lote WHERE id = ?', [lote_id]).fetchone()
+                    conexao.execute(
+                        'UPDATE lote SET quantidade_disponivel = quantidade_disponivel - 1 WHERE id = ?', [lote_id]
+                    )
+                    conexao.execute('INSERT INTO saida (lote_id, quantidade) VALUES (?, 1)', [lote_id])
+                    conexao.execute('COMMIT')
+                except sqlite3.Error:
+                    conexao.execute('ROLLBACK')
+                    raise
+                escritas += 1
+            else:
+                inicio = random.randint(0, 3600)
+                conexao.execute(
+                    'SELECT COUNT(*), SUM(quantidade_disponivel) FROM lote WHERE validade BETWEEN ? AND ?',
+                    [inicio, inicio + 30],
+                ).fetchone()
+                leituras += 1
+        except sqlite3.OperationalError:
+            erros += 1  # "database is locked"
+    conexao.close()
+    resultados.put((leituras, escritas, erros))
+
+
+class Command(BaseCommand):
+    help = "Mede leituras/escritas concorrentes no SQLite com o perfil padrão e o de produção"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=4, help='Workers concorrentes (padrão: 4)')
+        parser.add_argument('--segundos', type=float, default=5, help='Duração de cada perfil (padrão: 5)')
+        parser.add_argument('--escritas', type=float, default=0.2, help='Fração de escritas (padrão: 0.2)')
+        parser.add_argument('--linhas', type=int, default=20000, help='Lotes no banco de teste (padrão: 20000)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['processos']} processo(s), {options['segundos']:g} s por perfil, "
+            f"{options['escritas']:.0%} de escritas\n"
+        )
+        self.stdout.write(f"{'perfil':<10} {'leituras/s':>12} {'escritas/s':>12} {'erros':>8}")
+
+        for nome, perfil in _perfis().items():
+            with tempfile.TemporaryDirectory() as diretorio:
+                caminho = os.path.join(diretorio, 'benchmark.sqlite3')
+                _criar_banco(caminho, options['linhas'])
+
+                resultados = multiprocessing.Queue()
+                processos = [
+                    multiprocessing.Process(target=_worker, args=(
+                        caminho, perfil, options['segundos'], options['escritas'], options['linhas'], resultados
+                    ))
+                    for _ in range(options['processos'])
+                ]
+                for processo in processos:
+                    processo.start()
+                totais = [resultados.get() for _ in processos]
+                for processo in processos:
+                    processo.join()
+
+            leituras, escritas, erros = (sum(valores) for valores in zip(*totais))
+            self.stdout.write(
+                f"{nome:<10} {leituras / options['segundos']:>12.0f} "
+                f"{escritas / options['segundos']:>12.0f} {erros:>8}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark concluído.'))
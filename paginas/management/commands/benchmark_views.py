@@ -0,0 +1,154 @@
+"""
+Mede as views mais acessadas sobre um banco grande de dados sintéticos e compara
+com a base de referência (paginas.benchmark). Sai com erro se algum endpoint
+regredir além da tolerância em tempo ou em número de consultas.
+
+Roda num banco de teste criado e destruído pelo comando (o banco configurado não
+é tocado) e com cache em memória. A base só é comparável com o mesmo volume de
+dados; os tempos dependem da máquina (e variam entre execuções, daí a tolerância
+larga), então grave a base na máquina que roda a comparação. As consultas não
+dependem da máquina e, por padrão, não têm tolerância.
+
+Uso:
+    python manage.py benchmark_views
+    python manage.py benchmark_views --gravar-base
+    python manage.py benchmark_views --endpoint api_notificacoes --endpoint pagina_index
+    python manage.py benchmark_views --anos 5 --movimentacoes-mes 300 --base /tmp/base.json --gravar-base
+"""
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from paginas import benchmark, sinteticos
+from perfis.models import Fazenda
+
+BASE_PADRAO = os.path.join(settings.BASE_DIR, 'benchmarks', 'views.json')
+
+
+class Command(BaseCommand):
+    help = "Mede as views principais sobre dados sintéticos e falha se regredirem em relação à base"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fazendas', type=int, default=2, help='Fazendas geradas (padrão: 2)')
+        parser.add_argument('--anos', type=float, default=2, help='Anos de histórico (padrão: 2)')
+        parser.add_argument(
+            '--movimentacoes-mes', type=int, default=sinteticos.VOLUME_PADRAO['movimentacoes_mes'],
+            help='Movimentações por mês (padrão: %(default)s)',
+        )
+        parser.add_argument(
+            '--entradas-mes', type=int, default=sinteticos.VOLUME_PADRAO['entradas_mes'],
+            help='Entradas de medicamento por mês (padrão: %(default)s)',
+        )
+        parser.add_argument('--semente', type=int, default=42, help='Semente dos dados (padrão: 42)')
+        parser.add_argument('--repeticoes', type=int, default=5, help='Requisições medidas por endpoint (padrão: 5)')
+        parser.add_argument(
+            '--endpoint', action='append', choices=list(benchmark.ENDPOINTS), dest='endpoints',
+            help='Mede só este endpoint (pode repetir)',
+        )
+        parser.add_argument('--base', default=BASE_PADRAO, help='Arquivo JSON da base (padrão: benchmarks/views.json)')
+        parser.add_argument('--gravar-base', action='store_true', help='Grava as medições como nova base')
+        parser.add_argument(
+            '--tolerancia-tempo', type=float, default=0.5,
+            help='Aumento de tempo aceito, em fração da base (padrão: 0.5)',
+        )
+        parser.add_argument(
+            '--tolerancia-consultas', type=int, default=0,
+            help='Consultas a mais aceitas por requisição (padrão: 0)',
+        )
+        parser.add_argument(
+            '--folga-ms', type=float, default=10,
+            help='Folga absoluta de tempo, para o ruído dos endpoints rápidos (padrão: 10)',
+        )
+
+    def handle(self, *args, **options):
+        volume = {
+            'fazendas': options['fazendas'],
+            'anos': options['anos'],
+            'movimentacoes_mes': options['movimentacoes_mes'],
+            'entradas_mes': options['entradas_mes'],
+            'semente': options['semente'],
+        }
+        base = None
+        if not options['gravar_base']:
+            base = benchmark.ler_base(options['base'])
+            if base is None:
+                raise CommandError(f"Base não encontrada em {options['base']}: rode com --gravar-base.")
+            if base['volume'] != volume:
+                raise CommandError(f"A base foi gravada com outro volume de dados: {base['volume']}")
+
+        resultados = self._medir(volume, options)
+
+        if options['gravar_base']:
+            os.makedirs(os.path.dirname(os.path.abspath(options['base'])), exist_ok=True)
+            anteriores = benchmark.ler_base(options['base'])
+            if options['endpoints'] and anteriores and anteriores['volume'] == volume:
+                resultados = {**anteriores['endpoints'], **resultados}
+            benchmark.gravar_base(options['base'], volume, resultados)
+            self._imprimir([(nome, medicao, None, '') for nome, medicao in resultados.items()])
+            self.stdout.write(self.style.SUCCESS(f"Base gravada em {options['base']}."))
+            return
+
+        linhas, regressoes = benchmark.comparar(
+            base['endpoints'], resultados,
+            tolerancia_tempo=options['tolerancia_tempo'],
+            tolerancia_consultas=options['tolerancia_consultas'],
+            folga_ms=options['folga_ms'],
+        )
+        self._imprimir(linhas)
+        if regressoes:
+            raise CommandError('Regressões em relação à base:\n  ' + '\n  '.join(regressoes))
+        self.stdout.write(self.style.SUCCESS(f'{len(linhas)} endpoint(s) dentro da tolerância.'))
+
+    def _medir(self, volume, options):
+        """Gera os dados num banco de teste, mede os endpoints e destrói o banco"""
+        setup_test_environment(debug=False)
+        # Os avisos de orçamento do DesempenhoMiddleware repetiriam a tabela a cada requisição
+        logger_desempenho = logging.getLogger('paginas.desempenho')
+        nivel_original = logger_desempenho.level
+        logger_desempenho.setLevel(logging.ERROR)
+        nome_original = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Cache em memória: as fazendas do banco de teste reutilizam os ids das reais
+            with override_settings(CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark_views'}
+            }):
+                inicio = time.perf_counter()
+                usuario = User.objects.create(username='benchmark')
+                fazendas = [
+                    Fazenda.objects.create(nome=f'Fazenda Benchmark {indice + 1}', dono=usuario)
+                    for indice in range(volume['fazendas'])
+                ]
+                totais = sinteticos.gerar(
+                    fazendas, usuario, volume['anos'], volume['semente'],
+                    volume={'movimentacoes_mes': volume['movimentacoes_mes'], 'entradas_mes': volume['entradas_mes']},
+                )
+                self.stdout.write(
+                    f"{sum(totais.values())} registros gerados em {time.perf_counter() - inicio:.1f} s; "
+                    f"medindo {options['repeticoes']} requisição(ões) por endpoint na fazenda #{fazendas[0].pk}\n"
+                )
+                try:
+                    return benchmark.medir_endpoints(
+                        usuario, fazendas[0], repeticoes=options['repeticoes'], nomes=options['endpoints']
+                    )
+                except benchmark.FalhaBenchmark as erro:
+                    raise CommandError(str(erro))
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+            teardown_test_environment()
+            logger_desempenho.setLevel(nivel_original)
+
+    def _imprimir(self, linhas):
+        self.stdout.write(f"{'endpoint':<26} {'mediana ms':>11} {'mín ms':>8} {'consultas':>10} {'base ms':>8} {'base cons.':>11}")
+        for nome, medicao, referencia, situacao in linhas:
+            base_tempo = f"{referencia['tempo_ms']:>8.1f}" if referencia else f"{'-':>8}"
+            base_consultas = f"{referencia['consultas']:>11}" if referencia else f"{'-':>11}"
+            self.stdout.write(
+                f"{nome:<26} {medicao['tempo_ms']:>11.1f} {medicao['tempo_min_ms']:>8.1f} "
+                f"{medicao['consultas']:>10} {base_tempo} {base_consultas}  {situacao}"
+            )
@@ -0,0 +1,89 @@
+"""
+Gera fazendas com anos de movimentações, parcelas, entradas e saídas de
+medicamentos para testes de carga e benchmarks (paginas.sinteticos).
+
+A mesma semente gera os mesmos dados, com qualquer número de workers.
+
+Uso:
+    python manage.py gerar_dados_sinteticos
+    python manage.py gerar_dados_sinteticos --fazendas 10 --anos 5 --workers 4
+    python manage.py gerar_dados_sinteticos --movimentacoes-mes 500 --semente 7
+    python manage.py gerar_dados_sinteticos --usuario carga --senha <senha>
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from paginas import sinteticos
+from perfis.models import Fazenda
+
+
+class Command(BaseCommand):
+    help = "Gera dados sintéticos (fazendas × anos de movimentações e estoque) com bulk_create"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fazendas', type=int, default=1, help='Fazendas geradas (padrão: 1)')
+        parser.add_argument('--anos', type=float, default=1, help='Anos de histórico por fazenda (padrão: 1)')
+        parser.add_argument(
+            '--movimentacoes-mes', type=int, default=sinteticos.VOLUME_PADRAO['movimentacoes_mes'],
+            help='Movimentações por mês (padrão: %(default)s)',
+        )
+        parser.add_argument(
+            '--entradas-mes', type=int, default=sinteticos.VOLUME_PADRAO['entradas_mes'],
+            help='Entradas de medicamento por mês (padrão: %(default)s)',
+        )
+        parser.add_argument(
+            '--medicamentos', type=int, default=sinteticos.VOLUME_PADRAO['medicamentos'],
+            help='Medicamentos cadastrados por fazenda (padrão: %(default)s)',
+        )
+        parser.add_argument('--semente', type=int, default=42, help='Semente do gerador aleatório (padrão: 42)')
+        parser.add_argument('--workers', type=int, default=1, help='Processos em paralelo, um por fazenda (padrão: 1)')
+        parser.add_argument(
+            '--usuario', default='sintetico',
+            help='Dono das fazendas, criado se não existir (padrão: sintetico)',
+        )
+        parser.add_argument(
+            '--senha',
+            help='Senha do usuário criado; sem ela o usuário não consegue fazer login',
+        )
+
+    def handle(self, *args, **options):
+        if options['fazendas'] < 1 or options['anos'] <= 0 or options['workers'] < 1:
+            raise CommandError('--fazendas, --anos e --workers devem ser positivos.')
+
+        usuario, criado = User.objects.get_or_create(username=options['usuario'])
+        if criado:
+            if options['senha']:
+                usuario.set_password(options['senha'])
+            else:
+                usuario.set_unusable_password()
+            usuario.save()
+
+        inicio = time.perf_counter()
+        fazendas = [
+            Fazenda.objects.create(nome=f"Fazenda Sintética {options['semente']}-{indice + 1}", dono=usuario)
+            for indice in range(options['fazendas'])
+        ]
+        volume = {
+            'movimentacoes_mes': options['movimentacoes_mes'],
+            'entradas_mes': options['entradas_mes'],
+            'medicamentos': options['medicamentos'],
+        }
+
+        def ao_concluir(fazenda_id, totais):
+            self.stdout.write(
+                f"Fazenda #{fazenda_id}: {totais['movimentacoes']} movimentações, {totais['parcelas']} parcelas, "
+                f"{totais['entradas']} entradas, {totais['saidas']} saídas"
+            )
+
+        totais = sinteticos.gerar(
+            fazendas, usuario, options['anos'], options['semente'],
+            volume=volume, workers=options['workers'], ao_concluir=ao_concluir,
+        )
+        duracao = time.perf_counter() - inicio
+        registros = sum(totais.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(fazendas)} fazenda(s), {registros} registros em {duracao:.1f} s "
+            f"({registros / duracao:.0f} registros/s)."
+        ))
@@ -0,0 +1,53 @@
+"""
+Importa uma planilha (CSV/XLSX) de movimentações ou entradas de medicamentos
+para uma fazenda, usando o mesmo pipeline da tela de importação.
+
+Uso:
+    python manage.py importar_planilha movimentacoes dados.csv --fazenda 3 --usuario admin
+    python manage.py importar_planilha entradas estoque.xlsx --fazenda 3 --usuario admin --simular
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from medicamento.importacao import ImportadorEntradasMedicamento
+from movimentacao.importacao import ImportadorMovimentacoes
+from paginas.importacao import ErroImportacao
+from perfis.models import Fazenda
+
+IMPORTADORES = {
+    'movimentacoes': ImportadorMovimentacoes,
+    'entradas': ImportadorEntradasMedicamento,
+}
+
+
+class Command(BaseCommand):
+    help = "Importa movimentações ou entradas de medicamentos de uma planilha CSV/XLSX"
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(IMPORTADORES), help='O que importar')
+        parser.add_argument('arquivo', help='Caminho do arquivo .csv ou .xlsx')
+        parser.add_argument('--fazenda', type=int, required=True, help='ID da fazenda de destino')
+        parser.add_argument('--usuario', required=True, help='Username registrado como autor dos cadastros')
+        parser.add_argument('--simular', action='store_true', help='Apenas valida, sem gravar')
+
+    def handle(self, *args, **options):
+        try:
+            fazenda = Fazenda.objects.get(pk=options['fazenda'])
+            usuario = User.objects.get(username=options['usuario'])
+        except (Fazenda.DoesNotExist, User.DoesNotExist) as erro:
+            raise CommandError(str(erro))
+
+        importador = IMPORTADORES[options['tipo']](fazenda, usuario)
+        try:
+            with open(options['arquivo'], 'rb') as arquivo:
+                resultado = importador.importar(arquivo, options['arquivo'], simular=options['simular'])
+        except (OSError, ErroImportacao) as erro:
+            raise CommandError(str(erro))
+
+        for linha, mensagem in resultado.erros:
+            self.stderr.write(f'Linha {linha}: {mensagem}')
+
+        acao = 'válida(s)' if options['simular'] else 'importada(s)'
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.importadas} de {resultado.linhas} linha(s) {acao}; {resultado.total_erros} com erro.'
+        ))
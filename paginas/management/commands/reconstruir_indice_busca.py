@@ -0,0 +1,36 @@
+"""
+Reconstrói o índice de busca das listagens (DocumentoBusca e a tabela FTS5)
+a partir das movimentações e entradas de medicamentos.
+
+Uso:
+    python manage.py reconstruir_indice_busca
+    python manage.py reconstruir_indice_busca --fazenda 3
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from paginas import busca
+from perfis.models import Fazenda
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o índice de busca textual das listagens"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fazenda',
+            type=int,
+            help='ID da fazenda a reconstruir (padrão: todas)',
+        )
+
+    def handle(self, *args, **options):
+        fazendas = None
+        if options['fazenda']:
+            fazendas = Fazenda.objects.filter(pk=options['fazenda'])
+
+        with transaction.atomic():
+            total = busca.reindexar(fazendas)
+            if fazendas is None:
+                busca.reconstruir_fts()
+
+        self.stdout.write(self.style.SUCCESS(f'{total} documento(s) de busca reconstruído(s).'))
@@ -0,0 +1,65 @@
+"""
+Mostra os agregados de desempenho por URL (consultas, tempo de banco e tempo total)
+gravados pelo DesempenhoMiddleware de todos os processos.
+
+Uso:
+    python manage.py relatorio_desempenho
+    python manage.py relatorio_desempenho --ordenar banco
+    python manage.py relatorio_desempenho --limpar
+"""
+from django.core.management.base import BaseCommand
+
+from paginas import desempenho
+
+ORDENACOES = {
+    'consultas': lambda linha: linha['consultas'] / linha['requisicoes'],
+    'banco': lambda linha: linha['tempo_banco'] / linha['requisicoes'],
+    'total': lambda linha: linha['tempo_total'] / linha['requisicoes'],
+    'requisicoes': lambda linha: linha['requisicoes'],
+    'acima': lambda linha: linha['acima'],
+}
+
+
+class Command(BaseCommand):
+    help = "Mostra consultas e tempos médios por URL registrados pelo DesempenhoMiddleware"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ordenar',
+            choices=sorted(ORDENACOES),
+            default='consultas',
+            help='Coluna de ordenação, decrescente (padrão: consultas)',
+        )
+        parser.add_argument(
+            '--limpar',
+            action='store_true',
+            help='Zera os agregados de todos os processos',
+        )
+
+    def handle(self, *args, **options):
+        if options['limpar']:
+            desempenho.limpar()
+            self.stdout.write(self.style.SUCCESS('Agregados de desempenho zerados.'))
+            return
+
+        agregados = desempenho.ler_agregados()
+        if not agregados:
+            self.stdout.write('Nenhuma requisição registrada.')
+            return
+
+        self.stdout.write(
+            f"{'url':<36} {'req.':>7} {'cons. méd':>10} {'cons. máx':>10} "
+            f"{'banco ms':>9} {'total ms':>9} {'máx ms':>8} {'acima':>6}"
+        )
+        ordenacao = ORDENACOES[options['ordenar']]
+        for url_name, linha in sorted(agregados.items(), key=lambda item: ordenacao(item[1]), reverse=True):
+            requisicoes = linha['requisicoes']
+            self.stdout.write(
+                f"{url_name[:36]:<36} {requisicoes:>7} "
+                f"{linha['consultas'] / requisicoes:>10.1f} {linha['consultas_max']:>10} "
+                f"{linha['tempo_banco'] * 1000 / requisicoes:>9.1f} "
+                f"{linha['tempo_total'] * 1000 / requisicoes:>9.1f} "
+                f"{linha['tempo_total_max'] * 1000:>8.0f} {linha['acima']:>6}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'{len(agregados)} URL(s) com requisições registradas.'))
@@ -0,0 +1,33 @@
+"""
+Middleware de instrumentação de desempenho (paginas.desempenho)
+"""
+from paginas import desempenho
+
+
+class DesempenhoMiddleware:
+    """
+    Mede consultas, tempo de banco e tempo total de cada requisição, registra no
+    log as que passam do orçamento da URL e acumula os agregados por nome de URL.
+
+    A medição fica em `response.desempenho` (usada pelas asserções dos testes).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with desempenho.medir() as medicao:
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = (match.url_name if match else None) or desempenho.SEM_ROTA
+        acima = desempenho.excedidos(medicao, desempenho.orcamento_url(url_name))
+        if acima:
+            desempenho.logger.warning(
+                '%s %s (%s) acima do orçamento (%s): %s',
+                request.method, request.path, url_name, ', '.join(acima), medicao,
+            )
+        desempenho.registrar(url_name, medicao, acima)
+
+        response.desempenho = medicao
+        return response
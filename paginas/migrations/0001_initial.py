@@ -0,0 +1,82 @@
+# Generated by Django 4.2.23 on 2026-10-17 17:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def criar_indice_textual(apps, schema_editor):
+    """FTS5 no SQLite e índice trigram no PostgreSQL (veja paginas.busca)"""
+    from paginas.busca import criar_indice_textual
+
+    criar_indice_textual(schema_editor.connection)
+
+
+def remover_indice_textual(apps, schema_editor):
+    from paginas.busca import TABELA_FTS
+
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABELA_FTS}")
+
+
+def popular_documentos(apps, schema_editor):
+    """Cria os documentos de busca dos registros existentes"""
+    from paginas.importacao import normalizar_nome
+
+    DocumentoBusca = apps.get_model('paginas', 'DocumentoBusca')
+    Movimentacao = apps.get_model('movimentacao', 'Movimentacao')
+    EntradaMedicamento = apps.get_model('medicamento', 'EntradaMedicamento')
+
+    def texto(*partes):
+        return normalizar_nome(' '.join(str(parte) for parte in partes if parte))
+
+    documentos = [
+        DocumentoBusca(
+            fazenda_id=row['fazenda_id'], tipo='movimentacao', objeto_id=row['id'],
+            texto=texto(row['descricao'], row['categoria__nome'], row['parceiros__nome']),
+        )
+        for row in Movimentacao.objects.values(
+            'id', 'fazenda_id', 'descricao', 'categoria__nome', 'parceiros__nome'
+        ).iterator()
+    ]
+    documentos += [
+        DocumentoBusca(
+            fazenda_id=row['medicamento__fazenda_id'], tipo='entrada_medicamento', objeto_id=row['id'],
+            texto=texto(row['medicamento__nome'], row['observacao']),
+        )
+        for row in EntradaMedicamento.objects.values(
+            'id', 'medicamento__fazenda_id', 'medicamento__nome', 'observacao'
+        ).iterator()
+    ]
+    DocumentoBusca.objects.bulk_create(documentos, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('perfis', '0001_initial'),
+        ('movimentacao', '0002_resumomensalmovimentacao'),
+        ('medicamento', '0003_estoquemedicamento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoBusca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('movimentacao', 'Movimentação'), ('entrada_medicamento', 'Entrada de Medicamento')], max_length=30, verbose_name='Tipo')),
+                ('objeto_id', models.PositiveBigIntegerField(verbose_name='Registro')),
+                ('texto', models.TextField(verbose_name='Texto Indexado')),
+                ('fazenda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='perfis.fazenda', verbose_name='Fazenda')),
+            ],
+            options={
+                'verbose_name': 'Documento de Busca',
+                'verbose_name_plural': 'Documentos de Busca',
+                'indexes': [models.Index(fields=['fazenda', 'tipo'], name='paginas_doc_fazenda_31c921_idx')],
+                'unique_together': {('tipo', 'objeto_id')},
+            },
+        ),
+        migrations.RunPython(criar_indice_textual, remover_indice_textual),
+        migrations.RunPython(popular_documentos, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,34 @@
 from django.db import models
 
-# Create your models here.
 
+############  DocumentoBusca  ############
+class DocumentoBusca(models.Model):
+    """
+    Texto normalizado de um registro pesquisável nas listagens (veja paginas.busca).
 
+    Mantido pelos signals; não editar manualmente.
+    """
+    fazenda = models.ForeignKey(
+        "perfis.Fazenda", on_delete=models.CASCADE, verbose_name="Fazenda"
+    )
+    tipo = models.CharField(
+        max_length=30,
+        choices=[
+            ("movimentacao", "Movimentação"),
+            ("entrada_medicamento", "Entrada de Medicamento"),
+        ],
+        verbose_name="Tipo",
+    )
+    objeto_id = models.PositiveBigIntegerField(verbose_name="Registro")
+    texto = models.TextField(verbose_name="Texto Indexado")
 
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.objeto_id}"
+
+    class Meta:
+        verbose_name = "Documento de Busca"
+        verbose_name_plural = "Documentos de Busca"
+        unique_together = ('tipo', 'objeto_id')
+        indexes = [
+            models.Index(fields=['fazenda', 'tipo']),
+        ]
@@ -0,0 +1,221 @@
+"""
+Paginação por cursor (keyset) para as listagens
+
+A paginação padrão do Django faz COUNT(*) sobre o join filtrado a cada página e
+pula registros com OFFSET, o que fica mais lento quanto mais longe a página. Aqui
+cada página começa a partir dos valores de ordenação do último (ou primeiro)
+registro da página anterior, usando os índices de ordenação da listagem:
+
+    ?cursor=<token>&direcao=proximo&page=3
+
+O total de registros é guardado no cache versionado da fazenda (paginas.cache),
+então só é recontado quando os dados da fazenda mudam. Links antigos com apenas
+?page=N continuam funcionando (caem no OFFSET).
+"""
+import base64
+import hashlib
+import json
+import math
+from datetime import date
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+from paginas.cache import obter_ou_calcular
+
+PARAMETROS_PAGINACAO = ('page', 'cursor', 'direcao')
+
+
+def _codificar_cursor(valores):
+    texto = json.dumps([v.isoformat() if isinstance(v, date) else v for v in valores])
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def _decodificar_cursor(token, campos):
+    """Converte o token de volta para os valores dos campos (None se inválido)"""
+    try:
+        texto = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        valores = json.loads(texto)
+        if not isinstance(valores, list) or len(valores) != len(campos):
+            return None
+        return [campo.to_python(valor) for campo, valor in zip(campos, valores)]
+    except Exception:
+        return None
+
+
+class PaginadorCursor(Paginator):
+    """
+    Paginator com total informado de fora (cache) em vez de COUNT(*) a cada página.
+
+    Mantém a interface usada pelo template paginacao.html (count, num_pages).
+    """
+
+    def __init__(self, object_list, per_page, contar):
+        super().__init__(object_list, per_page)
+        self._contar = contar
+
+    @property
+    def count(self):
+        if not hasattr(self, '_total'):
+            self._total = self._contar()
+        return self._total
+
+    @property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+
+class PaginaCursor:
+    """Página de uma listagem paginada por cursor (interface compatível com Page)"""
+    por_cursor = True
+
+    def __init__(self, object_list, number, paginator, has_next, has_previous, ordenacao):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self._ordenacao = ordenacao
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1 if self.object_list else 0
+
+    def _cursor(self, objeto):
+        return _codificar_cursor([getattr(objeto, campo) for campo, _ in self._ordenacao])
+
+    @property
+    def cursor_proximo(self):
+        return self._cursor(self.object_list[-1]) if self.object_list else ''
+
+    @property
+    def cursor_anterior(self):
+        return self._cursor(self.object_list[0]) if self.object_list else ''
+
+
+class PaginacaoCursorMixin:
+    """
+    Troca a paginação por OFFSET de uma ListView pela paginação por cursor.
+
+    Subclasses definem `ordenacao_cursor` com os campos de ordenação (o último deve
+    ser único, ex.: 'id'), no formato de order_by: ('-data', 'id').
+    """
+    ordenacao_cursor = ('-id',)
+    contagem_timeout = 3600
+
+    def _ordenacao(self):
+        return [(campo.lstrip('-'), campo.startswith('-')) for campo in self.ordenacao_cursor]
+
+    @staticmethod
+    def _filtro_apos(ordenacao, valores, reverso=False):
+        """
+        Condição "depois do cursor" na ordenação (lexicográfica):
+        (a > x) OR (a = x AND b > y) ... com > ou < conforme a direção de cada campo
+        """
+        filtro = Q()
+        iguais = Q()
+        for (campo, decrescente), valor in zip(ordenacao, valores):
+            operador = 'lt' if decrescente != reverso else 'gt'
+            filtro |= iguais & Q(**{f'{campo}__{operador}': valor})
+            iguais &= Q(**{campo: valor})
+        return filtro
+
+    def _chave_contagem(self):
+        """Identifica o total pelos filtros da requisição (sem os parâmetros de paginação)"""
+        parametros = sorted(
+            (chave, valor) for chave, valores in self.request.GET.lists()
+            for valor in valores if chave not in PARAMETROS_PAGINACAO
+        )
+        return hashlib.md5(json.dumps(parametros).encode()).hexdigest()
+
+    def contar_registros(self, queryset):
+        """Total de registros filtrados; em cache até os dados da fazenda mudarem"""
+        fazenda = getattr(self.request, 'fazenda_ativa', None)
+        if not fazenda:
+            return queryset.count()
+        return obter_ou_calcular(
+            fazenda, 'total_lista',
+            lambda: queryset.order_by().count(),
+            self.__class__.__name__, date.today().isoformat(), self._chave_contagem(),
+            timeout=self.contagem_timeout,
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        ordenacao = self._ordenacao()
+        modelo = queryset.model
+        campos = [
+            modelo._meta.pk if nome in ('id', 'pk') else modelo._meta.get_field(nome)
+            for nome, _ in ordenacao
+        ]
+        ordem = list(self.ordenacao_cursor)
+        ordem_reversa = [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in ordem]
+
+        paginator = PaginadorCursor(queryset, page_size, lambda: self.contar_registros(queryset))
+        parametros = self.request.GET
+        direcao = parametros.get('direcao', '')
+        valores = _decodificar_cursor(parametros.get('cursor', ''), campos)
+        try:
+            numero = max(1, int(parametros.get('page', 1)))
+        except (TypeError, ValueError):
+            numero = 1
+
+        if direcao == 'ultima':
+            # Última página: ordem invertida, com o tamanho que ela teria no OFFSET
+            numero = paginator.num_pages
+            tamanho = paginator.count - (numero - 1) * page_size or page_size
+            objetos = list(queryset.order_by(*ordem_reversa)[:tamanho + 1])
+            has_previous = len(objetos) > tamanho
+            objetos = objetos[:tamanho][::-1]
+            has_next = False
+        elif direcao == 'anterior' and valores:
+            filtro = self._filtro_apos(ordenacao, valores, reverso=True)
+            objetos = list(queryset.filter(filtro).order_by(*ordem_reversa)[:page_size + 1])
+            has_previous = len(objetos) > page_size
+            objetos = objetos[:page_size][::-1]
+            has_next = True
+            if not has_previous:
+                numero = 1
+        elif direcao == 'proximo' and valores:
+            filtro = self._filtro_apos(ordenacao, valores)
+            objetos = list(queryset.filter(filtro).order_by(*ordem)[:page_size + 1])
+            has_next = len(objetos) > page_size
+            objetos = objetos[:page_size]
+            has_previous = True
+        else:
+            # Primeira página (ou link antigo ?page=N sem cursor: OFFSET)
+            inicio = (numero - 1) * page_size
+            objetos = list(queryset.order_by(*ordem)[inicio:inicio + page_size + 1])
+            has_next = len(objetos) > page_size
+            objetos = objetos[:page_size]
+            has_previous = numero > 1
+
+        pagina = PaginaCursor(objetos, numero, paginator, has_next, has_previous, ordenacao)
+        return (paginator, pagina, pagina.object_list, pagina.has_other_pages())
@@ -0,0 +1,60 @@
+"""
+Resumo das listagens filtradas (totais e contagens por grupo)
+
+Os totais exibidos nas listagens são calculados no banco, sobre o mesmo queryset
+filtrado (fazenda, pesquisa e django-filter) que alimenta a paginação, em uma única
+query com agregados condicionais. Assim a tela carrega apenas as linhas da página
+e os totais continuam valendo para todos os registros filtrados.
+
+Exemplo:
+    resumo_filtrado(
+        queryset,
+        grupos={'todas': None, 'ir': Q(imposto_renda=True)},
+        campos={'quantidade': Count('pk'), 'valor': Sum('valor_total')},
+    )
+    -> {'todas': {'quantidade': 3, 'valor': Decimal('300.00')}, 'ir': {...}}
+"""
+import copy
+
+
+def resumo_filtrado(queryset, grupos, campos):
+    """
+    Calcula os agregados de `campos` para cada grupo (filtro Q; None = todos os registros).
+
+    Returns:
+        dict: {grupo: {campo: valor}}; somas sem registros retornam 0
+    """
+    agregados = {}
+    for grupo, filtro in grupos.items():
+        for campo, agregado in campos.items():
+            agregado = copy.copy(agregado)
+            if filtro is not None:
+                agregado.filter = filtro & agregado.filter if agregado.filter else filtro
+            agregados[f'{grupo}__{campo}'] = agregado
+
+    valores = queryset.order_by().aggregate(**agregados)
+
+    return {
+        grupo: {campo: valores[f'{grupo}__{campo}'] or 0 for campo in campos}
+        for grupo in grupos
+    }
+
+
+class ResumoFiltradoMixin:
+    """
+    Adiciona `resumo` ao contexto de uma ListView, calculado sobre `self.object_list`
+    (o mesmo queryset filtrado da paginação).
+
+    Subclasses definem `resumo_campos` e `resumo_grupos` (ou `get_resumo_grupos()`
+    quando os filtros dependem da data atual).
+    """
+    resumo_grupos = {'todos': None}
+    resumo_campos = {}
+
+    def get_resumo_grupos(self):
+        return self.resumo_grupos
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['resumo'] = resumo_filtrado(self.object_list, self.get_resumo_grupos(), self.resumo_campos)
+        return context
@@ -0,0 +1,168 @@
+"""
+Signals que invalidam o cache versionado da fazenda (paginas.cache)
+quando dados exibidos no dashboard, relatórios e notificações mudam,
+e que mantêm o índice de busca das listagens (paginas.busca) e as
+notificações materializadas (relatorios.notificacoes).
+"""
+from django.db import models
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from medicamento.models import EntradaMedicamento, Medicamento, SaidaMedicamento
+from movimentacao.models import Categoria, Movimentacao, Parcela
+from perfis.models import Fazenda, Parceiros
+from paginas import busca
+from paginas.cache import invalidar_ao_gravar
+from relatorios import notificacoes
+
+
+def _fazenda_id(instance):
+    """
+    Fazenda do registro. Parcela e EntradaMedicamento têm a cópia desnormalizada
+    (fazenda_id); só a SaidaMedicamento chega à fazenda pelo medicamento.
+    """
+    if isinstance(instance, SaidaMedicamento):
+        relacionado = SaidaMedicamento.medicamento
+        if relacionado.is_cached(instance):
+            return instance.medicamento.fazenda_id
+        return Medicamento.objects.filter(
+            pk=instance.medicamento_id
+        ).values_list('fazenda_id', flat=True).first()
+    return instance.fazenda_id
+
+
+def _invalidar(fazenda_id):
+    invalidar_ao_gravar(fazenda_id)
+
+
+@receiver(post_save, sender=Movimentacao)
+@receiver(post_save, sender=Parcela)
+@receiver(post_save, sender=EntradaMedicamento)
+@receiver(post_save, sender=SaidaMedicamento)
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Medicamento)
+@receiver(post_save, sender=Parceiros)
+def invalidar_cache_ao_salvar(sender, instance, **kwargs):
+    """Invalida o cache da fazenda quando um registro é criado ou alterado"""
+    _invalidar(_fazenda_id(instance))
+
+
+@receiver(post_delete, sender=Movimentacao)
+@receiver(post_delete, sender=Parcela)
+@receiver(post_delete, sender=EntradaMedicamento)
+@receiver(post_delete, sender=SaidaMedicamento)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=Medicamento)
+@receiver(post_delete, sender=Parceiros)
+def invalidar_cache_ao_excluir(sender, instance, origin=None, **kwargs):
+    """Invalida o cache da fazenda quando um registro é excluído"""
+    if isinstance(origin, models.Model) and origin is not instance:
+        # Exclusão em cascata: o registro de origem já invalida a fazenda
+        # (evita uma query por filho para descobrir a fazenda)
+        if isinstance(origin, Fazenda):
+            _invalidar(origin.pk)
+        elif type(origin) not in (Movimentacao, Medicamento, EntradaMedicamento, Categoria, Parceiros):
+            _invalidar(_fazenda_id(instance))
+        return
+    _invalidar(_fazenda_id(instance))
+
+
+############ Índice de busca ############
+def criar_indice_busca(using='default', **kwargs):
+    """Garante a tabela FTS5/índice trigram após o migrate (conectado em PaginasConfig.ready)"""
+    from django.db import connections
+
+    busca.criar_indice_textual(connections[using])
+
+
+@receiver(post_save, sender=Movimentacao)
+def indexar_movimentacao(sender, instance, **kwargs):
+    busca.indexar(busca.TIPO_MOVIMENTACAO, [instance])
+
+
+@receiver(post_save, sender=EntradaMedicamento)
+def indexar_entrada_medicamento(sender, instance, **kwargs):
+    busca.indexar(busca.TIPO_ENTRADA_MEDICAMENTO, [instance])
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Parceiros)
+def reindexar_movimentacoes_relacionadas(sender, instance, created=False, **kwargs):
+    """O nome da categoria/parceiro faz parte do texto das movimentações"""
+    if created:
+        return
+    campo = 'categoria' if sender is Categoria else 'parceiros'
+    busca.indexar(
+        busca.TIPO_MOVIMENTACAO,
+        Movimentacao.objects.filter(**{campo: instance}).select_related('categoria', 'parceiros'),
+    )
+
+
+@receiver(post_save, sender=Medicamento)
+def reindexar_entradas_relacionadas(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    busca.indexar(
+        busca.TIPO_ENTRADA_MEDICAMENTO,
+        EntradaMedicamento.objects.filter(medicamento=instance).select_related('medicamento'),
+    )
+
+
+@receiver(post_delete, sender=Movimentacao)
+@receiver(post_delete, sender=EntradaMedicamento)
+def remover_documento_busca(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Fazenda):
+        return  # Os documentos da fazenda são excluídos em cascata
+    tipo = busca.TIPO_MOVIMENTACAO if sender is Movimentacao else busca.TIPO_ENTRADA_MEDICAMENTO
+    busca.remover(tipo, [instance.pk])
+
+
+############ Notificações materializadas ############
+@receiver(post_save, sender=Parcela)
+def atualizar_notificacao_parcela(sender, instance, **kwargs):
+    notificacoes.agendar_atualizacao(instance.fazenda_id, parcelas=Q(pk=instance.pk))
+
+
+@receiver(post_save, sender=Movimentacao)
+def atualizar_notificacoes_movimentacao(sender, instance, **kwargs):
+    """As parcelas são geradas/recalculadas em lote no save da movimentação"""
+    notificacoes.agendar_atualizacao(instance.fazenda_id, parcelas=Q(movimentacao_id=instance.pk))
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Parceiros)
+def atualizar_notificacoes_relacionadas(sender, instance, created=False, **kwargs):
+    """Nome e tipo da categoria/nome do parceiro fazem parte das notificações das parcelas"""
+    if created:
+        return
+    campo = 'movimentacao__categoria_id' if sender is Categoria else 'movimentacao__parceiros_id'
+    notificacoes.agendar_atualizacao(instance.fazenda_id, parcelas=Q(**{campo: instance.pk}))
+
+
+@receiver(post_save, sender=EntradaMedicamento)
+def atualizar_notificacao_entrada(sender, instance, **kwargs):
+    notificacoes.agendar_atualizacao(instance.fazenda_id, entradas=Q(pk=instance.pk))
+
+
+@receiver(post_save, sender=Medicamento)
+def atualizar_notificacoes_medicamento(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    notificacoes.agendar_atualizacao(instance.fazenda_id, entradas=Q(medicamento_id=instance.pk))
+
+
+@receiver(post_delete, sender=Movimentacao)
+@receiver(post_delete, sender=Parcela)
+@receiver(post_delete, sender=Medicamento)
+@receiver(post_delete, sender=EntradaMedicamento)
+def registrar_exclusao_notificacoes(sender, instance, origin=None, **kwargs):
+    """
+    A notificação é excluída em cascata com a origem; aqui só se incrementa a versão
+    da fazenda (ETag da API), uma vez por exclusão de movimentação/medicamento.
+    """
+    if isinstance(origin, Fazenda):
+        return
+    if isinstance(origin, (Movimentacao, Medicamento)) and origin is not instance:
+        return
+    notificacoes.agendar_exclusao(instance.fazenda_id)
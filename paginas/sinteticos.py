@@ -0,0 +1,285 @@
+"""
+Gerador de dados sintéticos para bancos de carga e benchmark
+
+Gera N fazendas × M anos de movimentações, parcelas, entradas e saídas de
+medicamentos com bulk_create. Os objetos de cada mês são montados fora da
+transação e gravados numa transação curta (o lock de escrita do SQLite fica com
+cada worker só durante os INSERTs). Cada fazenda usa um gerador aleatório
+próprio, semeado por (semente, índice da fazenda): o mesmo comando gera os mesmos
+dados com qualquer número de workers. As datas são relativas ao dia da geração.
+
+Como no import em lote, bulk_create não passa pelo save() nem pelos signals: as
+cópias desnormalizadas (fazenda/tipo) e o índice de busca são gravados junto com
+cada mês e, no fim de cada fazenda, resumo mensal, estoque e notificações são
+reconstruídos.
+
+Uso: python manage.py gerar_dados_sinteticos (paginas/management/commands)
+"""
+import multiprocessing
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from medicamento.models import EntradaMedicamento, EstoqueMedicamento, Medicamento, SaidaMedicamento
+from movimentacao.models import Categoria, Movimentacao, Parcela, ResumoMensalMovimentacao
+from paginas import busca
+from paginas.cache import invalidar_ao_gravar
+from perfis.models import Fazenda, Parceiros
+from relatorios.notificacoes import materializar_notificacoes
+
+TAMANHO_LOTE = 2000
+
+CATEGORIAS = {
+    'receita': ['Venda de Leite', 'Venda de Gado', 'Venda de Bezerros', 'Venda de Grãos', 'Arrendamento', 'Serviços'],
+    'despesa': [
+        'Ração', 'Medicamentos', 'Veterinário', 'Combustível', 'Energia', 'Salários',
+        'Manutenção', 'Sementes', 'Fertilizantes', 'Impostos', 'Transporte', 'Equipamentos',
+    ],
+}
+PARCEIROS = [
+    'Laticínios', 'Cooperativa', 'Frigorífico', 'Agropecuária', 'Casa do Produtor',
+    'Distribuidora', 'Transportadora', 'Posto', 'Veterinária', 'Cerealista',
+]
+MEDICAMENTOS = [
+    'Ivermectina', 'Oxitetraciclina', 'Penicilina', 'Vacina Aftosa', 'Vacina Brucelose',
+    'Vermífugo', 'Carrapaticida', 'Anti-inflamatório', 'Vitamina ADE', 'Antibiótico',
+    'Mastite', 'Cicatrizante', 'Soro', 'Ocitocina', 'Albendazol',
+]
+MOTIVOS_SAIDA = ['Aplicação no rebanho', 'Tratamento', 'Vacinação', 'Descarte', 'Uso preventivo']
+PARCELAMENTOS = [1, 1, 1, 1, 2, 3, 4, 6, 10, 12]
+
+VOLUME_PADRAO = {
+    'movimentacoes_mes': 100,
+    'entradas_mes': 20,
+    'saidas_por_entrada': 4,
+    'medicamentos': 30,
+    'parceiros': 20,
+}
+
+
+def _meses(inicio, fim):
+    """Primeiro dia de cada mês entre inicio e fim"""
+    mes = inicio.replace(day=1)
+    while mes <= fim:
+        yield mes
+        mes = (mes + timedelta(days=32)).replace(day=1)
+
+
+def _momento(dia, rng):
+    """DateTime aware num horário comercial do dia"""
+    return timezone.make_aware(datetime.combine(dia, time(rng.randint(7, 18), rng.randint(0, 59))))
+
+
+def _valor(rng, minimo, maximo):
+    return Decimal(rng.randint(minimo * 100, maximo * 100)) / 100
+
+
+############ Geração por fazenda ############
+def _cadastros(fazenda_id, rng, volume):
+    parceiros = Parceiros.objects.bulk_create([
+        Parceiros(nome=f'{PARCEIROS[i % len(PARCEIROS)]} {i + 1}', fazenda_id=fazenda_id)
+        for i in range(volume['parceiros'])
+    ])
+    categorias = Categoria.objects.bulk_create([
+        Categoria(nome=nome, tipo=tipo, fazenda_id=fazenda_id)
+        for tipo, nomes in CATEGORIAS.items() for nome in nomes
+    ])
+    medicamentos = Medicamento.objects.bulk_create([
+        Medicamento(nome=f'{MEDICAMENTOS[i % len(MEDICAMENTOS)]} {i // len(MEDICAMENTOS) + 1}', fazenda_id=fazenda_id)
+        for i in range(volume['medicamentos'])
+    ])
+    return parceiros, categorias, medicamentos
+
+
+def _movimentacoes_do_mes(fazenda_id, usuario_id, mes, hoje, rng, volume, parceiros, categorias):
+    """Movimentações e parcelas do mês, ainda não gravadas (parcelas vencidas quase sempre pagas)"""
+    # Despesas são mais frequentes que receitas
+    pesos = [1 if categoria.tipo == 'receita' else 2 for categoria in categorias]
+    movimentacoes, parcelas = [], []
+    for _ in range(volume['movimentacoes_mes']):
+        categoria = rng.choices(categorias, pesos)[0]
+        movimentacao = Movimentacao(
+            categoria=categoria,
+            tipo=categoria.tipo,
+            fazenda_id=fazenda_id,
+            parceiros=rng.choice(parceiros) if parceiros and rng.random() < 0.8 else None,
+            valor_total=_valor(rng, 50, 20000),
+            parcelas=rng.choice(PARCELAMENTOS),
+            imposto_renda=rng.random() < 0.3,
+            descricao=f'{categoria.nome} - {mes:%m/%Y}',
+            data=min(mes + timedelta(days=rng.randint(0, 27)), hoje),
+            cadastrada_por_id=usuario_id,
+        )
+        movimentacoes.append(movimentacao)
+        for ordem, valor_parcela, vencimento in movimentacao.calcular_parcelas():
+            paga = vencimento < hoje and rng.random() < 0.9
+            # movimentacao_id é resolvido no bulk_create, depois da movimentação gravada
+            parcelas.append(Parcela(
+                movimentacao=movimentacao,
+                fazenda_id=fazenda_id,
+                tipo=movimentacao.tipo,
+                ordem_parcela=ordem,
+                valor_parcela=valor_parcela,
+                data_vencimento=vencimento,
+                valor_pago=valor_parcela if paga else Decimal('0.00'),
+                status_pagamento='Pago' if paga else 'Pendente',
+                data_quitacao=min(vencimento + timedelta(days=rng.randint(-5, 10)), hoje) if paga else None,
+            ))
+    return movimentacoes, parcelas
+
+
+def _estoque_do_mes(fazenda_id, usuario_id, mes, hoje, rng, volume, medicamentos):
+    """Entradas do mês e as saídas já dadas delas até hoje, ainda não gravadas"""
+    entradas, saidas = [], []
+    for _ in range(volume['entradas_mes']):
+        dia = min(mes + timedelta(days=rng.randint(0, 27)), hoje)
+        quantidade = rng.randint(10, 500)
+        validade = dia + timedelta(days=rng.randint(30, 720))
+        retiradas, disponivel = [], quantidade
+        fim_uso = min(validade, hoje)
+        for _ in range(rng.randint(0, volume['saidas_por_entrada'])):
+            retirada = rng.randint(1, max(1, quantidade // volume['saidas_por_entrada']))
+            if retirada > disponivel or fim_uso <= dia:
+                break
+            disponivel -= retirada
+            retiradas.append((retirada, dia + timedelta(days=rng.randint(0, (fim_uso - dia).days))))
+        entrada = EntradaMedicamento(
+            medicamento=rng.choice(medicamentos),
+            fazenda_id=fazenda_id,
+            valor_medicamento=_valor(rng, 20, 3000),
+            quantidade=quantidade,
+            quantidade_disponivel=disponivel,
+            validade=validade,
+            cadastrada_por_id=usuario_id,
+            data_cadastro=_momento(dia, rng),
+        )
+        entradas.append(entrada)
+        for retirada, dia_saida in retiradas:
+            saidas.append(SaidaMedicamento(
+                medicamento=entrada.medicamento,
+                entrada=entrada,
+                quantidade=retirada,
+                motivo=rng.choice(MOTIVOS_SAIDA),
+                registrada_por_id=usuario_id,
+                data_saida=_momento(dia_saida, rng),
+            ))
+    return entradas, saidas
+
+
+def _gravar_mes(fazenda_id, movimentacoes, parcelas, entradas, saidas):
+    """Grava os registros de um mês numa transação curta"""
+    with transaction.atomic():
+        invalidar_ao_gravar(fazenda_id)
+        Movimentacao.objects.bulk_create(movimentacoes, batch_size=TAMANHO_LOTE)
+        Parcela.objects.bulk_create(parcelas, batch_size=TAMANHO_LOTE)
+        busca.indexar(busca.TIPO_MOVIMENTACAO, movimentacoes)
+
+        # data_cadastro/data_saida são auto_now_add: o bulk_create grava o momento
+        # atual e o bulk_update devolve as datas geradas
+        datas_cadastro = [entrada.data_cadastro for entrada in entradas]
+        datas_saida = [saida.data_saida for saida in saidas]
+        EntradaMedicamento.objects.bulk_create(entradas, batch_size=TAMANHO_LOTE)
+        SaidaMedicamento.objects.bulk_create(saidas, batch_size=TAMANHO_LOTE)
+        for entrada, data_cadastro in zip(entradas, datas_cadastro):
+            entrada.data_cadastro = data_cadastro
+        for saida, data_saida in zip(saidas, datas_saida):
+            saida.data_saida = data_saida
+        EntradaMedicamento.objects.bulk_update(entradas, ['data_cadastro'], batch_size=TAMANHO_LOTE)
+        SaidaMedicamento.objects.bulk_update(saidas, ['data_saida'], batch_size=TAMANHO_LOTE)
+        busca.indexar(busca.TIPO_ENTRADA_MEDICAMENTO, entradas)
+
+
+def gerar_fazenda(fazenda_id, indice, usuario_id, anos, semente, volume=None):
+    """
+    Gera os dados de uma fazenda já criada.
+
+    Args:
+        fazenda_id: Fazenda a preencher
+        indice: Posição da fazenda na geração (junto com a semente, define os dados)
+        usuario_id: Usuário gravado como autor dos registros
+        anos: Anos de histórico até hoje (as parcelas seguem no futuro)
+        semente: Semente do gerador aleatório
+        volume: Sobrescreve chaves de VOLUME_PADRAO
+
+    Returns:
+        dict: Quantidade de registros gerados por tipo
+    """
+    volume = {**VOLUME_PADRAO, **(volume or {})}
+    rng = random.Random(semente * 1000003 + indice)
+    hoje = date.today()
+    inicio = hoje - timedelta(days=round(365.25 * anos))
+    totais = dict.fromkeys(['movimentacoes', 'parcelas', 'entradas', 'saidas'], 0)
+
+    with transaction.atomic():
+        parceiros, categorias, medicamentos = _cadastros(fazenda_id, rng, volume)
+
+    for mes in _meses(inicio, hoje):
+        # Os objetos são montados fora da transação: o lock de escrita fica só com os INSERTs
+        movimentacoes, parcelas = _movimentacoes_do_mes(
+            fazenda_id, usuario_id, mes, hoje, rng, volume, parceiros, categorias
+        )
+        entradas, saidas = [], []
+        if medicamentos:
+            entradas, saidas = _estoque_do_mes(fazenda_id, usuario_id, mes, hoje, rng, volume, medicamentos)
+        _gravar_mes(fazenda_id, movimentacoes, parcelas, entradas, saidas)
+        totais['movimentacoes'] += len(movimentacoes)
+        totais['parcelas'] += len(parcelas)
+        totais['entradas'] += len(entradas)
+        totais['saidas'] += len(saidas)
+
+    # bulk_create não passa pelo save(): dados derivados reconstruídos de uma vez
+    with transaction.atomic():
+        ResumoMensalMovimentacao.reconstruir(Fazenda.objects.filter(pk=fazenda_id))
+        EstoqueMedicamento.reconstruir(Medicamento.objects.filter(fazenda_id=fazenda_id))
+        invalidar_ao_gravar(fazenda_id)
+    materializar_notificacoes(fazenda_id)
+    return totais
+
+
+def _gerar_fazenda_em_processo(argumentos):
+    fazenda_id = argumentos[0]
+    totais = gerar_fazenda(*argumentos)
+    connections.close_all()
+    return fazenda_id, totais
+
+
+def gerar(fazendas, usuario, anos, semente, volume=None, workers=1, ao_concluir=None):
+    """
+    Gera os dados das fazendas, em paralelo quando workers > 1 (um processo por
+    fazenda por vez; no SQLite as escritas continuam em série, mas a geração em
+    Python dos meses seguintes não espera).
+
+    Args:
+        fazendas: Fazendas já criadas, na ordem que define a semente de cada uma
+        ao_concluir: Chamado com (fazenda_id, totais) a cada fazenda concluída
+
+    Returns:
+        dict: Totais somados de todas as fazendas
+    """
+    tarefas = [
+        (fazenda.pk, indice, usuario.pk, anos, semente, volume)
+        for indice, fazenda in enumerate(fazendas)
+    ]
+    totais = dict.fromkeys(['movimentacoes', 'parcelas', 'entradas', 'saidas'], 0)
+
+    if workers > 1 and len(tarefas) > 1:
+        # Conexões abertas não podem ser herdadas pelos processos filhos
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(min(workers, len(tarefas))) as pool:
+            resultados = pool.imap_unordered(_gerar_fazenda_em_processo, tarefas)
+            for fazenda_id, parcial in resultados:
+                _somar(totais, parcial, fazenda_id, ao_concluir)
+    else:
+        for tarefa in tarefas:
+            _somar(totais, gerar_fazenda(*tarefa), tarefa[0], ao_concluir)
+    return totais
+
+
+def _somar(totais, parcial, fazenda_id, ao_concluir):
+    for chave, valor in parcial.items():
+        totais[chave] += valor
+    if ao_concluir:
+        ao_concluir(fazenda_id, parcial)
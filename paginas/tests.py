@@ -1,4 +1,499 @@
-﻿from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth.models import User
+from datetime import date, timedelta
+from perfis.models import Fazenda
+from medicamento.models import Medicamento, EntradaMedicamento
+from movimentacao.models import Categoria, Movimentacao
+from django.urls import reverse
+from paginas import desempenho
+from paginas.cache import obter_ou_calcular, versao_fazenda
+from paginas.desempenho import OrcamentoMixin
 
-# Testes do app paginas foram removidos.
-# Manter foco nos testes essenciais de perfis e movimentacao.
+
+class CacheVersionadoFazendaTest(TestCase):
+    """Testes do cache por fazenda invalidado pelos signals"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='produtor', password='senha123')
+        self.fazenda = Fazenda.objects.create(nome='Fazenda Cache', dono=self.user)
+        self.outra_fazenda = Fazenda.objects.create(nome='Outra Fazenda', dono=self.user)
+        self.categoria = Categoria.objects.create(nome='Venda', tipo='receita', fazenda=self.fazenda)
+
+    def _total_receitas(self):
+        return obter_ou_calcular(
+            self.fazenda, 'teste_total',
+            lambda: sum(m.valor_total for m in Movimentacao.objects.filter(fazenda=self.fazenda))
+        )
+
+    def test_valor_em_cache_ate_os_dados_mudarem(self):
+        """Testa que o valor é reutilizado e recalculado após uma nova movimentação"""
+        self.assertEqual(self._total_receitas(), 0)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._total_receitas(), 0)
+
+        Movimentacao.objects.create(
+            categoria=self.categoria, valor_total=100, parcelas=2,
+            data=date.today(), fazenda=self.fazenda, cadastrada_por=self.user
+        )
+        self.assertEqual(self._total_receitas(), 100)
+
+    def test_alteracao_invalida_apenas_a_propria_fazenda(self):
+        """Testa que dados de uma fazenda não invalidam o cache de outra"""
+        versao_outra = versao_fazenda(self.outra_fazenda)
+        versao_propria = versao_fazenda(self.fazenda)
+
+        medicamento = Medicamento.objects.create(nome='Ivermectina', fazenda=self.fazenda)
+        EntradaMedicamento.objects.create(
+            medicamento=medicamento, quantidade=10, valor_medicamento=50,
+            validade=date.today() + timedelta(days=10), cadastrada_por=self.user
+        )
+
+        self.assertNotEqual(versao_fazenda(self.fazenda), versao_propria)
+        self.assertEqual(versao_fazenda(self.outra_fazenda), versao_outra)
+
+    def test_fazenda_do_signal_vem_da_copia_desnormalizada(self):
+        """Testa que descobrir a fazenda de parcela e entrada não consulta a FK"""
+        from movimentacao.models import Parcela
+        from paginas.signals import _fazenda_id
+
+        Movimentacao.objects.create(
+            categoria=self.categoria, valor_total=100, parcelas=1,
+            data=date.today(), fazenda=self.fazenda, cadastrada_por=self.user
+        )
+        medicamento = Medicamento.objects.create(nome='Ivermectina', fazenda=self.fazenda)
+        EntradaMedicamento.objects.create(
+            medicamento=medicamento, quantidade=10, valor_medicamento=50,
+            validade=date.today() + timedelta(days=10), cadastrada_por=self.user
+        )
+        parcela = Parcela.objects.get()
+        entrada = EntradaMedicamento.objects.get()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(_fazenda_id(parcela), self.fazenda.pk)
+            self.assertEqual(_fazenda_id(entrada), self.fazenda.pk)
+
+    def test_contador_de_notificacoes_invalida_com_parcela_paga(self):
+        """Testa que o badge reflete o pagamento de uma parcela imediatamente"""
+        from django.test import RequestFactory
+        from paginas.context_processors import notificacoes_count
+
+        movimentacao = Movimentacao.objects.create(
+            categoria=self.categoria, valor_total=100, parcelas=1,
+            data=date.today(), fazenda=self.fazenda, cadastrada_por=self.user
+        )
+        def nova_requisicao():
+            request = RequestFactory().get('/')
+            request.user = self.user
+            request.fazenda_ativa = self.fazenda
+            return request
+
+        self.assertEqual(notificacoes_count(nova_requisicao())['notificacoes_count'], 1)
+
+        parcela = movimentacao.parcela_set.get()
+        parcela.status_pagamento = 'Pago'
+        # As notificações materializadas são atualizadas após o commit
+        with self.captureOnCommitCallbacks(execute=True):
+            parcela.save()
+        self.assertEqual(notificacoes_count(nova_requisicao())['notificacoes_count'], 0)
+
+
+class PaginacaoCursorTest(TestCase):
+    """Testes da paginação por cursor das listagens"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='produtor', password='senha123')
+        self.fazenda = Fazenda.objects.create(nome='Fazenda Paginação', dono=self.user)
+        self.user.perfil.fazendas.add(self.fazenda)
+        categoria = Categoria.objects.create(nome='Venda', tipo='receita', fazenda=self.fazenda)
+        # 45 receitas, três por dia (empates na data são desempatados pelo id)
+        for indice in range(45):
+            Movimentacao.objects.create(
+                categoria=categoria, valor_total=10, parcelas=1,
+                data=date.today() - timedelta(days=indice // 3),
+                fazenda=self.fazenda, cadastrada_por=self.user
+            )
+        self.esperado = list(
+            Movimentacao.objects.order_by('-data', 'id').values_list('id', flat=True)
+        )
+
+        self.client.login(username='produtor', password='senha123')
+        session = self.client.session
+        session['fazenda_ativa_id'] = self.fazenda.id
+        session.save()
+
+    def _pagina(self, **parametros):
+        from django.urls import reverse
+        response = self.client.get(reverse('listar_movimentacao_receita'), parametros)
+        return response.context['page_obj']
+
+    def _ids(self, pagina):
+        return [movimentacao.id for movimentacao in pagina.object_list]
+
+    def test_navegacao_para_frente_e_para_tras(self):
+        """Testa se as páginas por cursor reproduzem a ordem da listagem sem repetir registros"""
+        primeira = self._pagina()
+        segunda = self._pagina(cursor=primeira.cursor_proximo, direcao='proximo', page=2)
+        terceira = self._pagina(cursor=segunda.cursor_proximo, direcao='proximo', page=3)
+
+        self.assertEqual(self._ids(primeira) + self._ids(segunda) + self._ids(terceira), self.esperado)
+        self.assertEqual((terceira.number, terceira.has_next()), (3, False))
+        self.assertEqual((terceira.start_index(), terceira.end_index()), (41, 45))
+        self.assertEqual(terceira.paginator.count, 45)
+
+        volta = self._pagina(cursor=terceira.cursor_anterior, direcao='anterior', page=2)
+        self.assertEqual(self._ids(volta), self._ids(segunda))
+        self.assertTrue(volta.has_previous() and volta.has_next())
+
+    def test_ultima_pagina_e_link_antigo(self):
+        """Testa a última página (mesmo recorte do OFFSET) e links ?page=N sem cursor"""
+        ultima = self._pagina(direcao='ultima')
+        self.assertEqual(ultima.number, 3)
+        self.assertEqual(self._ids(ultima), self.esperado[40:])
+
+        anterior = self._pagina(cursor=ultima.cursor_anterior, direcao='anterior', page=2)
+        self.assertEqual(self._ids(anterior), self.esperado[20:40])
+
+        self.assertEqual(self._ids(self._pagina(page=2)), self.esperado[20:40])
+
+    def test_total_em_cache_ate_os_dados_mudarem(self):
+        """Testa que o COUNT(*) não é repetido a cada página"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def contagens(queries):
+            return [q['sql'] for q in queries if 'COUNT(*) AS "__count"' in q['sql']]
+
+        with CaptureQueriesContext(connection) as queries:
+            primeira = self._pagina()
+        self.assertEqual(len(contagens(queries)), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self._pagina(cursor=primeira.cursor_proximo, direcao='proximo', page=2)
+        self.assertEqual(contagens(queries), [])
+
+
+class IndiceBuscaTest(TestCase):
+    """Testes do índice de busca textual das listagens"""
+
+    def setUp(self):
+        from perfis.models import Parceiros
+
+        self.user = User.objects.create_user(username='produtor', password='senha123')
+        self.fazenda = Fazenda.objects.create(nome='Fazenda Busca', dono=self.user)
+        self.outra_fazenda = Fazenda.objects.create(nome='Outra Fazenda', dono=self.user)
+        self.user.perfil.fazendas.add(self.fazenda)
+        self.categoria = Categoria.objects.create(nome='Venda de Leite', tipo='receita', fazenda=self.fazenda)
+        self.parceiro = Parceiros.objects.create(nome='Laticínio São José', fazenda=self.fazenda)
+
+        self.vacinacao = self._movimentacao('Vacinação do rebanho', parceiros=self.parceiro)
+        self.racao = self._movimentacao('Ração para bezerros')
+        outra_categoria = Categoria.objects.create(nome='Venda', tipo='receita', fazenda=self.outra_fazenda)
+        Movimentacao.objects.create(
+            categoria=outra_categoria, descricao='Vacinação', valor_total=10, parcelas=1,
+            data=date.today(), fazenda=self.outra_fazenda, cadastrada_por=self.user
+        )
+
+        self.client.login(username='produtor', password='senha123')
+        session = self.client.session
+        session['fazenda_ativa_id'] = self.fazenda.id
+        session.save()
+
+    def _movimentacao(self, descricao, **kwargs):
+        return Movimentacao.objects.create(
+            categoria=self.categoria, descricao=descricao, valor_total=100, parcelas=2,
+            data=date.today(), fazenda=self.fazenda, cadastrada_por=self.user, **kwargs
+        )
+
+    def _ids(self, termo):
+        from paginas.busca import TIPO_MOVIMENTACAO, filtrar_busca
+        queryset = filtrar_busca(Movimentacao.objects.all(), self.fazenda, TIPO_MOVIMENTACAO, termo)
+        return set(queryset.values_list('id', flat=True))
+
+    def test_busca_sem_acentos_por_prefixo_e_por_fazenda(self):
+        """Testa acentos, prefixos, vários termos e o isolamento entre fazendas"""
+        self.assertEqual(self._ids('vacinacao'), {self.vacinacao.id})
+        self.assertEqual(self._ids('RAÇÃO bez'), {self.racao.id})
+        self.assertEqual(self._ids('sao jose'), {self.vacinacao.id})
+        self.assertEqual(self._ids('leite'), {self.vacinacao.id, self.racao.id})
+        self.assertEqual(self._ids('vacinacao bezerros'), set())
+        self.assertEqual(self._ids('"'), set())
+
+    def test_indice_acompanha_alteracoes(self):
+        """Testa edição, renomeação da categoria e exclusão"""
+        self.racao.descricao = 'Sal mineral'
+        self.racao.save()
+        self.assertEqual(self._ids('racao'), set())
+        self.assertEqual(self._ids('mineral'), {self.racao.id})
+
+        self.categoria.nome = 'Produção'
+        self.categoria.save()
+        self.assertEqual(self._ids('producao'), {self.vacinacao.id, self.racao.id})
+
+        self.vacinacao.delete()
+        self.assertEqual(self._ids('producao'), {self.racao.id})
+
+    def test_listagens_pesquisam_pelo_indice(self):
+        """Testa a pesquisa nas listagens de receitas, parcelas e estoque"""
+        from django.urls import reverse
+
+        response = self.client.get(reverse('listar_movimentacao_receita'), {'search': 'vacinação'})
+        self.assertEqual([m.id for m in response.context['page_obj']], [self.vacinacao.id])
+
+        response = self.client.get(reverse('listar_parcelas_receita'), {'search': 'racao'})
+        self.assertEqual({p.movimentacao_id for p in response.context['page_obj']}, {self.racao.id})
+        self.assertEqual(len(response.context['page_obj'].object_list), 2)
+
+        # Status comparado por igualdade (pelo início do nome), sem LIKE na tabela de parcelas
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from movimentacao.models import Parcela
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('listar_parcelas_receita'), {'search': 'pend'})
+        self.assertEqual(len(response.context['page_obj'].object_list), Parcela.objects.filter(
+            fazenda=self.fazenda, tipo='receita', status_pagamento='Pendente'
+        ).count())
+        self.assertFalse(any('status_pagamento" LIKE' in consulta['sql'] for consulta in consultas))
+
+        medicamento = Medicamento.objects.create(nome='Ivermectina', fazenda=self.fazenda)
+        entrada = EntradaMedicamento.objects.create(
+            medicamento=medicamento, quantidade=10, valor_medicamento=50, observacao='Lote Açude',
+            validade=date.today() + timedelta(days=90), cadastrada_por=self.user
+        )
+        response = self.client.get(reverse('medicamento_estoque'), {'search': 'acude'})
+        self.assertEqual([e.id for e in response.context['page_obj']], [entrada.id])
+
+
+class PerfilSQLiteTest(TransactionTestCase):
+    """Testes do backend SQLite de produção (farmedicare.sqlite)"""
+
+    def test_pragmas_aplicados_em_cada_conexao(self):
+        from django.conf import settings
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+
+    def test_banco_em_arquivo_usa_wal(self):
+        import os
+        import sqlite3
+        import tempfile
+        from django.conf import settings
+        from farmedicare.sqlite.base import aplicar_pragmas
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            conexao = sqlite3.connect(os.path.join(diretorio, 'teste.sqlite3'))
+            aplicar_pragmas(conexao, settings.SQLITE_PRAGMAS)
+            self.assertEqual(conexao.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            conexao.close()
+
+    def test_transacoes_comecam_com_begin_immediate(self):
+        from django.db import connection, transaction
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as consultas:
+            with transaction.atomic():
+                Fazenda.objects.exists()
+        self.assertEqual(consultas.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+class DesempenhoMiddlewareTest(OrcamentoMixin, TestCase):
+    """Testes da instrumentação por requisição e dos orçamentos das páginas principais"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='produtor', password='senha123')
+        self.fazenda = Fazenda.objects.create(nome='Fazenda Desempenho', dono=self.user)
+        self.user.perfil.fazendas.add(self.fazenda)
+        categoria = Categoria.objects.create(nome='Venda', tipo='receita', fazenda=self.fazenda)
+        for dias in range(15):
+            Movimentacao.objects.create(
+                categoria=categoria, valor_total=100, parcelas=2, data=date.today() - timedelta(days=dias),
+                fazenda=self.fazenda, cadastrada_por=self.user
+            )
+        medicamento = Medicamento.objects.create(nome='Ivermectina', fazenda=self.fazenda)
+        for dias in (10, 40, 400):
+            EntradaMedicamento.objects.create(
+                medicamento=medicamento, quantidade=5, valor_medicamento=10,
+                validade=date.today() + timedelta(days=dias), cadastrada_por=self.user
+            )
+        self.client.login(username='produtor', password='senha123')
+        session = self.client.session
+        session['fazenda_ativa_id'] = self.fazenda.id
+        session.save()
+        desempenho.limpar()
+
+    def test_paginas_principais_dentro_do_orcamento(self):
+        """O número de consultas não deve crescer com os dados (orçamentos de DESEMPENHO_ORCAMENTOS)"""
+        for nome in (
+            'pagina_index', 'listar_movimentacao_receita', 'listar_parcelas_receita', 'medicamento_estoque',
+            'listar_medicamentos', 'api_notificacoes', 'notificacoes_unificadas', 'dashboard_relatorios',
+        ):
+            with self.subTest(nome):
+                resposta = self.client.get(reverse(nome))
+                self.assertEqual(resposta.status_code, 200)
+                self.assertDentroDoOrcamento(resposta)
+
+    def test_requisicao_acima_do_orcamento_vai_para_o_log(self):
+        with self.settings(DESEMPENHO_ORCAMENTOS={'padrao': {'consultas': 0}}):
+            with self.assertLogs('paginas.desempenho', level='WARNING') as log:
+                self.client.get(reverse('api_notificacoes'))
+        self.assertIn('api_notificacoes', log.output[0])
+        self.assertIn('consultas', log.output[0])
+
+        with self.assertRaises(AssertionError):
+            self.assertDentroDoOrcamento(self.client.get(reverse('api_notificacoes')), consultas=0)
+
+    def test_agregados_por_url_no_comando(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        with self.settings(DESEMPENHO_INTERVALO_GRAVACAO=0):
+            for _ in range(3):
+                self.client.get(reverse('api_notificacoes'))
+            self.client.get(reverse('medicamento_estoque'))
+
+        agregados = desempenho.ler_agregados()
+        self.assertEqual(agregados['api_notificacoes']['requisicoes'], 3)
+        self.assertEqual(agregados['medicamento_estoque']['requisicoes'], 1)
+        self.assertGreater(agregados['medicamento_estoque']['consultas'], 0)
+
+        saida = StringIO()
+        call_command('relatorio_desempenho', stdout=saida)
+        self.assertIn('api_notificacoes', saida.getvalue())
+
+        call_command('relatorio_desempenho', '--limpar', stdout=StringIO())
+        self.assertEqual(desempenho.ler_agregados(), {})
+
+
+class DadosSinteticosTest(TestCase):
+    """Testes do gerador de dados sintéticos (paginas.sinteticos)"""
+
+    VOLUME = {'movimentacoes_mes': 6, 'entradas_mes': 3, 'medicamentos': 4, 'parceiros': 3}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='sintetico', password='senha123')
+
+    def _gerar(self, semente=7):
+        from paginas import sinteticos
+
+        fazendas = [Fazenda.objects.create(nome=f'Sintética {indice}', dono=self.user) for indice in range(2)]
+        with self.captureOnCommitCallbacks(execute=True):
+            totais = sinteticos.gerar(fazendas, self.user, 0.5, semente, volume=self.VOLUME)
+        return fazendas, totais
+
+    def test_gera_registros_consistentes(self):
+        from django.db.models import F, Sum
+        from medicamento.models import EstoqueMedicamento, SaidaMedicamento
+        from movimentacao.models import Parcela, ResumoMensalMovimentacao
+        from paginas.models import DocumentoBusca
+
+        fazendas, totais = self._gerar()
+        self.assertEqual(Movimentacao.objects.filter(fazenda__in=fazendas).count(), totais['movimentacoes'])
+        self.assertGreater(totais['movimentacoes'], 0)
+        self.assertEqual(Parcela.objects.filter(fazenda__in=fazendas).count(), totais['parcelas'])
+        self.assertEqual(SaidaMedicamento.objects.filter(medicamento__fazenda__in=fazendas).count(), totais['saidas'])
+
+        # Cópias desnormalizadas iguais às da origem
+        self.assertFalse(Movimentacao.objects.exclude(tipo=F('categoria__tipo')).exists())
+        self.assertFalse(Parcela.objects.exclude(fazenda=F('movimentacao__fazenda')).exists())
+        self.assertFalse(EntradaMedicamento.objects.exclude(fazenda=F('medicamento__fazenda')).exists())
+
+        # Disponível de cada lote = quantidade - saídas dele
+        for entrada in EntradaMedicamento.objects.annotate(saidas=Sum('saidamedicamento__quantidade')):
+            self.assertEqual(entrada.quantidade_disponivel, entrada.quantidade - (entrada.saidas or 0))
+
+        # Datas geradas gravadas, apesar do auto_now_add
+        self.assertTrue(EntradaMedicamento.objects.filter(data_cadastro__date__lt=date.today() - timedelta(days=60)).exists())
+        self.assertTrue(SaidaMedicamento.objects.filter(data_saida__date__lt=date.today() - timedelta(days=60)).exists())
+
+        # Dados derivados reconstruídos
+        self.assertEqual(
+            EstoqueMedicamento.objects.filter(medicamento__fazenda__in=fazendas).aggregate(total=Sum('quantidade'))['total'],
+            EntradaMedicamento.objects.filter(fazenda__in=fazendas).aggregate(total=Sum('quantidade_disponivel'))['total'],
+        )
+        self.assertTrue(ResumoMensalMovimentacao.objects.filter(fazenda=fazendas[0]).exists())
+        self.assertEqual(
+            DocumentoBusca.objects.filter(fazenda__in=fazendas).count(),
+            totais['movimentacoes'] + totais['entradas'],
+        )
+
+    def test_mesma_semente_gera_os_mesmos_dados(self):
+        def valores(fazendas):
+            return [
+                list(Movimentacao.objects.filter(fazenda=fazenda).order_by('pk').values_list(
+                    'categoria__nome', 'valor_total', 'parcelas', 'data'
+                ))
+                for fazenda in fazendas
+            ]
+
+        primeira = valores(self._gerar()[0])
+        self.assertEqual(valores(self._gerar()[0]), primeira)
+        self.assertNotEqual(valores(self._gerar(semente=8)[0]), primeira)
+
+    def test_comando(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        saida = StringIO()
+        call_command(
+            'gerar_dados_sinteticos', '--fazendas', '1', '--anos', '0.2', '--movimentacoes-mes', '3',
+            '--entradas-mes', '2', '--medicamentos', '2', '--usuario', 'carga', stdout=saida,
+        )
+        self.assertIn('registros', saida.getvalue())
+        fazenda = Fazenda.objects.get(dono__username='carga')
+        self.assertTrue(Movimentacao.objects.filter(fazenda=fazenda).exists())
+        self.assertFalse(User.objects.get(username='carga').has_usable_password())
+
+    def test_comando_com_senha(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        call_command(
+            'gerar_dados_sinteticos', '--fazendas', '1', '--anos', '0.1', '--movimentacoes-mes', '1',
+            '--entradas-mes', '1', '--medicamentos', '1', '--usuario', 'carga', '--senha', 'segredo-local',
+            stdout=StringIO(),
+        )
+        self.assertTrue(User.objects.get(username='carga').check_password('segredo-local'))
+
+
+class BenchmarkViewsTest(TestCase):
+    """Testes do benchmark de views (paginas.benchmark)"""
+
+    def test_mede_todos_os_endpoints(self):
+        from paginas import benchmark, sinteticos
+
+        user = User.objects.create_user(username='benchmark', password='senha123')
+        fazenda = Fazenda.objects.create(nome='Fazenda Benchmark', dono=user)
+        with self.captureOnCommitCallbacks(execute=True):
+            sinteticos.gerar([fazenda], user, 0.3, 42, volume={'movimentacoes_mes': 5, 'entradas_mes': 3})
+
+        resultados = benchmark.medir_endpoints(user, fazenda, repeticoes=1)
+        self.assertEqual(list(resultados), list(benchmark.ENDPOINTS))
+        for nome, medicao in resultados.items():
+            with self.subTest(nome):
+                self.assertGreater(medicao['consultas'], 0)
+                self.assertGreaterEqual(medicao['tempo_ms'], medicao['tempo_min_ms'])
+
+    def test_comparar_aponta_regressoes_alem_da_tolerancia(self):
+        from paginas.benchmark import comparar
+
+        base = {
+            'rapido': {'tempo_ms': 10.0, 'consultas': 5},
+            'lento': {'tempo_ms': 100.0, 'consultas': 5},
+        }
+        atual = {
+            'rapido': {'tempo_ms': 18.0, 'tempo_min_ms': 17.0, 'consultas': 5},
+            'lento': {'tempo_ms': 200.0, 'tempo_min_ms': 190.0, 'consultas': 7},
+            'novo': {'tempo_ms': 1.0, 'tempo_min_ms': 1.0, 'consultas': 1},
+        }
+        linhas, regressoes = comparar(base, atual, tolerancia_tempo=0.5, folga_ms=5)
+
+        self.assertEqual([situacao for *_, situacao in linhas], ['ok', 'REGRESSÃO', 'novo'])
+        self.assertEqual(regressoes, ['lento: tempo 200.0 ms > 155.0 ms', 'lento: consultas 7 > 5'])
+        self.assertEqual(comparar(base, atual, tolerancia_tempo=1, tolerancia_consultas=2)[1], [])
@@ -1,9 +1,15 @@
 from datetime import datetime, timedelta, date
-from django.views.generic import TemplateView
+from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.shortcuts import redirect
+from django.urls import reverse_lazy
+from django.views.generic import FormView, TemplateView
 from django.db.models import Sum, Count, Q
-from django.core.cache import cache
-from movimentacao.models import Movimentacao, Parcela
+from movimentacao.models import Movimentacao, Parcela, ResumoMensalMovimentacao
 from medicamento.models import EntradaMedicamento, Medicamento
+from paginas.cache import obter_ou_calcular
+from paginas.forms import ImportacaoPlanilhaForm
+from paginas.importacao import ErroImportacao
 import json
 
 
@@ -47,8 +53,8 @@ class PaginaView(TemplateView):
         
         # ========== OTIMIZAÇÃO: Uma única query para totais de receitas e despesas (FILTRANDO POR FAZENDA) ==========
         totais = Movimentacao.objects.filter(fazenda=fazenda_ativa).aggregate(
-            total_receitas=Sum('valor_total', filter=Q(categoria__tipo='receita')),
-            total_despesas=Sum('valor_total', filter=Q(categoria__tipo='despesa'))
+            total_receitas=Sum('valor_total', filter=Q(tipo='receita')),
+            total_despesas=Sum('valor_total', filter=Q(tipo='despesa'))
         )
         
         total_receitas = totais['total_receitas'] or 0
@@ -67,20 +73,20 @@ class PaginaView(TemplateView):
             data__gte=mes_anterior_inicio
         ).aggregate(
             receitas_mes_atual=Sum('valor_total', filter=Q(
-                categoria__tipo='receita',
+                tipo='receita',
                 data__gte=mes_atual_inicio
             )),
             receitas_mes_anterior=Sum('valor_total', filter=Q(
-                categoria__tipo='receita',
+                tipo='receita',
                 data__gte=mes_anterior_inicio,
                 data__lt=mes_atual_inicio
             )),
             despesas_mes_atual=Sum('valor_total', filter=Q(
-                categoria__tipo='despesa',
+                tipo='despesa',
                 data__gte=mes_atual_inicio
             )),
             despesas_mes_anterior=Sum('valor_total', filter=Q(
-                categoria__tipo='despesa',
+                tipo='despesa',
                 data__gte=mes_anterior_inicio,
                 data__lt=mes_atual_inicio
             ))
@@ -103,7 +109,7 @@ class PaginaView(TemplateView):
 
         # ========== OTIMIZAÇÃO: Aggregate para totais de medicamentos (uma query) - FILTRANDO POR FAZENDA ==========
         totais_medicamentos = EntradaMedicamento.objects.filter(
-            medicamento__fazenda=fazenda_ativa
+            fazenda=fazenda_ativa
         ).aggregate(
             total_quantidade=Sum('quantidade'),
             total_valor=Sum('valor_medicamento')
@@ -117,7 +123,7 @@ class PaginaView(TemplateView):
         data_limite_7 = hoje + timedelta(days=7)
         
         contagens_medicamentos = EntradaMedicamento.objects.filter(
-            medicamento__fazenda=fazenda_ativa
+            fazenda=fazenda_ativa
         ).aggregate(
             total_medicamentos=Count('id', filter=Q(quantidade_disponivel__gt=0)),
             proximos_vencer_30=Count('id', filter=Q(
@@ -133,14 +139,14 @@ class PaginaView(TemplateView):
 
         # ========== OTIMIZAÇÃO: Parcelas pendentes - FILTRANDO POR FAZENDA ==========
         parcelas_pendentes = Parcela.objects.filter(
-            movimentacao__fazenda=fazenda_ativa,
+            fazenda=fazenda_ativa,
             status_pagamento="Pendente"
         ).only('id').count()
         
         # Parcelas vencidas ou que vencem em até 7 dias (URGENTES)
         data_limite_parcelas_urgentes = hoje + timedelta(days=7)
         parcelas_urgentes = Parcela.objects.filter(
-            movimentacao__fazenda=fazenda_ativa,
+            fazenda=fazenda_ativa,
             status_pagamento="Pendente",
             data_vencimento__lte=data_limite_parcelas_urgentes
         ).only('id').count()
@@ -154,7 +160,7 @@ class PaginaView(TemplateView):
         # ========== OTIMIZAÇÃO: Últimas receitas e despesas - FILTRANDO POR FAZENDA ==========
         ultimas_receitas = list(Movimentacao.objects.filter(
             fazenda=fazenda_ativa,
-            categoria__tipo="receita"
+            tipo="receita"
         ).select_related(
             'categoria', 'fazenda', 'parceiros'
         ).only(
@@ -164,7 +170,7 @@ class PaginaView(TemplateView):
 
         ultimas_despesas = list(Movimentacao.objects.filter(
             fazenda=fazenda_ativa,
-            categoria__tipo="despesa"
+            tipo="despesa"
         ).select_related(
             'categoria', 'fazenda', 'parceiros'
         ).only(
@@ -174,7 +180,7 @@ class PaginaView(TemplateView):
 
         # ========== OTIMIZAÇÃO: Medicamentos próximos de vencer - FILTRANDO POR FAZENDA ==========
         medicamentos_vencimento = list(EntradaMedicamento.objects.filter(
-            medicamento__fazenda=fazenda_ativa,
+            fazenda=fazenda_ativa,
             validade__gte=hoje,
             quantidade_disponivel__gt=0
         ).select_related(
@@ -231,43 +237,39 @@ class PaginaView(TemplateView):
 
     def get_dados_grafico_linhas(self, fazenda):
         """
-        OTIMIZADO: Busca dados dos últimos 6 meses em uma única query + Cache
+        OTIMIZADO: Busca dados dos últimos 6 meses em uma única query + Cache versionado por fazenda
         """
-        # Cache específico por fazenda
-        cache_key = f'grafico_linhas_6meses_fazenda_{fazenda.id if fazenda else "none"}'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return cached_data
-        
         # Se não há fazenda, retornar vazio
         if not fazenda:
             return {'meses': [], 'receitas': [], 'despesas': []}
         
+        return obter_ou_calcular(
+            fazenda, 'grafico_linhas_6meses',
+            lambda: self._calcular_grafico_linhas(fazenda), date.today()
+        )
+
+    def _calcular_grafico_linhas(self, fazenda):
         # Calcular range dos últimos 6 meses
         hoje = date.today()
         inicio_periodo = (datetime.now() - timedelta(days=180)).replace(day=1).date()
         
-        # Uma única query para todos os meses - FILTRANDO POR FAZENDA
-        movimentacoes = list(Movimentacao.objects.filter(
+        # Totais mensais do resumo (ResumoMensalMovimentacao) - FILTRANDO POR FAZENDA
+        totais_mensais = ResumoMensalMovimentacao.objects.filter(
             fazenda=fazenda,
-            data__gte=inicio_periodo
-        ).values(
-            'data', 'categoria__tipo', 'valor_total'
-        ))
+            mes__gte=inicio_periodo
+        ).values('mes', 'tipo').annotate(soma=Sum('total'))
         
-        # Processar em Python (mais eficiente que 12 queries separadas)
         meses_dict = {}
         for i in range(5, -1, -1):
             mes = (datetime.now() - timedelta(days=30 * i)).strftime("%Y-%m")
             meses_dict[mes] = {'receitas': 0, 'despesas': 0}
         
-        # Agregar valores
-        for mov in movimentacoes:
-            mes = mov['data'].strftime("%Y-%m")
+        # Distribuir os totais nos meses do gráfico
+        for linha in totais_mensais:
+            mes = linha['mes'].strftime("%Y-%m")
             if mes in meses_dict:
-                tipo = mov['categoria__tipo']
-                valor = float(mov['valor_total'] or 0)
-                if tipo == 'receita':
+                valor = float(linha['soma'] or 0)
+                if linha['tipo'] == 'receita':
                     meses_dict[mes]['receitas'] += valor
                 else:
                     meses_dict[mes]['despesas'] += valor
@@ -282,53 +284,94 @@ class PaginaView(TemplateView):
             receitas_mensais.append(meses_dict[mes]['receitas'])
             despesas_mensais.append(meses_dict[mes]['despesas'])
 
-        result = {
+        return {
             "meses": meses,
             "receitas": receitas_mensais,
             "despesas": despesas_mensais,
         }
-        
-        # Guardar no cache por 60 segundos
-        cache.set(cache_key, result, 60)
-        return result
 
     def get_dados_grafico_pizza(self, fazenda):
         """
-        OTIMIZADO: Distribuição de despesas por categoria (uma query) + Cache
+        OTIMIZADO: Distribuição de despesas por categoria (uma query) + Cache versionado por fazenda
         """
-        # Cache específico por fazenda
-        cache_key = f'grafico_pizza_despesas_fazenda_{fazenda.id if fazenda else "none"}'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return cached_data
-        
         # Se não há fazenda, retornar vazio
         if not fazenda:
             return {"categorias": [], "valores": []}
         
-        # FILTRANDO POR FAZENDA
+        return obter_ou_calcular(
+            fazenda, 'grafico_pizza_despesas', lambda: self._calcular_grafico_pizza(fazenda)
+        )
+
+    def _calcular_grafico_pizza(self, fazenda):
+        # FILTRANDO POR FAZENDA - somando os totais do resumo mensal
         categorias = list(
-            Movimentacao.objects.filter(
+            ResumoMensalMovimentacao.objects.filter(
                 fazenda=fazenda,
-                categoria__tipo="despesa"
+                tipo="despesa"
             )
             .values("categoria__nome")
-            .annotate(total=Sum("valor_total"))
-            .order_by("-total")
+            .annotate(soma=Sum("total"))
+            .order_by("-soma")
         )
 
         # Se não houver dados, retornar valores vazios
         if not categorias:
             return {"categorias": [], "valores": []}
 
-        result = {
+        return {
             "categorias": [
                 cat["categoria__nome"] or "Sem Categoria" for cat in categorias
             ],
-            "valores": [float(cat["total"] or 0) for cat in categorias],
+            "valores": [float(cat["soma"] or 0) for cat in categorias],
         }
-        
-        # Guardar no cache por 60 segundos
-        cache.set(cache_key, result, 60)
-        return result
 
+
+class ImportacaoPlanilhaView(LoginRequiredMixin, FormView):
+    """
+    Tela de importação em lote de uma planilha para a fazenda ativa.
+    Subclasses definem importador_class, titulo, subtitulo e colunas.
+    """
+    form_class = ImportacaoPlanilhaForm
+    template_name = "formularios/formulario_importacao.html"
+    login_url = reverse_lazy("login")
+    importador_class = None
+    titulo = "Importar Planilha"
+    subtitulo = ""
+    colunas = []
+
+    def form_valid(self, form):
+        if not hasattr(self.request, 'fazenda_ativa'):
+            messages.error(self.request, '❌ Selecione uma fazenda antes de importar a planilha.')
+            return redirect('selecionar_fazenda')
+
+        arquivo = form.cleaned_data['arquivo']
+        simular = form.cleaned_data['simular']
+        importador = self.importador_class(self.request.fazenda_ativa, self.request.user)
+
+        try:
+            resultado = importador.importar(arquivo, arquivo.name, simular=simular)
+        except ErroImportacao as erro:
+            form.add_error('arquivo', str(erro))
+            return self.form_invalid(form)
+
+        if simular:
+            messages.info(
+                self.request,
+                f'Validação concluída: {resultado.importadas} de {resultado.linhas} linha(s) válida(s).'
+            )
+        elif resultado.importadas:
+            messages.success(self.request, f'✅ {resultado.importadas} registro(s) importado(s) com sucesso!')
+        if resultado.total_erros:
+            messages.error(self.request, f'{resultado.total_erros} linha(s) com erro não foram importadas.')
+
+        return self.render_to_response(self.get_context_data(form=form, resultado=resultado))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({
+            "title": self.titulo,
+            "titulo": self.titulo,
+            "subtitulo": self.subtitulo,
+            "colunas": self.colunas,
+        })
+        return context
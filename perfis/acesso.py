@@ -0,0 +1,170 @@
+"""
+Controle de acesso às fazendas em cache (por usuário)
+
+Cada usuário tem uma entrada no cache com:
+    - permitidas: ids de todas as fazendas que ele pode acessar (dono ou funcionário)
+    - ativas: ids das fazendas ativas, na ordem de Fazenda.Meta.ordering
+    - fazendas: as linhas de Fazenda, por id
+
+O FazendaMiddleware resolve a fazenda ativa só com essa entrada (nenhuma query
+no caminho normal). A entrada é apagada pelos signals abaixo sempre que o vínculo
+usuário x fazenda muda (M2M PerfilUsuario.fazendas, dono da fazenda, dados da fazenda).
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Fazenda, PerfilUsuario
+
+TIMEOUT_ACESSO = 3600
+
+
+def _chave_acesso(user_id):
+    return f'acesso_usuario_{user_id}'
+
+
+def _calcular_acesso(user):
+    """Busca as fazendas do usuário (próprias ou com acesso) em uma única query"""
+    fazendas = Fazenda.objects.filter(Q(usuarios__user=user) | Q(dono=user)).distinct()
+    por_id = {fazenda.id: fazenda for fazenda in fazendas}
+    return {
+        'permitidas': frozenset(por_id),
+        'ativas': [fazenda.id for fazenda in por_id.values() if fazenda.ativa],
+        'fazendas': por_id,
+    }
+
+
+def acesso_usuario(user, request=None):
+    """
+    Retorna a entrada de acesso do usuário (cache + memorizada na requisição).
+
+    Args:
+        user: Usuário autenticado
+        request: Se informado, a entrada é guardada em request._acesso_fazendas
+                 (middleware e context processors compartilham o mesmo resultado)
+
+    Returns:
+        dict: permitidas (frozenset de ids), ativas (lista de ids) e fazendas ({id: Fazenda})
+    """
+    if request is not None:
+        memo = getattr(request, '_acesso_fazendas', None)
+        if memo is not None:
+            return memo
+
+    chave = _chave_acesso(user.pk)
+    acesso = cache.get(chave)
+    if acesso is None:
+        # Usuários antigos podem não ter perfil (criado pelo signal apenas em novos usuários)
+        if not hasattr(user, 'perfil'):
+            PerfilUsuario.objects.create(user=user)
+        acesso = _calcular_acesso(user)
+        cache.set(chave, acesso, TIMEOUT_ACESSO)
+
+    if request is not None:
+        request._acesso_fazendas = acesso
+    return acesso
+
+
+class FazendasUsuario:
+    """
+    Lista (preguiçosa) das fazendas ativas do usuário, para o seletor de fazendas.
+
+    Nada é buscado até o template iterar/contar a lista; a entrada de acesso é a
+    mesma que o FazendaMiddleware já carregou na requisição.
+    """
+
+    def __init__(self, request):
+        self._request = request
+        self._fazendas = None
+
+    def _carregar(self):
+        if self._fazendas is None:
+            acesso = acesso_usuario(self._request.user, self._request)
+            self._fazendas = [acesso['fazendas'][fazenda_id] for fazenda_id in acesso['ativas']]
+        return self._fazendas
+
+    def __iter__(self):
+        return iter(self._carregar())
+
+    def __len__(self):
+        return len(self._carregar())
+
+    def __bool__(self):
+        return bool(self._carregar())
+
+    def __getitem__(self, indice):
+        return self._carregar()[indice]
+
+    def count(self):
+        """Compatível com {{ fazendas_usuario.count }} (mesma API do QuerySet)"""
+        return len(self)
+
+    def exists(self):
+        return bool(self)
+
+
+def invalidar_acesso(*user_ids):
+    """Apaga a entrada de acesso dos usuários (agora e novamente após o commit)"""
+    chaves = [_chave_acesso(user_id) for user_id in set(user_ids) if user_id]
+    if not chaves:
+        return
+    cache.delete_many(chaves)
+    transaction.on_commit(lambda: cache.delete_many(chaves))
+
+
+def _usuarios_da_fazenda(fazenda):
+    """Dono + funcionários vinculados à fazenda"""
+    user_ids = list(
+        PerfilUsuario.objects.filter(fazendas=fazenda).values_list('user_id', flat=True)
+    )
+    user_ids.append(fazenda.dono_id)
+    return user_ids
+
+
+############ SIGNALS DE INVALIDAÇÃO ############
+
+@receiver(m2m_changed, sender=PerfilUsuario.fazendas.through)
+def acesso_vinculo_alterado(sender, instance, action, reverse, pk_set, **kwargs):
+    """Vínculo funcionário x fazenda alterado (perfil.fazendas ou fazenda.usuarios)"""
+    if not reverse:
+        # instance é o PerfilUsuario
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidar_acesso(instance.user_id)
+        return
+
+    # instance é a Fazenda e pk_set contém ids de PerfilUsuario
+    if action in ('post_add', 'post_remove'):
+        invalidar_acesso(*PerfilUsuario.objects.filter(
+            pk__in=pk_set
+        ).values_list('user_id', flat=True))
+    elif action == 'pre_clear':
+        # Depois do clear não dá mais para saber quem tinha acesso
+        invalidar_acesso(*_usuarios_da_fazenda(instance))
+
+
+@receiver(pre_save, sender=Fazenda)
+def acesso_guardar_dono_anterior(sender, instance, **kwargs):
+    """Guarda o dono anterior para também invalidar o acesso dele se mudar"""
+    if instance.pk:
+        instance._dono_anterior_id = Fazenda.objects.filter(
+            pk=instance.pk
+        ).values_list('dono_id', flat=True).first()
+
+
+@receiver(post_save, sender=Fazenda)
+def acesso_fazenda_salva(sender, instance, **kwargs):
+    """Nome, status (ativa) ou dono mudaram: a linha em cache ficou desatualizada"""
+    invalidar_acesso(getattr(instance, '_dono_anterior_id', None), *_usuarios_da_fazenda(instance))
+
+
+@receiver(pre_delete, sender=Fazenda)
+def acesso_fazenda_excluida(sender, instance, **kwargs):
+    """Os vínculos M2M são apagados junto com a fazenda: coletar os usuários antes"""
+    invalidar_acesso(*_usuarios_da_fazenda(instance))
+
+
+@receiver(post_delete, sender=PerfilUsuario)
+def acesso_perfil_excluido(sender, instance, **kwargs):
+    invalidar_acesso(instance.user_id)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PerfisConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'perfis'
+
+    def ready(self):
+        # Registra os signals de invalidação do cache de acesso às fazendas
+        from . import acesso  # noqa: F401
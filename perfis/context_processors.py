@@ -1,10 +1,15 @@
 """
 Context processors para disponibilizar informações globais nos templates
 """
+from .acesso import FazendasUsuario
+
 
 def fazenda_ativa(request):
     """
-    Adiciona a fazenda ativa e lista de fazendas do usuário no contexto
+    Adiciona a fazenda ativa e lista de fazendas do usuário no contexto.
+
+    A lista de fazendas é preguiçosa: só é montada se o template usar o
+    seletor de fazendas, e reaproveita a entrada de acesso do FazendaMiddleware.
     """
     context = {
         'fazenda_ativa': None,
@@ -13,12 +18,6 @@ def fazenda_ativa(request):
     
     if request.user.is_authenticated and hasattr(request, 'fazenda_ativa'):
         context['fazenda_ativa'] = request.fazenda_ativa
-        
-        # Busca todas as fazendas do usuário
-        if hasattr(request.user, 'perfil'):
-            perfil = request.user.perfil
-            from .models import Fazenda
-            fazendas = perfil.fazendas.filter(ativa=True) | Fazenda.objects.filter(dono=request.user, ativa=True)
-            context['fazendas_usuario'] = fazendas.distinct()
+        context['fazendas_usuario'] = FazendasUsuario(request)
     
     return context
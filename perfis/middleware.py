@@ -3,7 +3,7 @@ Middleware para gerenciar a fazenda ativa do usuário na sessão
 """
 from django.shortcuts import redirect
 from django.urls import reverse
-from .models import Fazenda, PerfilUsuario
+from .acesso import acesso_usuario
 
 
 class FazendaMiddleware:
@@ -31,41 +31,32 @@ class FazendaMiddleware:
             response = self.get_response(request)
             return response
         
-        # Verifica se o usuário tem perfil
-        if not hasattr(request.user, 'perfil'):
-            PerfilUsuario.objects.create(user=request.user)
-        
-        perfil = request.user.perfil
+        # Fazendas do usuário vêm do cache de acesso (perfis.acesso):
+        # nenhuma query enquanto os vínculos do usuário não mudarem
+        acesso = acesso_usuario(request.user, request)
         
         # Obtém a fazenda ativa da sessão
         fazenda_id = request.session.get('fazenda_ativa_id')
+        fazenda_ativa = None
         
         if fazenda_id:
-            try:
-                fazenda_ativa = Fazenda.objects.get(id=fazenda_id)
-                # Verifica se o usuário ainda tem acesso a essa fazenda
-                if not (fazenda_ativa in perfil.fazendas.all() or fazenda_ativa.dono == request.user):
-                    # Remove fazenda inválida da sessão
-                    del request.session['fazenda_ativa_id']
-                    fazenda_ativa = None
-                else:
-                    request.fazenda_ativa = fazenda_ativa
-            except Fazenda.DoesNotExist:
+            # Verifica se o usuário ainda tem acesso a essa fazenda
+            if fazenda_id in acesso['permitidas']:
+                fazenda_ativa = acesso['fazendas'][fazenda_id]
+                request.fazenda_ativa = fazenda_ativa
+            else:
+                # Remove fazenda inválida (ou excluída) da sessão
                 del request.session['fazenda_ativa_id']
-                fazenda_ativa = None
-        else:
-            fazenda_ativa = None
         
         # Se não tem fazenda ativa, tenta definir uma
         if not fazenda_ativa:
-            # Busca fazendas do usuário (próprias ou com acesso)
-            fazendas_usuario = perfil.fazendas.filter(ativa=True) | Fazenda.objects.filter(dono=request.user, ativa=True)
-            fazendas_usuario = fazendas_usuario.distinct()
+            # Fazendas ativas do usuário (próprias ou com acesso)
+            fazendas_ativas = acesso['ativas']
             
-            if fazendas_usuario.exists():
+            if fazendas_ativas:
                 # Se tem apenas uma fazenda, seleciona automaticamente
-                if fazendas_usuario.count() == 1:
-                    fazenda_ativa = fazendas_usuario.first()
+                if len(fazendas_ativas) == 1:
+                    fazenda_ativa = acesso['fazendas'][fazendas_ativas[0]]
                     request.session['fazenda_ativa_id'] = fazenda_ativa.id
                     request.fazenda_ativa = fazenda_ativa
                 else:
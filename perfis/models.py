@@ -79,8 +79,9 @@ class PerfilUsuario(models.Model):
         return self.tipo == 'funcionario'
     
     def pode_acessar_fazenda(self, fazenda):
-        """Verifica se o usuário tem acesso a uma fazenda específica"""
-        return fazenda in self.fazendas.all() or fazenda.dono == self.user
+        """Verifica se o usuário tem acesso a uma fazenda específica (via cache de acesso)"""
+        from .acesso import acesso_usuario
+        return fazenda.pk in acesso_usuario(self.user)['permitidas']
 
     class Meta:
         verbose_name = 'Perfil de Usuário'
@@ -1,8 +1,12 @@
 import pytest
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import TestCase, Client, RequestFactory
 from django.urls import reverse
 from django.contrib.auth.models import User
 from perfis.models import Parceiros, Fazenda, PerfilUsuario
+from perfis.middleware import FazendaMiddleware
+from perfis.context_processors import fazenda_ativa
 
 
 class TestParceirosModel(TestCase):
@@ -145,6 +149,100 @@ class TestPerfilUsuarioModel(TestCase):
         self.assertTrue(self.perfil.pode_acessar_fazenda(outra_fazenda))
 
 
+class TestAcessoFazendaMiddleware(TestCase):
+    """Testes do cache de acesso às fazendas usado pelo FazendaMiddleware"""
+    
+    def setUp(self):
+        # O banco de testes reutiliza os ids de usuário: entradas de outro teste não valem aqui
+        cache.clear()
+        self.dono = User.objects.create_user(username='dono', password='test123')
+        self.funcionario = User.objects.create_user(username='func', password='test123')
+        self.fazenda = Fazenda.objects.create(nome='Fazenda A', dono=self.dono)
+        self.outra = Fazenda.objects.create(nome='Fazenda B', dono=self.dono)
+        self.funcionario.perfil.fazendas.add(self.fazenda)
+        self.factory = RequestFactory()
+        self.middleware = FazendaMiddleware(lambda request: HttpResponse('ok'))
+    
+    def _request(self, user, sessao):
+        request = self.factory.get('/')
+        request.user = user
+        request.session = sessao
+        return request
+    
+    def test_middleware_sem_queries_com_cache(self):
+        """Com a entrada em cache, resolver a fazenda ativa não faz nenhuma query"""
+        sessao = {'fazenda_ativa_id': self.fazenda.id}
+        self.middleware(self._request(self.funcionario, sessao))
+        
+        request = self._request(self.funcionario, sessao)
+        with self.assertNumQueries(0):
+            response = self.middleware(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(request.fazenda_ativa, self.fazenda)
+    
+    def test_selecao_automatica_fazenda_unica(self):
+        """Funcionário com uma única fazenda tem ela selecionada automaticamente"""
+        sessao = {}
+        request = self._request(self.funcionario, sessao)
+        self.middleware(request)
+        self.assertEqual(request.fazenda_ativa, self.fazenda)
+        self.assertEqual(sessao['fazenda_ativa_id'], self.fazenda.id)
+    
+    def test_remover_vinculo_invalida_acesso(self):
+        """Remover o funcionário da fazenda derruba a fazenda da sessão"""
+        sessao = {'fazenda_ativa_id': self.fazenda.id}
+        self.middleware(self._request(self.funcionario, sessao))
+        
+        self.funcionario.perfil.fazendas.remove(self.fazenda)
+        request = self._request(self.funcionario, sessao)
+        response = self.middleware(request)
+        self.assertFalse(hasattr(request, 'fazenda_ativa'))
+        self.assertNotIn('fazenda_ativa_id', sessao)
+        self.assertEqual(response.status_code, 302)
+    
+    def test_vinculo_pelo_lado_da_fazenda_invalida_acesso(self):
+        """fazenda.usuarios.add() (lado reverso do M2M) também invalida o cache"""
+        self.assertFalse(self.funcionario.perfil.pode_acessar_fazenda(self.outra))
+        self.outra.usuarios.add(self.funcionario.perfil)
+        self.assertTrue(self.funcionario.perfil.pode_acessar_fazenda(self.outra))
+        self.outra.usuarios.clear()
+        self.assertFalse(self.funcionario.perfil.pode_acessar_fazenda(self.outra))
+    
+    def test_troca_de_dono_invalida_acesso(self):
+        """Trocar o dono invalida o acesso do dono antigo e do novo"""
+        novo_dono = User.objects.create_user(username='novo', password='test123')
+        self.assertTrue(self.dono.perfil.pode_acessar_fazenda(self.outra))
+        self.assertFalse(novo_dono.perfil.pode_acessar_fazenda(self.outra))
+        
+        self.outra.dono = novo_dono
+        self.outra.save()
+        self.assertFalse(self.dono.perfil.pode_acessar_fazenda(self.outra))
+        self.assertTrue(novo_dono.perfil.pode_acessar_fazenda(self.outra))
+    
+    def test_alterar_fazenda_atualiza_linha_em_cache(self):
+        """Renomear a fazenda não deixa a linha antiga no cache"""
+        sessao = {'fazenda_ativa_id': self.fazenda.id}
+        self.middleware(self._request(self.funcionario, sessao))
+        
+        self.fazenda.nome = 'Fazenda Renomeada'
+        self.fazenda.save()
+        request = self._request(self.funcionario, sessao)
+        self.middleware(request)
+        self.assertEqual(request.fazenda_ativa.nome, 'Fazenda Renomeada')
+
+    
+    def test_context_processor_preguicoso(self):
+        """A lista de fazendas do seletor só é montada quando usada e reaproveita o middleware"""
+        sessao = {'fazenda_ativa_id': self.fazenda.id}
+        request = self._request(self.dono, sessao)
+        self.middleware(request)
+        
+        with self.assertNumQueries(0):
+            context = fazenda_ativa(request)
+            self.assertEqual(context['fazenda_ativa'], self.fazenda)
+            self.assertEqual(list(context['fazendas_usuario']), [self.fazenda, self.outra])
+            self.assertEqual(context['fazendas_usuario'].count(), 2)
+
 class TestParceirosCreateView(TestCase):
     """Testes da view de criação de parceiros"""
     
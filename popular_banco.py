@@ -369,8 +369,8 @@ def criar_movimentacoes(fazendas, parceiros, categorias, admin):
                         continue  # Tentar novamente
     
     print(f"✅ Criadas {total_movimentacoes} movimentações financeiras")
-    print(f"   - Receitas: {Movimentacao.objects.filter(categoria__tipo='receita').count()}")
-    print(f"   - Despesas: {Movimentacao.objects.filter(categoria__tipo='despesa').count()}")
+    print(f"   - Receitas: {Movimentacao.objects.filter(tipo='receita').count()}")
+    print(f"   - Despesas: {Movimentacao.objects.filter(tipo='despesa').count()}")
     print(f"   - Total de parcelas: {Parcela.objects.count()}")
     print(f"   - Parcelas pagas: {Parcela.objects.filter(status_pagamento='Pago').count()}")
 
@@ -1,3 +1,18 @@
 from django.contrib import admin
+from .models import Notificacao, RelatorioJob
 
-# Register your models here.
+
+@admin.register(RelatorioJob)
+class RelatorioJobAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'fazenda', 'solicitado_por', 'status', 'progresso', 'data_criacao', 'data_conclusao']
+    list_select_related = ['fazenda', 'solicitado_por']
+    list_filter = ['status', 'fazenda']
+    readonly_fields = ['id', 'data_criacao', 'data_conclusao']
+
+
+@admin.register(Notificacao)
+class NotificacaoAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'fazenda', 'tipo', 'categoria', 'urgencia', 'data']
+    list_select_related = ['fazenda']
+    list_filter = ['tipo', 'categoria', 'fazenda']
+    readonly_fields = ['parcela', 'entrada']
@@ -0,0 +1,148 @@
+"""
+Jobs de geração do PDF do relatório em segundo plano
+
+A requisição só cria o RelatorioJob e devolve o id; o PDF é gerado fora do ciclo
+da requisição (pool local de threads) e gravado em RELATORIOS_PDF_DIR. O dashboard
+consulta o progresso pelo endpoint de status e baixa o arquivo quando concluído.
+
+RELATORIOS_PDF_EXECUCAO:
+    - 'thread': pool de threads do processo (RELATORIOS_PDF_WORKERS threads)
+    - 'sincrona': gera na própria requisição (testes e depuração)
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import RelatorioJob
+from .pdf import gerar_relatorio_pdf
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _obter_executor():
+    """Cria o pool de threads na primeira utilização (um por processo/worker)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RELATORIOS_PDF_WORKERS,
+                thread_name_prefix='relatorio-pdf'
+            )
+    return _executor
+
+
+def _caminho_parcial(job_id):
+    """Arquivo temporário em que o PDF é escrito antes do rename final"""
+    return os.path.join(settings.RELATORIOS_PDF_DIR, f'{job_id}.pdf.parcial')
+
+
+def _atualizar(job_id, **campos):
+    """Grava o estado do job com um UPDATE direto (sem recarregar a linha)"""
+    RelatorioJob.objects.filter(pk=job_id).update(**campos)
+
+
+def executar_job(job_id):
+    """Gera o PDF do job, registrando o progresso de cada seção"""
+    try:
+        job = RelatorioJob.objects.select_related('fazenda').get(pk=job_id)
+    except RelatorioJob.DoesNotExist:
+        return
+
+    _atualizar(job_id, status='processando', progresso=0, etapa='Iniciando')
+
+    os.makedirs(settings.RELATORIOS_PDF_DIR, exist_ok=True)
+    nome_arquivo = f'{job.pk}.pdf'
+    caminho = os.path.join(settings.RELATORIOS_PDF_DIR, nome_arquivo)
+    # Escreve em arquivo temporário e renomeia no fim: o download nunca vê um PDF pela metade
+    caminho_temp = _caminho_parcial(job.pk)
+
+    def progresso(percentual, etapa):
+        _atualizar(job_id, progresso=percentual, etapa=etapa)
+
+    try:
+        gerar_relatorio_pdf(caminho_temp, job.fazenda, job.data_inicio, job.data_fim, progresso=progresso)
+        os.replace(caminho_temp, caminho)
+    except Exception as exc:
+        logger.exception('Erro ao gerar o relatório %s', job_id)
+        if os.path.exists(caminho_temp):
+            os.remove(caminho_temp)
+        _atualizar(job_id, status='erro', etapa='Erro', erro=str(exc), data_conclusao=timezone.now())
+        return
+
+    _atualizar(
+        job_id,
+        status='concluido',
+        progresso=100,
+        etapa='Concluído',
+        arquivo=nome_arquivo,
+        data_conclusao=timezone.now()
+    )
+
+
+def _executar_em_thread(job_id):
+    """Executa o job em uma thread do pool, com conexões de banco próprias"""
+    close_old_connections()
+    try:
+        executar_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def enfileirar_relatorio(fazenda, usuario, data_inicio, data_fim):
+    """
+    Cria o job do relatório e agenda a geração do PDF.
+
+    Returns:
+        RelatorioJob criado (status 'pendente', ou o estado final no modo síncrono)
+    """
+    limpar_jobs_expirados()
+
+    job = RelatorioJob.objects.create(
+        fazenda=fazenda,
+        solicitado_por=usuario if usuario and usuario.is_authenticated else None,
+        data_inicio=data_inicio,
+        data_fim=data_fim,
+    )
+
+    if settings.RELATORIOS_PDF_EXECUCAO == 'sincrona':
+        executar_job(job.pk)
+        job.refresh_from_db()
+    else:
+        # Só dispara depois do commit: a thread precisa enxergar a linha do job
+        transaction.on_commit(lambda: _obter_executor().submit(_executar_em_thread, job.pk))
+
+    return job
+
+
+def limpar_jobs_expirados():
+    """
+    Apaga os jobs finalizados (e seus PDFs) mais antigos que RELATORIOS_PDF_RETENCAO_HORAS.
+
+    Jobs pendentes ou em processamento além da retenção foram interrompidos (o pool
+    de threads não sobrevive ao reinício do worker): viram 'erro', têm o arquivo
+    parcial removido e são apagados na mesma limpeza.
+    """
+    agora = timezone.now()
+    limite = agora - timedelta(hours=settings.RELATORIOS_PDF_RETENCAO_HORAS)
+
+    em_andamento = RelatorioJob.objects.filter(data_criacao__lt=limite, status__in=('pendente', 'processando'))
+    for job_id in list(em_andamento.values_list('pk', flat=True)):
+        caminho_temp = _caminho_parcial(job_id)
+        if os.path.exists(caminho_temp):
+            os.remove(caminho_temp)
+    em_andamento.update(status='erro', etapa='Erro', erro='Geração interrompida.', data_conclusao=agora)
+
+    # Só jobs finalizados: o post_delete de cada job (relatorios.models) remove o
+    # arquivo do disco, e o de um job em andamento ainda está sendo escrito
+    RelatorioJob.objects.filter(
+        data_criacao__lt=limite, status__in=('concluido', 'erro')
+    ).delete()
@@ -0,0 +1,45 @@
+"""
+Materializa as notificações do dia de cada fazenda (tabela Notificacao).
+
+Feito para rodar uma vez por dia, logo após a meia-noite (cron/agendador), para que
+a virada do dia (parcelas que passam a vencidas, lotes que entram na janela de aviso)
+não fique para a primeira requisição. Sem a rotina, a primeira leitura do dia de cada
+fazenda materializa as notificações.
+
+Uso:
+    python manage.py materializar_notificacoes
+    python manage.py materializar_notificacoes --fazenda 3
+
+Exemplo de crontab:
+    5 0 * * * cd /caminho/do/projeto && python manage.py materializar_notificacoes
+"""
+from django.core.management.base import BaseCommand
+
+from perfis.models import Fazenda
+from relatorios.notificacoes import materializar_notificacoes
+
+
+class Command(BaseCommand):
+    help = "Materializa as notificações do dia (parcelas e medicamentos) de cada fazenda"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fazenda',
+            type=int,
+            help='ID da fazenda a materializar (padrão: todas)',
+        )
+
+    def handle(self, *args, **options):
+        fazendas = Fazenda.objects.all()
+        if options['fazenda']:
+            fazendas = fazendas.filter(pk=options['fazenda'])
+
+        total = 0
+        fazenda_ids = list(fazendas.values_list('pk', flat=True))
+        for fazenda_id in fazenda_ids:
+            # materializar_notificacoes() também invalida o cache da fazenda
+            total += materializar_notificacoes(fazenda_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} notificação(ões) materializada(s) em {len(fazenda_ids)} fazenda(s).'
+        ))
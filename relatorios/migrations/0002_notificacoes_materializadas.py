@@ -0,0 +1,57 @@
+# Generated by Django 4.2.23 on 2026-10-17 17:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movimentacao', '0004_movimentacao_tipo'),
+        ('perfis', '0001_initial'),
+        ('medicamento', '0004_entradamedicamento_fazenda'),
+        ('relatorios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeracaoNotificacoes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_referencia', models.DateField(verbose_name='Data de Referência')),
+                ('atualizado_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Atualizado Em')),
+                ('fazenda', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='geracao_notificacoes', to='perfis.fazenda', verbose_name='Fazenda')),
+            ],
+            options={
+                'verbose_name': 'Geração de Notificações',
+                'verbose_name_plural': 'Gerações de Notificações',
+            },
+        ),
+        migrations.CreateModel(
+            name='Notificacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('receita_vencida', 'Receita Vencida'), ('receita_vencer', 'Receita a Vencer'), ('despesa_vencida', 'Despesa Vencida'), ('despesa_vencer', 'Despesa a Vencer'), ('medicamento_vencido', 'Medicamento Vencido'), ('medicamento_vencer', 'Medicamento a Vencer')], max_length=30, verbose_name='Tipo')),
+                ('categoria', models.CharField(max_length=20, verbose_name='Categoria')),
+                ('urgencia', models.PositiveSmallIntegerField(verbose_name='Urgência')),
+                ('data', models.DateField(verbose_name='Vencimento/Validade')),
+                ('valor', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Valor')),
+                ('quantidade', models.PositiveIntegerField(blank=True, null=True, verbose_name='Quantidade')),
+                ('parcela_numero', models.PositiveIntegerField(blank=True, null=True, verbose_name='Número da Parcela')),
+                ('total_parcelas', models.PositiveIntegerField(blank=True, null=True, verbose_name='Total de Parcelas')),
+                ('nome', models.CharField(blank=True, max_length=255, verbose_name='Parceiro/Medicamento')),
+                ('categoria_nome', models.CharField(blank=True, max_length=100, verbose_name='Categoria da Movimentação')),
+                ('descricao', models.TextField(blank=True, verbose_name='Descrição')),
+                ('entrada', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notificacao', to='medicamento.entradamedicamento', verbose_name='Entrada de Medicamento')),
+                ('fazenda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes', to='perfis.fazenda', verbose_name='Fazenda')),
+                ('parcela', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notificacao', to='movimentacao.parcela', verbose_name='Parcela')),
+            ],
+            options={
+                'verbose_name': 'Notificação',
+                'verbose_name_plural': 'Notificações',
+                'ordering': ['-urgencia', 'data', 'id'],
+                'indexes': [models.Index(fields=['fazenda', '-urgencia', 'data'], name='relatorios__fazenda_fc131f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relatorios', '0002_notificacoes_materializadas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geracaonotificacoes',
+            name='versao',
+            field=models.PositiveIntegerField(default=0, verbose_name='Versão'),
+        ),
+        migrations.AddField(
+            model_name='notificacao',
+            name='versao',
+            field=models.PositiveIntegerField(default=0, help_text='Versão da fazenda em que a notificação foi gravada (modo since= da API)', verbose_name='Versão'),
+        ),
+    ]
@@ -1,3 +1,165 @@
+import os
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
 from django.db import models
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from medicamento.models import EntradaMedicamento
+from movimentacao.models import Parcela
+from perfis.models import Fazenda
+
+
+class RelatorioJob(models.Model):
+    """
+    Geração do PDF do relatório em segundo plano.
+    O arquivo é gravado em RELATORIOS_PDF_DIR e servido pelo endpoint de download.
+    """
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('processando', 'Processando'),
+        ('concluido', 'Concluído'),
+        ('erro', 'Erro'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    fazenda = models.ForeignKey(
+        Fazenda,
+        on_delete=models.CASCADE,
+        related_name='relatorio_jobs',
+        verbose_name='Fazenda'
+    )
+    solicitado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='relatorio_jobs',
+        verbose_name='Solicitado por'
+    )
+    data_inicio = models.DateField(verbose_name='Início do Período')
+    data_fim = models.DateField(verbose_name='Fim do Período')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente', verbose_name='Status')
+    progresso = models.PositiveSmallIntegerField(default=0, verbose_name='Progresso (%)')
+    etapa = models.CharField(max_length=100, blank=True, verbose_name='Etapa Atual')
+    arquivo = models.CharField(max_length=255, blank=True, verbose_name='Arquivo')
+    erro = models.TextField(blank=True, verbose_name='Erro')
+    data_criacao = models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')
+    data_conclusao = models.DateTimeField(null=True, blank=True, verbose_name='Data de Conclusão')
+
+    def __str__(self):
+        return f"Relatório {self.data_inicio:%d/%m/%Y} - {self.data_fim:%d/%m/%Y} ({self.get_status_display()})"
+
+    @property
+    def caminho_arquivo(self):
+        """Caminho absoluto do PDF gerado (None enquanto não concluído)"""
+        if not self.arquivo:
+            return None
+        return os.path.join(settings.RELATORIOS_PDF_DIR, self.arquivo)
+
+    class Meta:
+        verbose_name = 'Job de Relatório'
+        verbose_name_plural = 'Jobs de Relatórios'
+        ordering = ['-data_criacao']
+
+
+class Notificacao(models.Model):
+    """
+    Notificação materializada da fazenda: parcela pendente ou lote de medicamento
+    vencido/a vencer, já classificada e com os textos que a API exibe.
+
+    Gerada uma vez por dia para cada fazenda e atualizada a cada gravação relevante
+    (veja relatorios.notificacoes); badge, página e API leem daqui com uma única query.
+    Excluída em cascata junto com a parcela ou a entrada de origem.
+    """
+    TIPO_CHOICES = [
+        ('receita_vencida', 'Receita Vencida'),
+        ('receita_vencer', 'Receita a Vencer'),
+        ('despesa_vencida', 'Despesa Vencida'),
+        ('despesa_vencer', 'Despesa a Vencer'),
+        ('medicamento_vencido', 'Medicamento Vencido'),
+        ('medicamento_vencer', 'Medicamento a Vencer'),
+    ]
+
+    fazenda = models.ForeignKey(
+        Fazenda,
+        on_delete=models.CASCADE,
+        related_name='notificacoes',
+        verbose_name='Fazenda'
+    )
+    parcela = models.OneToOneField(
+        Parcela,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='notificacao',
+        verbose_name='Parcela'
+    )
+    entrada = models.OneToOneField(
+        EntradaMedicamento,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='notificacao',
+        verbose_name='Entrada de Medicamento'
+    )
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES, verbose_name='Tipo')
+    categoria = models.CharField(max_length=20, verbose_name='Categoria')
+    urgencia = models.PositiveSmallIntegerField(verbose_name='Urgência')
+    data = models.DateField(verbose_name='Vencimento/Validade')
+    valor = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='Valor')
+    quantidade = models.PositiveIntegerField(null=True, blank=True, verbose_name='Quantidade')
+    parcela_numero = models.PositiveIntegerField(null=True, blank=True, verbose_name='Número da Parcela')
+    total_parcelas = models.PositiveIntegerField(null=True, blank=True, verbose_name='Total de Parcelas')
+    nome = models.CharField(max_length=255, blank=True, verbose_name='Parceiro/Medicamento')
+    categoria_nome = models.CharField(max_length=100, blank=True, verbose_name='Categoria da Movimentação')
+    descricao = models.TextField(blank=True, verbose_name='Descrição')
+    versao = models.PositiveIntegerField(
+        default=0, verbose_name='Versão',
+        help_text='Versão da fazenda em que a notificação foi gravada (modo since= da API)'
+    )
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} - {self.data:%d/%m/%Y}"
+
+    class Meta:
+        verbose_name = 'Notificação'
+        verbose_name_plural = 'Notificações'
+        ordering = ['-urgencia', 'data', 'id']
+        indexes = [
+            models.Index(fields=['fazenda', '-urgencia', 'data']),
+        ]
+
+
+class GeracaoNotificacoes(models.Model):
+    """
+    Dia para o qual as notificações de cada fazenda foram materializadas e versão
+    atual delas (incrementada a cada alteração): é o token de mudança da API.
+    """
+    fazenda = models.OneToOneField(
+        Fazenda,
+        on_delete=models.CASCADE,
+        related_name='geracao_notificacoes',
+        verbose_name='Fazenda'
+    )
+    data_referencia = models.DateField(verbose_name='Data de Referência')
+    versao = models.PositiveIntegerField(default=0, verbose_name='Versão')
+    atualizado_em = models.DateTimeField(default=timezone.now, verbose_name='Atualizado Em')
+
+    def __str__(self):
+        return f"{self.fazenda} - {self.data_referencia:%d/%m/%Y}"
+
+    class Meta:
+        verbose_name = 'Geração de Notificações'
+        verbose_name_plural = 'Gerações de Notificações'
+
 
-# Create your models here.
+@receiver(post_delete, sender=RelatorioJob)
+def remover_arquivo_relatorio(sender, instance, **kwargs):
+    """Apaga o PDF do disco junto com o job"""
+    caminho = instance.caminho_arquivo
+    if caminho and os.path.exists(caminho):
+        os.remove(caminho)
@@ -0,0 +1,416 @@
+"""
+Notificações materializadas (badge, API e página de notificações)
+
+As notificações de cada fazenda (parcelas pendentes e lotes de medicamentos vencidos
+ou a vencer) ficam gravadas na tabela Notificacao, já classificadas para o dia:
+
+    - materializar_notificacoes: regera todas as notificações da fazenda (rotina
+      diária `python manage.py materializar_notificacoes` ou primeira leitura do dia)
+    - atualizar_notificacoes: regera só os registros alterados, após o commit das
+      gravações (signals de paginas.signals, saídas e importações)
+
+Badge, página e API leem a tabela com uma única query indexada; os contadores ficam
+no cache versionado da fazenda e são memorizados na própria requisição.
+
+Cada gravação incrementa a versão da fazenda (GeracaoNotificacoes.versao) e marca
+as notificações gravadas com ela. A API usa a versão como token de mudança (ETag /
+Last-Modified, 304 sem ler a tabela) e, com ?since=<versão>, devolve apenas as
+notificações gravadas depois da versão informada.
+"""
+import zlib
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from medicamento.models import EntradaMedicamento
+from movimentacao.models import Parcela
+from paginas.cache import invalidar_ao_gravar, obter_ou_calcular
+from relatorios.models import GeracaoNotificacoes, Notificacao
+
+# Janelas de antecedência das notificações
+DIAS_AVISO_PARCELAS = 5
+DIAS_AVISO_MEDICAMENTOS = 30
+
+RESUMO_VAZIO = {
+    'receitas_vencidas': 0,
+    'receitas_vencer': 0,
+    'despesas_vencidas': 0,
+    'despesas_vencer': 0,
+    'medicamentos_vencidos': 0,
+    'medicamentos_vencer': 0,
+    'parcelas': 0,
+    'medicamentos': 0,
+    'total': 0,
+}
+
+# Contador do resumo -> tipo da notificação
+TIPOS_RESUMO = {
+    'receitas_vencidas': 'receita_vencida',
+    'receitas_vencer': 'receita_vencer',
+    'despesas_vencidas': 'despesa_vencida',
+    'despesas_vencer': 'despesa_vencer',
+    'medicamentos_vencidos': 'medicamento_vencido',
+    'medicamentos_vencer': 'medicamento_vencer',
+}
+
+# Aparência de cada tipo na API: ícone, cor (vencido/muito próximo), cor (próximo), fundo e borda
+ESTILOS = {
+    'receita_vencida': ('fa-hand-holding-usd', '#2e7d32', '#2e7d32', '#e8f5e9', '#4caf50'),
+    'receita_vencer': ('fa-hand-holding-usd', '#43a047', '#66bb6a', '#f1f8e9', '#8bc34a'),
+    'despesa_vencida': ('fa-file-invoice-dollar', '#f57c00', '#f57c00', '#fff3e0', '#ff9800'),
+    'despesa_vencer': ('fa-file-invoice-dollar', '#fb8c00', '#ffa726', '#fff8e1', '#ffb74d'),
+    'medicamento_vencido': ('fa-pills', '#5e35b1', '#5e35b1', '#ede7f6', '#7e57c2'),
+    'medicamento_vencer': ('fa-pills', '#7b1fa2', '#9c27b0', '#f3e5f5', '#ab47bc'),
+}
+
+
+############ Geração ############
+def _classificar(dias, dias_muito_proximo):
+    """(vencido, categoria, urgência) pelos dias que faltam para o vencimento"""
+    if dias < 0:
+        return True, 'vencido', 3
+    if dias <= dias_muito_proximo:
+        return False, 'muito_proximo', 2
+    return False, 'proximo', 1
+
+
+def _notificacoes_parcelas(fazenda_id, hoje, filtro=None):
+    parcelas = Parcela.objects.filter(
+        fazenda_id=fazenda_id,
+        status_pagamento='Pendente',
+        data_vencimento__lte=hoje + timedelta(days=DIAS_AVISO_PARCELAS)
+    )
+    if filtro is not None:
+        parcelas = parcelas.filter(filtro)
+
+    notificacoes = []
+    for linha in parcelas.order_by().values(
+        'id', 'tipo', 'ordem_parcela', 'valor_parcela', 'data_vencimento',
+        'movimentacao__parcelas', 'movimentacao__descricao',
+        'movimentacao__categoria__nome', 'movimentacao__parceiros__nome'
+    ):
+        vencida, categoria, urgencia = _classificar((linha['data_vencimento'] - hoje).days, 2)
+        notificacoes.append(Notificacao(
+            fazenda_id=fazenda_id,
+            parcela_id=linha['id'],
+            tipo=f"{linha['tipo']}_{'vencida' if vencida else 'vencer'}",
+            categoria=categoria,
+            urgencia=urgencia,
+            data=linha['data_vencimento'],
+            valor=linha['valor_parcela'],
+            parcela_numero=linha['ordem_parcela'],
+            total_parcelas=linha['movimentacao__parcelas'],
+            nome=linha['movimentacao__parceiros__nome'] or '',
+            categoria_nome=linha['movimentacao__categoria__nome'],
+            descricao=linha['movimentacao__descricao'] or '',
+        ))
+    return notificacoes
+
+
+def _notificacoes_entradas(fazenda_id, hoje, filtro=None):
+    entradas = EntradaMedicamento.objects.filter(
+        fazenda_id=fazenda_id,
+        validade__lte=hoje + timedelta(days=DIAS_AVISO_MEDICAMENTOS),
+        quantidade_disponivel__gt=0
+    )
+    if filtro is not None:
+        entradas = entradas.filter(filtro)
+
+    notificacoes = []
+    for linha in entradas.order_by().values('id', 'quantidade_disponivel', 'validade', 'medicamento__nome'):
+        vencido, categoria, urgencia = _classificar((linha['validade'] - hoje).days, 7)
+        notificacoes.append(Notificacao(
+            fazenda_id=fazenda_id,
+            entrada_id=linha['id'],
+            tipo='medicamento_vencido' if vencido else 'medicamento_vencer',
+            categoria=categoria,
+            urgencia=urgencia,
+            data=linha['validade'],
+            quantidade=linha['quantidade_disponivel'],
+            nome=linha['medicamento__nome'],
+        ))
+    return notificacoes
+
+
+def _gravar(fazenda_id, hoje, notificacoes):
+    """
+    Grava as notificações com a próxima versão da fazenda. O marcador fica travado
+    até o fim da transação, então gravações concorrentes recebem versões distintas.
+    """
+    geracao, _ = GeracaoNotificacoes.objects.select_for_update().get_or_create(
+        fazenda_id=fazenda_id, defaults={'data_referencia': hoje}
+    )
+    geracao.versao += 1
+    geracao.data_referencia = hoje
+    geracao.atualizado_em = timezone.now()
+    geracao.save(update_fields=['versao', 'data_referencia', 'atualizado_em'])
+
+    for notificacao in notificacoes:
+        notificacao.versao = geracao.versao
+    Notificacao.objects.bulk_create(notificacoes, batch_size=500)
+
+
+def materializar_notificacoes(fazenda_id, hoje=None):
+    """
+    Regera todas as notificações da fazenda para o dia (duas leituras e um bulk_create).
+
+    Returns:
+        int: Número de notificações gravadas
+    """
+    hoje = hoje or timezone.now().date()
+    with transaction.atomic():
+        Notificacao.objects.filter(fazenda_id=fazenda_id).delete()
+        notificacoes = _notificacoes_parcelas(fazenda_id, hoje) + _notificacoes_entradas(fazenda_id, hoje)
+        _gravar(fazenda_id, hoje, notificacoes)
+        # Os contadores em cache foram calculados com as notificações antigas
+        invalidar_ao_gravar(fazenda_id)
+    return len(notificacoes)
+
+
+def atualizar_notificacoes(fazenda_id, parcelas=None, entradas=None):
+    """
+    Regera as notificações dos registros alterados.
+
+    Args:
+        fazenda_id: Fazenda dos registros
+        parcelas: Filtro (Q) das parcelas alteradas
+        entradas: Filtro (Q) das entradas de medicamentos alteradas
+
+    Fazendas ainda não materializadas hoje são ignoradas: a primeira leitura do dia
+    (ou a rotina diária) gera tudo de uma vez.
+    """
+    hoje = timezone.now().date()
+    if not fazenda_id or not GeracaoNotificacoes.objects.filter(
+        fazenda_id=fazenda_id, data_referencia=hoje
+    ).exists():
+        return
+
+    with transaction.atomic():
+        notificacoes = []
+        if parcelas is not None:
+            Notificacao.objects.filter(parcela__in=Parcela.objects.filter(parcelas).values('pk')).delete()
+            notificacoes += _notificacoes_parcelas(fazenda_id, hoje, parcelas)
+        if entradas is not None:
+            Notificacao.objects.filter(entrada__in=EntradaMedicamento.objects.filter(entradas).values('pk')).delete()
+            notificacoes += _notificacoes_entradas(fazenda_id, hoje, entradas)
+        _gravar(fazenda_id, hoje, notificacoes)
+        # Os contadores em cache foram calculados com as notificações antigas
+        invalidar_ao_gravar(fazenda_id)
+
+
+def agendar_atualizacao(fazenda_id, parcelas=None, entradas=None):
+    """
+    Atualiza as notificações após o commit: as parcelas de uma movimentação são
+    geradas depois do post_save, dentro da mesma transação.
+    """
+    transaction.on_commit(lambda: atualizar_notificacoes(fazenda_id, parcelas=parcelas, entradas=entradas))
+
+
+def registrar_exclusao(fazenda_id):
+    """
+    Incrementa a versão da fazenda após excluir registros com notificação (as
+    notificações somem em cascata, sem passar por _gravar).
+    """
+    GeracaoNotificacoes.objects.filter(fazenda_id=fazenda_id).update(
+        versao=F('versao') + 1, atualizado_em=timezone.now()
+    )
+
+
+def agendar_exclusao(fazenda_id):
+    if fazenda_id:
+        transaction.on_commit(lambda: registrar_exclusao(fazenda_id))
+
+
+def garantir_notificacoes(fazenda, hoje=None):
+    """
+    Materializa as notificações do dia na primeira leitura, se a rotina diária ainda não rodou.
+
+    Returns:
+        GeracaoNotificacoes: Marcador da fazenda (uma query quando já está em dia)
+    """
+    hoje = hoje or timezone.now().date()
+    geracao = GeracaoNotificacoes.objects.filter(fazenda=fazenda).first()
+    if geracao is None or geracao.data_referencia != hoje:
+        materializar_notificacoes(fazenda.pk, hoje)
+        geracao = GeracaoNotificacoes.objects.get(fazenda=fazenda)
+    return geracao
+
+
+def token_notificacoes(fazenda, geracao):
+    """
+    Token de mudança das notificações da fazenda (ETag da API): muda a cada
+    gravação ou exclusão, na virada do dia e quando o nome da fazenda muda.
+    """
+    return '{}-{}-{}-{:x}'.format(
+        fazenda.pk, geracao.data_referencia.isoformat(), geracao.versao,
+        zlib.crc32(fazenda.nome.encode()),
+    )
+
+
+############ Leitura ############
+def chave_notificacao(notificacao):
+    """Identifica a notificação entre versões (modo since= da API)"""
+    if notificacao.entrada_id:
+        return f'entrada-{notificacao.entrada_id}'
+    return f'parcela-{notificacao.parcela_id}'
+
+
+def formatar_notificacao(notificacao, hoje, fazenda_nome):
+    """Converte uma Notificacao no dict exibido por static/js/notificacoes.js"""
+    icone, cor_urgente, cor_proximo, cor_bg, cor_border = ESTILOS[notificacao.tipo]
+    dias = (notificacao.data - hoje).days
+    vencido = notificacao.categoria == 'vencido'
+    dados = {
+        'chave': chave_notificacao(notificacao),
+        'tipo': notificacao.tipo,
+        'categoria': notificacao.categoria,
+        'urgencia': notificacao.urgencia,
+        'icone': icone,
+        'cor': cor_proximo if notificacao.categoria == 'proximo' else cor_urgente,
+        'cor_bg': cor_bg,
+        'cor_border': cor_border,
+    }
+
+    if notificacao.entrada_id:
+        if vencido:
+            dados['titulo'] = f'Medicamento Vencido há {-dias} dia(s)'
+            dados['mensagem'] = f'Venceu há {-dias} dia(s)'
+        else:
+            dados['titulo'] = f'Medicamento Vence em {dias} dia(s)'
+            dados['mensagem'] = f'Vence em {dias} dia(s)'
+        dados.update({
+            'medicamento': notificacao.nome,
+            'fazenda': fazenda_nome,
+            'lote': f'ID-{notificacao.entrada_id}',
+            'quantidade': notificacao.quantidade,
+            'validade': notificacao.data.strftime('%d/%m/%Y'),
+            'validade_raw': notificacao.data.isoformat(),
+            'id_entrada': notificacao.entrada_id,
+        })
+        return dados
+
+    rotulo = 'Receita' if notificacao.tipo.startswith('receita') else 'Despesa'
+    parcela = f'Parcela {notificacao.parcela_numero}/{notificacao.total_parcelas}'
+    if vencido:
+        dados['titulo'] = f'{rotulo} Vencida - {-dias} dia(s) de atraso'
+        dados['mensagem'] = f'{parcela} vencida há {-dias} dia(s)'
+    else:
+        dados['titulo'] = f'{rotulo} a Vencer em {dias} dia(s)'
+        dados['mensagem'] = f'{parcela} vence em {dias} dia(s)'
+    dados.update({
+        'parcela_numero': notificacao.parcela_numero,
+        'total_parcelas': notificacao.total_parcelas,
+        'valor': float(notificacao.valor),
+        'data_vencimento': notificacao.data.strftime('%d/%m/%Y'),
+        'data_vencimento_raw': notificacao.data.isoformat(),
+        'parceiro': notificacao.nome or 'Sem parceiro',
+        'categoria_nome': notificacao.categoria_nome,
+        'descricao': notificacao.descricao,
+        'fazenda': fazenda_nome,
+        'id_parcela': notificacao.parcela_id,
+    })
+    return dados
+
+
+def listar_notificacoes(fazenda, hoje=None):
+    """
+    Notificações da fazenda formatadas para a API, da mais urgente para a menos
+    urgente e, na mesma urgência, pelo vencimento.
+    """
+    hoje = hoje or timezone.now().date()
+    garantir_notificacoes(fazenda, hoje)
+    return [
+        formatar_notificacao(notificacao, hoje, fazenda.nome)
+        for notificacao in Notificacao.objects.filter(fazenda=fazenda)
+    ]
+
+
+def payload_notificacoes(fazenda, geracao=None, since=None, hoje=None):
+    """
+    Resposta da API de notificações.
+
+    Args:
+        fazenda: Fazenda ativa
+        geracao: Marcador já lido na requisição (evita reler)
+        since: Versão que o cliente já tem; se válida, devolve só o que mudou depois dela
+        hoje: Data de referência (padrão: hoje)
+
+    Returns:
+        dict: total, versao e notificacoes. No modo since= (delta=True), `notificacoes`
+              traz apenas as gravadas depois da versão informada e `chaves` a ordem
+              completa atual (as chaves ausentes foram removidas).
+    """
+    hoje = hoje or timezone.now().date()
+    if geracao is None or geracao.data_referencia != hoje:
+        geracao = garantir_notificacoes(fazenda, hoje)
+
+    notificacoes = Notificacao.objects.filter(fazenda=fazenda)
+    # Versões de outro dia ou futuras não servem de base: resposta completa
+    if since is None or not 0 < since <= geracao.versao:
+        lista = [formatar_notificacao(n, hoje, fazenda.nome) for n in notificacoes]
+        return {'total': len(lista), 'versao': geracao.versao, 'notificacoes': lista}
+
+    chaves = [
+        f'entrada-{entrada_id}' if entrada_id else f'parcela-{parcela_id}'
+        for parcela_id, entrada_id in notificacoes.values_list('parcela_id', 'entrada_id')
+    ]
+    alteradas = [
+        formatar_notificacao(n, hoje, fazenda.nome) for n in notificacoes.filter(versao__gt=since)
+    ]
+    return {
+        'total': len(chaves),
+        'versao': geracao.versao,
+        'delta': True,
+        'chaves': chaves,
+        'notificacoes': alteradas,
+    }
+
+
+def _calcular_resumo(fazenda, hoje):
+    """Contadores por tipo (uma agregação sobre a tabela materializada)"""
+    garantir_notificacoes(fazenda, hoje)
+    contagens = dict(
+        Notificacao.objects.filter(fazenda=fazenda).order_by().values_list('tipo').annotate(Count('id'))
+    )
+
+    resumo = {campo: contagens.get(tipo, 0) for campo, tipo in TIPOS_RESUMO.items()}
+    resumo['medicamentos'] = resumo['medicamentos_vencidos'] + resumo['medicamentos_vencer']
+    resumo['parcelas'] = sum(contagens.values()) - resumo['medicamentos']
+    resumo['total'] = resumo['parcelas'] + resumo['medicamentos']
+    return resumo
+
+
+def resumo_notificacoes(fazenda, request=None, hoje=None):
+    """
+    Retorna os contadores de notificações da fazenda.
+
+    Args:
+        fazenda: Fazenda ativa (None retorna tudo zerado)
+        request: Se informado, o resultado é memorizado na requisição
+                 (badge do menu e página reutilizam o mesmo cálculo)
+        hoje: Data de referência (padrão: hoje)
+
+    Returns:
+        dict: receitas_vencidas, receitas_vencer, despesas_vencidas, despesas_vencer,
+              medicamentos_vencidos, medicamentos_vencer, parcelas, medicamentos e total
+    """
+    if not fazenda:
+        return dict(RESUMO_VAZIO)
+
+    hoje = hoje or timezone.now().date()
+    chave_request = (fazenda.pk, hoje)
+
+    memo = getattr(request, '_resumo_notificacoes', None) if request is not None else None
+    if memo and chave_request in memo:
+        return memo[chave_request]
+
+    resumo = obter_ou_calcular(
+        fazenda, 'resumo_notificacoes', lambda: _calcular_resumo(fazenda, hoje), hoje
+    )
+
+    if request is not None:
+        if memo is None:
+            memo = request._resumo_notificacoes = {}
+        memo[chave_request] = resumo
+    return resumo
@@ -0,0 +1,486 @@
+"""
+Geração do PDF do Relatório Gerencial Completo
+
+Usado tanto pelo download direto (relatorios.views.gerar_pdf_relatorio) quanto pelos
+jobs em segundo plano (relatorios.jobs). O PDF é escrito direto no destino
+(arquivo em disco ou arquivo temporário), sem montar um BytesIO na memória.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytz
+from django.db.models import Count, Sum
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from medicamento.models import EntradaMedicamento, Medicamento
+from movimentacao.models import Movimentacao
+
+
+def gerar_relatorio_pdf(destino, fazenda_ativa, data_inicio_date, data_fim_date, progresso=None):
+    """
+    Gera o PDF completo e detalhado do relatório - FILTRADO POR FAZENDA.
+
+    Args:
+        destino: Caminho do arquivo ou objeto file-like onde o PDF será escrito
+        fazenda_ativa: Fazenda do relatório
+        data_inicio_date: Início do período (date)
+        data_fim_date: Fim do período (date)
+        progresso: Função opcional progresso(percentual, etapa) chamada a cada seção
+    """
+    avancar = progresso or (lambda percentual, etapa: None)
+    hoje = timezone.now().date()
+    
+    # Converter para datetime aware para filtros de DateTimeField
+    data_inicio_datetime = timezone.make_aware(datetime.combine(data_inicio_date, datetime.min.time()))
+    data_fim_datetime = timezone.make_aware(datetime.combine(data_fim_date, datetime.max.time()))
+    
+    # Criar PDF
+    doc = SimpleDocTemplate(destino, pagesize=A4, rightMargin=30, leftMargin=30,
+                           topMargin=30, bottomMargin=18)
+    
+    # Container para elementos
+    elements = []
+    
+    # Estilos
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=20,
+        textColor=colors.HexColor('#2e7d32'),
+        spaceAfter=20,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#4a8f29'),
+        spaceAfter=10,
+        spaceBefore=15,
+        fontName='Helvetica-Bold'
+    )
+    
+    subheading_style = ParagraphStyle(
+        'SubHeading',
+        parent=styles['Normal'],
+        fontSize=11,
+        textColor=colors.HexColor('#666666'),
+        spaceAfter=15,
+        alignment=TA_CENTER
+    )
+    
+    # ====================
+    # CABEÇALHO
+    # ====================
+    # Obter horário local de Brasília
+    fuso_brasilia = pytz.timezone('America/Sao_Paulo')
+    agora_brasilia = timezone.now().astimezone(fuso_brasilia)
+    
+    elements.append(Paragraph("RELATÓRIO GERENCIAL COMPLETO", title_style))
+    elements.append(Paragraph("FARMEDICARE - Sistema de Gestão", subheading_style))
+    elements.append(Paragraph(f"Fazenda: {fazenda_ativa.nome}", subheading_style))
+    elements.append(Paragraph(
+        f"Período: {data_inicio_date.strftime('%d/%m/%Y')} até {data_fim_date.strftime('%d/%m/%Y')}", 
+        subheading_style
+    ))
+    elements.append(Paragraph(
+        f"Gerado em: {agora_brasilia.strftime('%d/%m/%Y às %H:%M:%S')}", 
+        subheading_style
+    ))
+    elements.append(Spacer(1, 20))
+    
+    avancar(5, 'Resumo financeiro')
+    
+    # ====================
+    # 1. RESUMO FINANCEIRO
+    # ====================
+    elements.append(Paragraph("1. RESUMO FINANCEIRO GERAL", heading_style))
+    
+    # FILTRAR POR FAZENDA
+    receitas = Movimentacao.objects.filter(
+        fazenda=fazenda_ativa,
+        tipo='receita', 
+        data__range=[data_inicio_date, data_fim_date]
+    )
+    despesas = Movimentacao.objects.filter(
+        fazenda=fazenda_ativa,
+        tipo='despesa', 
+        data__range=[data_inicio_date, data_fim_date]
+    )
+    
+    total_receitas = receitas.aggregate(total=Sum('valor_total'))['total'] or Decimal('0.00')
+    total_despesas = despesas.aggregate(total=Sum('valor_total'))['total'] or Decimal('0.00')
+    saldo = total_receitas - total_despesas
+    count_receitas = receitas.count()
+    count_despesas = despesas.count()
+    
+    data_resumo = [
+        ['Descrição', 'Quantidade', 'Valor Total'],
+        ['💰 Total de Receitas', f'{count_receitas} lançamento(s)', 
+         f'R$ {total_receitas:,.2f}'.replace(',', '_').replace('.', ',').replace('_', '.')],
+        ['💸 Total de Despesas', f'{count_despesas} lançamento(s)', 
+         f'R$ {total_despesas:,.2f}'.replace(',', '_').replace('.', ',').replace('_', '.')],
+        ['💵 Saldo do Período', '-', 
+         f'R$ {saldo:,.2f}'.replace(',', '_').replace('.', ',').replace('_', '.')],
+    ]
+    
+    table_resumo = Table(data_resumo, colWidths=[9*cm, 4*cm, 5*cm])
+    table_resumo.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4a8f29')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'CENTER'),
+        ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('TOPPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.beige, colors.lightgrey]),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('TOPPADDING', (0, 1), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+    ]))
+    
+    elements.append(table_resumo)
+    elements.append(Spacer(1, 20))
+    
+    avancar(20, 'Receitas por categoria')
+    
+    # ====================
+    # 2. DETALHAMENTO DE RECEITAS
+    # ====================
+    elements.append(Paragraph("2. RECEITAS DETALHADAS POR CATEGORIA", heading_style))
+    
+    receitas_por_categoria = receitas.values('categoria__nome').annotate(
+        total=Sum('valor_total'),
+        quantidade=Count('id')
+    ).order_by('-total')
+    
+    if receitas_por_categoria:
+        data_receitas = [['Posição', 'Categoria', 'Qtd. Lançamentos', 'Valor Total', '% do Total']]
+        
+        for idx, item in enumerate(receitas_por_categoria, 1):
+            percentual = (item['total'] / total_receitas * 100) if total_receitas > 0 else 0
+            data_receitas.append([
+                str(idx),
+                item['categoria__nome'] or 'Sem Categoria',
+                str(item['quantidade']),
+                f"R$ {item['total']:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.'),
+                f"{percentual:.1f}%"
+            ])
+        
+        table_receitas = Table(data_receitas, colWidths=[1.5*cm, 8*cm, 3*cm, 4*cm, 2*cm])
+        table_receitas.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4caf50')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+            ('ALIGN', (2, 0), (2, -1), 'CENTER'),
+            ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.lightgreen, colors.white]),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ]))
+        elements.append(table_receitas)
+    else:
+        elements.append(Paragraph("➤ Nenhuma receita registrada no período.", styles['Normal']))
+    
+    elements.append(Spacer(1, 20))
+    
+    avancar(35, 'Despesas por categoria')
+    
+    # ====================
+    # 3. DETALHAMENTO DE DESPESAS
+    # ====================
+    elements.append(Paragraph("3. DESPESAS DETALHADAS POR CATEGORIA", heading_style))
+    
+    despesas_por_categoria = despesas.values('categoria__nome').annotate(
+        total=Sum('valor_total'),
+        quantidade=Count('id')
+    ).order_by('-total')
+    
+    if despesas_por_categoria:
+        data_despesas = [['Posição', 'Categoria', 'Qtd. Lançamentos', 'Valor Total', '% do Total']]
+        
+        for idx, item in enumerate(despesas_por_categoria, 1):
+            percentual = (item['total'] / total_despesas * 100) if total_despesas > 0 else 0
+            data_despesas.append([
+                str(idx),
+                item['categoria__nome'] or 'Sem Categoria',
+                str(item['quantidade']),
+                f"R$ {item['total']:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.'),
+                f"{percentual:.1f}%"
+            ])
+        
+        table_despesas = Table(data_despesas, colWidths=[1.5*cm, 8*cm, 3*cm, 4*cm, 2*cm])
+        table_despesas.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#ef5350')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+            ('ALIGN', (2, 0), (2, -1), 'CENTER'),
+            ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.lightpink, colors.white]),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ]))
+        elements.append(table_despesas)
+    else:
+        elements.append(Paragraph("➤ Nenhuma despesa registrada no período.", styles['Normal']))
+    
+    elements.append(PageBreak())
+    
+    avancar(50, 'Estoque de medicamentos')
+    
+    # ====================
+    # 4. ANÁLISE DE MEDICAMENTOS
+    # ====================
+    elements.append(Paragraph("4. ESTOQUE E MOVIMENTAÇÃO DE MEDICAMENTOS", heading_style))
+    
+    # Estatísticas gerais - FILTRADO POR FAZENDA
+    total_medicamentos = Medicamento.objects.filter(fazenda=fazenda_ativa).count()
+    entradas_periodo = EntradaMedicamento.objects.filter(
+        fazenda=fazenda_ativa,
+        data_cadastro__range=[data_inicio_datetime, data_fim_datetime]
+    )
+    total_entradas = entradas_periodo.count()
+    
+    # Calcular valor total das entradas (valor_medicamento já é o valor TOTAL da entrada)
+    valor_total_entradas = entradas_periodo.aggregate(
+        total=Sum('valor_medicamento')
+    )['total'] or Decimal('0.00')
+    
+    # Medicamentos vencidos e próximos ao vencimento - FILTRADO POR FAZENDA
+    trinta_dias = hoje + timedelta(days=30)
+    
+    medicamentos_vencidos = EntradaMedicamento.objects.filter(
+        fazenda=fazenda_ativa,
+        validade__lt=hoje,
+        quantidade_disponivel__gt=0
+    ).count()
+    
+    medicamentos_vencer = EntradaMedicamento.objects.filter(
+        fazenda=fazenda_ativa,
+        validade__gte=hoje,
+        validade__lte=trinta_dias,
+        quantidade_disponivel__gt=0
+    ).count()
+    
+    data_med_resumo = [
+        ['Indicador', 'Valor'],
+        ['📦 Total de Medicamentos Cadastrados', str(total_medicamentos)],
+        ['📥 Entradas no Período', str(total_entradas)],
+        ['💰 Valor Total das Entradas', f'R$ {valor_total_entradas:,.2f}'.replace(',', '_').replace('.', ',').replace('_', '.')],
+        ['⚠️ Medicamentos Próximos ao Vencimento (30 dias)', str(medicamentos_vencer)],
+        ['❌ Medicamentos Vencidos com Estoque', str(medicamentos_vencidos)],
+    ]
+    
+    table_med_resumo = Table(data_med_resumo, colWidths=[14*cm, 4*cm])
+    table_med_resumo.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2196f3')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.lightblue, colors.white]),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ]))
+    
+    elements.append(table_med_resumo)
+    elements.append(Spacer(1, 15))
+    
+    avancar(65, 'Lista de medicamentos')
+    
+    # ====================
+    # 5. LISTA COMPLETA DE MEDICAMENTOS
+    # ====================
+    elements.append(Paragraph("5. LISTA DETALHADA DE MEDICAMENTOS", heading_style))
+    
+    # FILTRAR POR FAZENDA - estoque lido do snapshot (uma única query com JOIN)
+    medicamentos = Medicamento.objects.filter(
+        fazenda=fazenda_ativa
+    ).select_related('fazenda', 'estoque').order_by('nome')
+    
+    if medicamentos:
+        data_med_lista = [['Nº', 'Medicamento', 'Fazenda', 'Qtd. Total', 'Status']]
+        
+        for idx, med in enumerate(medicamentos, 1):
+            quantidade = med.quantidade_total
+            
+            # Verificar status do estoque
+            if quantidade == 0:
+                status = '⚫ SEM ESTOQUE'
+            elif quantidade < 10:
+                status = '🔴 ESTOQUE BAIXO'
+            elif quantidade < 50:
+                status = '🟡 ESTOQUE MÉDIO'
+            else:
+                status = '🟢 ESTOQUE BOM'
+            
+            data_med_lista.append([
+                str(idx),
+                med.nome,
+                med.fazenda.nome if med.fazenda else 'N/A',
+                str(quantidade),
+                status
+            ])
+        
+        table_med_lista = Table(data_med_lista, colWidths=[1*cm, 7*cm, 4*cm, 2*cm, 4.5*cm])
+        table_med_lista.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#9c27b0')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+            ('ALIGN', (1, 0), (2, -1), 'LEFT'),
+            ('ALIGN', (3, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.lavender, colors.white]),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('TOPPADDING', (0, 0), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ]))
+        elements.append(table_med_lista)
+    else:
+        elements.append(Paragraph("➤ Nenhum medicamento cadastrado.", styles['Normal']))
+    
+    elements.append(PageBreak())
+    
+    avancar(75, 'Controle de validade')
+    
+    # ====================
+    # 6. MEDICAMENTOS POR VALIDADE
+    # ====================
+    elements.append(Paragraph("6. MEDICAMENTOS: CONTROLE DE VALIDADE", heading_style))
+    
+    # Medicamentos vencidos - FILTRADO POR FAZENDA
+    entradas_vencidas = EntradaMedicamento.objects.filter(
+        fazenda=fazenda_ativa,
+        validade__lt=hoje,
+        quantidade_disponivel__gt=0
+    ).select_related('medicamento').order_by('validade')
+    
+    if entradas_vencidas:
+        elements.append(Paragraph("⚠️ MEDICAMENTOS VENCIDOS COM ESTOQUE", 
+                                 ParagraphStyle('Alert', parent=styles['Normal'], fontSize=11, 
+                                              textColor=colors.red, fontName='Helvetica-Bold')))
+        elements.append(Spacer(1, 10))
+        
+        data_vencidos = [['Medicamento', 'Quantidade', 'Data Validade', 'Dias Vencido']]
+        
+        for entrada in entradas_vencidas:
+            dias_vencido = (hoje - entrada.validade).days
+            data_vencidos.append([
+                entrada.medicamento.nome,
+                str(entrada.quantidade_disponivel),
+                entrada.validade.strftime('%d/%m/%Y'),
+                f'{dias_vencido} dia(s)'
+            ])
+        
+        table_vencidos = Table(data_vencidos, colWidths=[9*cm, 2.5*cm, 3*cm, 4*cm])
+        table_vencidos.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.red),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.mistyrose, colors.white]),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('TOPPADDING', (0, 0), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ]))
+        elements.append(table_vencidos)
+        elements.append(Spacer(1, 15))
+    
+    # Medicamentos próximos ao vencimento - FILTRADO POR FAZENDA
+    entradas_vencer = EntradaMedicamento.objects.filter(
+        fazenda=fazenda_ativa,
+        validade__gte=hoje,
+        validade__lte=trinta_dias,
+        quantidade_disponivel__gt=0
+    ).select_related('medicamento').order_by('validade')
+    
+    if entradas_vencer:
+        elements.append(Paragraph("⏰ MEDICAMENTOS PRÓXIMOS AO VENCIMENTO (30 DIAS)", 
+                                 ParagraphStyle('Warning', parent=styles['Normal'], fontSize=11, 
+                                              textColor=colors.orange, fontName='Helvetica-Bold')))
+        elements.append(Spacer(1, 10))
+        
+        data_vencer = [['Medicamento', 'Quantidade', 'Data Validade', 'Dias Restantes']]
+        
+        for entrada in entradas_vencer:
+            dias_restantes = (entrada.validade - hoje).days
+            data_vencer.append([
+                entrada.medicamento.nome,
+                str(entrada.quantidade_disponivel),
+                entrada.validade.strftime('%d/%m/%Y'),
+                f'{dias_restantes} dia(s)'
+            ])
+        
+        table_vencer = Table(data_vencer, colWidths=[9*cm, 2.5*cm, 3*cm, 4*cm])
+        table_vencer.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.orange),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.lightyellow, colors.white]),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('TOPPADDING', (0, 0), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ]))
+        elements.append(table_vencer)
+    
+    if not entradas_vencidas and not entradas_vencer:
+        elements.append(Paragraph("✅ Não há medicamentos vencidos ou próximos ao vencimento.", 
+                                 ParagraphStyle('Success', parent=styles['Normal'], fontSize=10, 
+                                              textColor=colors.green)))
+    
+    # ====================
+    # RODAPÉ
+    # ====================
+    elements.append(Spacer(1, 30))
+    elements.append(Paragraph("_" * 80, styles['Normal']))
+    elements.append(Spacer(1, 10))
+    elements.append(Paragraph(
+        f"Relatório completo gerado pelo sistema FARMEDICARE em {agora_brasilia.strftime('%d/%m/%Y às %H:%M:%S')}",
+        ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, 
+                      textColor=colors.grey, alignment=TA_CENTER)
+    ))
+    
+    avancar(85, 'Montando o PDF')
+    
+    # Construir PDF
+    doc.build(elements)
+
+
+def nome_arquivo_relatorio(data_inicio_date, data_fim_date):
+    """Nome do arquivo para download (ex.: relatorio_completo_20250101_20250131.pdf)"""
+    return f'relatorio_completo_{data_inicio_date.strftime("%Y%m%d")}_{data_fim_date.strftime("%Y%m%d")}.pdf'
@@ -1,3 +1,386 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+from datetime import date, timedelta
+from perfis.models import Fazenda
+from medicamento.models import Medicamento, EntradaMedicamento
+from movimentacao.models import Categoria, Movimentacao
+from relatorios.jobs import enfileirar_relatorio, limpar_jobs_expirados
+from relatorios.models import GeracaoNotificacoes, Notificacao, RelatorioJob
+from relatorios.notificacoes import materializar_notificacoes, resumo_notificacoes
+
+
+class ResumoNotificacoesTest(TestCase):
+    """Testes do resumo de notificações compartilhado por badge, API e página"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='produtor', password='senha123')
+        self.fazenda = Fazenda.objects.create(nome='Fazenda Alertas', dono=self.user)
+        self.user.perfil.fazendas.add(self.fazenda)
+        hoje = date.today()
+
+        receita = Categoria.objects.create(nome='Venda', tipo='receita', fazenda=self.fazenda)
+        despesa = Categoria.objects.create(nome='Ração', tipo='despesa', fazenda=self.fazenda)
+        # 3 parcelas mensais: a 1ª vencida há 40 dias, a 2ª vencida há 10 dias, a 3ª vence em 20 dias
+        Movimentacao.objects.create(
+            categoria=receita, valor_total=300, parcelas=3, data=hoje - timedelta(days=40),
+            fazenda=self.fazenda, cadastrada_por=self.user
+        )
+        # Despesa à vista vencendo em 3 dias
+        Movimentacao.objects.create(
+            categoria=despesa, valor_total=50, parcelas=1, data=hoje + timedelta(days=3),
+            fazenda=self.fazenda, cadastrada_por=self.user
+        )
+
+        medicamento = Medicamento.objects.create(nome='Ivermectina', fazenda=self.fazenda)
+        for dias in (-2, 10, 90):
+            EntradaMedicamento.objects.create(
+                medicamento=medicamento, quantidade=5, valor_medicamento=10,
+                validade=hoje + timedelta(days=dias), cadastrada_por=self.user
+            )
+
+        self.client = Client()
+        self.client.login(username='produtor', password='senha123')
+        session = self.client.session
+        session['fazenda_ativa_id'] = self.fazenda.id
+        session.save()
+
+    def test_contadores_por_grupo(self):
+        """Testa os contadores de cada grupo lidos da tabela materializada em duas queries"""
+        materializar_notificacoes(self.fazenda.pk)
+        with self.assertNumQueries(2):
+            resumo = resumo_notificacoes(self.fazenda)
+
+        self.assertEqual(resumo['receitas_vencidas'], 2)
+        self.assertEqual(resumo['receitas_vencer'], 0)
+        self.assertEqual(resumo['despesas_vencidas'], 0)
+        self.assertEqual(resumo['despesas_vencer'], 1)
+        self.assertEqual(resumo['medicamentos_vencidos'], 1)
+        self.assertEqual(resumo['medicamentos_vencer'], 1)
+        self.assertEqual(resumo['total'], 5)
+
+    def test_resumo_memorizado_na_requisicao(self):
+        """Testa que uma segunda chamada na mesma requisição não consulta nada"""
+        request = RequestFactory().get('/')
+        resumo_notificacoes(self.fazenda, request=request)
+
+        with self.assertNumQueries(0):
+            resumo_notificacoes(self.fazenda, request=request)
+
+    def test_badge_api_e_pagina_concordam(self):
+        """Testa que badge, página e API reportam o mesmo total"""
+        pagina = self.client.get(reverse('notificacoes_unificadas'))
+        api = self.client.get(reverse('api_notificacoes')).json()
+
+        self.assertEqual(pagina.context['total'], 5)
+        self.assertEqual(pagina.context['notificacoes_count'], 5)
+        self.assertEqual(api['total'], 5)
+
+
+class NotificacoesMaterializadasTest(TestCase):
+    """Testes da tabela de notificações (geração diária e atualização incremental)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='produtor', password='senha123')
+        self.fazenda = Fazenda.objects.create(nome='Fazenda Alertas', dono=self.user)
+        self.user.perfil.fazendas.add(self.fazenda)
+        self.hoje = date.today()
+
+        self.despesa = Categoria.objects.create(nome='Ração', tipo='despesa', fazenda=self.fazenda)
+        # Despesa à vista vencendo em 1 dia (muito próxima) e outra vencida há 3 dias
+        self.movimentacao = Movimentacao.objects.create(
+            categoria=self.despesa, valor_total=50, parcelas=1, data=self.hoje + timedelta(days=1),
+            fazenda=self.fazenda, cadastrada_por=self.user, descricao='Ração de inverno'
+        )
+        Movimentacao.objects.create(
+            categoria=self.despesa, valor_total=80, parcelas=1, data=self.hoje - timedelta(days=3),
+            fazenda=self.fazenda, cadastrada_por=self.user
+        )
+        self.medicamento = Medicamento.objects.create(nome='Ivermectina', fazenda=self.fazenda)
+        self.entrada = EntradaMedicamento.objects.create(
+            medicamento=self.medicamento, quantidade=5, valor_medicamento=10,
+            validade=self.hoje + timedelta(days=20), cadastrada_por=self.user
+        )
+
+        self.client = Client()
+        self.client.login(username='produtor', password='senha123')
+        session = self.client.session
+        session['fazenda_ativa_id'] = self.fazenda.id
+        session.save()
+
+    def _tipos(self):
+        return list(Notificacao.objects.filter(fazenda=self.fazenda).values_list('tipo', flat=True))
+
+    def test_materializar_invalida_o_cache_da_fazenda(self):
+        """Testa que regerar as notificações (bulk_create, sem signals) troca a versão da fazenda"""
+        from paginas.cache import versao_fazenda
+
+        versao = versao_fazenda(self.fazenda)
+        with self.captureOnCommitCallbacks(execute=True):
+            materializar_notificacoes(self.fazenda.pk)
+        self.assertNotEqual(versao_fazenda(self.fazenda), versao)
+
+    def test_api_le_a_tabela_ordenada_por_urgencia(self):
+        """Testa o formato da API, a ordenação e a materialização na primeira leitura"""
+        dados = self.client.get(reverse('api_notificacoes')).json()
+
+        self.assertTrue(GeracaoNotificacoes.objects.filter(fazenda=self.fazenda, data_referencia=self.hoje).exists())
+        self.assertEqual(dados['total'], 3)
+        self.assertEqual(
+            [n['tipo'] for n in dados['notificacoes']],
+            ['despesa_vencida', 'despesa_vencer', 'medicamento_vencer']
+        )
+        vencida, vencer, medicamento = dados['notificacoes']
+        self.assertEqual(vencida['titulo'], 'Despesa Vencida - 3 dia(s) de atraso')
+        self.assertEqual(vencer['categoria'], 'muito_proximo')
+        self.assertEqual(vencer['cor'], '#fb8c00')
+        self.assertEqual(vencer['mensagem'], 'Parcela 1/1 vence em 1 dia(s)')
+        self.assertEqual(vencer['descricao'], 'Ração de inverno')
+        self.assertEqual(vencer['parceiro'], 'Sem parceiro')
+        self.assertEqual(vencer['fazenda'], 'Fazenda Alertas')
+        self.assertEqual(medicamento['lote'], f'ID-{self.entrada.id}')
+        self.assertEqual(medicamento['cor'], '#9c27b0')
+
+    def test_gravacoes_atualizam_apenas_os_registros_alterados(self):
+        """Testa a atualização incremental após o commit: pagamento, nova entrada e exclusão"""
+        materializar_notificacoes(self.fazenda.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            parcela = self.movimentacao.parcela_set.get()
+            parcela.status_pagamento = 'Pago'
+            parcela.save()
+        self.assertEqual(sorted(self._tipos()), ['despesa_vencida', 'medicamento_vencer'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EntradaMedicamento.objects.create(
+                medicamento=self.medicamento, quantidade=2, valor_medicamento=4,
+                validade=self.hoje - timedelta(days=1), cadastrada_por=self.user
+            )
+        self.assertEqual(
+            sorted(self._tipos()), ['despesa_vencida', 'medicamento_vencer', 'medicamento_vencido']
+        )
+
+        self.entrada.delete()
+        self.assertEqual(sorted(self._tipos()), ['despesa_vencida', 'medicamento_vencido'])
+
+    def test_saida_que_zera_o_lote_remove_a_notificacao(self):
+        """Testa que as saídas gravadas em lote também atualizam as notificações"""
+        from medicamento.saidas import registrar_saidas
+
+        materializar_notificacoes(self.fazenda.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_saidas(self.fazenda, self.user, [
+                {'medicamento_id': self.medicamento.id, 'quantidade': 5, 'motivo': ''}
+            ])
+        self.assertNotIn('medicamento_vencer', self._tipos())
+
+    def test_virada_do_dia_e_rotina_diaria(self):
+        """Testa a regeneração na primeira leitura do dia e pelo comando diário"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        # Materializada ontem: a despesa de amanhã ainda estava fora da janela de 2 dias
+        materializar_notificacoes(self.fazenda.pk, hoje=self.hoje - timedelta(days=2))
+        self.assertEqual(Notificacao.objects.get(parcela__movimentacao=self.movimentacao).categoria, 'proximo')
+
+        self.assertEqual(resumo_notificacoes(self.fazenda)['total'], 3)
+        self.assertEqual(
+            Notificacao.objects.get(parcela__movimentacao=self.movimentacao).categoria, 'muito_proximo'
+        )
+
+        Notificacao.objects.all().delete()
+        saida = StringIO()
+        call_command('materializar_notificacoes', '--fazenda', str(self.fazenda.pk), stdout=saida)
+        self.assertIn('3 notificação(ões)', saida.getvalue())
+        self.assertEqual(Notificacao.objects.filter(fazenda=self.fazenda).count(), 3)
+
+    def test_etag_responde_304_sem_ler_as_notificacoes(self):
+        """Testa o 304 com o ETag atual: só o marcador da fazenda é consultado"""
+        url = reverse('api_notificacoes')
+        resposta = self.client.get(url)
+        etag = resposta['ETag']
+        self.assertIn('Last-Modified', resposta)
+        self.assertIn('no-cache', resposta['Cache-Control'])
+
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 304)
+        self.assertFalse([q for q in consultas.captured_queries if 'relatorios_notificacao"' in q['sql']])
+
+        # Pagamento e exclusão mudam o token
+        with self.captureOnCommitCallbacks(execute=True):
+            parcela = self.movimentacao.parcela_set.get()
+            parcela.status_pagamento = 'Pago'
+            parcela.save()
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['total'], 2)
+
+        etag = resposta['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entrada.delete()
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['total'], 1)
+
+    def test_since_devolve_apenas_as_alteradas(self):
+        """Testa o modo delta: notificações gravadas depois da versão e a ordem atual"""
+        url = reverse('api_notificacoes')
+        completa = self.client.get(url).json()
+        versao = completa['versao']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entrada.validade = self.hoje - timedelta(days=1)
+            self.entrada.save()
+            parcela = self.movimentacao.parcela_set.get()
+            parcela.status_pagamento = 'Pago'
+            parcela.save()
+
+        delta = self.client.get(url, {'since': versao}).json()
+        self.assertTrue(delta['delta'])
+        self.assertGreater(delta['versao'], versao)
+        self.assertEqual(delta['total'], 2)
+        self.assertEqual([n['chave'] for n in delta['notificacoes']], [f'entrada-{self.entrada.id}'])
+        self.assertEqual(delta['notificacoes'][0]['tipo'], 'medicamento_vencido')
+        vencida = completa['notificacoes'][0]['chave']
+        self.assertEqual(delta['chaves'], [vencida, f'entrada-{self.entrada.id}'])
+
+        # Versão desconhecida (futura ou inválida): resposta completa
+        for since in (delta['versao'] + 5, 'x'):
+            dados = self.client.get(url, {'since': since}).json()
+            self.assertNotIn('delta', dados)
+            self.assertEqual(len(dados['notificacoes']), 2)
+
+    def test_stream_desligado_responde_204(self):
+        """Testa que, sem o stream, o EventSource recebe 204 (o JS volta à consulta periódica)"""
+        with self.settings(NOTIFICACOES_STREAM=False):
+            resposta = self.client.get(reverse('stream_notificacoes'))
+        self.assertEqual(resposta.status_code, 204)
+
+    @override_settings(NOTIFICACOES_STREAM=True, NOTIFICACOES_STREAM_DURACAO=0)
+    async def test_stream_envia_as_notificacoes_quando_a_versao_muda(self):
+        """Testa os eventos do stream: completo na conexão, ping quando a versão não mudou"""
+        from django.test import AsyncClient
+
+        cliente = AsyncClient()
+        cliente.cookies = self.client.cookies
+
+        async def eventos(**extra):
+            resposta = await cliente.get(reverse('stream_notificacoes'), **extra)
+            self.assertEqual(resposta['Content-Type'], 'text/event-stream')
+            return ''.join([parte.decode() async for parte in resposta.streaming_content])
+
+        texto = await eventos()
+        self.assertIn('event: notificacoes', texto)
+        dados = json.loads(texto.split('data: ', 1)[1].split('\n', 1)[0])
+        self.assertEqual(dados['total'], 3)
+        self.assertIn(f"id: {dados['versao']}", texto)
+
+        # Reconexão com a última versão recebida: nada mudou, só keep-alive
+        texto = await eventos(headers={'Last-Event-ID': str(dados['versao'])})
+        self.assertNotIn('event: notificacoes', texto)
+        self.assertIn(': ping', texto)
+
+
+class RelatorioJobTest(TestCase):
+    """Testes da geração do PDF em segundo plano (executada de forma síncrona)"""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio, ignore_errors=True)
+        configuracao = override_settings(RELATORIOS_PDF_DIR=self.diretorio, RELATORIOS_PDF_EXECUCAO='sincrona')
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.user = User.objects.create_user(username='gerente', password='senha123')
+        self.fazenda = Fazenda.objects.create(nome='Fazenda Relatório', dono=self.user)
+        self.user.perfil.fazendas.add(self.fazenda)
+        receita = Categoria.objects.create(nome='Leite', tipo='receita', fazenda=self.fazenda)
+        Movimentacao.objects.create(
+            categoria=receita, valor_total=1200, parcelas=1, data=date.today(),
+            fazenda=self.fazenda, cadastrada_por=self.user
+        )
+
+        self.client = Client()
+        self.client.login(username='gerente', password='senha123')
+        session = self.client.session
+        session['fazenda_ativa_id'] = self.fazenda.id
+        session.save()
+
+    def test_solicitar_status_e_download(self):
+        """Testa o fluxo completo: solicitar, consultar o status e baixar o PDF"""
+        resposta = self.client.post(reverse('solicitar_pdf_relatorio'), {'periodo': '30'})
+        self.assertEqual(resposta.status_code, 202)
+        dados = resposta.json()
+        self.assertEqual(dados['status'], 'concluido')
+        self.assertEqual(dados['progresso'], 100)
+
+        status = self.client.get(dados['status_url']).json()
+        self.assertEqual(status['download_url'], dados['download_url'])
+
+        download = self.client.get(dados['download_url'])
+        self.assertEqual(download['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF'))
+
+    def test_job_de_outra_fazenda_nao_e_acessivel(self):
+        """Testa que o status e o download só respondem para a fazenda do job"""
+        outro = User.objects.create_user(username='vizinho', password='senha123')
+        outra_fazenda = Fazenda.objects.create(nome='Fazenda Vizinha', dono=outro)
+        job = enfileirar_relatorio(outra_fazenda, outro, date.today() - timedelta(days=30), date.today())
+
+        self.assertEqual(self.client.get(reverse('status_pdf_relatorio', args=[job.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('download_pdf_relatorio', args=[job.pk])).status_code, 404)
+
+    def test_limpeza_remove_job_e_arquivo(self):
+        """Testa que jobs expirados são apagados junto com o PDF"""
+        job = enfileirar_relatorio(self.fazenda, self.user, date.today() - timedelta(days=30), date.today())
+        self.assertTrue(os.path.exists(job.caminho_arquivo))
+
+        with override_settings(RELATORIOS_PDF_RETENCAO_HORAS=0):
+            limpar_jobs_expirados()
+
+        self.assertFalse(RelatorioJob.objects.filter(pk=job.pk).exists())
+        self.assertFalse(os.path.exists(job.caminho_arquivo))
+
+    def test_limpeza_preserva_job_em_andamento(self):
+        """Testa que jobs pendentes ou em processamento dentro da retenção não são apagados"""
+        processando = RelatorioJob.objects.create(
+            fazenda=self.fazenda, data_inicio=date.today(), data_fim=date.today(), status='processando'
+        )
+        pendente = RelatorioJob.objects.create(
+            fazenda=self.fazenda, data_inicio=date.today(), data_fim=date.today()
+        )
+
+        limpar_jobs_expirados()
+
+        self.assertEqual(
+            set(RelatorioJob.objects.values_list('pk', flat=True)), {processando.pk, pendente.pk}
+        )
+
+    def test_limpeza_remove_job_interrompido_e_arquivo_parcial(self):
+        """Testa que um job preso em processamento além da retenção é apagado com o arquivo parcial"""
+        job = RelatorioJob.objects.create(
+            fazenda=self.fazenda, data_inicio=date.today(), data_fim=date.today(), status='processando'
+        )
+        parcial = os.path.join(self.diretorio, f'{job.pk}.pdf.parcial')
+        with open(parcial, 'wb') as arquivo:
+            arquivo.write(b'%PDF')
+
+        with override_settings(RELATORIOS_PDF_RETENCAO_HORAS=0):
+            limpar_jobs_expirados()
+
+        self.assertFalse(RelatorioJob.objects.filter(pk=job.pk).exists())
+        self.assertFalse(os.path.exists(parcial))
+
+    def test_download_direto_continua_funcionando(self):
+        """Testa o download direto sem job (link sem JavaScript)"""
+        resposta = self.client.get(reverse('gerar_pdf_relatorio'), {'periodo': '30'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(b''.join(resposta.streaming_content).startswith(b'%PDF'))
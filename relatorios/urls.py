@@ -1,9 +1,16 @@
 from django.urls import path
-from .views import RelatoriosView, gerar_pdf_relatorio, api_notificacoes, notificacoes_page
+from .views import (
+    RelatoriosView, gerar_pdf_relatorio, solicitar_pdf_relatorio, status_pdf_relatorio,
+    download_pdf_relatorio, api_notificacoes, stream_notificacoes, notificacoes_page
+)
 
 urlpatterns = [
     path('dashboard/', RelatoriosView.as_view(), name='dashboard_relatorios'),
     path('gerar-pdf/', gerar_pdf_relatorio, name='gerar_pdf_relatorio'),
+    path('pdf/solicitar/', solicitar_pdf_relatorio, name='solicitar_pdf_relatorio'),
+    path('pdf/<uuid:job_id>/status/', status_pdf_relatorio, name='status_pdf_relatorio'),
+    path('pdf/<uuid:job_id>/download/', download_pdf_relatorio, name='download_pdf_relatorio'),
     path('api/notificacoes/', api_notificacoes, name='api_notificacoes'),
+    path('api/notificacoes/stream/', stream_notificacoes, name='stream_notificacoes'),
     path('notificacoes/', notificacoes_page, name='notificacoes_unificadas'),
 ]
@@ -1,23 +1,83 @@
-from django.shortcuts import render
-from django.http import HttpResponse, JsonResponse, HttpResponseForbidden
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render, get_object_or_404
+from django.http import (
+    FileResponse, Http404, HttpResponse, JsonResponse, HttpResponseForbidden, StreamingHttpResponse
+)
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_POST
 from django.views.generic import TemplateView
 from django.db.models import Sum, Count, Avg, Q, F
 from django.utils import timezone
-from django.core.cache import cache
 from datetime import timedelta, datetime
 from decimal import Decimal
-import pytz
+import asyncio
+import json
+import tempfile
+import time
 
-from medicamento.models import Medicamento, EntradaMedicamento, SaidaMedicamento
-from movimentacao.models import Movimentacao, Parcela
+from medicamento.models import Medicamento, EntradaMedicamento, SaidaMedicamento, EstoqueMedicamento
+from movimentacao.models import Movimentacao, Parcela, ResumoMensalMovimentacao
+from paginas.cache import obter_ou_calcular
+from relatorios.notificacoes import (
+    garantir_notificacoes, payload_notificacoes, resumo_notificacoes, token_notificacoes
+)
+from relatorios.jobs import enfileirar_relatorio
+from relatorios.models import RelatorioJob
+from relatorios.pdf import gerar_relatorio_pdf, nome_arquivo_relatorio
 
-import io
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch, cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
+
+def _totais_mensais(fazenda_ativa, inicio):
+    """
+    Receitas e despesas por mês a partir de `inicio`, lidas do resumo mensal
+    (ResumoMensalMovimentacao): o custo não cresce com o histórico.
+
+    Returns:
+        dict: {'AAAA-MM': {'receita': float, 'despesa': float}}
+    """
+    linhas = ResumoMensalMovimentacao.objects.filter(
+        fazenda=fazenda_ativa,
+        mes__gte=inicio
+    ).values('mes', 'tipo').annotate(
+        soma=Sum('total')
+    ).order_by('mes', 'tipo')
+    
+    dados_por_mes = {}
+    for linha in linhas:
+        mes_key = linha['mes'].strftime('%Y-%m')
+        if mes_key not in dados_por_mes:
+            dados_por_mes[mes_key] = {'receita': 0, 'despesa': 0}
+        dados_por_mes[mes_key][linha['tipo']] = float(linha['soma'] or 0)
+    return dados_por_mes
+
+
+def _calcular_comparativo_6_meses(fazenda_ativa, hoje):
+    """Receitas x despesas dos últimos 6 meses (resumo mensal) - FILTRANDO POR FAZENDA"""
+    # Buscar últimos 6 meses de dados (iniciar 6 meses atrás)
+    inicio_6_meses = (hoje - timedelta(days=180)).replace(day=1)
+    dados_por_mes = _totais_mensais(fazenda_ativa, inicio_6_meses)
+    
+    # Preparar estrutura dos últimos 6 meses
+    comparativo_labels = []
+    comparativo_receitas = []
+    comparativo_despesas = []
+    
+    # Preencher arrays dos últimos 6 meses
+    for i in range(5, -1, -1):
+        data_ref = hoje - timedelta(days=30*i)
+        mes_key = data_ref.strftime('%Y-%m')
+        mes_label = data_ref.strftime('%b/%y')
+        
+        comparativo_labels.append(mes_label)
+        comparativo_receitas.append(dados_por_mes.get(mes_key, {}).get('receita', 0))
+        comparativo_despesas.append(dados_por_mes.get(mes_key, {}).get('despesa', 0))
+    
+    return {
+        'labels': comparativo_labels,
+        'receitas': comparativo_receitas,
+        'despesas': comparativo_despesas
+    }
 
 
 class RelatoriosView(TemplateView):
@@ -58,7 +118,7 @@ class RelatoriosView(TemplateView):
         # Receitas - OTIMIZADO com select_related - FILTRANDO POR FAZENDA
         receitas = Movimentacao.objects.filter(
             fazenda=fazenda_ativa,
-            categoria__tipo='receita',
+            tipo='receita',
             data__range=[data_inicio, data_fim]
         ).select_related('categoria', 'fazenda', 'parceiros')
         
@@ -71,7 +131,7 @@ class RelatoriosView(TemplateView):
         # Despesas - OTIMIZADO - FILTRANDO POR FAZENDA
         despesas = Movimentacao.objects.filter(
             fazenda=fazenda_ativa,
-            categoria__tipo='despesa',
+            tipo='despesa',
             data__range=[data_inicio, data_fim]
         ).select_related('categoria', 'fazenda', 'parceiros')
         
@@ -86,7 +146,7 @@ class RelatoriosView(TemplateView):
         
         # Parcelas pendentes - OTIMIZADO - FILTRANDO POR FAZENDA
         parcelas_pendentes = Parcela.objects.filter(
-            movimentacao__fazenda=fazenda_ativa,
+            fazenda=fazenda_ativa,
             data_vencimento__range=[data_inicio, data_fim]
         ).exclude(status_pagamento='Pago').select_related('movimentacao')
         
@@ -96,7 +156,7 @@ class RelatoriosView(TemplateView):
         
         # Parcelas pagas - OTIMIZADO - FILTRANDO POR FAZENDA
         parcelas_pagas = Parcela.objects.filter(
-            movimentacao__fazenda=fazenda_ativa,
+            fazenda=fazenda_ativa,
             data_quitacao__range=[data_inicio, data_fim],
             status_pagamento='Pago'
         ).select_related('movimentacao')
@@ -123,29 +183,22 @@ class RelatoriosView(TemplateView):
         
         # ========== DADOS DE MEDICAMENTOS ==========
         
-        # OTIMIZADO: Total de UNIDADES em estoque (soma de quantidade_disponivel) - FILTRANDO POR FAZENDA
-        # Igual à página de estoque de medicamentos
-        total_unidades_estoque = EntradaMedicamento.objects.filter(
+        # OTIMIZADO: Total de UNIDADES em estoque e medicamentos com estoque baixo (< 10 unidades)
+        # lidos do snapshot EstoqueMedicamento (uma linha por medicamento) - FILTRANDO POR FAZENDA
+        resumo_estoque = EstoqueMedicamento.objects.filter(
             medicamento__fazenda=fazenda_ativa,
-            quantidade_disponivel__gt=0
+            quantidade__gt=0
         ).aggregate(
-            total=Sum('quantidade_disponivel')
-        )['total'] or 0
+            total=Sum('quantidade'),
+            baixo_estoque=Count('id', filter=Q(quantidade__lt=10))
+        )
         
-        # OTIMIZADO: Calcular medicamentos com estoque baixo (< 10 unidades por medicamento) - FILTRANDO POR FAZENDA
-        estoques_por_medicamento = EntradaMedicamento.objects.filter(
-            medicamento__fazenda=fazenda_ativa
-        ).values(
-            'medicamento'
-        ).annotate(
-            total_estoque=Sum('quantidade_disponivel')
-        ).filter(total_estoque__gt=0, total_estoque__lt=10)
-        
-        medicamentos_baixo_estoque = estoques_por_medicamento.count()
+        total_unidades_estoque = resumo_estoque['total'] or 0
+        medicamentos_baixo_estoque = resumo_estoque['baixo_estoque']
         
         # Entradas no período - OTIMIZADO com only() - FILTRANDO POR FAZENDA
         entradas = EntradaMedicamento.objects.filter(
-            medicamento__fazenda=fazenda_ativa,
+            fazenda=fazenda_ativa,
             data_cadastro__range=[data_inicio, data_fim]
         ).only('id', 'quantidade', 'valor_medicamento', 'medicamento_id')
         
@@ -160,7 +213,7 @@ class RelatoriosView(TemplateView):
         data_vencimento_limite = hoje + timedelta(days=30)
         
         medicamentos_vencer = EntradaMedicamento.objects.filter(
-            medicamento__fazenda=fazenda_ativa,
+            fazenda=fazenda_ativa,
             validade__lte=data_vencimento_limite,
             validade__gte=hoje,
             quantidade_disponivel__gt=0
@@ -168,7 +221,7 @@ class RelatoriosView(TemplateView):
         
         # Medicamentos vencidos - OTIMIZADO - FILTRANDO POR FAZENDA
         medicamentos_vencidos = EntradaMedicamento.objects.filter(
-            medicamento__fazenda=fazenda_ativa,
+            fazenda=fazenda_ativa,
             validade__lt=hoje,
             quantidade_disponivel__gt=0
         ).only('id').count()
@@ -195,13 +248,13 @@ class RelatoriosView(TemplateView):
         data_limite_vencimento = hoje + timedelta(days=5)
         
         parcelas_vencidas = Parcela.objects.filter(
-            movimentacao__fazenda=fazenda_ativa,
+            fazenda=fazenda_ativa,
             data_vencimento__lt=hoje,
             status_pagamento__in=['Pendente', 'Atrasado']
         ).select_related('movimentacao__categoria')
         
         parcelas_vencer_5dias = Parcela.objects.filter(
-            movimentacao__fazenda=fazenda_ativa,
+            fazenda=fazenda_ativa,
             data_vencimento__gte=hoje,
             data_vencimento__lte=data_limite_vencimento,
             status_pagamento__in=['Pendente', 'Atrasado']
@@ -211,67 +264,21 @@ class RelatoriosView(TemplateView):
         parcelas_vencidas_list = list(parcelas_vencidas)
         parcelas_vencer_list = list(parcelas_vencer_5dias)
         
-        receitas_vencidas = [p for p in parcelas_vencidas_list if p.movimentacao.categoria.tipo == 'receita']
-        despesas_vencidas = [p for p in parcelas_vencidas_list if p.movimentacao.categoria.tipo == 'despesa']
-        receitas_vencer = [p for p in parcelas_vencer_list if p.movimentacao.categoria.tipo == 'receita']
-        despesas_vencer = [p for p in parcelas_vencer_list if p.movimentacao.categoria.tipo == 'despesa']
+        receitas_vencidas = [p for p in parcelas_vencidas_list if p.tipo == 'receita']
+        despesas_vencidas = [p for p in parcelas_vencidas_list if p.tipo == 'despesa']
+        receitas_vencer = [p for p in parcelas_vencer_list if p.tipo == 'receita']
+        despesas_vencer = [p for p in parcelas_vencer_list if p.tipo == 'despesa']
         
         # ========== DADOS PARA GRÁFICOS ==========
         
-        # OTIMIZADO: Gráfico comparativo usando UMA query + processamento em Python + CACHE - FILTRANDO POR FAZENDA
-        # Buscar últimos 6 meses de dados (iniciar 6 meses atrás)
-        inicio_6_meses = (hoje - timedelta(days=180)).replace(day=1)
-        cache_key = f'grafico_comparativo_6meses_{inicio_6_meses}_fazenda_{fazenda_ativa.id}'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            comparativo_labels = cached_data['labels']
-            comparativo_receitas = cached_data['receitas']
-            comparativo_despesas = cached_data['despesas']
-        else:
-            # Uma única query para todas as movimentações dos últimos 6 meses - FILTRANDO POR FAZENDA
-            from django.db.models.functions import TruncMonth
-            movimentacoes_mensais = Movimentacao.objects.filter(
-                fazenda=fazenda_ativa,
-                data__gte=inicio_6_meses
-            ).annotate(
-                mes=TruncMonth('data')
-            ).values('mes', 'categoria__tipo').annotate(
-                total=Sum('valor_total')
-            ).order_by('mes', 'categoria__tipo')
-            
-            # Preparar estrutura dos últimos 6 meses
-            comparativo_labels = []
-            comparativo_receitas = []
-            comparativo_despesas = []
-            
-            # Criar dicionário para facilitar lookup
-            dados_por_mes = {}
-            for mov in movimentacoes_mensais:
-                mes_key = mov['mes'].strftime('%Y-%m')
-                if mes_key not in dados_por_mes:
-                    dados_por_mes[mes_key] = {'receita': 0, 'despesa': 0}
-                
-                tipo = mov['categoria__tipo']
-                valor = float(mov['total'] or 0)
-                dados_por_mes[mes_key][tipo] = valor
-            
-            # Preencher arrays dos últimos 6 meses
-            for i in range(5, -1, -1):
-                data_ref = hoje - timedelta(days=30*i)
-                mes_key = data_ref.strftime('%Y-%m')
-                mes_label = data_ref.strftime('%b/%y')
-                
-                comparativo_labels.append(mes_label)
-                comparativo_receitas.append(dados_por_mes.get(mes_key, {}).get('receita', 0))
-                comparativo_despesas.append(dados_por_mes.get(mes_key, {}).get('despesa', 0))
-            
-            # Guardar no cache por 5 minutos (300 segundos)
-            cache.set(cache_key, {
-                'labels': comparativo_labels,
-                'receitas': comparativo_receitas,
-                'despesas': comparativo_despesas
-            }, 300)
+        # OTIMIZADO: Gráfico comparativo usando UMA query + processamento em Python + CACHE versionado por fazenda
+        comparativo = obter_ou_calcular(
+            fazenda_ativa, 'grafico_comparativo_6meses',
+            lambda: _calcular_comparativo_6_meses(fazenda_ativa, hoje), hoje
+        )
+        comparativo_labels = comparativo['labels']
+        comparativo_receitas = comparativo['receitas']
+        comparativo_despesas = comparativo['despesas']
         
         # ========== DADOS PARA GRÁFICOS APEXCHARTS ==========
         
@@ -360,15 +367,8 @@ class RelatoriosView(TemplateView):
         # ========== GRÁFICO: EVOLUÇÃO MENSAL DETALHADA (12 MESES) ==========
         inicio_12_meses = (hoje - timedelta(days=365)).replace(day=1)
         
-        from django.db.models.functions import TruncMonth
-        movimentacoes_12_meses = Movimentacao.objects.filter(
-            fazenda=fazenda_ativa,
-            data__gte=inicio_12_meses
-        ).annotate(
-            mes=TruncMonth('data')
-        ).values('mes', 'categoria__tipo').annotate(
-            total=Sum('valor_total')
-        ).order_by('mes', 'categoria__tipo')
+        # Resumo mensal: poucas linhas por mês, independente do volume de movimentações
+        dados_12_meses = _totais_mensais(fazenda_ativa, inicio_12_meses)
         
         # Estrutura para 12 meses
         evolucao_12_labels = []
@@ -376,16 +376,6 @@ class RelatoriosView(TemplateView):
         evolucao_12_despesas = []
         evolucao_12_saldo = []
         
-        dados_12_meses = {}
-        for mov in movimentacoes_12_meses:
-            mes_key = mov['mes'].strftime('%Y-%m')
-            if mes_key not in dados_12_meses:
-                dados_12_meses[mes_key] = {'receita': 0, 'despesa': 0}
-            
-            tipo = mov['categoria__tipo']
-            valor = float(mov['total'] or 0)
-            dados_12_meses[mes_key][tipo] = valor
-        
         # Preencher arrays dos últimos 12 meses
         for i in range(11, -1, -1):
             data_ref = hoje - timedelta(days=30*i)
@@ -502,21 +492,13 @@ class RelatoriosView(TemplateView):
         return context
 
 
-def gerar_pdf_relatorio(request):
-    """Gera PDF completo e detalhado do relatório - FILTRADO POR FAZENDA"""
-    
-    # Obter fazenda ativa
-    fazenda_ativa = request.fazenda_ativa if hasattr(request, 'fazenda_ativa') else None
+def _periodo_relatorio(request):
+    """Lê o período do relatório (periodo ou data_inicio/data_fim) da query string ou do POST"""
+    dados = request.POST if request.method == 'POST' else request.GET
+    periodo = dados.get('periodo', '30')
+    data_inicio = dados.get('data_inicio')
+    data_fim = dados.get('data_fim')
     
-    if not fazenda_ativa:
-        return HttpResponseForbidden("Selecione uma fazenda antes de gerar o relatório.")
-    
-    # Parâmetros de filtro
-    periodo = request.GET.get('periodo', '30')
-    data_inicio = request.GET.get('data_inicio')
-    data_fim = request.GET.get('data_fim')
-    
-    # Definir datas
     hoje = timezone.now().date()
     
     if data_inicio and data_fim:
@@ -526,454 +508,132 @@ def gerar_pdf_relatorio(request):
         dias = int(periodo)
         data_inicio_date = hoje - timedelta(days=dias)
         data_fim_date = hoje
+    return data_inicio_date, data_fim_date
+
+
+def gerar_pdf_relatorio(request):
+    """
+    Gera PDF completo e detalhado do relatório - FILTRADO POR FAZENDA
     
-    # Converter para datetime aware para filtros de DateTimeField
-    data_inicio_datetime = timezone.make_aware(datetime.combine(data_inicio_date, datetime.min.time()))
-    data_fim_datetime = timezone.make_aware(datetime.combine(data_fim_date, datetime.max.time()))
-    
-    # Criar buffer
-    buffer = io.BytesIO()
-    
-    # Criar PDF
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30,
-                           topMargin=30, bottomMargin=18)
-    
-    # Container para elementos
-    elements = []
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=20,
-        textColor=colors.HexColor('#2e7d32'),
-        spaceAfter=20,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#4a8f29'),
-        spaceAfter=10,
-        spaceBefore=15,
-        fontName='Helvetica-Bold'
-    )
-    
-    subheading_style = ParagraphStyle(
-        'SubHeading',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.HexColor('#666666'),
-        spaceAfter=15,
-        alignment=TA_CENTER
-    )
-    
-    # ====================
-    # CABEÇALHO
-    # ====================
-    # Obter horário local de Brasília
-    fuso_brasilia = pytz.timezone('America/Sao_Paulo')
-    agora_brasilia = timezone.now().astimezone(fuso_brasilia)
-    
-    elements.append(Paragraph("RELATÓRIO GERENCIAL COMPLETO", title_style))
-    elements.append(Paragraph("FARMEDICARE - Sistema de Gestão", subheading_style))
-    elements.append(Paragraph(f"Fazenda: {fazenda_ativa.nome}", subheading_style))
-    elements.append(Paragraph(
-        f"Período: {data_inicio_date.strftime('%d/%m/%Y')} até {data_fim_date.strftime('%d/%m/%Y')}", 
-        subheading_style
-    ))
-    elements.append(Paragraph(
-        f"Gerado em: {agora_brasilia.strftime('%d/%m/%Y às %H:%M:%S')}", 
-        subheading_style
-    ))
-    elements.append(Spacer(1, 20))
-    
-    # ====================
-    # 1. RESUMO FINANCEIRO
-    # ====================
-    elements.append(Paragraph("1. RESUMO FINANCEIRO GERAL", heading_style))
-    
-    # FILTRAR POR FAZENDA
-    receitas = Movimentacao.objects.filter(
-        fazenda=fazenda_ativa,
-        categoria__tipo='receita', 
-        data__range=[data_inicio_date, data_fim_date]
-    )
-    despesas = Movimentacao.objects.filter(
-        fazenda=fazenda_ativa,
-        categoria__tipo='despesa', 
-        data__range=[data_inicio_date, data_fim_date]
-    )
-    
-    total_receitas = receitas.aggregate(total=Sum('valor_total'))['total'] or Decimal('0.00')
-    total_despesas = despesas.aggregate(total=Sum('valor_total'))['total'] or Decimal('0.00')
-    saldo = total_receitas - total_despesas
-    count_receitas = receitas.count()
-    count_despesas = despesas.count()
-    
-    data_resumo = [
-        ['Descrição', 'Quantidade', 'Valor Total'],
-        ['💰 Total de Receitas', f'{count_receitas} lançamento(s)', 
-         f'R$ {total_receitas:,.2f}'.replace(',', '_').replace('.', ',').replace('_', '.')],
-        ['💸 Total de Despesas', f'{count_despesas} lançamento(s)', 
-         f'R$ {total_despesas:,.2f}'.replace(',', '_').replace('.', ',').replace('_', '.')],
-        ['💵 Saldo do Período', '-', 
-         f'R$ {saldo:,.2f}'.replace(',', '_').replace('.', ',').replace('_', '.')],
-    ]
-    
-    table_resumo = Table(data_resumo, colWidths=[9*cm, 4*cm, 5*cm])
-    table_resumo.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4a8f29')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'CENTER'),
-        ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.beige, colors.lightgrey]),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-    ]))
-    
-    elements.append(table_resumo)
-    elements.append(Spacer(1, 20))
-    
-    # ====================
-    # 2. DETALHAMENTO DE RECEITAS
-    # ====================
-    elements.append(Paragraph("2. RECEITAS DETALHADAS POR CATEGORIA", heading_style))
-    
-    receitas_por_categoria = receitas.values('categoria__nome').annotate(
-        total=Sum('valor_total'),
-        quantidade=Count('id')
-    ).order_by('-total')
-    
-    if receitas_por_categoria:
-        data_receitas = [['Posição', 'Categoria', 'Qtd. Lançamentos', 'Valor Total', '% do Total']]
-        
-        for idx, item in enumerate(receitas_por_categoria, 1):
-            percentual = (item['total'] / total_receitas * 100) if total_receitas > 0 else 0
-            data_receitas.append([
-                str(idx),
-                item['categoria__nome'] or 'Sem Categoria',
-                str(item['quantidade']),
-                f"R$ {item['total']:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.'),
-                f"{percentual:.1f}%"
-            ])
-        
-        table_receitas = Table(data_receitas, colWidths=[1.5*cm, 8*cm, 3*cm, 4*cm, 2*cm])
-        table_receitas.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4caf50')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('ALIGN', (2, 0), (2, -1), 'CENTER'),
-            ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.lightgreen, colors.white]),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        elements.append(table_receitas)
-    else:
-        elements.append(Paragraph("➤ Nenhuma receita registrada no período.", styles['Normal']))
-    
-    elements.append(Spacer(1, 20))
-    
-    # ====================
-    # 3. DETALHAMENTO DE DESPESAS
-    # ====================
-    elements.append(Paragraph("3. DESPESAS DETALHADAS POR CATEGORIA", heading_style))
+    Download direto (sem JavaScript). O dashboard usa o modo em segundo plano
+    (solicitar_pdf_relatorio + status_pdf_relatorio) para não prender o worker.
+    """
     
-    despesas_por_categoria = despesas.values('categoria__nome').annotate(
-        total=Sum('valor_total'),
-        quantidade=Count('id')
-    ).order_by('-total')
+    # Obter fazenda ativa
+    fazenda_ativa = request.fazenda_ativa if hasattr(request, 'fazenda_ativa') else None
     
-    if despesas_por_categoria:
-        data_despesas = [['Posição', 'Categoria', 'Qtd. Lançamentos', 'Valor Total', '% do Total']]
-        
-        for idx, item in enumerate(despesas_por_categoria, 1):
-            percentual = (item['total'] / total_despesas * 100) if total_despesas > 0 else 0
-            data_despesas.append([
-                str(idx),
-                item['categoria__nome'] or 'Sem Categoria',
-                str(item['quantidade']),
-                f"R$ {item['total']:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.'),
-                f"{percentual:.1f}%"
-            ])
-        
-        table_despesas = Table(data_despesas, colWidths=[1.5*cm, 8*cm, 3*cm, 4*cm, 2*cm])
-        table_despesas.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#ef5350')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('ALIGN', (2, 0), (2, -1), 'CENTER'),
-            ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.lightpink, colors.white]),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        elements.append(table_despesas)
-    else:
-        elements.append(Paragraph("➤ Nenhuma despesa registrada no período.", styles['Normal']))
+    if not fazenda_ativa:
+        return HttpResponseForbidden("Selecione uma fazenda antes de gerar o relatório.")
     
-    elements.append(PageBreak())
+    data_inicio_date, data_fim_date = _periodo_relatorio(request)
     
-    # ====================
-    # 4. ANÁLISE DE MEDICAMENTOS
-    # ====================
-    elements.append(Paragraph("4. ESTOQUE E MOVIMENTAÇÃO DE MEDICAMENTOS", heading_style))
+    # PDF escrito em arquivo temporário (apagado ao fechar a resposta)
+    arquivo = tempfile.TemporaryFile()
+    gerar_relatorio_pdf(arquivo, fazenda_ativa, data_inicio_date, data_fim_date)
+    arquivo.seek(0)
     
-    # Estatísticas gerais - FILTRADO POR FAZENDA
-    total_medicamentos = Medicamento.objects.filter(fazenda=fazenda_ativa).count()
-    entradas_periodo = EntradaMedicamento.objects.filter(
-        medicamento__fazenda=fazenda_ativa,
-        data_cadastro__range=[data_inicio_datetime, data_fim_datetime]
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename=nome_arquivo_relatorio(data_inicio_date, data_fim_date),
+        content_type='application/pdf'
     )
-    total_entradas = entradas_periodo.count()
-    
-    # Calcular valor total das entradas (valor_medicamento já é o valor TOTAL da entrada)
-    valor_total_entradas = entradas_periodo.aggregate(
-        total=Sum('valor_medicamento')
-    )['total'] or Decimal('0.00')
-    
-    # Medicamentos vencidos e próximos ao vencimento - FILTRADO POR FAZENDA
-    trinta_dias = hoje + timedelta(days=30)
-    
-    medicamentos_vencidos = EntradaMedicamento.objects.filter(
-        medicamento__fazenda=fazenda_ativa,
-        validade__lt=hoje,
-        quantidade_disponivel__gt=0
-    ).count()
-    
-    medicamentos_vencer = EntradaMedicamento.objects.filter(
-        medicamento__fazenda=fazenda_ativa,
-        validade__gte=hoje,
-        validade__lte=trinta_dias,
-        quantidade_disponivel__gt=0
-    ).count()
-    
-    data_med_resumo = [
-        ['Indicador', 'Valor'],
-        ['📦 Total de Medicamentos Cadastrados', str(total_medicamentos)],
-        ['📥 Entradas no Período', str(total_entradas)],
-        ['💰 Valor Total das Entradas', f'R$ {valor_total_entradas:,.2f}'.replace(',', '_').replace('.', ',').replace('_', '.')],
-        ['⚠️ Medicamentos Próximos ao Vencimento (30 dias)', str(medicamentos_vencer)],
-        ['❌ Medicamentos Vencidos com Estoque', str(medicamentos_vencidos)],
-    ]
-    
-    table_med_resumo = Table(data_med_resumo, colWidths=[14*cm, 4*cm])
-    table_med_resumo.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2196f3')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.lightblue, colors.white]),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    
-    elements.append(table_med_resumo)
-    elements.append(Spacer(1, 15))
-    
-    # ====================
-    # 5. LISTA COMPLETA DE MEDICAMENTOS
-    # ====================
-    elements.append(Paragraph("5. LISTA DETALHADA DE MEDICAMENTOS", heading_style))
-    
-    # FILTRAR POR FAZENDA
-    medicamentos = Medicamento.objects.filter(fazenda=fazenda_ativa).order_by('nome')
-    
-    if medicamentos:
-        data_med_lista = [['Nº', 'Medicamento', 'Fazenda', 'Qtd. Total', 'Status']]
-        
-        for idx, med in enumerate(medicamentos, 1):
-            quantidade = med.quantidade_total
-            
-            # Verificar status do estoque
-            if quantidade == 0:
-                status = '⚫ SEM ESTOQUE'
-            elif quantidade < 10:
-                status = '🔴 ESTOQUE BAIXO'
-            elif quantidade < 50:
-                status = '🟡 ESTOQUE MÉDIO'
-            else:
-                status = '🟢 ESTOQUE BOM'
-            
-            data_med_lista.append([
-                str(idx),
-                med.nome,
-                med.fazenda.nome if med.fazenda else 'N/A',
-                str(quantidade),
-                status
-            ])
-        
-        table_med_lista = Table(data_med_lista, colWidths=[1*cm, 7*cm, 4*cm, 2*cm, 4.5*cm])
-        table_med_lista.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#9c27b0')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-            ('ALIGN', (1, 0), (2, -1), 'LEFT'),
-            ('ALIGN', (3, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.lavender, colors.white]),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('TOPPADDING', (0, 0), (-1, -1), 5),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-        ]))
-        elements.append(table_med_lista)
-    else:
-        elements.append(Paragraph("➤ Nenhum medicamento cadastrado.", styles['Normal']))
-    
-    elements.append(PageBreak())
-    
-    # ====================
-    # 6. MEDICAMENTOS POR VALIDADE
-    # ====================
-    elements.append(Paragraph("6. MEDICAMENTOS: CONTROLE DE VALIDADE", heading_style))
-    
-    # Medicamentos vencidos - FILTRADO POR FAZENDA
-    entradas_vencidas = EntradaMedicamento.objects.filter(
-        medicamento__fazenda=fazenda_ativa,
-        validade__lt=hoje,
-        quantidade_disponivel__gt=0
-    ).select_related('medicamento').order_by('validade')
-    
-    if entradas_vencidas:
-        elements.append(Paragraph("⚠️ MEDICAMENTOS VENCIDOS COM ESTOQUE", 
-                                 ParagraphStyle('Alert', parent=styles['Normal'], fontSize=11, 
-                                              textColor=colors.red, fontName='Helvetica-Bold')))
-        elements.append(Spacer(1, 10))
-        
-        data_vencidos = [['Medicamento', 'Quantidade', 'Data Validade', 'Dias Vencido']]
-        
-        for entrada in entradas_vencidas:
-            dias_vencido = (hoje - entrada.validade).days
-            data_vencidos.append([
-                entrada.medicamento.nome,
-                str(entrada.quantidade_disponivel),
-                entrada.validade.strftime('%d/%m/%Y'),
-                f'{dias_vencido} dia(s)'
-            ])
-        
-        table_vencidos = Table(data_vencidos, colWidths=[9*cm, 2.5*cm, 3*cm, 4*cm])
-        table_vencidos.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.red),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.mistyrose, colors.white]),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('TOPPADDING', (0, 0), (-1, -1), 5),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-        ]))
-        elements.append(table_vencidos)
-        elements.append(Spacer(1, 15))
-    
-    # Medicamentos próximos ao vencimento - FILTRADO POR FAZENDA
-    entradas_vencer = EntradaMedicamento.objects.filter(
-        medicamento__fazenda=fazenda_ativa,
-        validade__gte=hoje,
-        validade__lte=trinta_dias,
-        quantidade_disponivel__gt=0
-    ).select_related('medicamento').order_by('validade')
-    
-    if entradas_vencer:
-        elements.append(Paragraph("⏰ MEDICAMENTOS PRÓXIMOS AO VENCIMENTO (30 DIAS)", 
-                                 ParagraphStyle('Warning', parent=styles['Normal'], fontSize=11, 
-                                              textColor=colors.orange, fontName='Helvetica-Bold')))
-        elements.append(Spacer(1, 10))
-        
-        data_vencer = [['Medicamento', 'Quantidade', 'Data Validade', 'Dias Restantes']]
-        
-        for entrada in entradas_vencer:
-            dias_restantes = (entrada.validade - hoje).days
-            data_vencer.append([
-                entrada.medicamento.nome,
-                str(entrada.quantidade_disponivel),
-                entrada.validade.strftime('%d/%m/%Y'),
-                f'{dias_restantes} dia(s)'
-            ])
-        
-        table_vencer = Table(data_vencer, colWidths=[9*cm, 2.5*cm, 3*cm, 4*cm])
-        table_vencer.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.orange),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.lightyellow, colors.white]),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('TOPPADDING', (0, 0), (-1, -1), 5),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-        ]))
-        elements.append(table_vencer)
-    
-    if not entradas_vencidas and not entradas_vencer:
-        elements.append(Paragraph("✅ Não há medicamentos vencidos ou próximos ao vencimento.", 
-                                 ParagraphStyle('Success', parent=styles['Normal'], fontSize=10, 
-                                              textColor=colors.green)))
-    
-    # ====================
-    # RODAPÉ
-    # ====================
-    elements.append(Spacer(1, 30))
-    elements.append(Paragraph("_" * 80, styles['Normal']))
-    elements.append(Spacer(1, 10))
-    elements.append(Paragraph(
-        f"Relatório completo gerado pelo sistema FARMEDICARE em {agora_brasilia.strftime('%d/%m/%Y às %H:%M:%S')}",
-        ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, 
-                      textColor=colors.grey, alignment=TA_CENTER)
-    ))
+
+
+
+def _dados_job(job):
+    """Estado do job em JSON (download_url só quando o PDF está pronto)"""
+    return {
+        'id': str(job.pk),
+        'status': job.status,
+        'progresso': job.progresso,
+        'etapa': job.etapa,
+        'erro': job.erro,
+        'status_url': reverse('status_pdf_relatorio', args=[job.pk]),
+        'download_url': reverse('download_pdf_relatorio', args=[job.pk]) if job.status == 'concluido' else None,
+    }
+
+
+def _job_da_fazenda(request, job_id):
+    """Busca o job garantindo que ele pertence à fazenda ativa"""
+    fazenda_ativa = request.fazenda_ativa if hasattr(request, 'fazenda_ativa') else None
+    if not fazenda_ativa:
+        raise Http404
+    return get_object_or_404(RelatorioJob, pk=job_id, fazenda=fazenda_ativa)
+
+
+@require_POST
+def solicitar_pdf_relatorio(request):
+    """Enfileira a geração do PDF em segundo plano e retorna o job criado"""
+    fazenda_ativa = request.fazenda_ativa if hasattr(request, 'fazenda_ativa') else None
     
-    # Construir PDF
-    doc.build(elements)
+    if not fazenda_ativa:
+        return JsonResponse({'erro': 'Selecione uma fazenda antes de gerar o relatório.'}, status=403)
     
-    # Retornar resposta
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="relatorio_completo_{data_inicio_date.strftime("%Y%m%d")}_{data_fim_date.strftime("%Y%m%d")}.pdf"'
+    data_inicio_date, data_fim_date = _periodo_relatorio(request)
+    job = enfileirar_relatorio(fazenda_ativa, request.user, data_inicio_date, data_fim_date)
     
-    return response
+    return JsonResponse(_dados_job(job), status=202)
+
+
+def status_pdf_relatorio(request, job_id):
+    """Progresso do job de PDF (consultado periodicamente pelo dashboard)"""
+    job = _job_da_fazenda(request, job_id)
+    return JsonResponse(_dados_job(job))
 
 
+def download_pdf_relatorio(request, job_id):
+    """Serve o PDF gerado pelo job direto do disco"""
+    job = _job_da_fazenda(request, job_id)
+    caminho = job.caminho_arquivo
+    
+    if job.status != 'concluido' or not caminho:
+        return JsonResponse(_dados_job(job), status=409)
+    
+    try:
+        arquivo = open(caminho, 'rb')
+    except FileNotFoundError:
+        raise Http404("O arquivo do relatório expirou. Gere o relatório novamente.")
+    
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename=nome_arquivo_relatorio(job.data_inicio, job.data_fim),
+        content_type='application/pdf'
+    )
+
 # ========== API DE NOTIFICAÇÕES ESTILO FACEBOOK ==========
 
+def _geracao_notificacoes(request):
+    """Marcador de notificações da fazenda ativa, lido uma vez por requisição"""
+    if not hasattr(request, '_geracao_notificacoes'):
+        fazenda_ativa = getattr(request, 'fazenda_ativa', None)
+        request._geracao_notificacoes = garantir_notificacoes(fazenda_ativa) if fazenda_ativa else None
+    return request._geracao_notificacoes
+
+
+def _etag_notificacoes(request):
+    geracao = _geracao_notificacoes(request)
+    return token_notificacoes(request.fazenda_ativa, geracao) if geracao else None
+
+
+def _ultima_alteracao_notificacoes(request):
+    geracao = _geracao_notificacoes(request)
+    return geracao.atualizado_em if geracao else None
+
+
+@condition(etag_func=_etag_notificacoes, last_modified_func=_ultima_alteracao_notificacoes)
 def api_notificacoes(request):
     """
     API que retorna notificações detalhadas estilo Facebook
     - Parcelas de receitas vencidas ou próximas do vencimento (5 dias)
     - Parcelas de despesas vencidas ou próximas do vencimento (5 dias)
     - Medicamentos vencidos ou próximos do vencimento (30 dias)
+
+    OTIMIZADO: lê a tabela de notificações materializadas (relatorios.notificacoes),
+    uma única query indexada já ordenada por urgência e vencimento.
+    A versão da fazenda é o ETag: se nada mudou, responde 304 lendo só o marcador;
+    com ?since=<versao> devolve apenas as notificações alteradas depois dela.
     """
     # Obter fazenda ativa
     fazenda_ativa = request.fazenda_ativa if hasattr(request, 'fazenda_ativa') else None
@@ -985,280 +645,70 @@ def api_notificacoes(request):
             'notificacoes': []
         })
     
-    hoje = timezone.now().date()
-    data_limite_5dias = hoje + timedelta(days=5)
-    data_limite_30dias = hoje + timedelta(days=30)
-    
-    notificacoes = []
-    
-    # ========== PARCELAS DE RECEITAS ==========
-    
-    # Receitas vencidas (não pagas) - OTIMIZADO com select_related - FILTRANDO POR FAZENDA
-    receitas_vencidas = Parcela.objects.filter(
-        movimentacao__fazenda=fazenda_ativa,
-        movimentacao__categoria__tipo='receita',
-        data_vencimento__lt=hoje,
-        status_pagamento='Pendente'
-    ).select_related(
-        'movimentacao__parceiros', 
-        'movimentacao__categoria', 
-        'movimentacao__fazenda'
-    ).only(
-        'id', 'ordem_parcela', 'valor_parcela', 'data_vencimento',
-        'movimentacao__parcelas', 'movimentacao__descricao',
-        'movimentacao__parceiros__nome',
-        'movimentacao__categoria__nome',
-        'movimentacao__fazenda__nome'
-    )
-    
-    for parcela in receitas_vencidas:
-        dias_atraso = (hoje - parcela.data_vencimento).days
-        notificacoes.append({
-            'tipo': 'receita_vencida',
-            'categoria': 'vencido',
-            'urgencia': 3,  # Crítico
-            'icone': 'fa-hand-holding-usd',
-            'cor': '#2e7d32',  # Verde escuro para receitas
-            'cor_bg': '#e8f5e9',  # Fundo verde claro
-            'cor_border': '#4caf50',  # Borda verde
-            'titulo': f'Receita Vencida - {dias_atraso} dia(s) de atraso',
-            'mensagem': f'Parcela {parcela.ordem_parcela}/{parcela.movimentacao.parcelas} vencida há {dias_atraso} dia(s)',
-            'parcela_numero': parcela.ordem_parcela,
-            'total_parcelas': parcela.movimentacao.parcelas,
-            'valor': float(parcela.valor_parcela),
-            'data_vencimento': parcela.data_vencimento.strftime('%d/%m/%Y'),
-            'data_vencimento_raw': parcela.data_vencimento.isoformat(),
-            'parceiro': parcela.movimentacao.parceiros.nome if parcela.movimentacao.parceiros else 'Sem parceiro',
-            'categoria_nome': parcela.movimentacao.categoria.nome,
-            'descricao': parcela.movimentacao.descricao or '',
-            'fazenda': parcela.movimentacao.fazenda.nome,
-            'id_parcela': parcela.id,
-        })
-    
-    # Receitas a vencer (próximas 5 dias) - OTIMIZADO - FILTRANDO POR FAZENDA
-    receitas_vencer = Parcela.objects.filter(
-        movimentacao__fazenda=fazenda_ativa,
-        movimentacao__categoria__tipo='receita',
-        data_vencimento__gte=hoje,
-        data_vencimento__lte=data_limite_5dias,
-        status_pagamento='Pendente'
-    ).select_related(
-        'movimentacao__parceiros', 
-        'movimentacao__categoria', 
-        'movimentacao__fazenda'
-    ).only(
-        'id', 'ordem_parcela', 'valor_parcela', 'data_vencimento',
-        'movimentacao__parcelas', 'movimentacao__descricao',
-        'movimentacao__parceiros__nome',
-        'movimentacao__categoria__nome',
-        'movimentacao__fazenda__nome'
-    )
-    
-    for parcela in receitas_vencer:
-        dias_restantes = (parcela.data_vencimento - hoje).days
-        urgencia = 2 if dias_restantes <= 2 else 1
-        categoria = 'muito_proximo' if dias_restantes <= 2 else 'proximo'
-        cor = '#43a047' if dias_restantes <= 2 else '#66bb6a'  # Verde médio/claro
-        
-        notificacoes.append({
-            'tipo': 'receita_vencer',
-            'categoria': categoria,
-            'urgencia': urgencia,
-            'icone': 'fa-hand-holding-usd',
-            'cor': cor,
-            'cor_bg': '#f1f8e9',  # Fundo verde bem claro
-            'cor_border': '#8bc34a',  # Borda verde claro
-            'titulo': f'Receita a Vencer em {dias_restantes} dia(s)',
-            'mensagem': f'Parcela {parcela.ordem_parcela}/{parcela.movimentacao.parcelas} vence em {dias_restantes} dia(s)',
-            'parcela_numero': parcela.ordem_parcela,
-            'total_parcelas': parcela.movimentacao.parcelas,
-            'valor': float(parcela.valor_parcela),
-            'data_vencimento': parcela.data_vencimento.strftime('%d/%m/%Y'),
-            'data_vencimento_raw': parcela.data_vencimento.isoformat(),
-            'parceiro': parcela.movimentacao.parceiros.nome if parcela.movimentacao.parceiros else 'Sem parceiro',
-            'categoria_nome': parcela.movimentacao.categoria.nome,
-            'descricao': parcela.movimentacao.descricao or '',
-            'fazenda': parcela.movimentacao.fazenda.nome,
-            'id_parcela': parcela.id,
-        })
-    
-    # ========== PARCELAS DE DESPESAS ==========
-    
-    # Despesas vencidas (não pagas) - OTIMIZADO - FILTRANDO POR FAZENDA
-    despesas_vencidas = Parcela.objects.filter(
-        movimentacao__fazenda=fazenda_ativa,
-        movimentacao__categoria__tipo='despesa',
-        data_vencimento__lt=hoje,
-        status_pagamento='Pendente'
-    ).select_related(
-        'movimentacao__parceiros', 
-        'movimentacao__categoria', 
-        'movimentacao__fazenda'
-    ).only(
-        'id', 'ordem_parcela', 'valor_parcela', 'data_vencimento',
-        'movimentacao__parcelas', 'movimentacao__descricao',
-        'movimentacao__parceiros__nome',
-        'movimentacao__categoria__nome',
-        'movimentacao__fazenda__nome'
-    )
-    
-    for parcela in despesas_vencidas:
-        dias_atraso = (hoje - parcela.data_vencimento).days
-        notificacoes.append({
-            'tipo': 'despesa_vencida',
-            'categoria': 'vencido',
-            'urgencia': 3,  # Crítico
-            'icone': 'fa-file-invoice-dollar',
-            'cor': '#f57c00',  # Laranja escuro para despesas
-            'cor_bg': '#fff3e0',  # Fundo laranja claro
-            'cor_border': '#ff9800',  # Borda laranja
-            'titulo': f'Despesa Vencida - {dias_atraso} dia(s) de atraso',
-            'mensagem': f'Parcela {parcela.ordem_parcela}/{parcela.movimentacao.parcelas} vencida há {dias_atraso} dia(s)',
-            'parcela_numero': parcela.ordem_parcela,
-            'total_parcelas': parcela.movimentacao.parcelas,
-            'valor': float(parcela.valor_parcela),
-            'data_vencimento': parcela.data_vencimento.strftime('%d/%m/%Y'),
-            'data_vencimento_raw': parcela.data_vencimento.isoformat(),
-            'parceiro': parcela.movimentacao.parceiros.nome if parcela.movimentacao.parceiros else 'Sem parceiro',
-            'categoria_nome': parcela.movimentacao.categoria.nome,
-            'descricao': parcela.movimentacao.descricao or '',
-            'fazenda': parcela.movimentacao.fazenda.nome,
-            'id_parcela': parcela.id,
-        })
-    
-    # Despesas a vencer (próximas 5 dias) - OTIMIZADO - FILTRANDO POR FAZENDA
-    despesas_vencer = Parcela.objects.filter(
-        movimentacao__fazenda=fazenda_ativa,
-        movimentacao__categoria__tipo='despesa',
-        data_vencimento__gte=hoje,
-        data_vencimento__lte=data_limite_5dias,
-        status_pagamento='Pendente'
-    ).select_related(
-        'movimentacao__parceiros', 
-        'movimentacao__categoria', 
-        'movimentacao__fazenda'
-    ).only(
-        'id', 'ordem_parcela', 'valor_parcela', 'data_vencimento',
-        'movimentacao__parcelas', 'movimentacao__descricao',
-        'movimentacao__parceiros__nome',
-        'movimentacao__categoria__nome',
-        'movimentacao__fazenda__nome'
-    )
-    
-    for parcela in despesas_vencer:
-        dias_restantes = (parcela.data_vencimento - hoje).days
-        urgencia = 2 if dias_restantes <= 2 else 1
-        categoria = 'muito_proximo' if dias_restantes <= 2 else 'proximo'
-        cor = '#fb8c00' if dias_restantes <= 2 else '#ffa726'  # Laranja médio/claro
-        
-        notificacoes.append({
-            'tipo': 'despesa_vencer',
-            'categoria': categoria,
-            'urgencia': urgencia,
-            'icone': 'fa-file-invoice-dollar',
-            'cor': cor,
-            'cor_bg': '#fff8e1',  # Fundo amarelo claro
-            'cor_border': '#ffb74d',  # Borda laranja claro
-            'titulo': f'Despesa a Vencer em {dias_restantes} dia(s)',
-            'mensagem': f'Parcela {parcela.ordem_parcela}/{parcela.movimentacao.parcelas} vence em {dias_restantes} dia(s)',
-            'parcela_numero': parcela.ordem_parcela,
-            'total_parcelas': parcela.movimentacao.parcelas,
-            'valor': float(parcela.valor_parcela),
-            'data_vencimento': parcela.data_vencimento.strftime('%d/%m/%Y'),
-            'data_vencimento_raw': parcela.data_vencimento.isoformat(),
-            'parceiro': parcela.movimentacao.parceiros.nome if parcela.movimentacao.parceiros else 'Sem parceiro',
-            'categoria_nome': parcela.movimentacao.categoria.nome,
-            'descricao': parcela.movimentacao.descricao or '',
-            'fazenda': parcela.movimentacao.fazenda.nome,
-            'id_parcela': parcela.id,
-        })
-    
-    # ========== MEDICAMENTOS ==========
-    
-    # Medicamentos vencidos - OTIMIZADO - FILTRANDO POR FAZENDA
-    medicamentos_vencidos = EntradaMedicamento.objects.filter(
-        medicamento__fazenda=fazenda_ativa,
-        validade__lt=hoje,
-        quantidade_disponivel__gt=0
-    ).select_related('medicamento', 'medicamento__fazenda').only(
-        'id', 'quantidade_disponivel', 'validade',
-        'medicamento__id', 'medicamento__nome',
-        'medicamento__fazenda__nome'
-    )
-    
-    for entrada in medicamentos_vencidos:
-        dias_vencido = (hoje - entrada.validade).days
-        notificacoes.append({
-            'tipo': 'medicamento_vencido',
-            'categoria': 'vencido',
-            'urgencia': 3,
-            'icone': 'fa-pills',
-            'cor': '#5e35b1',  # Roxo escuro para medicamentos
-            'cor_bg': '#ede7f6',  # Fundo roxo claro
-            'cor_border': '#7e57c2',  # Borda roxo
-            'titulo': f'Medicamento Vencido há {dias_vencido} dia(s)',
-            'mensagem': f'Venceu há {dias_vencido} dia(s)',
-            'medicamento': entrada.medicamento.nome,
-            'fazenda': entrada.medicamento.fazenda.nome,
-            'lote': f'ID-{entrada.id}',
-            'quantidade': entrada.quantidade_disponivel,
-            'validade': entrada.validade.strftime('%d/%m/%Y'),
-            'validade_raw': entrada.validade.isoformat(),
-            'id_entrada': entrada.id,
-        })
-    
-    # Medicamentos a vencer (30 dias) - OTIMIZADO - FILTRANDO POR FAZENDA
-    medicamentos_vencer = EntradaMedicamento.objects.filter(
-        medicamento__fazenda=fazenda_ativa,
-        validade__gte=hoje,
-        validade__lte=data_limite_30dias,
-        quantidade_disponivel__gt=0
-    ).select_related('medicamento', 'medicamento__fazenda').only(
-        'id', 'quantidade_disponivel', 'validade',
-        'medicamento__id', 'medicamento__nome',
-        'medicamento__fazenda__nome'
-    )
-    
-    for entrada in medicamentos_vencer:
-        dias_restantes = (entrada.validade - hoje).days
-        if dias_restantes <= 7:
-            urgencia = 2
-            categoria = 'muito_proximo'
-            cor = '#7b1fa2'  # Roxo médio
+    try:
+        since = int(request.GET['since'])
+    except (KeyError, ValueError):
+        since = None
+
+    response = JsonResponse(payload_notificacoes(fazenda_ativa, _geracao_notificacoes(request), since))
+    # O navegador guarda a resposta, mas revalida (If-None-Match) a cada consulta
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _evento_sse(evento, dados, versao):
+    return f'id: {versao}\nevent: {evento}\ndata: {json.dumps(dados)}\n\n'
+
+
+async def _eventos_notificacoes(fazenda, versao):
+    """
+    Verifica a versão da fazenda a cada intervalo (uma query no marcador) e envia
+    as notificações alteradas quando ela muda; sem mudança, só um comentário de
+    keep-alive. Encerra após NOTIFICACOES_STREAM_DURACAO: o navegador reconecta
+    sozinho, enviando a última versão recebida em Last-Event-ID.
+    """
+    garantir = sync_to_async(garantir_notificacoes)
+    payload = sync_to_async(payload_notificacoes)
+    limite = time.monotonic() + settings.NOTIFICACOES_STREAM_DURACAO
+
+    yield 'retry: 3000\n\n'
+    while True:
+        geracao = await garantir(fazenda)
+        if geracao.versao != versao:
+            dados = await payload(fazenda, geracao, versao)
+            yield _evento_sse('notificacoes', dados, geracao.versao)
+            versao = geracao.versao
         else:
-            urgencia = 1
-            categoria = 'proximo'
-            cor = '#9c27b0'  # Roxo claro
-        
-        notificacoes.append({
-            'tipo': 'medicamento_vencer',
-            'categoria': categoria,
-            'urgencia': urgencia,
-            'icone': 'fa-pills',
-            'cor': cor,
-            'cor_bg': '#f3e5f5',  # Fundo roxo bem claro
-            'cor_border': '#ab47bc',  # Borda roxo claro
-            'titulo': f'Medicamento Vence em {dias_restantes} dia(s)',
-            'mensagem': f'Vence em {dias_restantes} dia(s)',
-            'medicamento': entrada.medicamento.nome,
-            'fazenda': entrada.medicamento.fazenda.nome,
-            'lote': f'ID-{entrada.id}',
-            'quantidade': entrada.quantidade_disponivel,
-            'validade': entrada.validade.strftime('%d/%m/%Y'),
-            'validade_raw': entrada.validade.isoformat(),
-            'id_entrada': entrada.id,
-        })
-    
-    # Ordenar por urgência (3 = crítico primeiro) e depois por data
-    notificacoes.sort(key=lambda x: (
-        -x['urgencia'],
-        x.get('data_vencimento_raw', x.get('validade_raw', ''))
-    ))
-    
-    return JsonResponse({
-        'total': len(notificacoes),
-        'notificacoes': notificacoes
-    })
+            yield ': ping\n\n'
+        if time.monotonic() >= limite:
+            return
+        await asyncio.sleep(settings.NOTIFICACOES_STREAM_INTERVALO)
+
+
+async def stream_notificacoes(request):
+    """
+    Stream (Server-Sent Events) das notificações da fazenda ativa: substitui a
+    consulta periódica da API por uma conexão por aba, que recebe o total do badge
+    e as notificações alteradas (mesmo formato do modo since= da API).
+
+    Com o stream desligado (NOTIFICACOES_STREAM) responde 204, e o EventSource do
+    navegador desiste: o notificacoes.js volta a consultar a API.
+    """
+    fazenda_ativa = getattr(request, 'fazenda_ativa', None)
+    if not settings.NOTIFICACOES_STREAM or not fazenda_ativa:
+        return HttpResponse(status=204)
+
+    try:
+        versao = int(request.headers.get('Last-Event-ID') or request.GET.get('since'))
+    except (TypeError, ValueError):
+        versao = None
+
+    response = StreamingHttpResponse(
+        _eventos_notificacoes(fazenda_ativa, versao), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: não acumular os eventos
+    return response
 
 
 def notificacoes_page(request):
@@ -1283,70 +733,19 @@ def notificacoes_page(request):
         }
         return render(request, 'relatorios/notificacoes_unificadas.html', context)
     
-    hoje = timezone.now().date()
-    data_limite_5dias = hoje + timedelta(days=5)
-    data_limite_30dias = hoje + timedelta(days=30)
-    
-    # Contadores OTIMIZADOS - usar only('id') para count - FILTRANDO POR FAZENDA
-    receitas_vencidas = Parcela.objects.filter(
-        movimentacao__fazenda=fazenda_ativa,
-        movimentacao__categoria__tipo='receita',
-        data_vencimento__lt=hoje,
-        status_pagamento='Pendente'
-    ).only('id').count()
-    
-    receitas_vencer = Parcela.objects.filter(
-        movimentacao__fazenda=fazenda_ativa,
-        movimentacao__categoria__tipo='receita',
-        data_vencimento__gte=hoje,
-        data_vencimento__lte=data_limite_5dias,
-        status_pagamento='Pendente'
-    ).only('id').count()
-    
-    despesas_vencidas = Parcela.objects.filter(
-        movimentacao__fazenda=fazenda_ativa,
-        movimentacao__categoria__tipo='despesa',
-        data_vencimento__lt=hoje,
-        status_pagamento='Pendente'
-    ).only('id').count()
-    
-    despesas_vencer = Parcela.objects.filter(
-        movimentacao__fazenda=fazenda_ativa,
-        movimentacao__categoria__tipo='despesa',
-        data_vencimento__gte=hoje,
-        data_vencimento__lte=data_limite_5dias,
-        status_pagamento='Pendente'
-    ).only('id').count()
-    
-    medicamentos_vencidos = EntradaMedicamento.objects.filter(
-        medicamento__fazenda=fazenda_ativa,
-        validade__lt=hoje,
-        quantidade_disponivel__gt=0
-    ).only('id').count()
-    
-    medicamentos_vencer = EntradaMedicamento.objects.filter(
-        medicamento__fazenda=fazenda_ativa,
-        validade__gte=hoje,
-        validade__lte=data_limite_30dias,
-        quantidade_disponivel__gt=0
-    ).only('id').count()
-    
-    total = (
-        receitas_vencidas + receitas_vencer +
-        despesas_vencidas + despesas_vencer +
-        medicamentos_vencidos + medicamentos_vencer
-    )
+    # Contadores OTIMIZADOS - resumo compartilhado com o badge (tabela materializada) - FILTRANDO POR FAZENDA
+    resumo = resumo_notificacoes(fazenda_ativa, request=request)
     
     context = {
         'titulo': 'Notificações',
         'title': 'Notificações - Farmedicare',
-        'total': total,
-        'receitas_vencidas': receitas_vencidas,
-        'receitas_vencer': receitas_vencer,
-        'despesas_vencidas': despesas_vencidas,
-        'despesas_vencer': despesas_vencer,
-        'medicamentos_vencidos': medicamentos_vencidos,
-        'medicamentos_vencer': medicamentos_vencer,
+        'total': resumo['total'],
+        'receitas_vencidas': resumo['receitas_vencidas'],
+        'receitas_vencer': resumo['receitas_vencer'],
+        'despesas_vencidas': resumo['despesas_vencidas'],
+        'despesas_vencer': resumo['despesas_vencer'],
+        'medicamentos_vencidos': resumo['medicamentos_vencidos'],
+        'medicamentos_vencer': resumo['medicamentos_vencer'],
     }
     
     return render(request, 'relatorios/notificacoes_unificadas.html', context)
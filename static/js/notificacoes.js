@@ -10,13 +10,8 @@ document.addEventListener('DOMContentLoaded', function() {
     
     let notificacoesCarregadas = false;
     
-    // Carregar contador inicial ao carregar a página
-    fetch('/relatorios/api/notificacoes/')
-        .then(response => response.json())
-        .then(data => {
-            atualizarBadge(data.total);
-        })
-        .catch(error => console.error('Erro ao carregar contador:', error));
+    // Contador inicial e atualizações: stream do servidor ou, sem ele, consulta periódica
+    iniciarStreamNotificacoes();
     
     // Abrir popup de notificações
     notificationBtn.addEventListener('click', function(e) {
@@ -49,8 +44,136 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// Última resposta da API guardada na sessão: as consultas seguintes pedem só o que
+// mudou desde a versão guardada (?since=) e o navegador revalida pelo ETag (304)
+const CHAVE_CACHE_NOTIFICACOES = 'notificacoes_api';
+
+function lerCacheNotificacoes() {
+    try {
+        return JSON.parse(sessionStorage.getItem(CHAVE_CACHE_NOTIFICACOES));
+    } catch (e) {
+        return null;
+    }
+}
+
+function gravarCacheNotificacoes(data) {
+    try {
+        sessionStorage.setItem(CHAVE_CACHE_NOTIFICACOES, JSON.stringify({
+            versao: data.versao,
+            notificacoes: data.notificacoes
+        }));
+    } catch (e) {
+        // Sem sessionStorage (modo privado/cota): segue sem o modo incremental
+    }
+}
+
+// Junta a resposta do modo since= com as notificações guardadas, na ordem atual
+// informada pelo servidor (null se o que está guardado não basta)
+function mesclarNotificacoes(cache, data) {
+    if (!data.delta) {
+        return data;
+    }
+    if (!cache || !cache.notificacoes) {
+        return null;
+    }
+    const porChave = {};
+    cache.notificacoes.forEach(notif => { porChave[notif.chave] = notif; });
+    data.notificacoes.forEach(notif => { porChave[notif.chave] = notif; });
+    if (data.chaves.some(chave => !porChave[chave])) {
+        return null;  // Cache de outra fazenda ou incompleto
+    }
+    return {
+        total: data.total,
+        versao: data.versao,
+        notificacoes: data.chaves.map(chave => porChave[chave])
+    };
+}
+
+function consultarApiNotificacoes(since) {
+    const url = '/relatorios/api/notificacoes/' + (since ? `?since=${since}` : '');
+    return fetch(url, { cache: 'no-cache', credentials: 'same-origin' })
+        .then(response => response.json());
+}
+
+function buscarNotificacoes() {
+    const cache = lerCacheNotificacoes();
+    const since = cache && cache.versao ? cache.versao : null;
+
+    return consultarApiNotificacoes(since).then(data => {
+        return mesclarNotificacoes(cache, data) || consultarApiNotificacoes(null);
+    }).then(data => {
+        if (data.versao !== undefined) {
+            gravarCacheNotificacoes(data);
+        }
+        return data;
+    });
+}
+
+// ========== STREAM (SERVER-SENT EVENTS) COM FALLBACK PARA CONSULTA PERIÓDICA ==========
+const URL_STREAM_NOTIFICACOES = '/relatorios/api/notificacoes/stream/';
+const INTERVALO_CONSULTA_NOTIFICACOES = 60000;
+let streamNotificacoesAtivo = false;
+
+function iniciarStreamNotificacoes() {
+    if (!window.EventSource) {
+        iniciarConsultaPeriodica();
+        return;
+    }
+
+    const cache = lerCacheNotificacoes();
+    const since = cache && cache.versao ? `?since=${cache.versao}` : '';
+    const fonte = new EventSource(URL_STREAM_NOTIFICACOES + since);
+
+    fonte.addEventListener('open', () => { streamNotificacoesAtivo = true; });
+
+    fonte.addEventListener('notificacoes', evento => {
+        const data = mesclarNotificacoes(lerCacheNotificacoes(), JSON.parse(evento.data));
+        if (!data) {
+            buscarNotificacoes().then(aplicarNotificacoes);
+            return;
+        }
+        gravarCacheNotificacoes(data);
+        aplicarNotificacoes(data);
+    });
+
+    fonte.addEventListener('error', () => {
+        // Stream desligado (204) ou indisponível: o navegador não vai reconectar
+        if (fonte.readyState === EventSource.CLOSED) {
+            streamNotificacoesAtivo = false;
+            iniciarConsultaPeriodica();
+        }
+    });
+}
+
+function iniciarConsultaPeriodica() {
+    const consultar = () => buscarNotificacoes()
+        .then(aplicarNotificacoes)
+        .catch(error => console.error('Erro ao carregar contador:', error));
+    consultar();
+    setInterval(() => {
+        if (!document.hidden) {
+            consultar();
+        }
+    }, INTERVALO_CONSULTA_NOTIFICACOES);
+}
+
+function aplicarNotificacoes(data) {
+    atualizarBadge(data.total);
+    const notificationPopup = document.getElementById('notificationPopup');
+    if (notificationPopup && notificationPopup.classList.contains('show')) {
+        renderizarNotificacoes(data);
+    }
+}
+
 function carregarNotificacoes() {
     const notificationBody = document.getElementById('notificationPopupBody');
+
+    // Com o stream ativo, as notificações guardadas já estão atualizadas
+    const cache = lerCacheNotificacoes();
+    if (streamNotificacoesAtivo && cache && cache.notificacoes) {
+        renderizarNotificacoes(cache);
+        return;
+    }
     
     // Mostrar loading
     notificationBody.innerHTML = `
@@ -60,8 +183,7 @@ function carregarNotificacoes() {
         </div>
     `;
     
-    fetch('/relatorios/api/notificacoes/')
-        .then(response => response.json())
+    buscarNotificacoes()
         .then(data => {
             renderizarNotificacoes(data);
             atualizarBadge(data.total);